@@ -8,14 +8,43 @@ Simple Flask API server to serve converted fragment files to the frontend.
 
 import os
 import json
+import time
 import subprocess
 import tempfile
+import threading
+import uuid
 from pathlib import Path
 from datetime import datetime
-from flask import Flask, jsonify, send_file, request
+from flask import Flask, jsonify, request
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
 
+from src.startup import StartupReport, load_env_file
+from src.converter_runner import ConverterRunner
+from src.scheduler import ConversionScheduler, INTERACTIVE
+from src.job_store import JobStore
+from src.storage import make_storage, ShardedLocalStorage
+from src.http_utils import send_stored_file, register_tracing, register_direct_uploads
+from src.model_index import ModelIndex
+from src.pipeline import PostConversionPipeline
+from src.lod import LodSettings
+from src.model_api import register_model_api
+from src.model_catalog import parse_fields, select_fields
+from src.project_bundle import ProjectStore, ProjectBundler
+from src.project_api import register_project_api
+from src.ifc_prune import get_profile, pruned_input, with_conversion_time
+from src.tiled_conversion import TiledConverter, TILESET_SUFFIX, tileset_name
+from src.profiling import ProfileStore, PROFILE_ID_RE
+from src.conversion_history import ConversionHistory, result_status
+from src.conversion_estimator import ConversionEstimator, job_etas
+from src.history_api import register_history_api
+from src.profile_api import register_profile_api, profiling_requested, link_request_profile, profile_url
+from src.tracing import configure_tracing, current_traceparent
+
+# Startup milestones of this process, printed when the server is ready and returned by /health
+STARTUP = StartupReport()
+STARTUP.mark("imports")
+
 app = Flask(__name__)
 CORS(app)
 
@@ -25,20 +54,205 @@ BACKEND_DIR = Path(__file__).parent
 PROJECT_ROOT = BACKEND_DIR.parent
 FRAGMENTS_DIR = PROJECT_ROOT / "data" / "fragments"
 IFC_DIR = PROJECT_ROOT / "data" / "ifc"
+STATE_DIR = PROJECT_ROOT / "data" / "state"
+INDEX_DIR = PROJECT_ROOT / "data" / "index"
+GEOMETRY_DIR = PROJECT_ROOT / "data" / "geometry"
+# Capacity settings from scripts/environment-manager.py (see src/startup.py); set variables take precedence
+ENV_FILE = Path(os.getenv("QGEN_IMPFRAG_ENV_FILE", PROJECT_ROOT / ".env.auto"))
+ENV_FILE_SETTINGS = load_env_file(ENV_FILE)
+REPORTS_DIR = Path(os.getenv("QGEN_IMPFRAG_REPORTS_DIR", PROJECT_ROOT / "data" / "reports"))
 CONVERTER_SCRIPT = BACKEND_DIR / "ifc_converter.js"
+GEOMETRY_SCRIPT = BACKEND_DIR / "ifc_geometry.js"
+CONVERTER_MAX_HEAP_MB = int(os.getenv("QGEN_IMPFRAG_CONVERTER_MAX_HEAP_MB", "8192"))
+# Full converter output per job in backend/logs/converter (only the tail is kept in memory otherwise)
+CONVERTER_LOGS = os.getenv("QGEN_IMPFRAG_CONVERTER_LOGS", "false").lower() == "true"
+# On-disk V8 code cache shared by the converter processes (Node 22.1+)
+CONVERTER_CACHE_DIR = Path(os.getenv("QGEN_IMPFRAG_CONVERTER_CACHE_DIR", PROJECT_ROOT / "data" / "cache" / "node"))
+# web-ifc threads per conversion of a large model; needs a multithreaded web-ifc build (see ifc_converter.js)
+CONVERTER_THREADS = int(os.getenv("QGEN_IMPFRAG_CONVERTER_THREADS", "1"))
+MAX_CONCURRENT_CONVERSIONS = int(os.getenv("QGEN_IMPFRAG_MAX_CONCURRENT_CONVERSIONS", "2"))
+# Threads running conversions may use together (converter threads, parallel tiles); 0: one per core
+THREAD_BUDGET = int(os.getenv("QGEN_IMPFRAG_THREAD_BUDGET", "0")) or max(os.cpu_count() or 1,
+                                                                          MAX_CONCURRENT_CONVERSIONS)
+JOB_RETENTION_DAYS = float(os.getenv("QGEN_IMPFRAG_JOB_RETENTION_DAYS", "30"))
+# Performance history of every conversion, kept for trends across converter versions
+HISTORY_RETENTION_DAYS = float(os.getenv("QGEN_IMPFRAG_HISTORY_RETENTION_DAYS", "365"))
+BUILD_INDEXES = os.getenv("QGEN_IMPFRAG_BUILD_INDEXES", "true").lower() == "true"
+SPATIAL_INDEX = os.getenv("QGEN_IMPFRAG_SPATIAL_INDEX", "true").lower() == "true"
+# Coarse overview variants (simplified meshes, element boxes) next to each fragment
+BUILD_LOD = os.getenv("QGEN_IMPFRAG_BUILD_LOD", "false").lower() == "true"
+# Distinct tessellated geometry shared by all models in a content-addressed library
+GEOMETRY_LIBRARY = os.getenv("QGEN_IMPFRAG_GEOMETRY_LIBRARY", "false").lower() == "true"
+# Slimmer IFC handed to the converter: orphans, viewer or geometry (see src/ifc_prune.py); empty disables
+PRUNE_PROFILE = get_profile(os.getenv("QGEN_IMPFRAG_PRUNE_PROFILE", ""),
+                            os.getenv("QGEN_IMPFRAG_PRUNE_PROFILES_FILE") or None)
+# IFC files at least this large are split by storey and converted as parallel tiles; 0 disables
+SPLIT_THRESHOLD_MB = float(os.getenv("QGEN_IMPFRAG_SPLIT_THRESHOLD_MB", "0"))
+SPLIT_PARTS = int(os.getenv("QGEN_IMPFRAG_SPLIT_PARTS", "0"))  # 0: one per core, up to 8
+SPLIT_MAX_PARALLEL = int(os.getenv("QGEN_IMPFRAG_SPLIT_MAX_PARALLEL", "0"))  # 0: all tiles at once
+# Conversions requested with ?profile=1 keep Python and Node profiles under REPORTS_DIR/profiles
+PROFILING = os.getenv("QGEN_IMPFRAG_PROFILING", "true").lower() == "true"
+# Spans of each request and conversion: "file" (REPORTS_DIR/traces), an OTLP/HTTP /v1/traces URL, or empty
+tracer = configure_tracing("qgen-impfrag-api", os.getenv("QGEN_IMPFRAG_TRACE_EXPORT", ""), REPORTS_DIR)
+register_tracing(app)
+
+# Storage backends (file://, sharded:// or s3:// URLs; local data dirs by default)
+fragment_storage = make_storage(os.getenv("QGEN_IMPFRAG_FRAGMENT_STORAGE"), FRAGMENTS_DIR)
+ifc_storage = make_storage(os.getenv("QGEN_IMPFRAG_IFC_STORAGE"), IFC_DIR)
+geometry_storage = (make_storage(os.getenv("QGEN_IMPFRAG_GEOMETRY_STORAGE"), GEOMETRY_DIR)
+                    if os.getenv("QGEN_IMPFRAG_GEOMETRY_STORAGE") else ShardedLocalStorage(GEOMETRY_DIR))
+# Hand downloads to the object store or nginx instead of streaming them through Python
+STORAGE_REDIRECT = os.getenv("QGEN_IMPFRAG_STORAGE_REDIRECT", "false").lower() == "true"
+ACCEL_REDIRECT_PREFIX = os.getenv("QGEN_IMPFRAG_ACCEL_REDIRECT_PREFIX", "")
+# Uploads are written to disk once, while the request is parsed: into the IFC store when UPLOAD_TO_STORE
+# (kept after the conversion), else into UPLOAD_DIR (deleted after the conversion)
+UPLOAD_TO_STORE = os.getenv("QGEN_IMPFRAG_UPLOAD_TO_STORE", "false").lower() == "true"
+UPLOAD_DIR = Path(os.getenv("QGEN_IMPFRAG_UPLOAD_DIR", tempfile.gettempdir()))
+
+def upload_base_name(filename):
+    """Sanitized name stem shared by a model's IFC and fragment"""
+    return secure_filename(filename).replace('.ifc', '').replace(' ', '_')
+
+def upload_path(filename):
+    """Where the multipart parser writes an uploaded file"""
+    if UPLOAD_TO_STORE and filename.lower().endswith('.ifc') and upload_base_name(filename):
+        # Hidden next to the stored IFC until the conversion is over, then committed under its name
+        staged = ifc_storage.staging_path(f"{upload_base_name(filename)}.ifc")
+        return staged.with_name(f".{staged.name}.upload-{uuid.uuid4().hex}")
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    return UPLOAD_DIR / f"qgen-upload-{uuid.uuid4().hex}.ifc"
+
+register_direct_uploads(app, upload_path)
+
+# Duration, timeout and heap of each conversion are predicted from the ones before it
+conversion_history = ConversionHistory(STATE_DIR / "history.sqlite3")
+conversion_estimator = ConversionEstimator(conversion_history, CONVERTER_MAX_HEAP_MB, CONVERTER_THREADS)
+# Converter jobs run in their own process group so they can be cancelled
+converter_runner = ConverterRunner(CONVERTER_SCRIPT, cwd=BACKEND_DIR, max_heap_mb=CONVERTER_MAX_HEAP_MB,
+                                   log_dir=BACKEND_DIR / "logs" / "converter" if CONVERTER_LOGS else None,
+                                   max_threads=CONVERTER_THREADS, cache_dir=CONVERTER_CACHE_DIR,
+                                   estimator=conversion_estimator)
+tiled_converter = TiledConverter(converter_runner, fragment_storage, SPLIT_PARTS, SPLIT_MAX_PARALLEL)
+# Uploads are all interactive here; the scheduler bounds how many run at once
+scheduler = ConversionScheduler(max_workers=MAX_CONCURRENT_CONVERSIONS, reserved_interactive_slots=0,
+                                thread_budget=THREAD_BUDGET)
+# Job state is shared with other API workers through SQLite
+job_store = JobStore(STATE_DIR / "jobs.sqlite3")
+# Property and query indexes built from each uploaded IFC
+model_index = ModelIndex(INDEX_DIR, geometry_storage)
+geometry_runner = (ConverterRunner(GEOMETRY_SCRIPT, cwd=BACKEND_DIR, max_heap_mb=CONVERTER_MAX_HEAP_MB,
+                                   cache_dir=CONVERTER_CACHE_DIR)
+                   if SPATIAL_INDEX or BUILD_LOD or GEOMETRY_LIBRARY else None)
+pipeline = PostConversionPipeline(
+    model_index, geometry_runner, spatial=SPATIAL_INDEX, lod=LodSettings() if BUILD_LOD else None,
+    geometry_library=GEOMETRY_LIBRARY
+) if BUILD_INDEXES else None
+register_model_api(app, model_index)
+# Federated projects merged into one fragment from the stored IFC files
+project_bundler = ProjectBundler(ProjectStore(STATE_DIR / "projects.sqlite3"), ifc_storage, fragment_storage,
+                                 converter_runner, scheduler)
+register_project_api(app, project_bundler, STORAGE_REDIRECT, ACCEL_REDIRECT_PREFIX)
+profile_store = ProfileStore(REPORTS_DIR / "profiles")
+register_profile_api(app, profile_store, PROFILING)
+register_history_api(app, conversion_history)
+
+def maintenance():
+    """Purge job history, converter logs and profiles past the retention period"""
+    try:
+        job_store.maintenance(JOB_RETENTION_DAYS)
+        conversion_history.maintenance(HISTORY_RETENTION_DAYS)
+        converter_runner.purge_logs(JOB_RETENTION_DAYS)
+        profile_store.maintenance(JOB_RETENTION_DAYS)
+    except Exception as e:
+        print(f"⚠️ Maintenance failed: {e}")
+
+# Retention sweeps scan directories, so they run next to startup instead of before it
+threading.Thread(target=maintenance, name="qgen-maintenance", daemon=True).start()
 
 # Debug logging
 print(f"🔍 Backend starting from: {Path.cwd()}")
 print(f"📁 PROJECT_ROOT: {PROJECT_ROOT}")
-print(f"📁 FRAGMENTS_DIR resolved to: {FRAGMENTS_DIR}")
-print(f"📁 IFC_DIR resolved to: {IFC_DIR}")
+print(f"📁 Fragment storage: {fragment_storage.describe()}")
+print(f"📁 IFC storage: {ifc_storage.describe()}")
 print(f"🔧 CONVERTER_SCRIPT: {CONVERTER_SCRIPT}")
-print(f"📄 Actual fragment files found: {list(FRAGMENTS_DIR.glob('*.frag'))}")
-print(f"📄 Actual IFC files found: {list(IFC_DIR.glob('*.ifc'))}")
+# Listing the data directories is slow on large network volumes; the catalog knows the converted models
+print(f"📄 Models in catalog: {model_index.catalog().count()} (files: /api/fragments, /api/ifc)")
+STARTUP.mark("setup")
+
+def record_job(job_id, filename, state, **fields):
+    """Persist job state so every API worker can report it"""
+    record = job_store.get(job_id)
+    data = record["data"] if record else {"job_id": job_id, "filename": filename}
+    data.update(fields, status=state, updated=datetime.now().isoformat())
+    job_store.save(job_id, filename, state, data, priority=INTERACTIVE)
 
-# Ensure directories exist
-FRAGMENTS_DIR.mkdir(parents=True, exist_ok=True)
-IFC_DIR.mkdir(parents=True, exist_ok=True)
+def run_conversion_job(input_path, output_path, job_id, filename, limits, model, fragment_name, profile=False,
+                       traceparent=None):
+    """Scheduler entry point for one upload conversion, continuing the upload request's trace"""
+    record_job(job_id, filename, "processing", started=datetime.now().isoformat())
+    node_args = profile_store.node_args(job_id) if profile else None
+    with profile_store.capture(job_id, "job", enabled=profile), \
+            tracer.span("conversion", parent=traceparent, attributes={"qgen.job_id": job_id, "qgen.model": model}):
+        tileset, prune = None, None
+        # The history keeps the size and features of the file the converter ran on, which predictions are made from
+        prescan = conversion_estimator.features(input_path)
+        input_bytes = input_path.stat().st_size
+        started = time.time()
+        if SPLIT_THRESHOLD_MB > 0 and input_bytes >= SPLIT_THRESHOLD_MB * 1024 * 1024:
+            # Large models convert as parallel tiles, published by the tiled converter itself
+            result, tileset = tiled_converter.convert(
+                input_path, fragment_name, job_id, cancel_check=lambda: job_store.cancel_requested(job_id),
+                profile=PRUNE_PROFILE, node_args=node_args
+            )
+            conversion_seconds = round(time.time() - started, 2)
+        else:
+            with pruned_input(input_path, PRUNE_PROFILE) as (convert_path, prune):
+                if prune is not None:
+                    record_job(job_id, filename, "processing", preprocessing=prune)
+                if convert_path != input_path:
+                    input_bytes = convert_path.stat().st_size
+                    estimate = conversion_estimator.estimate(input_bytes, convert_path)
+                    limits, prescan = estimate.limits, estimate.features
+                    record_job(job_id, filename, "processing", estimate=estimate.to_dict(), limits=limits.to_dict())
+                started = time.time()
+                result = converter_runner.run(
+                    convert_path, output_path, job_id=job_id, limits=limits,
+                    cancel_check=lambda: job_store.cancel_requested(job_id), node_args=node_args,
+                    progress=lambda percent, phase: record_job(job_id, filename, "processing", progress=percent,
+                                                               message=f"Converting: {phase}")
+                )
+                conversion_seconds = round(time.time() - started, 2)
+        record_job(job_id, filename, "processing", conversion_seconds=conversion_seconds)
+        output_bytes = None
+        if result.success:
+            preprocessing = with_conversion_time(prune, conversion_seconds) if prune else None
+            if preprocessing or tileset:
+                record_job(job_id, filename, "processing", preprocessing=preprocessing,
+                           tileset=tileset_name(fragment_name) if tileset else None)
+            output_bytes = int(tileset["size_mb"] * 1024 * 1024) if tileset else output_path.stat().st_size
+            # Listings read these from the catalog instead of the files
+            model_index.catalog().update(
+                model, source=filename,
+                conversion_seconds=conversion_seconds,
+                converted_at=datetime.now().isoformat(),
+                fragment_size_mb=round(output_bytes / (1024 * 1024), 2),
+                preprocessing=preprocessing,
+                tiles=len(tileset["tiles"]) if tileset else None
+            )
+        if result.success and pipeline is not None:
+            record_job(job_id, filename, "processing", message="Building indexes...")
+            pipeline.run(input_path, model, job_id, cancel_check=lambda: job_store.cancel_requested(job_id))
+        # Entity counts come from the catalog entry the index pipeline just wrote
+        stats = model_index.catalog().get(model) or {}
+        conversion_history.record(
+            job_id, model, result_status(result), source=filename,
+            converter_version=converter_runner.version(), input_bytes=input_bytes,
+            entity_counts=stats.get("entity_counts"), output_bytes=output_bytes, seconds=conversion_seconds,
+            startup_ms=result.startup_ms, peak_memory_mb=result.peak_memory_mb, phase_seconds=result.phase_seconds,
+            threads=limits.threads, tiles=len(tileset["tiles"]) if tileset else None,
+            prescan=prescan
+        )
+        return result
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -46,37 +260,63 @@ def health_check():
     return jsonify({
         "status": "healthy",
         "timestamp": datetime.now().isoformat(),
-        "service": "qgen-impfrag-backend"
+        "service": "qgen-impfrag-backend",
+        "startup": STARTUP.to_dict()
     })
 
 @app.route('/debug/paths', methods=['GET'])
 def debug_paths():
     """Debug endpoint to show exactly where backend is looking"""
-    fragments_files = list(FRAGMENTS_DIR.glob("*.frag"))
+    fragments_files = fragment_storage.list(".frag")
     return jsonify({
         "working_directory": str(Path.cwd()),
         "fragments_dir": str(FRAGMENTS_DIR),
         "fragments_dir_exists": FRAGMENTS_DIR.exists(),
+        "fragment_storage": fragment_storage.describe(),
         "ifc_dir": str(IFC_DIR),
         "ifc_dir_exists": IFC_DIR.exists(),
+        "ifc_storage": ifc_storage.describe(),
         "converter_script": str(CONVERTER_SCRIPT),
-        "fragments_found": [str(f) for f in fragments_files],
+        "fragments_found": [f.name for f in fragments_files],
         "fragments_count": len(fragments_files)
     })
 
 @app.route('/api/fragments', methods=['GET'])
 def list_fragments():
-    """List available fragment files"""
+    """List available fragment files with their precomputed model statistics
+
+    fields=a,b,... selects the statistics returned ("all" for every one).
+    """
     fragments = []
+    fields = parse_fields(request.args.get("fields"))
+    frag_files = fragment_storage.list(".frag")
+    tilesets = fragment_storage.list(TILESET_SUFFIX)
+    stats = model_index.catalog().stats_for(
+        [model_index.model_name(f.name) for f in frag_files] +
+        [model_index.model_name(f.name[:-len(TILESET_SUFFIX)] + ".frag") for f in tilesets]
+    )
     
-    for frag_file in FRAGMENTS_DIR.glob("*.frag"):
-        stat = frag_file.stat()
+    for frag_file in frag_files:
         fragments.append({
             "filename": frag_file.name,
-            "size_mb": round(stat.st_size / (1024 * 1024), 2),
-            "created": datetime.fromtimestamp(stat.st_ctime).isoformat(),
-            "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-            "url": f"/api/fragments/{frag_file.name}"
+            "size_mb": round(frag_file.size / (1024 * 1024), 2),
+            "created": datetime.fromtimestamp(frag_file.created or frag_file.modified).isoformat(),
+            "modified": datetime.fromtimestamp(frag_file.modified).isoformat(),
+            "url": f"/api/fragments/{frag_file.name}",
+            "stats": select_fields(stats.get(model_index.model_name(frag_file.name), {}), fields)
+        })
+    # Models converted as tiles: the viewer loads every tile listed in the manifest
+    for tileset in tilesets:
+        fragment_name = tileset.name[:-len(TILESET_SUFFIX)] + ".frag"
+        manifest = tiled_converter.read_manifest(fragment_name)
+        fragments.append({
+            "filename": tileset.name,
+            "size_mb": manifest["size_mb"],
+            "created": datetime.fromtimestamp(tileset.created or tileset.modified).isoformat(),
+            "modified": datetime.fromtimestamp(tileset.modified).isoformat(),
+            "url": f"/api/fragments/{tileset.name}",
+            "tiles": [t["url"] for t in manifest["tiles"]],
+            "stats": select_fields(stats.get(model_index.model_name(fragment_name), {}), fields)
         })
     
     return jsonify({
@@ -87,32 +327,60 @@ def list_fragments():
 
 @app.route('/api/fragments/<filename>', methods=['GET'])
 def serve_fragment(filename):
-    """Serve a fragment file"""
-    fragment_file = FRAGMENTS_DIR / filename
-    
-    if not fragment_file.exists():
-        return jsonify({"error": f"Fragment file not found: {filename}"}), 404
+    """Serve a fragment file (supports Range requests)"""
+    return send_stored_file(
+        fragment_storage, filename,
+        allow_redirect=STORAGE_REDIRECT,
+        accel_prefix=ACCEL_REDIRECT_PREFIX
+    )
+
+@app.route('/api/fragments/<filename>', methods=['PUT'])
+def upload_fragment(filename):
+    """Store a fragment file streamed in the request body"""
+    filename = secure_filename(filename)
+    if not filename.lower().endswith('.frag'):
+        return jsonify({"error": "File must be a .frag file"}), 400
     
-    return send_file(fragment_file, as_attachment=False, mimetype='application/octet-stream')
+    stored = fragment_storage.write_stream(filename, request.stream)
+    return jsonify({
+        "success": True,
+        "filename": stored.name,
+        "size_mb": round(stored.size / (1024 * 1024), 2),
+        "url": f"/api/fragments/{stored.name}"
+    }), 201
 
 @app.route('/api/ifc', methods=['GET'])
 def list_ifc_files():
-    """List available IFC files and their conversion status"""
+    """List available IFC files, their conversion status and model statistics
+
+    fields=a,b,... selects the statistics returned ("all" for every one).
+    """
     files = []
+    fields = parse_fields(request.args.get("fields"))
+    
+    fragment_files = {f.name: f for f in fragment_storage.list(".frag")}
+    tilesets = {f.name for f in fragment_storage.list(TILESET_SUFFIX)}
+    ifc_files = ifc_storage.list(".ifc")
+    # Look for corresponding fragment files
+    fragment_names = {
+        f.name: f"{Path(f.name).stem.replace(' ', '_').replace('(', '').replace(')', '')}.frag" for f in ifc_files
+    }
+    stats = model_index.catalog().stats_for(model_index.model_name(n) for n in fragment_names.values())
     
-    for ifc_file in IFC_DIR.glob("*.ifc"):
-        # Look for corresponding fragment file
-        fragment_name = f"{ifc_file.stem.replace(' ', '_').replace('(', '').replace(')', '')}.frag"
-        fragment_file = FRAGMENTS_DIR / fragment_name
+    for ifc_file in ifc_files:
+        fragment_name = fragment_names[ifc_file.name]
+        fragment_file = fragment_files.get(fragment_name)
+        tileset = tileset_name(fragment_name) if tileset_name(fragment_name) in tilesets else None
         
-        stat = ifc_file.stat()
         files.append({
             "filename": ifc_file.name,
-            "size_mb": round(stat.st_size / (1024 * 1024), 2),
-            "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-            "has_fragments": fragment_file.exists(),
-            "fragment_file": fragment_name if fragment_file.exists() else None,
-            "fragment_size_mb": round(fragment_file.stat().st_size / (1024 * 1024), 2) if fragment_file.exists() else None
+            "size_mb": round(ifc_file.size / (1024 * 1024), 2),
+            "modified": datetime.fromtimestamp(ifc_file.modified).isoformat(),
+            "has_fragments": fragment_file is not None or tileset is not None,
+            "fragment_file": fragment_name if fragment_file else tileset,
+            "fragment_size_mb": round(fragment_file.size / (1024 * 1024), 2) if fragment_file
+                                else stats.get(model_index.model_name(fragment_name), {}).get("fragment_size_mb"),
+            "stats": select_fields(stats.get(model_index.model_name(fragment_name), {}), fields)
         })
     
     return jsonify({
@@ -124,8 +392,8 @@ def list_ifc_files():
 @app.route('/api/status', methods=['GET'])
 def get_status():
     """Get overall system status"""
-    ifc_count = len(list(IFC_DIR.glob("*.ifc")))
-    fragment_count = len(list(FRAGMENTS_DIR.glob("*.frag")))
+    ifc_count = len(ifc_storage.list(".ifc"))
+    fragment_count = len(fragment_storage.list(".frag")) + len(fragment_storage.list(TILESET_SUFFIX))
     
     return jsonify({
         "status": "running",
@@ -148,31 +416,47 @@ def convert_ifc():
     if not file.filename.lower().endswith('.ifc'):
         return jsonify({"error": "File must be an IFC file"}), 400
     
+    # Clients may pass their own job ID so they can cancel while waiting; it names files and rows
+    job_id = request.form.get('job_id') or converter_runner.new_job_id()
+    if not PROFILE_ID_RE.match(job_id) or ".." in job_id:
+        return jsonify({"error": f"Invalid job ID: {job_id!r}"}), 400
+    if scheduler.get(job_id) is not None or job_store.get(job_id) is not None:
+        return jsonify({"error": f"Job ID already in use: {job_id}"}), 409
+    
     try:
-        # Create temporary file for IFC data
-        with tempfile.NamedTemporaryFile(suffix='.ifc', delete=False) as temp_ifc:
-            file.save(temp_ifc.name)
-            temp_ifc_path = temp_ifc.name
+        # Already on disk: the multipart parser wrote it to upload_path() (see register_direct_uploads)
+        file.stream.close()
+        temp_ifc_path = file.stream.name
+        # From the start of the request: parsing the multipart body and saving the file
+        tracer.record("upload.receive", tracer.current_span().start_ns, time.time_ns(),
+                      attributes={"qgen.upload.bytes": os.path.getsize(temp_ifc_path)})
         
         # Generate output filename (sanitized)
-        base_name = secure_filename(file.filename)
-        base_name = base_name.replace('.ifc', '').replace(' ', '_')
+        base_name = upload_base_name(file.filename)
         output_filename = f"{base_name}.frag"
-        output_path = FRAGMENTS_DIR / output_filename
+        # The converter writes locally; commit() publishes to the fragment store
+        output_path = fragment_storage.staging_path(output_filename)
         
-        # Run conversion using Node.js converter
-        cmd = [
-            'node', str(CONVERTER_SCRIPT),
-            '--input', temp_ifc_path,
-            '--output', str(output_path)
-        ]
+        # The scheduler accounts for the converter's web-ifc threads, or for all parallel tiles
+        upload_bytes = os.path.getsize(temp_ifc_path)
+        # Limits and ETA come from the conversions of similar models (see conversion_estimator)
+        estimate = conversion_estimator.estimate(upload_bytes, Path(temp_ifc_path))
+        limits = estimate.limits
+        threads = (tiled_converter.threads_for(upload_bytes)
+                   if SPLIT_THRESHOLD_MB > 0 and upload_bytes >= SPLIT_THRESHOLD_MB * 1024 * 1024 else limits.threads)
+        # ?profile=1 profiles this request, the job and its converter processes
+        profile = profiling_requested()
+        if profile:
+            link_request_profile(job_id)
         
         print(f"🔄 Converting: {file.filename} -> {output_filename}")
-        print(f"📄 Command: {' '.join(cmd)}")
+        print(f"🆔 Job ID: {job_id}")
         print(f"📁 Working directory: {Path(__file__).parent}")
         print(f"🔧 Converter script exists: {CONVERTER_SCRIPT.exists()}")
         print(f"📁 Temp IFC file: {temp_ifc_path}")
         print(f"📁 Output path: {output_path}")
+        print(f"📏 Limits: {limits.to_dict()}")
+        print(f"⏱️ Estimate: {estimate.seconds:.0f}s, {estimate.basis}")
         
         # Check if node is available
         try:
@@ -181,56 +465,164 @@ def convert_ifc():
         except Exception as node_error:
             print(f"❌ Node.js not found: {node_error}")
         
-        # Try with UTF-8 encoding and error handling
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True, 
-                                   cwd=Path(__file__).parent, encoding='utf-8', errors='replace')
-        except Exception as encoding_error:
-            print(f"🔄 Encoding error, trying without capture: {encoding_error}")
-            # Fallback: run without capturing output to see errors directly
-            result = subprocess.run(cmd, cwd=Path(__file__).parent)
-            result.stdout = "No output captured"
-            result.stderr = "No stderr captured"
+        record_job(job_id, file.filename, "queued", output_file=output_filename, limits=limits.to_dict(),
+                   estimate=estimate.to_dict(),
+                   profiles=profile_url(job_id) if profile else None)
+        job = scheduler.submit(
+            run_conversion_job, Path(temp_ifc_path), output_path, job_id, file.filename, limits,
+            model_index.model_name(output_filename), output_filename, profile, current_traceparent(),
+            priority_class=INTERACTIVE, job_id=job_id, threads=threads
+        )
+        # None means the job was cancelled before it left the queue
+        result = job.wait()
+        
+        if job.started_at is not None:
+            tracer.record("queue.wait", int(job.submitted_at.timestamp() * 1e9),
+                          int(job.started_at.timestamp() * 1e9), attributes={"qgen.job_id": job_id})
+        if result is not None:
+            print(f"⏳ Queue wait: {job.queue_seconds:.2f}s")
+            print(f"📤 Return code: {result.returncode}")
+            print(f"⏱️ Converter startup: {result.startup_ms} ms")
+            # Only the tail of the output is kept; the full output is in the converter log if enabled
+            if not result.success:
+                print(f"📤 STDOUT (tail): {result.stdout}")
+                print(f"📤 STDERR (tail): {result.stderr}")
+            print(f"📁 Output file exists after conversion: {output_path.exists()}")
         
-        print(f"📤 Return code: {result.returncode}")
-        print(f"📤 STDOUT: {result.stdout}")
-        print(f"📤 STDERR: {result.stderr}")
-        print(f"📁 Output file exists after conversion: {output_path.exists()}")
+        # Keep the upload in the IFC store (a rename for local storage), or clean up the temporary file
+        stored_ifc = None
+        if UPLOAD_TO_STORE and Path(temp_ifc_path).name.startswith('.'):
+            stored_ifc = f"{base_name}.ifc"
+            ifc_storage.commit(stored_ifc, Path(temp_ifc_path))
+        else:
+            os.unlink(temp_ifc_path)
         
-        # Clean up temporary file
-        os.unlink(temp_ifc_path)
+        tileset = None
+        if result is not None and result.success:
+            tileset = job_store.get(job_id)["data"].get("tileset")
+            if tileset is None:
+                with tracer.span("fragments.commit", attributes={"qgen.fragment": output_filename}):
+                    fragment_storage.commit(output_filename, output_path)
+                    tiled_converter.discard(output_filename)
         
-        if result.returncode == 0 and output_path.exists():
+        if result is None or result.cancelled:
+            print(f"🛑 Conversion cancelled: {job_id}")
+            record_job(job_id, file.filename, "cancelled", message="Conversion cancelled")
+            return jsonify({
+                "success": False,
+                "job_id": job_id,
+                "error": "Conversion cancelled"
+            }), 409
+        elif result.success:
             # Get file stats
-            stat = output_path.stat()
+            if tileset:
+                manifest = tiled_converter.read_manifest(output_filename)
+                size_mb, tiles = manifest["size_mb"], [t["url"] for t in manifest["tiles"]]
+            else:
+                size_mb, tiles = round(fragment_storage.stat(output_filename).size / (1024 * 1024), 2), None
+            record_job(job_id, file.filename, "completed", size_mb=size_mb)
+            # Projects are fingerprinted from the IFC store, so they go stale once the upload is in it
+            if stored_ifc is not None:
+                try:
+                    for project in project_bundler.refresh_for(stored_ifc):
+                        print(f"🧩 Queued rebuild of project {project}")
+                except Exception as e:
+                    print(f"⚠️ Could not refresh projects of {stored_ifc}: {e}")
+            conversion_seconds = job_store.get(job_id)["data"].get("conversion_seconds")
             return jsonify({
                 "success": True,
+                "job_id": job_id,
                 "message": f"Successfully converted {file.filename}",
-                "output_file": output_filename,
-                "size_mb": round(stat.st_size / (1024 * 1024), 2),
-                "conversion_time": "< 1 minute"
+                "output_file": tileset or output_filename,
+                "tiles": tiles,
+                "size_mb": size_mb,
+                "conversion_time": f"{conversion_seconds:.1f}s" if conversion_seconds is not None else None,
+                "conversion_seconds": conversion_seconds,
+                "estimated_seconds": round(estimate.seconds, 1),
+                "profiles": profile_url(job_id) if profile else None
             })
         else:
-            error_msg = result.stderr if result.stderr else "Conversion failed"
+            error_msg = result.error_message
             print(f"❌ Conversion error: {error_msg}")
+            record_job(job_id, file.filename, "failed", message=error_msg[-2000:])
             return jsonify({
                 "success": False,
+                "job_id": job_id,
                 "error": f"Conversion failed: {error_msg}"
-            }), 500
+            }), 504 if result.timed_out else 500
             
     except Exception as e:
         # Clean up temp file if it exists
         if 'temp_ifc_path' in locals() and os.path.exists(temp_ifc_path):
             os.unlink(temp_ifc_path)
+        if 'job_id' in locals():
+            record_job(job_id, file.filename, "failed", message=str(e))
         return jsonify({
             "success": False,
             "error": f"Server error: {str(e)}"
         }), 500
 
+def active_jobs():
+    """Queued and running jobs of every API worker, with their queue position and ETA"""
+    jobs = [record["data"] for state in ("queued", "processing") for record in job_store.list_by_state(state)]
+    now = datetime.now()
+    for job in jobs:
+        job["queue_position"] = scheduler.queue_position(job["job_id"])
+        job["estimated_seconds"] = (job.get("estimate") or {}).get("estimated_seconds")
+        if job.get("started"):
+            job["elapsed_seconds"] = (now - datetime.fromisoformat(job["started"])).total_seconds()
+    etas = job_etas(jobs, MAX_CONCURRENT_CONVERSIONS)
+    for job in jobs:
+        job["eta_seconds"] = etas.get(job["job_id"])
+    return jobs
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """List queued and running conversion jobs"""
+    jobs = active_jobs()
+    return jsonify({
+        "jobs": jobs,
+        "count": len(jobs),
+        "converters": converter_runner.active_jobs(),
+        "scheduler": scheduler.stats()
+    })
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get a job's state from the shared job store"""
+    record = job_store.get(job_id)
+    if record is None:
+        return jsonify({"error": f"Job not found: {job_id}"}), 404
+    
+    job = record["data"]
+    if record["state"] in ("queued", "processing"):
+        # A queued job's ETA depends on the jobs ahead of it
+        job = next((j for j in active_jobs() if j["job_id"] == job_id), job)
+    job.setdefault("queue_position", None)
+    return jsonify(job)
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Drop a queued conversion, or kill a running one and discard its partial output"""
+    # Jobs owned by another API worker pick the cancel flag up from the job store
+    if not (scheduler.cancel(job_id) or converter_runner.cancel(job_id) or job_store.request_cancel(job_id)):
+        return jsonify({"error": f"Job not found or not running: {job_id}"}), 404
+    
+    return jsonify({
+        "success": True,
+        "job_id": job_id,
+        "message": "Cancellation requested"
+    })
+
 if __name__ == '__main__':
     print("🚀 Starting QGEN_IMPFRAG Backend API Server...")
-    print(f"📁 IFC Directory: {IFC_DIR}")
-    print(f"📁 Fragments Directory: {FRAGMENTS_DIR}")
+    print(f"📁 IFC Storage: {ifc_storage.describe()}")
+    print(f"📁 Fragment Storage: {fragment_storage.describe()}")
+    if ENV_FILE_SETTINGS:
+        print(f"⚙️ Capacity profile from {ENV_FILE}: "
+              f"{MAX_CONCURRENT_CONVERSIONS} conversions, {CONVERTER_MAX_HEAP_MB} MB heap, {THREAD_BUDGET} threads")
     print(f"🌐 Server will run on http://0.0.0.0:8111")
+    STARTUP.mark("ready")
+    print(f"⏱️ Startup ({STARTUP.summary()})")
     
     app.run(host='0.0.0.0', port=8111, debug=True)
@@ -7,51 +7,203 @@
  * Based on the official ThatOpen Components IfcImporter documentation.
  * 
  * Usage:
- *   node ifc_converter.js --input input.ifc --output output.frag
+ *   node ifc_converter.js --input input.ifc --output output.frag [--threads 4]
+ *
+ * Threads: the stock web-ifc Node build is single-threaded. With more
+ * than one thread (--threads or QGEN_WEBIFC_THREADS) a pthread build of
+ * web-ifc is used where one is installed (QGEN_WEBIFC_MT_PATH, by default
+ * node_modules/web-ifc-mt); without one, or if it fails to start, the
+ * conversion runs on the single-threaded build.
+ *
+ * Tracing: the backend passes its trace context in TRACEPARENT and a file
+ * in QGEN_TRACE_FILE; the spans of this process (startup, read, each
+ * importer phase, write) are written there as JSON when it exits.
+ *
+ * Startup: @thatopen/fragments is imported on first use, and its compiled
+ * JavaScript is kept in an on-disk V8 code cache (NODE_COMPILE_CACHE, or
+ * QGEN_CONVERTER_CACHE_DIR; Node 22.1+, ignored by older versions). The
+ * time from process start to the importer being ready is logged as
+ * "Startup: <ms> ms" and recorded on the converter.startup span.
  */
 
 import fs from 'fs';
+import module from 'module';
+import os from 'os';
 import path from 'path';
+import { randomBytes } from 'crypto';
+import { performance } from 'perf_hooks';
 import { fileURLToPath } from 'url';
 
+// Spans of this process, continuing the backend's trace (W3C traceparent)
+class Trace {
+    constructor(traceparent, file) {
+        const match = /^00-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$/.exec(traceparent || '');
+        this.traceId = match ? match[1] : randomBytes(16).toString('hex');
+        this.parentId = match ? match[2] : undefined;
+        this.file = file;
+        this.spans = [];
+    }
+
+    static now() {
+        return BigInt(Math.round((performance.timeOrigin + performance.now()) * 1000)) * 1000n;
+    }
+
+    start(name, attributes = {}, parent = this.parentId, startTime = Trace.now()) {
+        const span = {
+            traceId: this.traceId,
+            spanId: randomBytes(8).toString('hex'),
+            parentSpanId: parent,
+            name,
+            startTimeUnixNano: startTime,
+            attributes
+        };
+        this.spans.push(span);
+        return span;
+    }
+
+    end(span, attributes = {}, error = undefined) {
+        span.endTimeUnixNano = Trace.now();
+        Object.assign(span.attributes, attributes);
+        if (error) {
+            span.status = { code: 2, message: String(error.message || error).slice(0, 500) };
+        }
+    }
+
+    flush() {
+        if (!this.file) return;
+        const open = Trace.now();
+        for (const span of this.spans) {
+            span.endTimeUnixNano = span.endTimeUnixNano || open;
+        }
+        fs.writeFileSync(this.file, JSON.stringify(this.spans, (key, value) =>
+            typeof value === 'bigint' ? value.toString() : value));
+    }
+}
+
+// Enabled before any dependency is loaded, so that all of them are compiled from the cache
+const compileCache = module.enableCompileCache?.(process.env.NODE_COMPILE_CACHE
+    || process.env.QGEN_CONVERTER_CACHE_DIR || path.join(os.tmpdir(), 'qgen-node-compile-cache'));
+const compileCacheStatus = compileCache
+    ? Object.keys(module.constants.compileCacheStatus)
+        .find(key => module.constants.compileCacheStatus[key] === compileCache.status).toLowerCase()
+    : 'unavailable';
+
+const trace = new Trace(process.env.TRACEPARENT, process.env.QGEN_TRACE_FILE);
+// Runs on process.exit() too, so every exit path keeps its spans
+process.on('exit', () => trace.flush());
+const startupSpan = trace.start('converter.startup', { 'process.pid': process.pid }, trace.parentId,
+    BigInt(Math.round(performance.timeOrigin * 1000)) * 1000n);
+if (process.env.TRACEPARENT) {
+    console.log(`🔗 Trace: ${trace.traceId}`);
+}
+
 // Get current directory for ES modules
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
 
 // Use node_modules in current directory (works for both development and Docker)
 const rootNodeModules = path.resolve(__dirname, './node_modules');
-
-console.log(`🔍 Looking for dependencies in: ${rootNodeModules}`);
-
-// Verify web-ifc WASM files exist
 const webIfcPath = path.join(rootNodeModules, 'web-ifc');
-const wasmFile = path.join(webIfcPath, 'web-ifc-node.wasm');
-console.log(`🔍 Checking for WASM file: ${wasmFile}`);
-console.log(`📁 WASM file exists: ${fs.existsSync(wasmFile)}`);
 
-// ThatOpen Components imports - using the correct API from documentation
+// Multithreaded (pthread) web-ifc build, if any: same file names as the web-ifc package
+const webIfcMtPath = process.env.QGEN_WEBIFC_MT_PATH || path.join(rootNodeModules, 'web-ifc-mt');
+
+// ThatOpen Components, imported when the first conversion starts: usage errors never load them
 let FRAGS;
 
-try {
-    // Import only what we need for IFC conversion
-    console.log('🔧 Loading ThatOpen Components...');
-    
-    FRAGS = await import('@thatopen/fragments');
-    console.log('✅ @thatopen/fragments loaded');
-    
-    console.log('✅ ThatOpen Components loaded successfully');
-} catch (error) {
-    console.error('❌ Failed to load ThatOpen Components:', error.message);
-    console.error('   Make sure to run: npm install @thatopen/fragments web-ifc');
-    process.exit(1);
+async function loadFragments() {
+    if (FRAGS) {
+        return FRAGS;
+    }
+    const importStarted = performance.now();
+    try {
+        FRAGS = await import('@thatopen/fragments');
+    } catch (error) {
+        trace.end(startupSpan, {}, error);
+        console.error('❌ Failed to load ThatOpen Components:', error.message);
+        // Only looked at when loading failed
+        const wasmFile = path.join(webIfcPath, 'web-ifc-node.wasm');
+        console.error(`   WASM file ${fs.existsSync(wasmFile) ? 'found' : 'missing'}: ${wasmFile}`);
+        console.error('   Make sure to run: npm install @thatopen/fragments web-ifc');
+        process.exit(1);
+    }
+    // performance.now() counts from process start
+    const startupMs = Math.round(performance.now());
+    const importMs = Math.round(performance.now() - importStarted);
+    trace.end(startupSpan, { 'qgen.startup.import_ms': importMs, 'qgen.compile_cache': compileCacheStatus });
+    console.log(`Startup: ${startupMs} ms (import ${importMs} ms, compile cache ${compileCacheStatus})`);
+    return FRAGS;
+}
+
+// Write next to the target and rename, so a reader never sees a partial output file
+function writeFileAtomic(target, data) {
+    const temp = `${target}.tmp-${process.pid}`;
+    try {
+        const fd = fs.openSync(temp, 'w');
+        try {
+            for (let offset = 0; offset < data.byteLength;) {
+                offset += fs.writeSync(fd, data, offset, data.byteLength - offset);
+            }
+        } finally {
+            fs.closeSync(fd);
+        }
+        fs.renameSync(temp, target);
+    } catch (error) {
+        fs.rmSync(temp, { force: true });
+        throw error;
+    }
+}
+
+// Peak resident memory of this process so far (maxRSS is in KB), recorded in the conversion history
+function logPeakMemory() {
+    console.log(`Peak memory: ${Math.round(process.resourceUsage().maxRSS / 1024)} MB`);
+}
+
+// "42m", "3h 12m" or "2d 5h", for progress ETAs
+function formatDuration(seconds) {
+    const minutes = Math.round(seconds / 60);
+    if (minutes < 60) return `${minutes}m`;
+    const hours = Math.floor(minutes / 60);
+    if (hours < 24) return `${hours}h ${minutes % 60}m`;
+    return `${Math.floor(hours / 24)}d ${hours % 24}h`;
+}
+
+// Emscripten pthread builds size their worker pool from navigator.hardwareConcurrency
+function setThreadPoolSize(threads) {
+    if (globalThis.navigator) {
+        Object.defineProperty(globalThis.navigator, 'hardwareConcurrency', { value: threads, configurable: true });
+    } else {
+        Object.defineProperty(globalThis, 'navigator', {
+            value: { hardwareConcurrency: threads }, configurable: true, writable: true
+        });
+    }
 }
 
 class IfcFragmentsConverter {
-    constructor() {
+    constructor(threads = 1) {
+        this.build = this.selectBuild(threads);
+        // One importer per web-ifc build, reused by every file of a batch
+        this.importers = new Map();
         console.log('🔧 IFC Fragments Converter initialized (using IfcImporter API)');
     }
 
+    // web-ifc build to load: the pthread build where one is installed and more than one thread is wanted
+    selectBuild(threads) {
+        const singleThreaded = { path: webIfcPath + path.sep, threads: 1, multithreaded: false };
+        if (threads <= 1) {
+            return singleThreaded;
+        }
+        if (!fs.existsSync(path.join(webIfcMtPath, 'web-ifc-node.wasm'))) {
+            console.log(`⚠️  No multithreaded web-ifc build in ${webIfcMtPath}; using a single thread`);
+            return singleThreaded;
+        }
+        setThreadPoolSize(threads);
+        return { path: webIfcMtPath + path.sep, threads, multithreaded: true };
+    }
+
     async convertFile(inputPath, outputPath) {
+        const fileSpan = trace.start('ifc.convert', { 'qgen.input': path.basename(inputPath) });
+        let phaseSpan;
         try {
             console.log(`🔄 Converting: ${inputPath} -> ${outputPath}`);
             
@@ -59,37 +211,55 @@ class IfcFragmentsConverter {
             if (!fs.existsSync(inputPath)) {
                 throw new Error(`Input file not found: ${inputPath}`);
             }
+            await loadFragments();
             
             // Read IFC file as Buffer
-            const ifcData = fs.readFileSync(inputPath);
+            const readSpan = trace.start('ifc.read', {}, fileSpan.spanId);
+            let ifcData = fs.readFileSync(inputPath);
+            trace.end(readSpan, { 'qgen.input.bytes': ifcData.length });
             console.log(`📖 Read IFC file: ${(ifcData.length / 1024 / 1024).toFixed(2)} MB`);
             
-            // Create IFC importer using the correct API from documentation
-            const serializer = new FRAGS.IfcImporter();
-            
-            // Configure WASM path (use local node_modules for Node.js environment)
-            // Ensure proper path formatting for Windows
-            const wasmPath = path.join(rootNodeModules, 'web-ifc') + path.sep;
-            console.log(`🔧 Setting WASM path to: ${wasmPath}`);
-            
-            serializer.wasm = {
-                path: wasmPath,
-                absolute: true
-            };
-            
             console.log('🏗️  Converting IFC to fragments...');
             
             // Convert IFC to fragments using the correct API from documentation
-            const fragmentsData = await serializer.process({
-                bytes: new Uint8Array(ifcData),
-                raw: false, // Compressed output for smaller files
-                progressCallback: (progress, data) => {
-                    console.log(`Progress: ${Math.round(progress * 100)}% - ${data?.process || 'processing'}`);
+            const processSpan = trace.start('ifc.process', {
+                'qgen.webifc.threads': this.build.threads
+            }, fileSpan.spanId);
+            let started = false;
+            const progressCallback = (progress, data) => {
+                started = true;
+                const phase = data?.process || 'processing';
+                // One span per importer phase
+                if (phaseSpan?.name !== `ifc.process.${phase}`) {
+                    if (phaseSpan) trace.end(phaseSpan);
+                    phaseSpan = trace.start(`ifc.process.${phase}`, {}, processSpan.spanId);
                 }
-            });
+                console.log(`Progress: ${Math.round(progress * 100)}% - ${phase}`);
+            };
+            // A view of the Buffer's memory: new Uint8Array(ifcData) would copy the whole model
+            const bytes = new Uint8Array(ifcData.buffer, ifcData.byteOffset, ifcData.byteLength);
+            let fragmentsData;
+            try {
+                fragmentsData = await this.process(bytes, progressCallback);
+            } catch (error) {
+                // A multithreaded build that cannot start falls back; failures past that point are real
+                if (!this.build.multithreaded || started) throw error;
+                console.log(`⚠️  Multithreaded web-ifc failed to start (${error.message}); using a single thread`);
+                this.build = this.selectBuild(1);
+                processSpan.attributes['qgen.webifc.threads'] = 1;
+                fragmentsData = await this.process(bytes, progressCallback);
+            }
+            if (phaseSpan) trace.end(phaseSpan);
+            phaseSpan = undefined;
+            trace.end(processSpan, { 'qgen.output.bytes': fragmentsData.length });
+            // web-ifc worked on its own copy; the input can go before the output is written
+            ifcData = null;
             
             // Save to output file
-            fs.writeFileSync(outputPath, fragmentsData);
+            const writeSpan = trace.start('fragments.write', {}, fileSpan.spanId);
+            writeFileAtomic(outputPath, fragmentsData);
+            fragmentsData = null;
+            trace.end(writeSpan);
             
             const outputSize = fs.statSync(outputPath).size;
             const inputSize = fs.statSync(inputPath).size;
@@ -99,6 +269,8 @@ class IfcFragmentsConverter {
             console.log(`   Input:  ${(inputSize / 1024 / 1024).toFixed(2)} MB`);
             console.log(`   Output: ${(outputSize / 1024 / 1024).toFixed(2)} MB`);
             console.log(`   Compression: ${compressionRatio}%`);
+            logPeakMemory();
+            trace.end(fileSpan);
             
             return {
                 success: true,
@@ -108,11 +280,38 @@ class IfcFragmentsConverter {
             };
             
         } catch (error) {
+            if (phaseSpan) trace.end(phaseSpan, {}, error);
+            trace.end(fileSpan, {}, error);
             console.error('❌ Conversion failed:', error.message);
+            logPeakMemory();
             throw error;
         }
     }
 
+    async process(bytes, progressCallback) {
+        let serializer = this.importers.get(this.build.path);
+        if (!serializer) {
+            // Create IFC importer using the correct API from documentation
+            serializer = new FRAGS.IfcImporter();
+            
+            // Configure WASM path (use local node_modules for Node.js environment)
+            // Ensure proper path formatting for Windows
+            console.log(`🔧 Setting WASM path to: ${this.build.path} (${this.build.threads} thread(s))`);
+            
+            serializer.wasm = {
+                path: this.build.path,
+                absolute: true
+            };
+            this.importers.set(this.build.path, serializer);
+        }
+        
+        return serializer.process({
+            bytes,
+            raw: false, // Compressed output for smaller files
+            progressCallback
+        });
+    }
+
     async convertDirectory(inputDir, outputDir) {
         try {
             console.log(`🔄 Converting directory: ${inputDir} -> ${outputDir}`);
@@ -132,21 +331,54 @@ class IfcFragmentsConverter {
             
             console.log(`📁 Found ${ifcFiles.length} IFC files`);
             
+            // Outputs newer than their input are kept, so an interrupted run resumes where it stopped
+            const pending = [];
             const results = [];
             for (const ifcFile of ifcFiles) {
-                const baseName = path.basename(ifcFile, '.ifc');
-                const outputFile = path.join(outputDir, `${baseName}.frag`);
-                
-                const result = await this.convertFile(ifcFile, outputFile);
-                results.push({ inputFile: ifcFile, outputFile, ...result });
+                const outputFile = path.join(outputDir, `${path.basename(ifcFile, path.extname(ifcFile))}.frag`);
+                const inputStat = fs.statSync(ifcFile);
+                const outputStat = fs.statSync(outputFile, { throwIfNoEntry: false });
+                if (outputStat && outputStat.mtimeMs >= inputStat.mtimeMs) {
+                    results.push({ inputFile: ifcFile, outputFile, success: true, skipped: true });
+                } else {
+                    pending.push({ ifcFile, outputFile, size: inputStat.size });
+                }
+            }
+            if (results.length > 0) {
+                console.log(`⏭️  ${results.length} files already converted`);
+            }
+            
+            const totalBytes = pending.reduce((sum, file) => sum + file.size, 0);
+            const started = Date.now();
+            let doneBytes = 0;
+            for (const [index, { ifcFile, outputFile, size }] of pending.entries()) {
+                // One broken model must not stop the batch
+                try {
+                    const result = await this.convertFile(ifcFile, outputFile);
+                    results.push({ inputFile: ifcFile, outputFile, ...result });
+                } catch (error) {
+                    results.push({ inputFile: ifcFile, outputFile, success: false, error: error.message });
+                }
+                doneBytes += size;
+                // ETA by bytes: conversion time grows with model size, not file count
+                const elapsed = (Date.now() - started) / 1000;
+                const eta = doneBytes > 0 ? elapsed * (totalBytes - doneBytes) / doneBytes : 0;
+                console.log(`📦 [${index + 1}/${pending.length}] ${path.basename(ifcFile)}: ` +
+                            `${(doneBytes / 1024 / 1024 / Math.max(elapsed, 1) * 60).toFixed(1)} MB/min, ` +
+                            `ETA ${formatDuration(eta)}`);
             }
             
             const successful = results.filter(r => r.success).length;
+            const failed = results.filter(r => !r.success);
             console.log(`🎉 Batch conversion completed: ${successful}/${results.length} files`);
+            for (const failure of failed) {
+                console.log(`   ❌ ${path.basename(failure.inputFile)}: ${failure.error}`);
+            }
             
             return {
-                success: true,
+                success: failed.length === 0,
                 converted: successful,
+                failed: failed.length,
                 total: results.length,
                 results
             };
@@ -169,13 +401,16 @@ async function main() {
         console.log(`
 Usage:
   Single file:    node ifc_converter.js --input file.ifc --output file.frag
+  Threads:        --threads N (or QGEN_WEBIFC_THREADS), needs a multithreaded web-ifc build
   Directory:      node ifc_converter.js --input-dir ./ifc --output-dir ./fragments
   Test mode:      node ifc_converter.js --test
         `);
         process.exit(1);
     }
     
-    const converter = new IfcFragmentsConverter();
+    const threadsIndex = args.indexOf('--threads');
+    const threads = parseInt(threadsIndex !== -1 ? args[threadsIndex + 1] : process.env.QGEN_WEBIFC_THREADS, 10);
+    const converter = new IfcFragmentsConverter(threads > 0 ? threads : 1);
     
     if (args.includes('--test')) {
         // Test mode - convert sample files if available
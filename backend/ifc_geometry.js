@@ -0,0 +1,541 @@
+#!/usr/bin/env node
+/**
+ * IFC Geometry Pass using web-ifc
+ * ===============================
+ *
+ * Tessellates an IFC model with web-ifc and writes per-element data the
+ * backend indexes are built from. Runs after the fragments conversion,
+ * on the same input file.
+ *
+ * Usage:
+ *   node ifc_geometry.js --input input.ifc --output bounds.bin --bounds
+ *   node ifc_geometry.js --input input.ifc --output lod.json --lod ./lod-dir
+ *       [--lod-cell 0.1] [--lod-min-size 0.25] [--lod-proxy-min-size 1.0] [--lod-exclude IFCFASTENER,...]
+ *   node ifc_geometry.js --input input.ifc --output instances.bin --geometry ./chunk-dir
+ *
+ * Bounds output (little-endian):
+ *   "QBND" | uint32 version | uint32 count | count x (uint32 expressID, float32 min xyz, float32 max xyz)
+ * Coordinates are web-ifc world coordinates (Y-up, metres), as shown in the viewer.
+ *
+ * LOD output: coarse overview variants of the model as binary glTF, one
+ * primitive per colour, plus a JSON report of what each level contains:
+ *   lod1.glb  meshes simplified by vertex clustering on a world grid
+ *   lod2.glb  one box per element
+ * Both drop the excluded classes and elements smaller than their minimum size.
+ *
+ * Geometry output: every distinct tessellated geometry, in its local
+ * coordinates, as a content-addressed chunk <sha256>.geo (little-endian):
+ *   "QGEO" | uint32 version | uint32 vertexCount | uint32 indexCount
+ *   | vertexCount x float32 (position xyz, normal xyz) | indexCount x uint32
+ * and one instance table placing the chunks:
+ *   "QGIN" | uint32 version | uint32 geometryCount | uint32 instanceCount
+ *   | geometryCount x 32-byte sha256
+ *   | instanceCount x (uint32 expressID, uint32 geometry, float32[16] matrix, float32[4] rgba)
+ * Vertex values are rounded to 10 micrometres so repeated families hash alike.
+ */
+
+import fs from 'fs';
+import path from 'path';
+import crypto from 'crypto';
+import { fileURLToPath } from 'url';
+
+const __filename = fileURLToPath(import.meta.url);
+const __dirname = path.dirname(__filename);
+const rootNodeModules = path.resolve(__dirname, './node_modules');
+
+const BOUNDS_VERSION = 1;
+const BOUNDS_RECORD_BYTES = 28;
+
+const GEOMETRY_VERSION = 1;
+const INSTANCE_RECORD_BYTES = 88;
+const VERTEX_PRECISION = 1e5;
+
+const GL_FLOAT = 5126;
+const GL_UNSIGNED_INT = 5125;
+const GL_ARRAY_BUFFER = 34962;
+const GL_ELEMENT_ARRAY_BUFFER = 34963;
+
+// Outward normals and corners (indices into min/max) of the six faces of a box
+const BOX_FACES = [
+    [[1, 0, 0], [[3, 1, 2], [3, 4, 2], [3, 4, 5], [3, 1, 5]]],
+    [[-1, 0, 0], [[0, 1, 5], [0, 4, 5], [0, 4, 2], [0, 1, 2]]],
+    [[0, 1, 0], [[0, 4, 2], [0, 4, 5], [3, 4, 5], [3, 4, 2]]],
+    [[0, -1, 0], [[0, 1, 5], [0, 1, 2], [3, 1, 2], [3, 1, 5]]],
+    [[0, 0, 1], [[0, 1, 5], [3, 1, 5], [3, 4, 5], [0, 4, 5]]],
+    [[0, 0, -1], [[3, 1, 2], [0, 1, 2], [0, 4, 2], [3, 4, 2]]]
+];
+
+/**
+ * Triangles of one LOD level grouped by colour, serialised as a GLB file
+ */
+class MeshBucket {
+    constructor() {
+        this.groups = new Map();
+        this.elements = 0;
+    }
+
+    group(color) {
+        const key = [color.x, color.y, color.z, color.w].map(c => Math.round(c * 255)).join(',');
+        let group = this.groups.get(key);
+        if (!group) {
+            group = { color: [color.x, color.y, color.z, color.w], positions: [], normals: [], indices: [] };
+            this.groups.set(key, group);
+        }
+        return group;
+    }
+
+    get triangles() {
+        let count = 0;
+        for (const group of this.groups.values()) count += group.indices.length / 3;
+        return count;
+    }
+
+    toGlb() {
+        const gltf = {
+            asset: { version: '2.0', generator: 'QGEN_IMPFRAG ifc_geometry.js' },
+            scene: 0,
+            scenes: [{ nodes: [] }],
+            nodes: [], meshes: [], materials: [], accessors: [], bufferViews: [], buffers: []
+        };
+        const chunks = [];
+        let byteLength = 0;
+        const addView = (array, target) => {
+            const bytes = Buffer.from(array.buffer, array.byteOffset, array.byteLength);
+            gltf.bufferViews.push({ buffer: 0, byteOffset: byteLength, byteLength: bytes.length, target });
+            chunks.push(bytes);
+            byteLength += bytes.length;
+            return gltf.bufferViews.length - 1;
+        };
+
+        for (const group of this.groups.values()) {
+            if (group.indices.length === 0) continue;
+            const positions = new Float32Array(group.positions);
+            const min = [Infinity, Infinity, Infinity], max = [-Infinity, -Infinity, -Infinity];
+            for (let i = 0; i < positions.length; i += 3) {
+                for (let a = 0; a < 3; a++) {
+                    if (positions[i + a] < min[a]) min[a] = positions[i + a];
+                    if (positions[i + a] > max[a]) max[a] = positions[i + a];
+                }
+            }
+            const count = positions.length / 3;
+            gltf.accessors.push(
+                { bufferView: addView(positions, GL_ARRAY_BUFFER), componentType: GL_FLOAT, count, type: 'VEC3', min, max },
+                { bufferView: addView(new Float32Array(group.normals), GL_ARRAY_BUFFER), componentType: GL_FLOAT, count, type: 'VEC3' },
+                { bufferView: addView(new Uint32Array(group.indices), GL_ELEMENT_ARRAY_BUFFER), componentType: GL_UNSIGNED_INT,
+                  count: group.indices.length, type: 'SCALAR' }
+            );
+            const transparent = group.color[3] < 1;
+            gltf.materials.push({
+                pbrMetallicRoughness: { baseColorFactor: group.color, metallicFactor: 0, roughnessFactor: 1 },
+                alphaMode: transparent ? 'BLEND' : 'OPAQUE',
+                doubleSided: true
+            });
+            const a = gltf.accessors.length - 3;
+            gltf.meshes.push({ primitives: [{ attributes: { POSITION: a, NORMAL: a + 1 }, indices: a + 2,
+                                              material: gltf.materials.length - 1 }] });
+            gltf.nodes.push({ mesh: gltf.meshes.length - 1 });
+            gltf.scenes[0].nodes.push(gltf.nodes.length - 1);
+        }
+        gltf.buffers.push({ byteLength });
+
+        // Chunks are 4-byte aligned: JSON padded with spaces, binary with zeros
+        const pad = (length) => (4 - (length % 4)) % 4;
+        let json = Buffer.from(JSON.stringify(gltf));
+        json = Buffer.concat([json, Buffer.alloc(pad(json.length), 0x20)]);
+        const bin = Buffer.concat([...chunks, Buffer.alloc(pad(byteLength))]);
+        const header = Buffer.alloc(20);
+        header.write('glTF', 0, 'ascii');
+        header.writeUInt32LE(2, 4);
+        header.writeUInt32LE(12 + 8 + json.length + 8 + bin.length, 8);
+        header.writeUInt32LE(json.length, 12);
+        header.write('JSON', 16, 'ascii');
+        const binHeader = Buffer.alloc(8);
+        binHeader.writeUInt32LE(bin.length, 0);
+        binHeader.write('BIN\0', 4, 'ascii');
+        return Buffer.concat([header, json, binHeader, bin]);
+    }
+}
+
+let WebIFC;
+try {
+    WebIFC = await import('web-ifc');
+} catch (error) {
+    console.error('❌ Failed to load web-ifc:', error.message);
+    console.error('   Make sure to run: npm install web-ifc');
+    process.exit(1);
+}
+
+class IfcGeometryPass {
+    constructor() {
+        this.api = new WebIFC.IfcAPI();
+    }
+
+    async open(inputPath) {
+        if (!fs.existsSync(inputPath)) {
+            throw new Error(`Input file not found: ${inputPath}`);
+        }
+        this.api.SetWasmPath(path.join(rootNodeModules, 'web-ifc') + path.sep, true);
+        await this.api.Init();
+
+        const ifcData = fs.readFileSync(inputPath);
+        console.log(`📖 Read IFC file: ${(ifcData.length / 1024 / 1024).toFixed(2)} MB`);
+        return this.api.OpenModel(ifcData, { COORDINATE_TO_ORIGIN: false });
+    }
+
+    /**
+     * Visit every placed geometry as (expressID, geometryExpressID, world-space vertex callback)
+     */
+    streamMeshes(modelID, visit) {
+        this.api.StreamAllMeshes(modelID, (mesh) => {
+            const placed = mesh.geometries;
+            for (let i = 0; i < placed.size(); i++) {
+                const placedGeometry = placed.get(i);
+                const geometry = this.api.GetGeometry(modelID, placedGeometry.geometryExpressID);
+                try {
+                    const vertices = this.api.GetVertexArray(geometry.GetVertexData(), geometry.GetVertexDataSize());
+                    visit(mesh.expressID, placedGeometry, vertices, geometry);
+                } finally {
+                    geometry.delete();
+                }
+            }
+        });
+    }
+
+    computeBounds(modelID) {
+        const bounds = new Map();
+        this.streamMeshes(modelID, (expressID, placedGeometry, vertices) => {
+            const m = placedGeometry.flatTransformation;
+            let box = bounds.get(expressID);
+            if (!box) {
+                box = [Infinity, Infinity, Infinity, -Infinity, -Infinity, -Infinity];
+                bounds.set(expressID, box);
+            }
+            // Vertices are interleaved position + normal; the matrix is column-major
+            for (let v = 0; v < vertices.length; v += 6) {
+                const x = vertices[v], y = vertices[v + 1], z = vertices[v + 2];
+                const wx = m[0] * x + m[4] * y + m[8] * z + m[12];
+                const wy = m[1] * x + m[5] * y + m[9] * z + m[13];
+                const wz = m[2] * x + m[6] * y + m[10] * z + m[14];
+                if (wx < box[0]) box[0] = wx;
+                if (wy < box[1]) box[1] = wy;
+                if (wz < box[2]) box[2] = wz;
+                if (wx > box[3]) box[3] = wx;
+                if (wy > box[4]) box[4] = wy;
+                if (wz > box[5]) box[5] = wz;
+            }
+        });
+        return bounds;
+    }
+
+    writeBounds(bounds, outputPath) {
+        const buffer = Buffer.alloc(12 + bounds.size * BOUNDS_RECORD_BYTES);
+        buffer.write('QBND', 0, 'ascii');
+        buffer.writeUInt32LE(BOUNDS_VERSION, 4);
+        buffer.writeUInt32LE(bounds.size, 8);
+        let offset = 12;
+        for (const [expressID, box] of bounds) {
+            buffer.writeUInt32LE(expressID, offset);
+            for (let i = 0; i < 6; i++) {
+                buffer.writeFloatLE(box[i], offset + 4 + i * 4);
+            }
+            offset += BOUNDS_RECORD_BYTES;
+        }
+        fs.writeFileSync(outputPath, buffer);
+    }
+
+    /**
+     * Visit every element once, with its placed geometries transformed to world space
+     */
+    streamElements(modelID, visit) {
+        let current = null;
+        const flush = () => {
+            if (current) visit(current);
+            current = null;
+        };
+        this.streamMeshes(modelID, (expressID, placedGeometry, vertices, geometry) => {
+            if (!current || current.expressID !== expressID) {
+                flush();
+                current = { expressID, parts: [], min: [Infinity, Infinity, Infinity], max: [-Infinity, -Infinity, -Infinity] };
+            }
+            const m = placedGeometry.flatTransformation;
+            const positions = new Float32Array(vertices.length / 2);
+            for (let v = 0, p = 0; v < vertices.length; v += 6, p += 3) {
+                const x = vertices[v], y = vertices[v + 1], z = vertices[v + 2];
+                positions[p] = m[0] * x + m[4] * y + m[8] * z + m[12];
+                positions[p + 1] = m[1] * x + m[5] * y + m[9] * z + m[13];
+                positions[p + 2] = m[2] * x + m[6] * y + m[10] * z + m[14];
+                for (let a = 0; a < 3; a++) {
+                    if (positions[p + a] < current.min[a]) current.min[a] = positions[p + a];
+                    if (positions[p + a] > current.max[a]) current.max[a] = positions[p + a];
+                }
+            }
+            const indices = this.api.GetIndexArray(geometry.GetIndexData(), geometry.GetIndexDataSize()).slice();
+            current.parts.push({ positions, indices, color: { ...placedGeometry.color } });
+        });
+        flush();
+    }
+
+    /**
+     * Overview variants: clustered meshes (lod1) and element boxes (lod2)
+     */
+    computeLod(modelID, options) {
+        const excluded = new Set(options.exclude.map(name => WebIFC[name]).filter(code => code !== undefined));
+        const lod1 = new MeshBucket();
+        const lod2 = new MeshBucket();
+        const report = { elements: 0, triangles: 0, excluded_classes: 0, levels: {} };
+        const skipped = { 1: 0, 2: 0 };
+
+        this.streamElements(modelID, (element) => {
+            report.elements++;
+            for (const part of element.parts) report.triangles += part.indices.length / 3;
+            if (excluded.has(this.api.GetLineType(modelID, element.expressID))) {
+                report.excluded_classes++;
+                return;
+            }
+            const size = Math.hypot(element.max[0] - element.min[0], element.max[1] - element.min[1],
+                                    element.max[2] - element.min[2]);
+            if (size >= options.minSize) {
+                this.addClustered(lod1, element, options.cell);
+            } else {
+                skipped[1]++;
+            }
+            if (size >= options.proxyMinSize) {
+                this.addBox(lod2, element);
+            } else {
+                skipped[2]++;
+            }
+        });
+
+        const levels = { 1: lod1, 2: lod2 };
+        for (const level of [1, 2]) {
+            const bucket = levels[level];
+            report.levels[level] = {
+                elements: bucket.elements,
+                triangles: bucket.triangles,
+                excluded_small: skipped[level]
+            };
+        }
+        return { report, levels };
+    }
+
+    addClustered(bucket, element, cell) {
+        bucket.elements++;
+        for (const part of element.parts) {
+            const group = bucket.group(part.color);
+            // Vertices falling into the same grid cell merge into their average
+            const clusters = new Map();
+            const remap = new Uint32Array(part.positions.length / 3);
+            const sums = [];
+            for (let v = 0; v < remap.length; v++) {
+                const x = part.positions[v * 3], y = part.positions[v * 3 + 1], z = part.positions[v * 3 + 2];
+                const key = `${Math.floor(x / cell)},${Math.floor(y / cell)},${Math.floor(z / cell)}`;
+                let cluster = clusters.get(key);
+                if (cluster === undefined) {
+                    cluster = sums.length / 4;
+                    clusters.set(key, cluster);
+                    sums.push(0, 0, 0, 0);
+                }
+                sums[cluster * 4] += x;
+                sums[cluster * 4 + 1] += y;
+                sums[cluster * 4 + 2] += z;
+                sums[cluster * 4 + 3]++;
+                remap[v] = cluster;
+            }
+
+            const base = group.positions.length / 3;
+            const clusterCount = sums.length / 4;
+            const normals = new Float64Array(clusterCount * 3);
+            const positions = new Float64Array(clusterCount * 3);
+            for (let c = 0; c < clusterCount; c++) {
+                for (let a = 0; a < 3; a++) positions[c * 3 + a] = sums[c * 4 + a] / sums[c * 4 + 3];
+            }
+            const triangles = [];
+            for (let t = 0; t < part.indices.length; t += 3) {
+                const a = remap[part.indices[t]], b = remap[part.indices[t + 1]], c = remap[part.indices[t + 2]];
+                if (a === b || b === c || a === c) continue;
+                triangles.push(a, b, c);
+                // Area-weighted face normal, accumulated on each corner
+                const ux = positions[b * 3] - positions[a * 3], uy = positions[b * 3 + 1] - positions[a * 3 + 1],
+                      uz = positions[b * 3 + 2] - positions[a * 3 + 2];
+                const vx = positions[c * 3] - positions[a * 3], vy = positions[c * 3 + 1] - positions[a * 3 + 1],
+                      vz = positions[c * 3 + 2] - positions[a * 3 + 2];
+                const nx = uy * vz - uz * vy, ny = uz * vx - ux * vz, nz = ux * vy - uy * vx;
+                for (const corner of [a, b, c]) {
+                    normals[corner * 3] += nx;
+                    normals[corner * 3 + 1] += ny;
+                    normals[corner * 3 + 2] += nz;
+                }
+            }
+            if (triangles.length === 0) continue;
+
+            // Keep only the clusters still referenced by a triangle
+            const used = new Int32Array(clusterCount).fill(-1);
+            let next = base;
+            for (const corner of triangles) {
+                if (used[corner] === -1) {
+                    used[corner] = next++;
+                    group.positions.push(positions[corner * 3], positions[corner * 3 + 1], positions[corner * 3 + 2]);
+                    const nx = normals[corner * 3], ny = normals[corner * 3 + 1], nz = normals[corner * 3 + 2];
+                    const length = Math.hypot(nx, ny, nz) || 1;
+                    group.normals.push(nx / length, ny / length, nz / length);
+                }
+                group.indices.push(used[corner]);
+            }
+        }
+    }
+
+    addBox(bucket, element) {
+        bucket.elements++;
+        // The largest part gives the element its colour
+        const main = element.parts.reduce((a, b) => (b.indices.length > a.indices.length ? b : a));
+        const group = bucket.group(main.color);
+        const corners = [...element.min, ...element.max];
+        for (const [normal, quad] of BOX_FACES) {
+            const base = group.positions.length / 3;
+            for (const [x, y, z] of quad) {
+                group.positions.push(corners[x], corners[y], corners[z]);
+                group.normals.push(...normal);
+            }
+            group.indices.push(base, base + 1, base + 2, base, base + 2, base + 3);
+        }
+    }
+
+    /**
+     * Content-addressed chunks of every distinct geometry and the instances placing them
+     */
+    writeGeometryLibrary(modelID, chunkDir, outputPath) {
+        fs.mkdirSync(chunkDir, { recursive: true });
+        const hashes = [];
+        const byHash = new Map();
+        // Mapped representations share a geometry express ID within a model
+        const byExpressID = new Map();
+        const instances = [];
+        let chunkBytes = 0;
+
+        this.streamMeshes(modelID, (expressID, placedGeometry, vertices, geometry) => {
+            let index = byExpressID.get(placedGeometry.geometryExpressID);
+            if (index === undefined) {
+                const indices = this.api.GetIndexArray(geometry.GetIndexData(), geometry.GetIndexDataSize());
+                const chunk = Buffer.alloc(16 + vertices.length * 4 + indices.length * 4);
+                chunk.write('QGEO', 0, 'ascii');
+                chunk.writeUInt32LE(GEOMETRY_VERSION, 4);
+                chunk.writeUInt32LE(vertices.length / 6, 8);
+                chunk.writeUInt32LE(indices.length, 12);
+                let offset = 16;
+                for (let i = 0; i < vertices.length; i++, offset += 4) {
+                    chunk.writeFloatLE(Math.round(vertices[i] * VERTEX_PRECISION) / VERTEX_PRECISION, offset);
+                }
+                for (let i = 0; i < indices.length; i++, offset += 4) {
+                    chunk.writeUInt32LE(indices[i], offset);
+                }
+                const hash = crypto.createHash('sha256').update(chunk).digest('hex');
+                index = byHash.get(hash);
+                if (index === undefined) {
+                    index = hashes.length;
+                    hashes.push(hash);
+                    byHash.set(hash, index);
+                    fs.writeFileSync(path.join(chunkDir, `${hash}.geo`), chunk);
+                    chunkBytes += chunk.length;
+                }
+                byExpressID.set(placedGeometry.geometryExpressID, index);
+            }
+            const c = placedGeometry.color;
+            instances.push([expressID, index, placedGeometry.flatTransformation, [c.x, c.y, c.z, c.w]]);
+        });
+
+        const buffer = Buffer.alloc(16 + hashes.length * 32 + instances.length * INSTANCE_RECORD_BYTES);
+        buffer.write('QGIN', 0, 'ascii');
+        buffer.writeUInt32LE(GEOMETRY_VERSION, 4);
+        buffer.writeUInt32LE(hashes.length, 8);
+        buffer.writeUInt32LE(instances.length, 12);
+        let offset = 16;
+        for (const hash of hashes) {
+            buffer.write(hash, offset, 'hex');
+            offset += 32;
+        }
+        for (const [expressID, index, matrix, color] of instances) {
+            buffer.writeUInt32LE(expressID, offset);
+            buffer.writeUInt32LE(index, offset + 4);
+            for (let i = 0; i < 16; i++) buffer.writeFloatLE(matrix[i], offset + 8 + i * 4);
+            for (let i = 0; i < 4; i++) buffer.writeFloatLE(color[i], offset + 72 + i * 4);
+            offset += INSTANCE_RECORD_BYTES;
+        }
+        fs.writeFileSync(outputPath, buffer);
+        return { geometries: hashes.length, instances: instances.length, chunkBytes };
+    }
+
+    close(modelID) {
+        this.api.CloseModel(modelID);
+    }
+}
+
+async function main() {
+    const args = process.argv.slice(2);
+    const inputIndex = args.indexOf('--input');
+    const outputIndex = args.indexOf('--output');
+
+    const lodIndex = args.indexOf('--lod');
+    const option = (name, fallback) => {
+        const index = args.indexOf(name);
+        return index === -1 ? fallback : args[index + 1];
+    };
+
+    const geometryIndex = args.indexOf('--geometry');
+
+    if (inputIndex === -1 || outputIndex === -1
+        || (!args.includes('--bounds') && lodIndex === -1 && geometryIndex === -1)) {
+        console.log(`
+Usage:
+  Element bounds:  node ifc_geometry.js --input file.ifc --output bounds.bin --bounds
+  Overview LODs:   node ifc_geometry.js --input file.ifc --output lod.json --lod ./lod-dir
+                       [--lod-cell 0.1] [--lod-min-size 0.25] [--lod-proxy-min-size 1.0]
+                       [--lod-exclude IFCFASTENER,IFCFLOWFITTING]
+  Geometry chunks: node ifc_geometry.js --input file.ifc --output instances.bin --geometry ./chunk-dir
+        `);
+        process.exit(1);
+    }
+
+    const inputPath = args[inputIndex + 1];
+    const outputPath = args[outputIndex + 1];
+    const pass = new IfcGeometryPass();
+    const modelID = await pass.open(inputPath);
+    try {
+        const started = Date.now();
+        if (geometryIndex !== -1) {
+            const stats = pass.writeGeometryLibrary(modelID, args[geometryIndex + 1], outputPath);
+            console.log(`✅ ${stats.instances} instances of ${stats.geometries} distinct geometries ` +
+                        `(${(stats.chunkBytes / 1024 / 1024).toFixed(2)} MB) in ${((Date.now() - started) / 1000).toFixed(2)}s`);
+        } else if (lodIndex !== -1) {
+            const lodDir = args[lodIndex + 1];
+            const { report, levels } = pass.computeLod(modelID, {
+                cell: parseFloat(option('--lod-cell', '0.1')),
+                minSize: parseFloat(option('--lod-min-size', '0.25')),
+                proxyMinSize: parseFloat(option('--lod-proxy-min-size', '1.0')),
+                exclude: option('--lod-exclude', '').split(',').filter(Boolean).map(name => name.toUpperCase())
+            });
+            fs.mkdirSync(lodDir, { recursive: true });
+            for (const [level, bucket] of Object.entries(levels)) {
+                const file = `lod${level}.glb`;
+                fs.writeFileSync(path.join(lodDir, file), bucket.toGlb());
+                report.levels[level].file = file;
+            }
+            fs.writeFileSync(outputPath, JSON.stringify(report, null, 2));
+            console.log(`✅ LODs built for ${report.elements} elements in ${((Date.now() - started) / 1000).toFixed(2)}s`);
+        } else {
+            const bounds = pass.computeBounds(modelID);
+            pass.writeBounds(bounds, outputPath);
+            console.log(`✅ Bounds computed for ${bounds.size} elements in ${((Date.now() - started) / 1000).toFixed(2)}s`);
+        }
+    } finally {
+        pass.close(modelID);
+    }
+}
+
+if (process.argv[1] && process.argv[1].endsWith('ifc_geometry.js')) {
+    main().catch(error => {
+        console.error('❌ Geometry pass failed:', error.message);
+        process.exit(1);
+    });
+}
+
+export { IfcGeometryPass };
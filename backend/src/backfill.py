@@ -0,0 +1,405 @@
+"""
+Resumable backfill for QGEN_IMPFRAG
+===================================
+
+Bulk conversion of IFC archives: directory trees of any depth holding
+more models than a single run can be expected to get through.
+
+    python src/ifc_processor.py --backfill /archive/ifc [--manifest PATH] [--rescan] [--retry-failed]
+
+The archive is walked with os.scandir, without recursion, and every IFC
+file is recorded in a manifest before anything is converted. Each file
+is copied into the IFC store under a flat name derived from its path in
+the archive (site/b1/model.ifc becomes site__b1__model.ifc) and
+converted as backfill work on the scheduler, or on the work queue in
+distributed mode, a bounded number at a time.
+
+The manifest (SQLite, in state_dir by default) is the checkpoint. A
+restarted backfill skips the files that are done, picks up the rest,
+and reconverts files whose size or modification time changed since the
+scan. Failed conversions are retried with exponential backoff; files
+that still fail after the last attempt are listed in the summary and
+left for --retry-failed. Throughput and ETA are logged as files finish,
+and a summary report is written to reports_dir/backfill.
+
+Author: XQG4_AXIS Team
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.db import SqliteDatabase
+from src.scheduler import BACKFILL
+
+
+# Manifest states
+PENDING = "pending"
+CONVERTING = "converting"
+DONE = "done"
+FAILED = "failed"
+
+MAX_BACKOFF_SECONDS = 3600
+
+# Files recorded per manifest transaction while scanning
+SCAN_BATCH = 1000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    state TEXT NOT NULL,
+    reconvert INTEGER NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    retry_at REAL NOT NULL DEFAULT 0,
+    job_id TEXT,
+    seconds REAL,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_files_state ON files (state, path);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def walk_archive(root: Path, suffix: str = ".ifc",
+                 logger: Optional[logging.Logger] = None) -> Iterator[Tuple[str, int, float]]:
+    """(path relative to root, size, mtime) of every file with suffix below root
+
+    Directories are walked from an explicit stack, so the depth of the
+    tree is not bounded by the recursion limit. Unreadable directories
+    are logged and skipped.
+    """
+    logger = logger or logging.getLogger(__name__)
+    root = Path(root)
+    stack = [str(root)]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = list(it)
+        except OSError as e:
+            logger.warning(f"⚠️ Skipping unreadable directory {directory}: {e}")
+            continue
+        for entry in sorted(entries, key=lambda e: e.name):
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file() and entry.name.lower().endswith(suffix):
+                    st = entry.stat()
+                    yield Path(entry.path).relative_to(root).as_posix(), st.st_size, st.st_mtime
+            except OSError as e:
+                logger.warning(f"⚠️ Skipping {entry.path}: {e}")
+
+
+def store_name(relative_path: str) -> str:
+    """Flat IFC store name for a file of the archive: site/b1/model.ifc -> site__b1__model.ifc"""
+    return relative_path.replace("/", "__")
+
+
+def format_duration(seconds: float) -> str:
+    """Durations like 42m, 3h 12m or 2d 5h, for progress ETAs"""
+    minutes = round(seconds / 60)
+    if minutes < 60:
+        return f"{minutes}m"
+    hours, minutes = divmod(minutes, 60)
+    if hours < 24:
+        return f"{hours}h {minutes}m"
+    days, hours = divmod(hours, 24)
+    return f"{days}d {hours}h"
+
+
+class BackfillManifest:
+    """Checkpoint of a backfill: every file of the archive and how far it got"""
+
+    def __init__(self, db_path: Path, busy_timeout_ms: int = 10000):
+        self.db_path = Path(db_path)
+        self.db = SqliteDatabase(db_path, busy_timeout_ms)
+        self.db.executescript(SCHEMA)
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row["value"] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self.db.write() as conn:
+            conn.execute("INSERT INTO meta (key, value) VALUES (?, ?) "
+                         "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))
+
+    def record(self, files: List[Tuple[str, int, float]]) -> int:
+        """Add scanned files; changed ones go back to pending. Returns the number added or changed"""
+        changed = 0
+        now = time.time()
+        with self.db.write() as conn:
+            for path, size, mtime in files:
+                row = conn.execute("SELECT size, mtime FROM files WHERE path = ?", (path,)).fetchone()
+                if row is None:
+                    conn.execute(
+                        "INSERT INTO files (path, name, size, mtime, state, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                        (path, self._unique_name(conn, path), size, mtime, PENDING, now)
+                    )
+                    changed += 1
+                elif row["size"] != size or row["mtime"] != mtime:
+                    conn.execute(
+                        """
+                        UPDATE files SET size = ?, mtime = ?, state = ?, reconvert = 1, attempts = 0,
+                            retry_at = 0, error = NULL, updated_at = ?
+                        WHERE path = ?
+                        """,
+                        (size, mtime, PENDING, now, path)
+                    )
+                    changed += 1
+        return changed
+
+    def _unique_name(self, conn, path: str) -> str:
+        name = store_name(path)
+        if conn.execute("SELECT 1 FROM files WHERE name = ?", (name,)).fetchone() is None:
+            return name
+        # a__b/c.ifc and a/b__c.ifc flatten alike; the path hash tells them apart
+        stem, _, suffix = name.rpartition(".")
+        return f"{stem}-{hashlib.sha1(path.encode()).hexdigest()[:8]}.{suffix}"
+
+    def recover(self) -> int:
+        """Files left converting by a process that stopped go back to pending"""
+        with self.db.write() as conn:
+            return conn.execute("UPDATE files SET state = ?, job_id = NULL WHERE state = ?",
+                                (PENDING, CONVERTING)).rowcount
+
+    def reset_failed(self) -> int:
+        """Give failed files a fresh set of attempts"""
+        with self.db.write() as conn:
+            return conn.execute("UPDATE files SET state = ?, attempts = 0, retry_at = 0 WHERE state = ?",
+                                (PENDING, FAILED)).rowcount
+
+    def ready(self, limit: int, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Pending files whose backoff has passed, in path order"""
+        rows = self.db.execute(
+            "SELECT * FROM files WHERE state = ? AND retry_at <= ? ORDER BY path LIMIT ?",
+            (PENDING, now if now is not None else time.time(), limit)
+        ).fetchall()
+        return [dict(row) for row in rows]
+
+    def next_retry_at(self) -> Optional[float]:
+        row = self.db.execute("SELECT MIN(retry_at) AS retry_at FROM files WHERE state = ?", (PENDING,)).fetchone()
+        return row["retry_at"]
+
+    def mark_converting(self, path: str, job_id: str):
+        with self.db.write() as conn:
+            conn.execute("UPDATE files SET state = ?, job_id = ?, updated_at = ? WHERE path = ?",
+                         (CONVERTING, job_id, time.time(), path))
+
+    def mark_done(self, path: str, seconds: Optional[float]):
+        with self.db.write() as conn:
+            conn.execute(
+                "UPDATE files SET state = ?, reconvert = 0, seconds = ?, error = NULL, updated_at = ? WHERE path = ?",
+                (DONE, seconds, time.time(), path)
+            )
+
+    def mark_failed(self, path: str, error: str, retry_at: Optional[float] = None):
+        """Count a failed attempt; with retry_at the file is tried again from then on"""
+        with self.db.write() as conn:
+            conn.execute(
+                """
+                UPDATE files SET state = ?, attempts = attempts + 1, retry_at = ?, job_id = NULL,
+                    error = ?, updated_at = ?
+                WHERE path = ?
+                """,
+                (PENDING if retry_at is not None else FAILED, retry_at or 0, error[-1000:], time.time(), path)
+            )
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """Files and bytes per state"""
+        rows = self.db.execute("SELECT state, COUNT(*) AS files, SUM(size) AS bytes FROM files GROUP BY state")
+        return {row["state"]: {"files": row["files"], "bytes": row["bytes"] or 0} for row in rows}
+
+    def failures(self, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = self.db.execute("SELECT path, name, attempts, error FROM files WHERE state = ? ORDER BY path LIMIT ?",
+                               (FAILED, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+
+class Backfill:
+    """Converts an archive recorded in a manifest, resuming where the last run stopped"""
+
+    def __init__(self, processor, archive_root: Path, manifest: BackfillManifest, max_in_flight: int = 4,
+                 max_attempts: int = 3, backoff_seconds: float = 60.0, poll_seconds: float = 1.0,
+                 logger: Optional[logging.Logger] = None):
+        self.processor = processor
+        self.archive_root = Path(archive_root)
+        self.manifest = manifest
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_attempts = max(1, max_attempts)
+        self.backoff_seconds = backoff_seconds
+        self.poll_seconds = poll_seconds
+        self.logger = logger or logging.getLogger(__name__)
+        self.started: Optional[float] = None
+        self.converted = 0
+        self.converted_bytes = 0
+        self.failed = 0
+
+    def scan(self, rescan: bool = False) -> int:
+        """Record the archive's files in the manifest; a finished scan is only repeated with rescan"""
+        if self.manifest.get_meta("scan_completed") and not rescan:
+            self.logger.info(f"📋 Archive already scanned on {self.manifest.get_meta('scan_completed')}")
+            return 0
+        self.logger.info(f"🔍 Scanning {self.archive_root}")
+        changed = scanned = 0
+        batch = []
+        for entry in walk_archive(self.archive_root, logger=self.logger):
+            batch.append(entry)
+            if len(batch) >= SCAN_BATCH:
+                changed += self.manifest.record(batch)
+                scanned += len(batch)
+                batch = []
+                self.logger.info(f"🔍 {scanned} IFC files found so far")
+        changed += self.manifest.record(batch)
+        scanned += len(batch)
+        self.manifest.set_meta("archive_root", str(self.archive_root))
+        self.manifest.set_meta("scan_completed", datetime.now().isoformat())
+        self.logger.info(f"📋 {scanned} IFC files in the archive, {changed} new or changed")
+        return changed
+
+    def run(self) -> Dict[str, Any]:
+        """Convert every pending file; returns the summary, also when interrupted"""
+        self.started = time.time()
+        recovered = self.manifest.recover()
+        if recovered:
+            self.logger.info(f"♻️ {recovered} files were still converting when the last run stopped")
+        in_flight: Dict[str, Tuple[Any, Dict[str, Any], float]] = {}
+        interrupted = False
+        try:
+            while True:
+                free = self.max_in_flight - len(in_flight)
+                if free > 0:
+                    for row in self.manifest.ready(free):
+                        handle = self._submit(row)
+                        if handle is not None:
+                            in_flight[row["path"]] = (handle, row, time.time())
+
+                if not in_flight:
+                    retry_at = self.manifest.next_retry_at()
+                    if retry_at is None:
+                        break
+                    # Only files waiting out their backoff are left
+                    time.sleep(min(max(retry_at - time.time(), 0), 60))
+                    continue
+
+                for path in list(in_flight):
+                    handle, row, submitted = in_flight[path]
+                    try:
+                        handle.wait(timeout=0)
+                    except TimeoutError:
+                        continue
+                    except Exception as e:
+                        self._failed(row, str(e))
+                    else:
+                        self._finished(row, handle.job_id, time.time() - submitted)
+                    del in_flight[path]
+                time.sleep(self.poll_seconds)
+        except KeyboardInterrupt:
+            # Files still converting are picked up again by the next run
+            interrupted = True
+            self.logger.info("🛑 Backfill interrupted; run the same command to resume")
+        return self.summary(interrupted)
+
+    def _submit(self, row: Dict[str, Any]):
+        """Copy a file into the IFC store and queue its conversion; None if the copy failed"""
+        processor = self.processor
+        name = row["name"]
+        try:
+            stored = processor.ifc_storage.stat(name)
+            if row["reconvert"] or stored is None or stored.size != row["size"]:
+                with open(self.archive_root / row["path"], "rb") as f:
+                    processor.ifc_storage.write_stream(name, f)
+        except OSError as e:
+            self._failed(row, f"Could not copy {row['path']} into the IFC store: {e}")
+            return None
+        handle = processor.submit_conversion(processor.config.ifc_input_dir / name,
+                                             force_reconvert=bool(row["reconvert"]), priority_class=BACKFILL)
+        self.manifest.mark_converting(row["path"], handle.job_id)
+        return handle
+
+    def _finished(self, row: Dict[str, Any], job_id: str, seconds: float):
+        status = self.processor.get_job_status(job_id)
+        if status is not None and status.status == "completed":
+            self.manifest.mark_done(row["path"], round(seconds, 2))
+            self.converted += 1
+            self.converted_bytes += row["size"]
+            self.logger.info(f"📦 {row['path']} converted in {seconds:.1f}s · {self.progress()}")
+        else:
+            self._failed(row, status.message if status is not None else "No job status")
+
+    def _failed(self, row: Dict[str, Any], error: str):
+        attempts = row["attempts"] + 1
+        if attempts < self.max_attempts:
+            delay = min(self.backoff_seconds * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS)
+            self.manifest.mark_failed(row["path"], error, retry_at=time.time() + delay)
+            self.logger.warning(f"⚠️ {row['path']} failed (attempt {attempts}/{self.max_attempts}), "
+                                f"retrying in {format_duration(delay)}: {error}")
+        else:
+            self.manifest.mark_failed(row["path"], error)
+            self.failed += 1
+            self.logger.error(f"❌ {row['path']} failed after {attempts} attempts: {error}")
+
+    def throughput(self) -> Dict[str, Any]:
+        """This run's rate and the time left at that rate"""
+        elapsed = time.time() - self.started if self.started else 0
+        counts = self.manifest.counts()
+        remaining = sum(counts.get(state, {}).get("bytes", 0) for state in (PENDING, CONVERTING))
+        # Conversion time grows with model size, so the ETA goes by bytes rather than files
+        rate = self.converted_bytes / elapsed if elapsed > 0 else 0
+        return {
+            "elapsed_seconds": round(elapsed, 1),
+            "files_per_hour": round(self.converted / elapsed * 3600, 1) if elapsed > 0 else 0,
+            "mb_per_hour": round(rate * 3600 / (1024 * 1024), 1),
+            "remaining_files": sum(counts.get(state, {}).get("files", 0) for state in (PENDING, CONVERTING)),
+            "eta_seconds": round(remaining / rate) if rate > 0 else None
+        }
+
+    def progress(self) -> str:
+        counts = self.manifest.counts()
+        total = sum(state["files"] for state in counts.values())
+        done = counts.get(DONE, {}).get("files", 0)
+        rates = self.throughput()
+        eta = format_duration(rates["eta_seconds"]) if rates["eta_seconds"] is not None else "unknown"
+        return (f"[{done}/{total}] {rates['files_per_hour']} files/h, {rates['mb_per_hour']} MB/h, "
+                f"ETA {eta}")
+
+    def summary(self, interrupted: bool = False) -> Dict[str, Any]:
+        return {
+            "archive_root": str(self.archive_root),
+            "manifest": str(self.manifest.db_path),
+            "started": datetime.fromtimestamp(self.started).isoformat() if self.started else None,
+            "finished": datetime.now().isoformat(),
+            "interrupted": interrupted,
+            "converted_this_run": self.converted,
+            "failed_this_run": self.failed,
+            "throughput": self.throughput(),
+            "states": self.manifest.counts(),
+            "failures": self.manifest.failures()
+        }
+
+    def write_report(self, summary: Dict[str, Any], reports_dir: Path) -> Path:
+        report_dir = Path(reports_dir) / "backfill"
+        report_dir.mkdir(parents=True, exist_ok=True)
+        report_file = report_dir / f"backfill-{datetime.now():%Y%m%d-%H%M%S}.json"
+        report_file.write_text(json.dumps(summary, indent=2), encoding="utf-8")
+        return report_file
+
+
+def default_manifest_path(state_dir: Path, archive_root: Path) -> Path:
+    """One manifest per archive, so the same command always resumes the same backfill"""
+    digest = hashlib.sha1(str(Path(archive_root).resolve()).encode()).hexdigest()[:12]
+    return Path(state_dir) / f"backfill-{digest}.db"
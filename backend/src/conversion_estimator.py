@@ -0,0 +1,303 @@
+"""
+Conversion estimates for QGEN_IMPFRAG
+=====================================
+
+Predicts how long a conversion will take and how much memory its
+converter will need, from a model fitted on the conversion history
+(see conversion_history), and derives the job's limits and ETA from
+the prediction.
+
+The features come from a pre-scan of the IFC file: its size, its
+number of entity instances and of shape representations (the geometry
+web-ifc has to tessellate). Both counts are plain byte counts over the
+raw file, so the pre-scan runs at disk speed; it is cached per file.
+Features are those of the file the converter runs on: a pruned input
+is recorded, and predicted, as pruned.
+
+The fit is least squares on logarithms,
+
+    log(seconds) = c0 + c1 log(MB) + c2 log(entities) + c3 log(representations)
+
+and the same for peak memory. While few conversions in the history
+have pre-scan features, size alone is used; with too little history
+the static size formula of ResourceLimits.for_input stays in charge
+and the duration is a rough guess of a second per MB.
+
+Limits get headroom: the timeout is TIMEOUT_HEADROOM times the
+predicted duration, widened when the fit is loose, plus a fixed margin
+for startup, so a small stuck job is stopped in minutes while a large
+one is given the hours it needs. The heap is MEMORY_HEADROOM times the
+predicted peak memory, never below the static minimum.
+
+Author: XQG4_AXIS Team
+"""
+
+import heapq
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.conversion_history import ConversionHistory, FIT_WINDOW, MIN_FIT_MB
+from src.converter_runner import ResourceLimits, WASM_VIRTUAL_RESERVE_MB
+
+
+MB = 1024 * 1024
+
+FEATURES = ("input_mb", "entities", "representations")
+# Points needed per fitted coefficient
+MIN_POINTS_PER_COEFFICIENT = 5
+# The fit is refreshed at most this often
+FIT_TTL_SECONDS = 60
+
+TIMEOUT_HEADROOM = 3.0
+TIMEOUT_MARGIN_SECONDS = 60
+MIN_TIMEOUT_SECONDS = 60
+MAX_TIMEOUT_SECONDS = 24 * 3600
+MEMORY_HEADROOM = 1.5
+MIN_HEAP_MB = 1024
+
+# Without history: startup plus about a second per MB
+FALLBACK_STARTUP_SECONDS = 5
+FALLBACK_SECONDS_PER_MB = 1.0
+
+PRESCAN_CACHE_SIZE = 256
+PRESCAN_CHUNK_BYTES = 8 * MB
+ENTITY_MARKER = b"\n#"
+REPRESENTATION_MARKER = b"IFCSHAPEREPRESENTATION("
+
+
+def prescan(path: Path) -> Dict[str, float]:
+    """Size, entity instances and shape representations of an IFC file, from byte counts"""
+    counts = {ENTITY_MARKER: 0, REPRESENTATION_MARKER: 0}
+    # The start of the file counts as a line start
+    tails = {ENTITY_MARKER: b"\n", REPRESENTATION_MARKER: b""}
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(PRESCAN_CHUNK_BYTES)
+            if not chunk:
+                break
+            # Markers may straddle two chunks: each carries a tail one byte too short to hold it whole,
+            # so nothing is counted twice. STEP keywords are upper case; the raw bytes are counted.
+            for marker in counts:
+                window = tails[marker] + chunk
+                counts[marker] += window.count(marker)
+                tails[marker] = window[-(len(marker) - 1):]
+    return {
+        "input_mb": round(os.path.getsize(path) / MB, 3),
+        "entities": counts[ENTITY_MARKER],
+        "representations": counts[REPRESENTATION_MARKER]
+    }
+
+
+def least_squares(rows: List[List[float]], targets: List[float]) -> Optional[List[float]]:
+    """Coefficients minimizing |rows . c - targets|, from the normal equations; None if singular"""
+    n = len(rows[0])
+    # A tiny ridge keeps nearly collinear features (entities track size closely) solvable
+    a = [[sum(r[i] * r[j] for r in rows) + (1e-9 if i == j else 0) for j in range(n)] for i in range(n)]
+    b = [sum(r[i] * t for r, t in zip(rows, targets)) for i in range(n)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+        if abs(a[pivot][col]) < 1e-12:
+            return None
+        a[col], a[pivot], b[col], b[pivot] = a[pivot], a[col], b[pivot], b[col]
+        for r in range(col + 1, n):
+            factor = a[r][col] / a[col][col]
+            for c in range(col, n):
+                a[r][c] -= factor * a[col][c]
+            b[r] -= factor * b[col]
+    coefficients = [0.0] * n
+    for r in reversed(range(n)):
+        coefficients[r] = (b[r] - sum(a[r][c] * coefficients[c] for c in range(r + 1, n))) / a[r][r]
+    return coefficients
+
+
+@dataclass
+class LogLinearFit:
+    """log(target) = c0 + sum(ci * log(feature i)), with the spread of its residuals"""
+    features: Tuple[str, ...]
+    coefficients: List[float]
+    residual_sd: float
+    points: int
+
+    @staticmethod
+    def _row(features: Tuple[str, ...], values: Dict[str, float]) -> List[float]:
+        return [1.0] + [math.log(max(values[name], MIN_FIT_MB if name == "input_mb" else 1)) for name in features]
+
+    @classmethod
+    def fit(cls, features: Tuple[str, ...], samples: List[Tuple[Dict[str, float], float]]) -> Optional["LogLinearFit"]:
+        if len(samples) < MIN_POINTS_PER_COEFFICIENT * (len(features) + 1):
+            return None
+        rows = [cls._row(features, values) for values, _ in samples]
+        targets = [math.log(max(target, 0.1)) for _, target in samples]
+        coefficients = least_squares(rows, targets)
+        if coefficients is None:
+            return None
+        residuals = [t - sum(c * x for c, x in zip(coefficients, row)) for row, t in zip(rows, targets)]
+        residual_sd = math.sqrt(sum(r * r for r in residuals) / max(1, len(residuals) - len(coefficients)))
+        return cls(features, coefficients, residual_sd, len(samples))
+
+    def predict(self, values: Dict[str, float]) -> float:
+        return math.exp(sum(c * x for c, x in zip(self.coefficients, self._row(self.features, values))))
+
+    def describe(self) -> str:
+        return f"{' + '.join(self.features)} fit on {self.points} conversions"
+
+
+@dataclass
+class Estimate:
+    """Predicted duration and memory of a conversion, and the limits derived from them"""
+    seconds: float
+    peak_memory_mb: Optional[float]
+    limits: ResourceLimits
+    basis: str
+    features: Dict[str, float] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "estimated_seconds": round(self.seconds, 1),
+            "estimated_peak_memory_mb": round(self.peak_memory_mb) if self.peak_memory_mb is not None else None,
+            "timeout_seconds": self.limits.timeout_seconds,
+            "heap_mb": self.limits.heap_mb,
+            "basis": self.basis
+        }
+
+
+class ConversionEstimator:
+    """Duration and memory predictions for new conversions, fitted on the conversion history"""
+
+    def __init__(self, history: ConversionHistory, max_heap_mb: int = 8192, max_threads: int = 1):
+        self.history = history
+        self.max_heap_mb = max_heap_mb
+        self.max_threads = max(1, max_threads)
+        self._lock = threading.Lock()
+        self._fits: Dict[str, Tuple[Optional[LogLinearFit], Optional[LogLinearFit]]] = {}
+        self._fitted_at = 0.0
+        self._prescans: "OrderedDict[Tuple[str, int, int], Dict[str, float]]" = OrderedDict()
+
+    def features(self, path: Path) -> Dict[str, float]:
+        """Pre-scan features of a file, cached by path, size and modification time"""
+        st = os.stat(path)
+        key = (str(path), st.st_size, st.st_mtime_ns)
+        with self._lock:
+            if key in self._prescans:
+                self._prescans.move_to_end(key)
+                return self._prescans[key]
+        values = prescan(path)
+        with self._lock:
+            self._prescans[key] = values
+            while len(self._prescans) > PRESCAN_CACHE_SIZE:
+                self._prescans.popitem(last=False)
+        return values
+
+    def _samples(self) -> List[Dict[str, Any]]:
+        """Features, seconds and peak memory of the recent successful single-process conversions"""
+        samples = []
+        for entry in self.history.recent(status="completed", limit=FIT_WINDOW):
+            # Tiled conversions run in parallel; their wall time says little about a single converter
+            if entry["input_bytes"] is None or entry["tiles"] is not None:
+                continue
+            samples.append({
+                "features": {"input_mb": entry["input_bytes"] / MB, **(entry["prescan"] or {})},
+                "seconds": entry["seconds"],
+                "memory": entry["peak_memory_mb"]
+            })
+        return samples
+
+    def _fits_for(self, target: str) -> Tuple[Optional[LogLinearFit], Optional[LogLinearFit]]:
+        """(pre-scan fit, size-only fit) of "seconds" or "memory", refreshed every FIT_TTL_SECONDS"""
+        with self._lock:
+            if time.monotonic() - self._fitted_at > FIT_TTL_SECONDS:
+                samples = self._samples()
+                for name in ("seconds", "memory"):
+                    usable = [(s["features"], s[name]) for s in samples if s[name] is not None]
+                    scanned = [(values, t) for values, t in usable if all(f in values for f in FEATURES)]
+                    self._fits[name] = (LogLinearFit.fit(FEATURES, scanned),
+                                        LogLinearFit.fit(("input_mb",), usable))
+                self._fitted_at = time.monotonic()
+            return self._fits[target]
+
+    def _best_fit(self, target: str, values: Dict[str, float]) -> Optional[LogLinearFit]:
+        """The pre-scan fit when the input has been scanned and enough history has too, size alone otherwise"""
+        scanned, by_size = self._fits_for(target)
+        if scanned is not None and all(name in values for name in FEATURES):
+            return scanned
+        return by_size
+
+    def estimate(self, input_bytes: int, path: Optional[Path] = None) -> Estimate:
+        """Prediction and limits for an input; without a local path only its size is known"""
+        static = ResourceLimits.for_input(input_bytes, self.max_heap_mb, self.max_threads)
+        values = {"input_mb": input_bytes / MB}
+        if path is not None:
+            try:
+                values = self.features(path)
+            except OSError:
+                pass
+
+        seconds_fit = self._best_fit("seconds", values)
+        if seconds_fit is None:
+            seconds = FALLBACK_STARTUP_SECONDS + values["input_mb"] * FALLBACK_SECONDS_PER_MB
+            return Estimate(seconds, None, static, "size formula (not enough conversion history)", values)
+
+        seconds = seconds_fit.predict(values)
+        # A loose fit widens the headroom: two standard deviations of the log residuals
+        headroom = max(TIMEOUT_HEADROOM, math.exp(2 * seconds_fit.residual_sd))
+        timeout = int(min(max(seconds * headroom + TIMEOUT_MARGIN_SECONDS, MIN_TIMEOUT_SECONDS),
+                          MAX_TIMEOUT_SECONDS))
+        memory_fit = self._best_fit("memory", values)
+        peak_memory = memory_fit.predict(values) if memory_fit is not None else None
+        heap_mb = (int(min(max(peak_memory * MEMORY_HEADROOM, MIN_HEAP_MB), self.max_heap_mb))
+                   if peak_memory is not None else static.heap_mb)
+        limits = replace(
+            static,
+            heap_mb=heap_mb,
+            address_space_mb=heap_mb + WASM_VIRTUAL_RESERVE_MB,
+            cpu_seconds=timeout * (1 + static.threads),
+            timeout_seconds=timeout
+        )
+        return Estimate(seconds, peak_memory, limits, seconds_fit.describe(), values)
+
+    def limits_for(self, input_path: Path) -> ResourceLimits:
+        """Per-job limits of a converter run (ConverterRunner consults this when it has an estimator)"""
+        return self.estimate(Path(input_path).stat().st_size, Path(input_path)).limits
+
+
+def remaining_seconds(estimated_seconds: float, elapsed_seconds: float, progress: float = 0) -> float:
+    """Seconds left of a running job: its estimate counted down, or its progress extrapolated once overrun"""
+    remaining = estimated_seconds - elapsed_seconds
+    if remaining <= 0 and 0 < progress < 100:
+        remaining = elapsed_seconds * (100 - progress) / progress
+    return max(remaining, 0.0)
+
+
+def job_etas(jobs: List[Dict[str, Any]], workers: int) -> Dict[str, float]:
+    """Seconds until each queued or processing job should finish
+
+    jobs carry job_id, status and estimated_seconds; processing jobs also
+    elapsed_seconds and progress, queued ones queue_position (0 = next).
+    Queued jobs take the first slot to free up, in queue order, so their
+    ETA includes the rest of the running jobs and the jobs ahead of them.
+    Jobs without an estimate get none, and count as taking no time.
+    """
+    etas: Dict[str, float] = {}
+    slots = []
+    for job in jobs:
+        if job["status"] == "processing" and job.get("estimated_seconds") is not None:
+            etas[job["job_id"]] = remaining_seconds(job["estimated_seconds"], job.get("elapsed_seconds") or 0,
+                                                    job.get("progress") or 0)
+            slots.append(etas[job["job_id"]])
+    # Idle workers take the next job at once; jobs running in other processes hold their own slots
+    slots += [0.0] * max(0, max(1, workers) - len(slots))
+    heapq.heapify(slots)
+    queued = [job for job in jobs if job["status"] == "queued"]
+    for job in sorted(queued, key=lambda job: (job.get("queue_position") is None, job.get("queue_position") or 0)):
+        start = heapq.heappop(slots)
+        seconds = job.get("estimated_seconds") or 0.0
+        heapq.heappush(slots, start + seconds)
+        if job.get("estimated_seconds") is not None:
+            etas[job["job_id"]] = start + seconds
+    return {job_id: round(eta) for job_id, eta in etas.items()}
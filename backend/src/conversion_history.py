@@ -0,0 +1,273 @@
+"""
+Conversion history for QGEN_IMPFRAG
+===================================
+
+Performance record of every conversion job: input size, entity counts,
+time per converter phase, peak converter memory, output size and the
+converter version, one row per job in a SQLite table shared by the API
+and converter processes of a host. Rows outlive the job store's; they
+are purged after their own retention period.
+
+The history API (see history_api) reads it for a model's trend over its
+revisions, throughput per converter version, and outliers: conversions
+that took several times longer than their input size predicts. The
+prediction is a power law, seconds = a * MB^b, fitted by least squares
+on the logarithms of the recent successful conversions. Conversion
+estimates for new jobs (see conversion_estimator) are fitted on the
+same rows, with the input features each job was pre-scanned for.
+
+Author: XQG4_AXIS Team
+"""
+
+import json
+import math
+import statistics
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.db import SqliteDatabase
+
+
+MB = 1024 * 1024
+
+# Successful conversions the size model is fitted on, newest first
+FIT_WINDOW = 2000
+# Fewer points than this give no useful fit
+MIN_FIT_POINTS = 5
+# Tiny inputs are dominated by converter startup; floor the values the fit sees
+MIN_FIT_MB = 0.01
+MIN_FIT_SECONDS = 0.1
+
+DEFAULT_OUTLIER_FACTOR = 3.0
+
+# Statuses recorded besides "completed"; cancelled jobs are not failures of the converter
+FAILED_STATES = ("failed", "timed_out")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversions (
+    job_id TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    source TEXT,
+    status TEXT NOT NULL,
+    converter_version TEXT,
+    input_bytes INTEGER,
+    entities INTEGER,
+    entity_counts TEXT,
+    output_bytes INTEGER,
+    seconds REAL,
+    startup_ms INTEGER,
+    peak_memory_mb INTEGER,
+    phase_seconds TEXT,
+    prescan TEXT,
+    threads INTEGER,
+    tiles INTEGER,
+    finished_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_conversions_model ON conversions (model, finished_at);
+CREATE INDEX IF NOT EXISTS idx_conversions_version ON conversions (converter_version, finished_at);
+CREATE INDEX IF NOT EXISTS idx_conversions_finished ON conversions (finished_at);
+"""
+
+JSON_COLUMNS = ("entity_counts", "phase_seconds", "prescan")
+
+
+def fit_power_law(points: List[Tuple[float, float]]) -> Optional[Tuple[float, float]]:
+    """(a, b) of y = a * x^b fitted to (x, y) points; None with too few distinct points"""
+    logs = [(math.log(max(x, MIN_FIT_MB)), math.log(max(y, MIN_FIT_SECONDS))) for x, y in points]
+    if len(logs) < MIN_FIT_POINTS:
+        return None
+    mean_x = statistics.fmean(lx for lx, _ in logs)
+    mean_y = statistics.fmean(ly for _, ly in logs)
+    spread = sum((lx - mean_x) ** 2 for lx, _ in logs)
+    if spread == 0:
+        return None
+    b = sum((lx - mean_x) * (ly - mean_y) for lx, ly in logs) / spread
+    return math.exp(mean_y - b * mean_x), b
+
+
+def result_status(result) -> str:
+    """History status of a ConverterResult"""
+    if result.success:
+        return "completed"
+    if result.cancelled:
+        return "cancelled"
+    return "timed_out" if result.timed_out else "failed"
+
+
+def _row(row) -> Dict[str, Any]:
+    entry = dict(row)
+    for column in JSON_COLUMNS:
+        entry[column] = json.loads(entry[column]) if entry[column] else None
+    entry["input_mb"] = round(entry["input_bytes"] / MB, 2) if entry["input_bytes"] is not None else None
+    entry["output_mb"] = round(entry["output_bytes"] / MB, 2) if entry["output_bytes"] is not None else None
+    entry["finished_at"] = datetime.fromtimestamp(entry["finished_at"]).isoformat()
+    return entry
+
+
+class ConversionHistory:
+    """One performance record per conversion job"""
+
+    def __init__(self, db_path: Path, busy_timeout_ms: int = 10000):
+        self.db = SqliteDatabase(db_path, busy_timeout_ms)
+        self.db.executescript(SCHEMA)
+        # Tables created before conversions were pre-scanned (see conversion_estimator) lack the column
+        if "prescan" not in {row["name"] for row in self.db.execute("PRAGMA table_info(conversions)")}:
+            with self.db.write() as conn:
+                conn.execute("ALTER TABLE conversions ADD COLUMN prescan TEXT")
+
+    def record(self, job_id: str, model: str, status: str, source: Optional[str] = None,
+               converter_version: Optional[str] = None, input_bytes: Optional[int] = None,
+               entity_counts: Optional[Dict[str, int]] = None, output_bytes: Optional[int] = None,
+               seconds: Optional[float] = None, startup_ms: Optional[int] = None,
+               peak_memory_mb: Optional[int] = None, phase_seconds: Optional[Dict[str, float]] = None,
+               threads: Optional[int] = None, tiles: Optional[int] = None,
+               prescan: Optional[Dict[str, float]] = None):
+        """Insert or replace a job's record; prescan holds the input features conversion estimates use"""
+        with self.db.write() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO conversions (job_id, model, source, status, converter_version, input_bytes,
+                    entities, entity_counts, output_bytes, seconds, startup_ms, peak_memory_mb, phase_seconds,
+                    prescan, threads, tiles, finished_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (job_id, model, source, status, converter_version, input_bytes,
+                 sum(entity_counts.values()) if entity_counts else None,
+                 json.dumps(entity_counts) if entity_counts else None,
+                 output_bytes, seconds, startup_ms, peak_memory_mb,
+                 json.dumps(phase_seconds) if phase_seconds else None,
+                 json.dumps(prescan) if prescan else None,
+                 threads, tiles, time.time())
+            )
+
+    def recent(self, model: Optional[str] = None, converter_version: Optional[str] = None,
+               status: Optional[str] = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Newest records first, optionally of one model, converter version or status"""
+        clauses, params = [], []
+        for column, value in (("model", model), ("converter_version", converter_version), ("status", status)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self.db.execute(f"SELECT * FROM conversions {where} ORDER BY finished_at DESC LIMIT ?",
+                               (*params, limit))
+        return [_row(row) for row in rows]
+
+    def size_model(self) -> Optional[Tuple[float, float]]:
+        """Power-law fit of seconds against input MB over the recent successful conversions"""
+        # Tiled conversions run in parallel, so their wall time does not follow the input size
+        rows = self.db.execute(
+            """
+            SELECT input_bytes, seconds FROM conversions
+            WHERE status = 'completed' AND input_bytes IS NOT NULL AND seconds IS NOT NULL AND tiles IS NULL
+            ORDER BY finished_at DESC LIMIT ?
+            """,
+            (FIT_WINDOW,)
+        )
+        return fit_power_law([(row["input_bytes"] / MB, row["seconds"]) for row in rows])
+
+    @staticmethod
+    def predict(fit: Optional[Tuple[float, float]], input_bytes: Optional[int]) -> Optional[float]:
+        if fit is None or input_bytes is None:
+            return None
+        a, b = fit
+        return a * max(input_bytes / MB, MIN_FIT_MB) ** b
+
+    def _with_prediction(self, entry: Dict[str, Any], fit: Optional[Tuple[float, float]]) -> Dict[str, Any]:
+        predicted = self.predict(fit, entry["input_bytes"])
+        entry["predicted_seconds"] = round(predicted, 2) if predicted is not None else None
+        entry["slowdown"] = (round(entry["seconds"] / predicted, 2)
+                             if predicted and entry["seconds"] is not None else None)
+        return entry
+
+    def model_trend(self, model: str, limit: int = 100) -> List[Dict[str, Any]]:
+        """A model's conversions oldest first, each compared with the size prediction and the previous one"""
+        fit = self.size_model()
+        rows = self.db.execute(
+            "SELECT * FROM (SELECT * FROM conversions WHERE model = ? ORDER BY finished_at DESC LIMIT ?) "
+            "ORDER BY finished_at",
+            (model, limit)
+        )
+        trend, previous = [], None
+        for row in rows:
+            entry = self._with_prediction(_row(row), fit)
+            entry["seconds_per_mb"] = (round(entry["seconds"] / entry["input_mb"], 3)
+                                       if entry["seconds"] is not None and entry["input_mb"] else None)
+            entry["change_seconds_per_mb"] = None
+            if entry["status"] == "completed":
+                if previous is not None and previous["seconds_per_mb"] and entry["seconds_per_mb"] is not None:
+                    entry["change_seconds_per_mb"] = round(entry["seconds_per_mb"] / previous["seconds_per_mb"], 2)
+                previous = entry
+            trend.append(entry)
+        return trend
+
+    def throughput(self, since: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Jobs, failures and MB converted per minute for each converter version"""
+        versions: Dict[str, Dict[str, Any]] = {}
+        rows = self.db.execute(
+            "SELECT converter_version, status, input_bytes, seconds, peak_memory_mb, finished_at FROM conversions "
+            "WHERE finished_at >= ? ORDER BY finished_at",
+            (since or 0,)
+        )
+        for row in rows:
+            version = versions.setdefault(row["converter_version"] or "unknown", {
+                "jobs": 0, "failed": 0, "input_bytes": 0, "seconds": 0.0, "seconds_per_mb": [], "peak_memory": [],
+                "first_seen": row["finished_at"], "last_seen": row["finished_at"]
+            })
+            version["jobs"] += 1
+            version["last_seen"] = row["finished_at"]
+            if row["status"] != "completed":
+                version["failed"] += row["status"] in FAILED_STATES
+                continue
+            if row["input_bytes"] and row["seconds"] is not None:
+                version["input_bytes"] += row["input_bytes"]
+                version["seconds"] += row["seconds"]
+                version["seconds_per_mb"].append(row["seconds"] / max(row["input_bytes"] / MB, MIN_FIT_MB))
+            if row["peak_memory_mb"] is not None:
+                version["peak_memory"].append(row["peak_memory_mb"])
+        return [
+            {
+                "converter_version": name,
+                "jobs": v["jobs"],
+                "failed": v["failed"],
+                "input_mb": round(v["input_bytes"] / MB, 2),
+                "mb_per_minute": round(v["input_bytes"] / MB / v["seconds"] * 60, 2) if v["seconds"] else None,
+                "median_seconds_per_mb": (round(statistics.median(v["seconds_per_mb"]), 3)
+                                          if v["seconds_per_mb"] else None),
+                "max_peak_memory_mb": max(v["peak_memory"], default=None),
+                "first_seen": datetime.fromtimestamp(v["first_seen"]).isoformat(),
+                "last_seen": datetime.fromtimestamp(v["last_seen"]).isoformat()
+            }
+            for name, v in sorted(versions.items(), key=lambda item: item[1]["last_seen"], reverse=True)
+        ]
+
+    def outliers(self, factor: float = DEFAULT_OUTLIER_FACTOR, since: Optional[float] = None,
+                 limit: int = 100) -> Dict[str, Any]:
+        """Successful single-process conversions at least factor times slower than their input size predicts"""
+        fit = self.size_model()
+        if fit is None:
+            return {"fit": None, "outliers": []}
+        rows = self.db.execute(
+            """
+            SELECT * FROM conversions
+            WHERE status = 'completed' AND input_bytes IS NOT NULL AND seconds IS NOT NULL AND tiles IS NULL
+                AND finished_at >= ?
+            ORDER BY finished_at DESC LIMIT ?
+            """,
+            (since or 0, FIT_WINDOW)
+        )
+        found = [entry for entry in (self._with_prediction(_row(row), fit) for row in rows)
+                 if entry["slowdown"] is not None and entry["slowdown"] >= factor]
+        found.sort(key=lambda entry: entry["slowdown"], reverse=True)
+        return {
+            "fit": {"a": round(fit[0], 4), "b": round(fit[1], 4), "formula": "seconds = a * input_mb ^ b"},
+            "outliers": found[:limit]
+        }
+
+    def maintenance(self, retention_days: float) -> int:
+        """Delete records older than the retention period"""
+        cutoff = time.time() - retention_days * 86400
+        with self.db.write() as conn:
+            return conn.execute("DELETE FROM conversions WHERE finished_at < ?", (cutoff,)).rowcount
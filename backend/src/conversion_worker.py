@@ -0,0 +1,136 @@
+"""
+Conversion worker for QGEN_IMPFRAG
+==================================
+
+Worker process mode: pulls conversion jobs from the shared work queue,
+runs them through the processor's converter and publishes the result
+to the shared fragment storage. Several workers, on one host or on
+many, can serve the same queue.
+
+Usage:
+    python ifc_processor.py --worker [--worker-concurrency N]
+
+Author: XQG4_AXIS Team
+"""
+
+import threading
+import logging
+from typing import Optional
+
+from src.job_store import process_owner
+from src.work_queue import WorkQueue, Lease
+
+
+class ConversionWorker:
+    """Pulls jobs from a WorkQueue and converts them with a QgenImpfragProcessor"""
+
+    def __init__(self, processor, queue: WorkQueue, concurrency: int = 1,
+                 lease_seconds: float = 60.0, poll_seconds: float = 2.0,
+                 logger: Optional[logging.Logger] = None):
+        self.processor = processor
+        self.queue = queue
+        self.concurrency = max(1, concurrency)
+        self.lease_seconds = lease_seconds
+        self.poll_seconds = poll_seconds
+        self.logger = logger or logging.getLogger(__name__)
+        self._stop = threading.Event()
+
+    def run(self):
+        """Serve the queue until interrupted"""
+        threads = [
+            threading.Thread(target=self._serve, args=(f"{process_owner()}:{slot}",),
+                             name=f"queue-worker-{slot}", daemon=True)
+            for slot in range(self.concurrency)
+        ]
+        self.logger.info(f"👷 Conversion worker started with {self.concurrency} slot(s)")
+        for thread in threads:
+            thread.start()
+
+        try:
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(timeout=1)
+        except KeyboardInterrupt:
+            self.logger.info("🛑 Worker shutdown requested, finishing running jobs")
+            self.stop()
+            for thread in threads:
+                thread.join()
+
+    def stop(self):
+        self._stop.set()
+
+    def _serve(self, worker_id: str):
+        while not self._stop.is_set():
+            try:
+                self.queue.requeue_expired()
+                lease = self.queue.claim(worker_id, self.lease_seconds)
+            except Exception as e:
+                self.logger.error(f"❌ Queue unavailable: {e}")
+                lease = None
+
+            if lease is None:
+                self._stop.wait(self.poll_seconds)
+                continue
+
+            self._process(worker_id, lease)
+
+    def _process(self, worker_id: str, lease: Lease):
+        payload = lease.payload
+        ifc_file = self.processor.config.ifc_input_dir / payload["filename"]
+        self.logger.info(f"📥 [{worker_id}] Claimed {lease.job_id} ({payload['filename']}, attempt {lease.attempt})")
+
+        done = threading.Event()
+        heartbeat = threading.Thread(
+            target=self._heartbeat, args=(worker_id, lease.job_id, done), daemon=True
+        )
+        heartbeat.start()
+
+        try:
+            if not self.processor.ifc_storage.exists(payload["filename"]):
+                self.queue.fail(lease.job_id, worker_id, f"File not found: {payload['filename']}", retry=False)
+                return
+
+            status = self.processor.convert_file(
+                ifc_file,
+                payload.get("force_reconvert", False),
+                payload.get("output_filename"),
+                lease.job_id,
+                lease.priority_class,
+                payload.get("profile", False),
+                payload.get("traceparent")
+            )
+        except Exception as e:
+            self.logger.error(f"❌ [{worker_id}] Job {lease.job_id} crashed: {e}")
+            self.queue.fail(lease.job_id, worker_id, str(e))
+            return
+        finally:
+            done.set()
+            heartbeat.join()
+
+        if status.status == "completed":
+            self.queue.complete(lease.job_id, worker_id, status.dict())
+        elif status.status == "cancelled":
+            self.queue.fail(lease.job_id, worker_id, status.message, retry=False)
+        else:
+            self.queue.fail(lease.job_id, worker_id, status.message)
+
+    def _heartbeat(self, worker_id: str, job_id: str, done: threading.Event):
+        """Renew the lease while the job runs; stop the converter if the lease is lost"""
+        interval = self.lease_seconds / 3
+        while not done.wait(interval):
+            # The local job store holds this worker's view of the job
+            record = self.processor.job_store.get(job_id)
+            try:
+                alive = self.queue.heartbeat(
+                    job_id, worker_id, self.lease_seconds,
+                    status=record["data"] if record else None
+                )
+            except Exception as e:
+                # Keep working; the lease only lapses if the queue stays unreachable
+                self.logger.warning(f"⚠️ Heartbeat for {job_id} failed: {e}")
+                continue
+
+            if not alive:
+                self.logger.warning(f"🛑 Lease lost or job cancelled: {job_id}")
+                self.processor.converter.cancel(job_id)
+                return
@@ -0,0 +1,600 @@
+"""
+Converter process management for QGEN_IMPFRAG
+=============================================
+
+Runs ifc_converter.js in its own process group with per-job resource
+limits derived from the input size, or predicted from past conversions
+when the runner has a conversion estimator, and keeps a registry of
+running jobs so that a conversion can be cancelled from another request.
+
+Large inputs may run web-ifc on several threads (QGEN_WEBIFC_THREADS,
+honoured where a multithreaded web-ifc build is installed); the thread
+count is part of the job's limits so the scheduler can account for it.
+
+Every converter shares one on-disk V8 code cache (NODE_COMPILE_CACHE,
+Node 22.1+), so its dependencies are not compiled again on each run,
+and reports its startup time, kept with the job and the result. The
+result also carries the time spent in each progress phase and the
+converter's peak memory, for the conversion history.
+
+Converter output is streamed, not buffered: progress lines are parsed
+as they arrive, only the last lines of each stream are kept for the
+result and error messages, and the full output can be spilled to a
+size-capped log file per job.
+
+Author: XQG4_AXIS Team
+"""
+
+import codecs
+import json
+import os
+import re
+import sys
+import signal
+import logging
+import subprocess
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Any
+
+from src.tracing import get_tracer
+
+try:
+    import resource
+except ImportError:  # Windows has no rlimits
+    resource = None
+
+
+MB = 1024 * 1024
+
+# V8 reserves large guard regions for every WebAssembly memory (web-ifc),
+# so the address-space limit has to leave room for them on top of the heap.
+WASM_VIRTUAL_RESERVE_MB = 16 * 1024
+
+# web-ifc threads: one per this many MB of input, for inputs of at least MULTITHREAD_MIN_INPUT_MB
+MULTITHREAD_MIN_INPUT_MB = 50
+MULTITHREAD_MB_PER_THREAD = 50
+
+# Grace period between SIGTERM and SIGKILL when stopping a converter
+TERMINATE_GRACE_SECONDS = 5
+
+# How often a running job checks for cancellation requested elsewhere
+CANCEL_POLL_SECONDS = 1.0
+
+# Converter output kept in memory: the last lines of each stream, each cut to a maximum length
+OUTPUT_TAIL_LINES = 200
+OUTPUT_LINE_MAX_CHARS = 2000
+# A job's spilled output rotates to <job_id>.log.1 at this size, so at most twice this is kept
+CONVERTER_LOG_MAX_BYTES = 20 * MB
+# Time given to the output readers after exit; processes the converter spawned may still hold the pipes
+OUTPUT_DRAIN_SECONDS = 5
+# Pipes are drained in chunks: Node drops output still queued for a full pipe when it calls process.exit()
+OUTPUT_READ_BYTES = 64 * 1024
+
+# "Progress: 42% - geometries" (ifc_converter.js)
+PROGRESS_RE = re.compile(r"^Progress: (\d+)% - (.*)$")
+# "Startup: 180 ms (import 95 ms, compile cache enabled)" (ifc_converter.js)
+STARTUP_RE = re.compile(r"^Startup: (\d+) ms")
+# "Peak memory: 812 MB" (ifc_converter.js)
+PEAK_MEMORY_RE = re.compile(r"^Peak memory: (\d+) MB")
+# Progress callbacks within a phase are spaced at least this far apart
+PROGRESS_INTERVAL_SECONDS = 1.0
+
+
+@dataclass
+class ResourceLimits:
+    """Per-job limits applied to a converter process"""
+    heap_mb: int
+    address_space_mb: Optional[int]
+    cpu_seconds: int
+    timeout_seconds: int
+    threads: int = 1
+
+    @staticmethod
+    def threads_for(input_size_bytes: int, max_threads: int = 1) -> int:
+        """web-ifc threads worth starting for an input: small models do not pay for the worker pool"""
+        size_mb = input_size_bytes / MB
+        if max_threads <= 1 or size_mb < MULTITHREAD_MIN_INPUT_MB:
+            return 1
+        return int(min(max_threads, 1 + size_mb // MULTITHREAD_MB_PER_THREAD))
+
+    @classmethod
+    def for_input(cls, input_size_bytes: int, max_heap_mb: int = 8192, max_threads: int = 1) -> "ResourceLimits":
+        """Derive limits from the IFC input size"""
+        size_mb = input_size_bytes / MB
+        heap_mb = int(min(max(1024, 1024 + size_mb * 6), max_heap_mb))
+        timeout_seconds = int(min(max(120, 60 + size_mb * 3), 6 * 3600))
+        threads = cls.threads_for(input_size_bytes, max_threads)
+        return cls(
+            heap_mb=heap_mb,
+            address_space_mb=heap_mb + WASM_VIRTUAL_RESERVE_MB,
+            # Node runs GC and compiler threads next to the web-ifc threads
+            cpu_seconds=timeout_seconds * (1 + threads),
+            timeout_seconds=timeout_seconds,
+            threads=threads
+        )
+
+    def node_args(self) -> List[str]:
+        return [f"--max-old-space-size={self.heap_mb}"]
+
+    def apply(self, pid: int):
+        """Apply rlimits to a started process (Linux; no Python runs in the child, which is unsafe
+        after forking a multithreaded server)"""
+        if resource is None or not hasattr(resource, "prlimit"):
+            return
+        if self.address_space_mb:
+            limit = self.address_space_mb * MB
+            resource.prlimit(pid, resource.RLIMIT_AS, (limit, limit))
+        if self.cpu_seconds:
+            # Soft limit sends SIGXCPU, hard limit a few seconds later SIGKILL
+            resource.prlimit(pid, resource.RLIMIT_CPU, (self.cpu_seconds, self.cpu_seconds + 10))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "heap_mb": self.heap_mb,
+            "address_space_mb": self.address_space_mb,
+            "cpu_seconds": self.cpu_seconds,
+            "timeout_seconds": self.timeout_seconds,
+            "threads": self.threads
+        }
+
+
+@dataclass
+class ConverterResult:
+    """Outcome of a converter run"""
+    job_id: str
+    returncode: Optional[int]
+    stdout: str = ""
+    stderr: str = ""
+    cancelled: bool = False
+    timed_out: bool = False
+    startup_ms: Optional[int] = None
+    peak_memory_mb: Optional[int] = None
+    # Seconds from each progress phase to the next, in the order the converter went through them
+    phase_seconds: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def success(self) -> bool:
+        return self.returncode == 0 and not self.cancelled and not self.timed_out
+
+    @property
+    def error_message(self) -> str:
+        if self.cancelled:
+            return "Conversion cancelled"
+        if self.timed_out:
+            return "Conversion timed out"
+        return self.stderr.strip() or self.stdout.strip() or "Unknown conversion error"
+
+
+class OutputTail:
+    """Ring buffer of a stream's last lines"""
+
+    def __init__(self, max_lines: int = OUTPUT_TAIL_LINES):
+        self.lines: deque = deque(maxlen=max_lines)
+        self.total_lines = 0
+
+    def extend(self, lines: List[str]):
+        self.total_lines += len(lines)
+        self.lines.extend(line if len(line) <= OUTPUT_LINE_MAX_CHARS else line[:OUTPUT_LINE_MAX_CHARS] + " [...]"
+                          for line in lines[-self.lines.maxlen:])
+
+    def text(self) -> str:
+        dropped = self.total_lines - len(self.lines)
+        lines = list(self.lines)
+        if dropped:
+            lines.insert(0, f"[... {dropped} earlier lines not kept]")
+        return "\n".join(lines)
+
+
+class JobLog:
+    """Full converter output of one job, rotated once it reaches max_bytes"""
+
+    def __init__(self, path: Path, max_bytes: int = CONVERTER_LOG_MAX_BYTES):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._file = open(self.path, "a", encoding="utf-8", errors="replace")
+        self._size = self.path.stat().st_size
+        self._lock = threading.Lock()
+
+    def write(self, stream: str, lines: List[str]):
+        prefix = f"{datetime.now().isoformat(timespec='milliseconds')} {stream} "
+        entry = "".join(f"{prefix}{line}\n" for line in lines)
+        with self._lock:
+            if self._file is None:
+                return
+            if self._size + len(entry) > self.max_bytes:
+                self._file.close()
+                os.replace(self.path, self.path.with_name(f"{self.path.name}.1"))
+                self._file = open(self.path, "w", encoding="utf-8", errors="replace")
+                self._size = 0
+            self._file.write(entry)
+            self._size += len(entry)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+@dataclass
+class ConverterJob:
+    """A single running converter process"""
+    job_id: str
+    input_path: Path
+    output_path: Path
+    limits: ResourceLimits
+    extra_args: List[str] = field(default_factory=list)
+    node_args: List[str] = field(default_factory=list)
+    process: Optional[subprocess.Popen] = None
+    started_at: datetime = field(default_factory=datetime.now)
+    cancelled: bool = False
+    timed_out: bool = False
+    progress: Optional[int] = None
+    phase: Optional[str] = None
+    startup_ms: Optional[int] = None
+    peak_memory_mb: Optional[int] = None
+    phase_seconds: Dict[str, float] = field(default_factory=dict)
+    phase_started: Optional[float] = None
+
+    def enter_phase(self, phase: Optional[str]):
+        """Close the current phase's timing and start the next one's (None when the converter exited)"""
+        now = time.monotonic()
+        if self.phase is not None and self.phase_started is not None:
+            self.phase_seconds[self.phase] = round(self.phase_seconds.get(self.phase, 0.0)
+                                                   + now - self.phase_started, 3)
+        self.phase_started = now if phase is not None else None
+
+    @property
+    def partial_path(self) -> Path:
+        """Path the converter writes to until the job succeeds"""
+        return self.output_path.with_name(f"{self.output_path.name}.partial-{self.job_id}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "input_file": self.input_path.name,
+            "output_file": self.output_path.name,
+            "pid": self.process.pid if self.process else None,
+            "started_at": self.started_at.isoformat(),
+            "cancelled": self.cancelled,
+            "progress": self.progress,
+            "phase": self.phase,
+            "startup_ms": self.startup_ms,
+            "phase_seconds": dict(self.phase_seconds),
+            "limits": self.limits.to_dict()
+        }
+
+
+class ConverterRunner:
+    """Launches Node converter script jobs (ifc_converter.js, ifc_geometry.js) and tracks them for cancellation"""
+
+    def __init__(self, converter_script: Path, cwd: Path, max_heap_mb: int = 8192,
+                 logger: Optional[logging.Logger] = None, log_dir: Optional[Path] = None, max_threads: int = 1,
+                 cache_dir: Optional[Path] = None, estimator=None):
+        self.converter_script = Path(converter_script)
+        self.cwd = Path(cwd)
+        self.max_heap_mb = max_heap_mb
+        # web-ifc threads per job, for inputs large enough (see ResourceLimits.threads_for)
+        self.max_threads = max(1, max_threads)
+        self.logger = logger or logging.getLogger(__name__)
+        # Full output of every job goes to <log_dir>/<job_id>.log when set
+        self.log_dir = Path(log_dir) if log_dir else None
+        if self.log_dir is not None:
+            self.log_dir.mkdir(parents=True, exist_ok=True)
+        # V8 code cache shared by all converter processes (NODE_COMPILE_CACHE)
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # ConversionEstimator predicting each job's limits from past conversions; size formula when None
+        self.estimator = estimator
+        self._jobs: Dict[str, ConverterJob] = {}
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+
+    @staticmethod
+    def new_job_id() -> str:
+        return uuid.uuid4().hex
+
+    def version(self) -> str:
+        """Installed converter library versions, like: fragments 3.1.0, web-ifc 0.0.68"""
+        if self._version is None:
+            versions = []
+            for package in ("@thatopen/fragments", "web-ifc"):
+                try:
+                    manifest = json.loads((self.cwd / "node_modules" / package / "package.json").read_text())
+                    versions.append(f"{package.split('/')[-1]} {manifest['version']}")
+                except (OSError, ValueError, KeyError):
+                    continue
+            self._version = ", ".join(versions) or "unknown"
+        return self._version
+
+    def limits_for(self, input_path: Path) -> ResourceLimits:
+        if self.estimator is not None:
+            return self.estimator.limits_for(input_path)
+        return ResourceLimits.for_input(Path(input_path).stat().st_size, self.max_heap_mb, self.max_threads)
+
+    def threads_for(self, input_size_bytes: int) -> int:
+        """Threads a job converting an input of this size will use, for the scheduler"""
+        return ResourceLimits.threads_for(input_size_bytes, self.max_threads)
+
+    def build_command(self, job: ConverterJob) -> List[str]:
+        return [
+            "node",
+            *job.limits.node_args(),
+            *job.node_args,
+            str(self.converter_script),
+            "--input", str(job.input_path),
+            "--output", str(job.partial_path),
+            *job.extra_args
+        ]
+
+    def run(self, input_path: Path, output_path: Path, job_id: Optional[str] = None,
+            limits: Optional[ResourceLimits] = None,
+            cancel_check: Optional[Callable[[], bool]] = None,
+            extra_args: Optional[List[str]] = None,
+            node_args: Optional[List[str]] = None,
+            progress: Optional[Callable[[int, str], None]] = None) -> ConverterResult:
+        """Run a conversion to completion, timeout or cancellation
+
+        cancel_check is polled while the converter runs, so that a cancel
+        request recorded by another process can stop this job. extra_args
+        go to the script, node_args to Node itself (profiling flags, say).
+        progress(percent, phase) is called from a reader thread when the
+        converter enters a new phase, and at most once a second within one.
+        """
+        job = ConverterJob(
+            job_id=job_id or self.new_job_id(),
+            input_path=Path(input_path),
+            output_path=Path(output_path),
+            limits=limits or self.limits_for(input_path),
+            extra_args=list(extra_args or []),
+            node_args=list(node_args or [])
+        )
+        with self._lock:
+            if job.job_id in self._jobs:
+                raise ValueError(f"Job already running: {job.job_id}")
+            self._jobs[job.job_id] = job
+
+        # The converter continues the caller's trace and writes its spans to a file
+        tracer = get_tracer()
+        span = tracer.start_span("converter", attributes={
+            "qgen.job_id": job.job_id,
+            "qgen.converter.script": self.converter_script.name,
+            "qgen.input.bytes": job.input_path.stat().st_size if job.input_path.exists() else None,
+            "qgen.limits.heap_mb": job.limits.heap_mb,
+            "qgen.limits.threads": job.limits.threads
+        })
+        env = {"TRACEPARENT": span.traceparent, "QGEN_WEBIFC_THREADS": str(job.limits.threads)}
+        if self.cache_dir is not None:
+            env["NODE_COMPILE_CACHE"] = str(self.cache_dir)
+        spans_file = None
+        if tracer.enabled:
+            fd, spans_file = tempfile.mkstemp(prefix="qgen-spans-", suffix=".json")
+            os.close(fd)
+            env["QGEN_TRACE_FILE"] = spans_file
+
+        try:
+            cmd = self.build_command(job)
+            self.logger.info(f"Running converter [{job.job_id}] trace {span.context.trace_id}: {' '.join(cmd)}")
+            job.process = self._spawn(cmd, job.limits, env)
+            span.set_attribute("qgen.converter.pid", job.process.pid)
+
+            # A cancel request may have arrived before the process existed
+            if job.cancelled:
+                self._terminate(job)
+
+            stdout, stderr = self._communicate(job, cancel_check, progress)
+            job.enter_phase(None)
+
+            result = ConverterResult(
+                job_id=job.job_id,
+                returncode=job.process.returncode,
+                stdout=stdout or "",
+                stderr=stderr or "",
+                cancelled=job.cancelled,
+                timed_out=job.timed_out,
+                startup_ms=job.startup_ms,
+                peak_memory_mb=job.peak_memory_mb,
+                phase_seconds=dict(job.phase_seconds)
+            )
+            span.set_attribute("qgen.converter.startup_ms", job.startup_ms)
+            if result.success and job.partial_path.exists():
+                os.replace(job.partial_path, job.output_path)
+            elif result.success:
+                result.returncode = -1
+                result.stderr = "Conversion completed but output file not found"
+            span.set_attribute("qgen.converter.returncode", result.returncode)
+            if not result.success:
+                span.set_error(result.error_message[-500:])
+            return result
+        except Exception as e:
+            span.set_error(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            self._cleanup_partial(job)
+            with self._lock:
+                self._jobs.pop(job.job_id, None)
+            span.end()
+            if spans_file:
+                tracer.import_spans(Path(spans_file), self.converter_script.name)
+                os.unlink(spans_file)
+
+    def _communicate(self, job: ConverterJob, cancel_check: Optional[Callable[[], bool]],
+                     progress: Optional[Callable[[int, str], None]] = None):
+        """Stream output until exit, enforcing the timeout and external cancellation; returns the output tails"""
+        tails = {"stdout": OutputTail(), "stderr": OutputTail()}
+        log = JobLog(self.log_dir / f"{job.job_id}.log") if self.log_dir is not None else None
+        readers = [
+            threading.Thread(target=self._read_stream, name=f"qgen-{name}-{job.job_id[:8]}", daemon=True,
+                             args=(job, getattr(job.process, name), name, tails[name], log, progress))
+            for name in ("stdout", "stderr")
+        ]
+        for reader in readers:
+            reader.start()
+
+        deadline = time.monotonic() + job.limits.timeout_seconds
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.logger.warning(f"⏱️ Converter job {job.job_id} exceeded {job.limits.timeout_seconds}s, "
+                                        f"terminating")
+                    job.timed_out = True
+                    self._terminate(job)
+                    break
+
+                poll = min(remaining, CANCEL_POLL_SECONDS) if cancel_check else remaining
+                try:
+                    job.process.wait(timeout=poll)
+                    break
+                except subprocess.TimeoutExpired:
+                    if cancel_check and not job.cancelled and cancel_check():
+                        self.logger.info(f"🛑 Cancel requested for converter job {job.job_id}")
+                        job.cancelled = True
+                        self._terminate(job)
+            job.process.wait()
+            for reader in readers:
+                reader.join(OUTPUT_DRAIN_SECONDS)
+        finally:
+            if log is not None:
+                log.close()
+        return tails["stdout"].text(), tails["stderr"].text()
+
+    def _read_stream(self, job: ConverterJob, stream, name: str, tail: OutputTail, log: Optional[JobLog],
+                     progress: Optional[Callable[[int, str], None]]):
+        """Reader thread: chunks of lines into the tail, the job log and the progress parser"""
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        partial, reported = "", 0.0
+        while True:
+            chunk = stream.read1(OUTPUT_READ_BYTES)
+            text = partial + decoder.decode(chunk, final=not chunk)
+            if chunk:
+                lines = text.split("\n")
+                partial = lines.pop()
+            else:
+                lines = [text] if text else []
+            lines = [line.rstrip("\r") for line in lines]
+            if lines:
+                tail.extend(lines)
+                if log is not None:
+                    log.write(name, lines)
+            if not chunk:
+                break
+
+            if name == "stdout" and job.startup_ms is None:
+                startup = next((STARTUP_RE.match(line) for line in lines if line.startswith("Startup:")), None)
+                if startup is not None:
+                    job.startup_ms = int(startup.group(1))
+            if name == "stdout":
+                peak = next((PEAK_MEMORY_RE.match(line) for line in reversed(lines)
+                             if line.startswith("Peak memory:")), None)
+                if peak is not None:
+                    job.peak_memory_mb = int(peak.group(1))
+
+            # Only the latest progress line of a chunk matters
+            match = None
+            if name == "stdout":
+                match = next((PROGRESS_RE.match(line) for line in reversed(lines) if line.startswith("Progress:")),
+                             None)
+            if match is None:
+                continue
+            percent, phase = int(match.group(1)), match.group(2).strip()
+            new_phase = phase != job.phase
+            if new_phase:
+                job.enter_phase(phase)
+            job.progress, job.phase = percent, phase
+            if progress is not None and (new_phase or time.monotonic() - reported >= PROGRESS_INTERVAL_SECONDS):
+                reported = time.monotonic()
+                try:
+                    progress(percent, phase)
+                except Exception as e:
+                    self.logger.warning(f"⚠️ Progress callback of {job.job_id} failed: {e}")
+        stream.close()
+
+    def purge_logs(self, retention_days: float) -> int:
+        """Delete spilled job logs older than the retention period"""
+        if self.log_dir is None:
+            return 0
+        cutoff = time.time() - retention_days * 86400
+        removed = 0
+        for path in self.log_dir.glob("*.log*"):
+            if path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                removed += 1
+        return removed
+
+    def cancel(self, job_id: str) -> bool:
+        """Kill a running job's process group; returns False if it is unknown"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return False
+
+        self.logger.info(f"🛑 Cancelling converter job {job_id}")
+        job.cancelled = True
+        if job.process is not None:
+            self._terminate(job)
+        return True
+
+    def active_jobs(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [job.to_dict() for job in self._jobs.values()]
+
+    def _spawn(self, cmd: List[str], limits: ResourceLimits,
+               env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+        kwargs: Dict[str, Any] = {
+            "cwd": str(self.cwd),
+            "env": {**os.environ, **(env or {})},
+            # Binary pipes: the output readers decode chunks themselves
+            "stdout": subprocess.PIPE,
+            "stderr": subprocess.PIPE
+        }
+        if sys.platform == "win32":
+            kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            kwargs["start_new_session"] = True
+        process = subprocess.Popen(cmd, **kwargs)
+        if sys.platform != "win32":
+            try:
+                limits.apply(process.pid)
+            except ProcessLookupError:
+                pass  # Exited already; its result reports why
+            except (OSError, ValueError):
+                process.kill()
+                process.wait()
+                raise
+        return process
+
+    def _terminate(self, job: ConverterJob):
+        """Stop the converter and anything it spawned"""
+        process = job.process
+        if process is None or process.poll() is not None:
+            return
+
+        if sys.platform == "win32":
+            process.kill()
+            return
+
+        try:
+            os.killpg(process.pid, signal.SIGTERM)
+            try:
+                process.wait(timeout=TERMINATE_GRACE_SECONDS)
+            except subprocess.TimeoutExpired:
+                os.killpg(process.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def _cleanup_partial(self, job: ConverterJob):
+        try:
+            job.partial_path.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            self.logger.warning(f"Could not remove partial output {job.partial_path}: {e}")
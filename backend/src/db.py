@@ -0,0 +1,98 @@
+"""
+SQLite helpers for QGEN_IMPFRAG
+===============================
+
+Shared connection setup for the SQLite-backed stores. Databases run in
+WAL mode so readers never block the writer, connections are kept per
+thread, and writes take the write lock up front with BEGIN IMMEDIATE so
+concurrent writers from several processes queue on the busy timeout
+instead of failing part-way through a transaction.
+
+The page cache of each connection defaults to SQLite's own (about 2 MB);
+QGEN_IMPFRAG_SQLITE_CACHE_MB, set by the capacity profile, raises it for
+the shared stores on hosts with memory to spare.
+
+Per-model indexes are written once and replaced atomically, so they are
+opened read-only and immutable.
+
+Author: XQG4_AXIS Team
+"""
+
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional
+
+
+class SqliteDatabase:
+    """Per-thread SQLite connections to one database file"""
+
+    def __init__(self, db_path: Path, busy_timeout_ms: int = 10000, read_only: bool = False,
+                 cache_mb: Optional[int] = None):
+        self.db_path = Path(db_path)
+        self.read_only = read_only
+        if not read_only:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cache_mb = cache_mb if cache_mb is not None else int(os.getenv("QGEN_IMPFRAG_SQLITE_CACHE_MB", "0"))
+        self._local = threading.local()
+
+    def connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            if self.read_only:
+                # Immutable build artifacts: no journal, no locking
+                conn = sqlite3.connect(f"{self.db_path.as_uri()}?mode=ro&immutable=1", uri=True,
+                                       isolation_level=None, check_same_thread=False)
+                conn.row_factory = sqlite3.Row
+            else:
+                conn = sqlite3.connect(str(self.db_path), timeout=self.busy_timeout_ms / 1000,
+                                       isolation_level=None, check_same_thread=False)
+                conn.row_factory = sqlite3.Row
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute("PRAGMA synchronous=NORMAL")
+                conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+                if self.cache_mb > 0:
+                    # A negative cache_size is in KiB rather than pages
+                    conn.execute(f"PRAGMA cache_size=-{self.cache_mb * 1024}")
+            self._local.conn = conn
+        return conn
+
+    def write(self) -> "WriteTransaction":
+        return WriteTransaction(self.connection())
+
+    def execute(self, sql: str, params=()) -> sqlite3.Cursor:
+        return self.connection().execute(sql, params)
+
+    def executescript(self, script: str):
+        self.connection().executescript(script)
+
+    def compact(self):
+        """Fold the WAL back into the database and reclaim free pages"""
+        conn = self.connection()
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("VACUUM")
+
+
+class WriteTransaction:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back if the block raises"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.conn.execute("COMMIT")
+        else:
+            self.conn.execute("ROLLBACK")
+        return False
+
+
+def placeholders(values) -> str:
+    """'?,?,?' for an IN clause"""
+    return ",".join("?" for _ in values)
@@ -0,0 +1,174 @@
+"""
+Content-addressed geometry library for QGEN_IMPFRAG
+===================================================
+
+Tessellated geometry shared by every model. The web-ifc geometry pass
+(ifc_geometry.js --geometry) writes each distinct geometry of a model as
+a chunk named after the SHA-256 of its bytes, plus an instance table
+placing those chunks; this module adds the chunks the library does not
+have yet and records which models use which chunks.
+
+A standard door, bolt or pile cap is stored once however many models,
+disciplines and revisions repeat it, and a chunk's content never
+changes, so clients cache it forever and fetch only the chunks a new
+model adds. Chunks no model references any more are deleted when a
+model is converted again or removed (DELETE /api/models/<model>).
+
+    <geometry storage>/<sha256>.geo   chunks (sharded:// under data/geometry by default)
+    data/index/geometry.sqlite3       chunk sizes and per-model references
+    data/index/<model>/instances.bin  the model's instance table
+
+Author: XQG4_AXIS Team
+"""
+
+import hashlib
+import re
+import struct
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.db import SqliteDatabase, placeholders
+from src.storage import Storage
+
+
+CHUNK_SUFFIX = ".geo"
+INSTANCES_MAGIC = b"QGIN"
+INSTANCES_HEADER = struct.Struct("<4sIII")
+HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS geometries (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS model_geometries (
+    model TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    PRIMARY KEY (model, hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_model_geometries_hash ON model_geometries (hash);
+"""
+
+
+def read_instance_hashes(path: Path) -> List[str]:
+    """Chunk hashes referenced by an instance table, in table order"""
+    with open(path, "rb") as f:
+        magic, version, geometries, instances = INSTANCES_HEADER.unpack(f.read(INSTANCES_HEADER.size))
+        if magic != INSTANCES_MAGIC:
+            raise ValueError(f"Not an instance table: {path}")
+        table = f.read(geometries * 32)
+    return [table[i:i + 32].hex() for i in range(0, len(table), 32)]
+
+
+def instance_count(path: Path) -> int:
+    with open(path, "rb") as f:
+        return INSTANCES_HEADER.unpack(f.read(INSTANCES_HEADER.size))[3]
+
+
+class GeometryLibrary:
+    """Chunks shared by all models, stored once by content hash"""
+
+    def __init__(self, storage: Storage, db_path: Path, busy_timeout_ms: int = 30000):
+        self.storage = storage
+        self.db = SqliteDatabase(db_path, busy_timeout_ms)
+        self.db.executescript(SCHEMA)
+
+    @staticmethod
+    def chunk_name(digest: str) -> str:
+        if not HASH_RE.match(digest):
+            raise ValueError(f"Invalid geometry hash: {digest!r}")
+        return f"{digest}{CHUNK_SUFFIX}"
+
+    def add_model(self, model: str, chunk_dir: Path, instances_path: Path) -> Dict[str, Any]:
+        """Store a model's new chunks and replace its references"""
+        hashes = read_instance_hashes(instances_path)
+        added, added_bytes, reused_bytes = [], 0, 0
+        # One write transaction, so a concurrent removal cannot delete a chunk this model reuses
+        with self.db.write() as conn:
+            known = set()
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                known.update(row["hash"] for row in conn.execute(
+                    f"SELECT hash FROM geometries WHERE hash IN ({placeholders(chunk)})", chunk
+                ))
+
+            for digest in hashes:
+                path = Path(chunk_dir) / self.chunk_name(digest)
+                size = path.stat().st_size
+                if digest in known:
+                    reused_bytes += size
+                    continue
+                # The name is a promise about the content; never store a mismatch
+                if hashlib.sha256(path.read_bytes()).hexdigest() != digest:
+                    raise ValueError(f"Geometry chunk does not match its hash: {digest}")
+                self.storage.commit(self.chunk_name(digest), self._stage(path, digest))
+                added.append((digest, size, time.time()))
+                added_bytes += size
+
+            conn.executemany("INSERT OR IGNORE INTO geometries (hash, size, created_at) VALUES (?, ?, ?)", added)
+            conn.execute("DELETE FROM model_geometries WHERE model = ?", (model,))
+            conn.executemany("INSERT INTO model_geometries (model, hash) VALUES (?, ?)",
+                             [(model, digest) for digest in hashes])
+            # Chunks only the model's previous conversion used
+            collected = self._collect(conn)
+        return {
+            "instances": instance_count(instances_path),
+            "geometries": len(hashes),
+            "new_geometries": len(added),
+            "new_bytes": added_bytes,
+            "reused_bytes": reused_bytes,
+            "collected_geometries": collected
+        }
+
+    def _stage(self, path: Path, digest: str) -> Path:
+        """Move a chunk to where the storage backend publishes it from"""
+        staging = self.storage.staging_path(self.chunk_name(digest))
+        if staging != path:
+            path.replace(staging)
+        return staging
+
+    def model_stats(self, model: str) -> Optional[Dict[str, Any]]:
+        row = self.db.execute(
+            "SELECT COUNT(*) AS geometries, COALESCE(SUM(g.size), 0) AS bytes, "
+            "SUM((SELECT COUNT(*) FROM model_geometries o WHERE o.hash = m.hash AND o.model != m.model) > 0) "
+            "AS shared FROM model_geometries m JOIN geometries g ON g.hash = m.hash WHERE m.model = ?",
+            (model,)
+        ).fetchone()
+        if not row["geometries"]:
+            return None
+        return {"geometries": row["geometries"], "bytes": row["bytes"], "shared_with_other_models": row["shared"]}
+
+    def remove_model(self, model: str) -> int:
+        """Drop a model's references and delete the chunks nobody uses any more"""
+        with self.db.write() as conn:
+            conn.execute("DELETE FROM model_geometries WHERE model = ?", (model,))
+            return self._collect(conn)
+
+    def _collect(self, conn) -> int:
+        """Delete the chunks no model references, within the caller's write transaction"""
+        orphans = [row["hash"] for row in conn.execute(
+            "SELECT hash FROM geometries g WHERE NOT EXISTS "
+            "(SELECT 1 FROM model_geometries m WHERE m.hash = g.hash)"
+        )]
+        conn.executemany("DELETE FROM geometries WHERE hash = ?", [(h,) for h in orphans])
+        for digest in orphans:
+            self.storage.delete(self.chunk_name(digest))
+        return len(orphans)
+
+    def stats(self) -> Dict[str, Any]:
+        """Library size against what every model would store on its own"""
+        row = self.db.execute("SELECT COUNT(*) AS n, COALESCE(SUM(size), 0) AS bytes FROM geometries").fetchone()
+        referenced = self.db.execute(
+            "SELECT COUNT(*) AS n, COALESCE(SUM(g.size), 0) AS bytes, COUNT(DISTINCT m.model) AS models "
+            "FROM model_geometries m JOIN geometries g ON g.hash = m.hash"
+        ).fetchone()
+        return {
+            "models": referenced["models"],
+            "geometries": row["n"],
+            "bytes": row["bytes"],
+            "referenced_geometries": referenced["n"],
+            "referenced_bytes": referenced["bytes"],
+            "saved_bytes": referenced["bytes"] - row["bytes"]
+        }
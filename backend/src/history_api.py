@@ -0,0 +1,78 @@
+"""
+Conversion history API for QGEN_IMPFRAG
+=======================================
+
+Flask blueprint over the conversion history (see conversion_history).
+Both API servers register it:
+
+    GET /api/history                       recent conversions (?model=, ?version=, ?status=, ?limit=)
+    GET /api/history/models/<model>        a model's conversions over its revisions
+    GET /api/history/throughput            throughput per converter version (?days=)
+    GET /api/history/outliers              conversions slower than their size predicts (?factor=3, ?days=)
+
+Author: XQG4_AXIS Team
+"""
+
+import time
+
+from flask import Blueprint, Flask, current_app, jsonify, request
+
+from src.conversion_history import ConversionHistory, DEFAULT_OUTLIER_FACTOR
+
+
+history_api = Blueprint("history_api", __name__)
+
+MAX_LIMIT = 1000
+
+
+def register_history_api(app: Flask, history: ConversionHistory):
+    app.extensions["qgen_conversion_history"] = history
+    app.register_blueprint(history_api)
+
+
+def _history() -> ConversionHistory:
+    return current_app.extensions["qgen_conversion_history"]
+
+
+def _since():
+    """Start of the ?days= window as a timestamp; None for all of the history"""
+    days = request.args.get("days", type=float)
+    return time.time() - days * 86400 if days else None
+
+
+def _limit() -> int:
+    return max(1, min(request.args.get("limit", 100, type=int), MAX_LIMIT))
+
+
+@history_api.route('/api/history', methods=['GET'])
+def list_history():
+    conversions = _history().recent(
+        model=request.args.get("model"),
+        converter_version=request.args.get("version"),
+        status=request.args.get("status"),
+        limit=_limit()
+    )
+    return jsonify({"conversions": conversions, "count": len(conversions)})
+
+
+@history_api.route('/api/history/models/<model>', methods=['GET'])
+def model_history(model):
+    trend = _history().model_trend(model, limit=_limit())
+    if not trend:
+        return jsonify({"error": f"No conversions recorded for model: {model}"}), 404
+    return jsonify({"model": model, "conversions": trend, "count": len(trend)})
+
+
+@history_api.route('/api/history/throughput', methods=['GET'])
+def throughput():
+    versions = _history().throughput(since=_since())
+    return jsonify({"versions": versions, "count": len(versions)})
+
+
+@history_api.route('/api/history/outliers', methods=['GET'])
+def outliers():
+    factor = request.args.get("factor", DEFAULT_OUTLIER_FACTOR, type=float)
+    if factor <= 0:
+        return jsonify({"error": "factor must be positive"}), 400
+    report = _history().outliers(factor=factor, since=_since(), limit=_limit())
+    return jsonify({"factor": factor, **report, "count": len(report["outliers"])})
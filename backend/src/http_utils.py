@@ -0,0 +1,152 @@
+"""
+HTTP helpers for QGEN_IMPFRAG API servers
+=========================================
+
+Serves objects from a Storage backend with the cheapest available
+mechanism: a redirect to a presigned object-store URL, an nginx
+X-Accel-Redirect for local files, Flask's send_file, or a ranged stream
+through the Python process as the last resort. Also runs every request
+in a tracing span (register_tracing), and writes file uploads straight
+to their destination (register_direct_uploads).
+
+Author: XQG4_AXIS Team
+"""
+
+import os
+from pathlib import Path
+from typing import BinaryIO, Callable, List
+
+from flask import Flask, Request, Response, current_app, g, jsonify, redirect, request, send_file, stream_with_context
+
+from src.storage import Storage
+from src.tracing import SERVER, get_tracer
+
+
+def send_stored_file(storage: Storage, name: str, as_attachment: bool = False,
+                     mimetype: str = "application/octet-stream",
+                     allow_redirect: bool = False, accel_prefix: str = ""):
+    """Flask response for a stored object, honouring Range requests"""
+    obj = storage.stat(name)
+    if obj is None:
+        return jsonify({"error": f"Fragment file not found: {name}"}), 404
+
+    if allow_redirect:
+        url = storage.presigned_url(name)
+        if url:
+            return redirect(url, code=302)
+
+    path = storage.local_path(name)
+    if path is not None and accel_prefix:
+        # nginx serves the file itself from an internal location
+        relative = path.relative_to(storage.root).as_posix()
+        response = Response(mimetype=mimetype)
+        response.headers["X-Accel-Redirect"] = f"{accel_prefix.rstrip('/')}/{relative}"
+        if as_attachment:
+            response.headers["Content-Disposition"] = f'attachment; filename="{name}"'
+        return response
+
+    if path is not None:
+        return send_file(path, as_attachment=as_attachment, mimetype=mimetype, conditional=True)
+
+    # Remote object: stream it, honouring a single byte range
+    start, stop, status = 0, obj.size, 200
+    if request.range is not None and request.range.units == "bytes" and len(request.range.ranges) == 1:
+        bounds = request.range.range_for_length(obj.size)
+        if bounds is None:
+            return Response(status=416, headers={"Content-Range": f"bytes */{obj.size}"})
+        start, stop = bounds
+        status = 206
+
+    response = Response(
+        stream_with_context(storage.open_read(name, start, stop - 1)),
+        status=status,
+        mimetype=mimetype,
+        direct_passthrough=True
+    )
+    response.headers["Accept-Ranges"] = "bytes"
+    response.headers["Content-Length"] = str(stop - start)
+    if status == 206:
+        response.headers["Content-Range"] = f"bytes {start}-{stop - 1}/{obj.size}"
+    if as_attachment:
+        response.headers["Content-Disposition"] = f'attachment; filename="{name}"'
+    return response
+
+
+def register_tracing(app: Flask):
+    """Run each request in a server span continuing the caller's traceparent header"""
+
+    @app.before_request
+    def _start_request_span():
+        tracer = get_tracer()
+        route = request.url_rule.rule if request.url_rule is not None else request.path
+        span = tracer.start_span(f"{request.method} {route}", parent=request.headers.get("traceparent"),
+                                 kind=SERVER, attributes={
+                                     "http.request.method": request.method,
+                                     "url.path": request.path,
+                                     "http.route": route,
+                                     "http.request.body.size": request.content_length
+                                 })
+        g.qgen_request_span = (span, tracer.activate(span))
+
+    @app.after_request
+    def _trace_response(response):
+        entry = g.get("qgen_request_span")
+        if entry is not None:
+            entry[0].set_attribute("http.response.status_code", response.status_code)
+            if response.status_code >= 500:
+                entry[0].set_error(f"HTTP {response.status_code}")
+            # W3C trace context level 2: lets the caller find this request's trace
+            response.headers["traceresponse"] = entry[0].traceparent
+        return response
+
+    @app.teardown_request
+    def _end_request_span(exc=None):
+        entry = g.pop("qgen_request_span", None)
+        if entry is None:
+            return
+        span, token = entry
+        get_tracer().deactivate(token)
+        if exc is not None:
+            span.set_error(f"{type(exc).__name__}: {exc}")
+        span.end()
+
+
+class DirectUploadRequest(Request):
+    """Request writing each uploaded file straight to a path chosen by the app
+
+    Werkzeug spools uploads to an anonymous temporary file, which the
+    handler then copies with FileStorage.save(). Here the multipart
+    parser writes into the file at app.config["QGEN_UPLOAD_PATH"](filename)
+    instead, and the handler takes it from file.stream.name. Upload files
+    still there when the request ends are removed; handlers keep one by
+    moving it.
+    """
+
+    upload_files: List[BinaryIO]
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        upload_path = current_app.config.get("QGEN_UPLOAD_PATH")
+        if upload_path is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        stream = open(Path(upload_path(filename or "")), "w+b")
+        if not hasattr(self, "upload_files"):
+            self.upload_files = []
+        self.upload_files.append(stream)
+        return stream
+
+
+def register_direct_uploads(app: Flask, upload_path: Callable[[str], Path]):
+    """Stream uploads to upload_path(client filename) instead of a temp file that is copied afterwards"""
+    app.request_class = DirectUploadRequest
+    app.config["QGEN_UPLOAD_PATH"] = upload_path
+
+    @app.teardown_request
+    def _remove_unclaimed_uploads(exc=None):
+        for stream in getattr(request, "upload_files", ()):
+            stream.close()
+            try:
+                os.unlink(stream.name)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                current_app.logger.warning(f"Could not remove upload {stream.name}: {e}")
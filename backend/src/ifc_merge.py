@@ -0,0 +1,143 @@
+"""
+Streaming IFC merge for QGEN_IMPFRAG
+====================================
+
+Combines several IFC files of one project into a single STEP file, so
+a federated set converts into one fragment. Each member is streamed
+twice and never held in memory:
+
+1. assign new entity ids, and map away the records that are dropped:
+   the IfcProject of every member after the first (its sites hang off
+   the first project instead), and value entities (points, directions,
+   property values, ... : no references, no GlobalId) identical to one
+   already written by any member
+2. write the kept records with every reference renumbered
+
+Members must share a schema and, to line up, a coordinate system and
+length unit; differing length units are reported as a warning.
+
+Author: XQG4_AXIS Team
+"""
+
+import hashlib
+import re
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Set
+
+from src.ifc_step import ENTITY_RE, _strip_strings, iter_records, read_header
+
+
+REF_OR_STRING_RE = re.compile(r"'(?:[^']|'')*'|#(\d+)")
+GLOBAL_ID_ARG_RE = re.compile(r"\s*'[0-9A-Za-z_$]{22}'")
+
+
+def _value_key(type_name: str, args: str) -> bytes:
+    # Digests keep millions of coordinate records cheap to remember
+    return hashlib.blake2b(f"{type_name}({args})".encode("utf-8"), digest_size=16).digest()
+
+
+def _is_value_entity(args: str) -> bool:
+    return "#" not in _strip_strings(args) and not GLOBAL_ID_ARG_RE.match(args)
+
+
+def _step_string(value: str) -> str:
+    return "'" + value.replace("'", "''") + "'"
+
+
+def merge_ifc(paths: List[Path], out_path: Path, name: str = "merged") -> Dict[str, Any]:
+    """Merge IFC files into out_path and return what was combined"""
+    if not paths:
+        raise ValueError("Nothing to merge")
+    started = time.time()
+    headers = [read_header(p) for p in paths]
+    schemas = {h["schema"] for h in headers}
+    if len(schemas) > 1:
+        raise ValueError(f"Members use different schemas: {', '.join(sorted(str(s) for s in schemas))}")
+
+    next_id = 1
+    project_id = None
+    value_ids: Dict[bytes, int] = {}
+    id_maps: List[Dict[int, int]] = []
+    dropped: List[Set[int]] = []
+    length_units: List[Set[str]] = []
+    stats = {"entities_in": 0, "entities_out": 0, "deduplicated": 0, "merged_projects": 0}
+
+    for path in paths:
+        id_map: Dict[int, int] = {}
+        skip: Set[int] = set()
+        units: Set[str] = set()
+        for section, record in iter_records(path):
+            if section != "DATA" or not record.startswith("#"):
+                continue
+            m = ENTITY_RE.match(record)
+            if m is None:
+                continue
+            old_id, type_name, args = int(m.group(1)), m.group(2).upper(), m.group(3)
+            stats["entities_in"] += 1
+
+            if type_name == "IFCPROJECT":
+                if project_id is not None:
+                    id_map[old_id] = project_id
+                    skip.add(old_id)
+                    stats["merged_projects"] += 1
+                    continue
+                project_id = next_id
+            elif type_name in ("IFCSIUNIT", "IFCCONVERSIONBASEDUNIT") and ".LENGTHUNIT." in args:
+                units.add(re.sub(r"#\d+", "#", args))
+            elif _is_value_entity(args):
+                key = _value_key(type_name, args)
+                existing = value_ids.get(key)
+                if existing is not None:
+                    id_map[old_id] = existing
+                    skip.add(old_id)
+                    stats["deduplicated"] += 1
+                    continue
+                value_ids[key] = next_id
+
+            id_map[old_id] = next_id
+            next_id += 1
+        id_maps.append(id_map)
+        dropped.append(skip)
+        length_units.append(units)
+
+    warnings = []
+    if len({frozenset(u) for u in length_units if u}) > 1:
+        warnings.append("Members define different length units; geometry may not line up")
+
+    timestamp = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+    with open(out_path, "w", encoding="utf-8", newline="\n") as out:
+        out.write("ISO-10303-21;\nHEADER;\n")
+        out.write("FILE_DESCRIPTION(('ViewDefinition [CoordinationView]'),'2;1');\n")
+        out.write(f"FILE_NAME({_step_string(name + '.ifc')},'{timestamp}',(''),(''),"
+                  f"'QGEN_IMPFRAG','QGEN_IMPFRAG project merge','');\n")
+        out.write(f"FILE_SCHEMA(({_step_string(headers[0]['schema'] or 'IFC4')}));\nENDSEC;\nDATA;\n")
+
+        for path, id_map, skip in zip(paths, id_maps, dropped):
+            def renumber(match: re.Match) -> str:
+                if match.group(1) is None:
+                    return match.group(0)
+                return f"#{id_map.get(int(match.group(1)), 0)}"
+
+            for section, record in iter_records(path):
+                if section != "DATA" or not record.startswith("#"):
+                    continue
+                m = ENTITY_RE.match(record)
+                if m is None or int(m.group(1)) in skip:
+                    continue
+                args = m.group(3)
+                if "#" in args:
+                    args = REF_OR_STRING_RE.sub(renumber, args)
+                out.write(f"#{id_map[int(m.group(1))]}={m.group(2)}({args});\n")
+                stats["entities_out"] += 1
+        out.write("ENDSEC;\nEND-ISO-10303-21;\n")
+
+    stats.update(
+        members=len(paths),
+        schema=headers[0]["schema"],
+        warnings=warnings,
+        size_bytes=out_path.stat().st_size,
+        seconds=round(time.time() - started, 3)
+    )
+    return stats
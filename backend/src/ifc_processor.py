@@ -20,6 +20,8 @@ Options:
     --dev           Run in development mode with debug logging
     --watch         Monitor IFC directory for new files
     --convert       Convert all IFC files immediately and exit
+    --worker        Pull conversion jobs from the shared work queue
+    --backfill DIR  Convert an IFC archive tree, resuming from its manifest (see src/backfill.py)
     --port PORT     Specify API server port (default: 8000)
 
 Author: XQG4_AXIS Team
@@ -35,17 +37,10 @@ import argparse
 from pathlib import Path
 from datetime import datetime
 from typing import List, Dict, Optional, Any
-import subprocess
-import shutil
+import threading
 
-# Web framework imports
-from flask import Flask, request, jsonify, send_file
-from flask_cors import CORS
-import click
-
-# File monitoring
-from watchdog.observers import Observer
-from watchdog.events import FileSystemEventHandler
+# Flask (API server) and watchdog (--watch) are imported by the modes that use them,
+# so --convert and --worker start without them: see QgenImpfragProcessor.app and setup_file_watcher
 
 # Configuration and validation
 from pydantic import BaseModel, Field
@@ -57,6 +52,31 @@ sys.path.append(str(BACKEND_DIR))
 
 # Node.js converter integration
 CONVERTER_SCRIPT = BACKEND_DIR / "ifc_converter.js"
+GEOMETRY_SCRIPT = BACKEND_DIR / "ifc_geometry.js"
+
+from src.startup import StartupReport, load_env_file
+from src.converter_runner import ConverterRunner
+from src.scheduler import ConversionScheduler, INTERACTIVE, WATCH, BACKFILL
+from src.job_store import JobStore
+from src.work_queue import make_work_queue, RemoteJob, PENDING, FAILED, CANCELLED
+from src.conversion_worker import ConversionWorker
+from src.backfill import Backfill, BackfillManifest, default_manifest_path
+from src.storage import make_storage, ShardedLocalStorage
+from src.model_index import ModelIndex
+from src.pipeline import PostConversionPipeline
+from src.lod import LodSettings, DEFAULT_EXCLUDED_CLASSES
+from src.model_catalog import parse_fields, select_fields
+from src.project_bundle import ProjectStore, ProjectBundler
+from src.ifc_prune import get_profile, pruned_input, with_conversion_time
+from src.tiled_conversion import TiledConverter, TILESET_SUFFIX, tileset_name
+from src.profiling import ProfileStore, profile_url
+from src.conversion_history import ConversionHistory, result_status
+from src.conversion_estimator import ConversionEstimator, Estimate, job_etas, remaining_seconds
+from src.tracing import configure_tracing, current_traceparent, get_tracer
+
+# Startup milestones of this process, logged when a mode is ready and returned by /health
+STARTUP = StartupReport()
+STARTUP.mark("imports")
 
 
 class Config(BaseSettings):
@@ -68,6 +88,18 @@ class Config(BaseSettings):
     fragments_output_dir: Path = Field(default_factory=lambda: Path("/data/XVUE/XQG4_AXIS/QGEN_IMPFRAG/data/fragments"))
     logs_dir: Path = Field(default_factory=lambda: Path("/data/XVUE/XQG4_AXIS/QGEN_IMPFRAG/backend/logs"))
     reports_dir: Path = Field(default_factory=lambda: Path("/data/XVUE/XQG4_AXIS/QGEN_IMPFRAG/data/reports"))
+    state_dir: Path = Field(default_factory=lambda: Path("/data/XVUE/XQG4_AXIS/QGEN_IMPFRAG/data/state"))
+    index_dir: Path = Field(default_factory=lambda: Path("/data/XVUE/XQG4_AXIS/QGEN_IMPFRAG/data/index"))
+    geometry_dir: Path = Field(default_factory=lambda: Path("/data/XVUE/XQG4_AXIS/QGEN_IMPFRAG/data/geometry"))
+    # On-disk V8 code cache shared by the converter processes (Node 22.1+)
+    converter_cache_dir: Path = Field(default_factory=lambda: Path("/data/XVUE/XQG4_AXIS/QGEN_IMPFRAG/data/cache/node"))
+    
+    # Storage backends: file://, sharded:// or s3:// URLs; empty means the local dirs above
+    fragment_storage_url: str = ""
+    ifc_storage_url: str = ""
+    geometry_storage_url: str = ""  # geometry library chunks; empty means sharded:// under geometry_dir
+    storage_redirect: bool = False  # redirect downloads to presigned object-store URLs
+    accel_redirect_prefix: str = ""  # nginx internal location serving fragment files
     
     # Server configuration
     host: str = "0.0.0.0"
@@ -78,6 +110,51 @@ class Config(BaseSettings):
     watch_enabled: bool = False
     auto_convert: bool = True
     max_file_size_mb: int = 500
+    converter_max_heap_mb: int = 8192
+    converter_logs: bool = False  # full converter output per job in logs_dir/converter; otherwise only the tail
+    # web-ifc threads per conversion of a large model; needs a multithreaded web-ifc build (see ifc_converter.js)
+    converter_threads: int = 1
+    build_indexes: bool = True  # property and query indexes built after each conversion
+    spatial_index: bool = True  # element bounds via a web-ifc geometry pass
+    # Level-of-detail overview variants, built by the same web-ifc pass
+    lod_enabled: bool = False
+    lod_cell_size: float = 0.1
+    lod_min_size: float = 0.25
+    lod_proxy_min_size: float = 1.0
+    lod_excluded_classes: List[str] = Field(default_factory=lambda: list(DEFAULT_EXCLUDED_CLASSES))
+    geometry_library: bool = False  # content-addressed geometry shared across models
+    # Slimmer IFC handed to the converter: orphans, viewer or geometry (see src/ifc_prune.py); empty disables
+    prune_profile: str = ""
+    prune_profiles_file: Optional[Path] = None  # JSON of extra or overriding profiles
+    # IFC files at least this large are split by storey and converted as parallel tiles; 0 disables
+    split_threshold_mb: float = 0
+    split_parts: int = 0  # 0: one per core, up to 8
+    split_max_parallel: int = 0  # 0: all tiles at once
+    # Conversions requested with profile=true keep Python and Node profiles under reports_dir/profiles
+    profiling_enabled: bool = True
+    # Spans of each request and conversion: "file" (reports_dir/traces), an OTLP/HTTP /v1/traces URL, or empty
+    trace_export: str = ""
+    
+    # Scheduling of interactive, watcher and backfill conversions
+    max_concurrent_conversions: int = 2
+    reserved_interactive_slots: int = 1
+    # Threads running conversions may use together (converter threads, parallel tiles); 0: one per core
+    thread_budget: int = 0
+    priority_weights: Dict[str, int] = Field(default_factory=lambda: {"interactive": 8, "watch": 3, "backfill": 1})
+    
+    # Job history kept in the shared job store
+    job_retention_days: float = 30.0
+    # Performance history of every conversion, kept for trends across converter versions
+    history_retention_days: float = 365.0
+    
+    # Distributed conversion: the API enqueues jobs and --worker processes run them.
+    # queue_url is redis://host:port/db or sqlite:///path; empty means a SQLite
+    # queue in state_dir, which only workers on this host can reach.
+    distributed: bool = False
+    queue_url: str = ""
+    queue_lease_seconds: float = 60.0
+    queue_max_attempts: int = 3
+    worker_poll_seconds: float = 2.0
     
     # Logging
     log_level: str = "INFO"
@@ -91,12 +168,17 @@ class ConversionRequest(BaseModel):
     filename: str
     force_reconvert: bool = False
     output_filename: Optional[str] = None
+    wait: bool = True
+    profile: bool = False
 
 
 class ConversionStatus(BaseModel):
     """Response model for conversion status"""
     filename: str
-    status: str  # pending, processing, completed, failed
+    status: str  # queued, processing, completed, failed, cancelled
+    job_id: Optional[str] = None
+    priority: Optional[str] = None
+    queue_position: Optional[int] = None
     progress: float = 0.0
     message: str = ""
     start_time: Optional[datetime] = None
@@ -104,27 +186,36 @@ class ConversionStatus(BaseModel):
     output_file: Optional[str] = None
     compression_ratio: Optional[float] = None
     file_size_mb: Optional[float] = None
+    preprocessing: Optional[Dict[str, Any]] = None
+    profiles: Optional[str] = None
+    # Predicted from past conversions (see conversion_estimator); the ETA is computed when read
+    estimated_seconds: Optional[float] = None
+    timeout_seconds: Optional[int] = None
+    eta_seconds: Optional[float] = None
 
 
-class IfcFileHandler(FileSystemEventHandler):
-    """File system event handler for automatic IFC processing"""
-    
-    def __init__(self, processor):
-        self.processor = processor
-        self.logger = logging.getLogger(__name__)
-    
-    def on_created(self, event):
-        if not event.is_dir and event.src_path.lower().endswith('.ifc'):
-            self.logger.info(f"📁 New IFC file detected: {event.src_path}")
-            # Add a small delay to ensure file is fully written
-            time.sleep(2)
-            self.processor.convert_file(Path(event.src_path))
-    
-    def on_modified(self, event):
-        if not event.is_dir and event.src_path.lower().endswith('.ifc'):
-            self.logger.info(f"📝 IFC file modified: {event.src_path}")
-            time.sleep(2)
-            self.processor.convert_file(Path(event.src_path))
+def ifc_file_handler(processor):
+    """File system event handler for automatic IFC processing (imports watchdog)"""
+    from watchdog.events import FileSystemEventHandler
+    
+    class IfcFileHandler(FileSystemEventHandler):
+        def __init__(self):
+            self.logger = logging.getLogger(__name__)
+        
+        def on_created(self, event):
+            if not event.is_dir and event.src_path.lower().endswith('.ifc'):
+                self.logger.info(f"📁 New IFC file detected: {event.src_path}")
+                # Add a small delay to ensure file is fully written
+                time.sleep(2)
+                processor.submit_conversion(Path(event.src_path), priority_class=WATCH)
+        
+        def on_modified(self, event):
+            if not event.is_dir and event.src_path.lower().endswith('.ifc'):
+                self.logger.info(f"📝 IFC file modified: {event.src_path}")
+                time.sleep(2)
+                processor.submit_conversion(Path(event.src_path), priority_class=WATCH)
+    
+    return IfcFileHandler()
 
 
 class QgenImpfragProcessor:
@@ -133,18 +224,120 @@ class QgenImpfragProcessor:
     def __init__(self, config: Config):
         self.config = config
         self.logger = self._setup_logging()
-        self.conversion_status: Dict[str, ConversionStatus] = {}
         self.setup_directories()
+        configure_tracing("qgen-impfrag-processor", config.trace_export, config.reports_dir, self.logger)
+        self.fragment_storage = make_storage(config.fragment_storage_url, config.fragments_output_dir)
+        self.ifc_storage = make_storage(config.ifc_storage_url, config.ifc_input_dir)
+        
+        # Job state lives in SQLite so every worker process sees the same jobs
+        self.job_store = JobStore(config.state_dir / "jobs.sqlite3", logger=self.logger)
+        
+        self.work_queue = None
+        if config.distributed:
+            queue_url = config.queue_url or f"sqlite:///{config.state_dir / 'queue.sqlite3'}"
+            self.work_queue = make_work_queue(queue_url, config.queue_max_attempts, self.logger)
+            self.logger.info(f"📮 Using shared work queue: {queue_url.split('@')[-1]}")
+        # Duration, timeout and heap of each conversion are predicted from the ones before it
+        self.conversion_history = ConversionHistory(config.state_dir / "history.sqlite3")
+        self.estimator = ConversionEstimator(self.conversion_history, config.converter_max_heap_mb,
+                                             config.converter_threads)
+        self.converter = ConverterRunner(
+            CONVERTER_SCRIPT,
+            cwd=BACKEND_DIR,
+            max_heap_mb=config.converter_max_heap_mb,
+            logger=self.logger,
+            log_dir=config.logs_dir / "converter" if config.converter_logs else None,
+            max_threads=config.converter_threads,
+            cache_dir=config.converter_cache_dir,
+            estimator=self.estimator
+        )
+        self.prune_profile = get_profile(config.prune_profile, config.prune_profiles_file)
+        self.tiled_converter = TiledConverter(self.converter, self.fragment_storage, config.split_parts,
+                                              config.split_max_parallel, self.logger)
+        # Derived per-model indexes, built from the IFC after each conversion
+        geometry_storage = (make_storage(config.geometry_storage_url, config.geometry_dir)
+                            if config.geometry_storage_url else ShardedLocalStorage(config.geometry_dir))
+        self.model_index = ModelIndex(config.index_dir, geometry_storage)
+        self.pipeline = None
+        if config.build_indexes:
+            geometry_runner = None
+            if config.spatial_index or config.lod_enabled or config.geometry_library:
+                geometry_runner = ConverterRunner(GEOMETRY_SCRIPT, cwd=BACKEND_DIR,
+                                                  max_heap_mb=config.converter_max_heap_mb, logger=self.logger,
+                                                  cache_dir=config.converter_cache_dir)
+            lod = None
+            if config.lod_enabled:
+                lod = LodSettings(config.lod_cell_size, config.lod_min_size, config.lod_proxy_min_size,
+                                  config.lod_excluded_classes)
+            self.pipeline = PostConversionPipeline(self.model_index, geometry_runner, self.logger,
+                                                   spatial=config.spatial_index, lod=lod,
+                                                   geometry_library=config.geometry_library)
+        self.scheduler = ConversionScheduler(
+            max_workers=config.max_concurrent_conversions,
+            weights=config.priority_weights,
+            reserved_interactive_slots=config.reserved_interactive_slots,
+            logger=self.logger,
+            thread_budget=config.thread_budget or max(os.cpu_count() or 1, config.max_concurrent_conversions)
+        )
         
-        # Initialize Flask app
-        self.app = Flask(__name__)
-        CORS(self.app)
-        self.setup_routes()
+        # Federated projects, rebuilt when one of their members is converted again
+        self.bundler = ProjectBundler(ProjectStore(config.state_dir / "projects.sqlite3"),
+                                      self.ifc_storage, self.fragment_storage, self.converter,
+                                      self.scheduler, self.logger)
+        
+        self.profile_store = ProfileStore(config.reports_dir / "profiles", self.logger)
+        # Built on first use: only the API server needs Flask
+        self._app = None
+        
+        # Retention sweeps scan directories, so they run next to startup instead of before it
+        threading.Thread(target=self._maintenance, name="qgen-maintenance", daemon=True).start()
         
         # File watcher
         self.observer = None
         if config.watch_enabled:
             self.setup_file_watcher()
+        STARTUP.mark("setup")
+    
+    @property
+    def app(self):
+        """The Flask app serving the API (imports Flask and the API blueprints)"""
+        if self._app is None:
+            from flask import Flask
+            from flask_cors import CORS
+            from src.http_utils import register_tracing
+            from src.model_api import register_model_api
+            from src.project_api import register_project_api
+            from src.profile_api import register_profile_api
+            from src.history_api import register_history_api
+            
+            self._app = Flask(__name__)
+            CORS(self._app)
+            register_tracing(self._app)
+            self.setup_routes()
+            register_model_api(self._app, self.model_index)
+            register_project_api(self._app, self.bundler, self.config.storage_redirect,
+                                 self.config.accel_redirect_prefix)
+            register_profile_api(self._app, self.profile_store, self.config.profiling_enabled)
+            register_history_api(self._app, self.conversion_history)
+        return self._app
+    
+    def _maintenance(self):
+        """Purge job history, finished queue records, converter logs and profiles past the retention period"""
+        try:
+            self.job_store.maintenance(self.config.job_retention_days)
+            self.conversion_history.maintenance(self.config.history_retention_days)
+            self.converter.purge_logs(self.config.job_retention_days)
+            self.profile_store.maintenance(self.config.job_retention_days)
+            if self.work_queue is not None:
+                self.work_queue.maintenance(self.config.job_retention_days)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Maintenance failed: {e}")
+    
+    def report_startup(self, mode: str):
+        """Log how long this process took to be ready for its mode"""
+        STARTUP.mode = mode
+        STARTUP.mark("ready")
+        self.logger.info(f"⏱️ Startup ({STARTUP.summary()})")
     
     def _setup_logging(self) -> logging.Logger:
         """Configure logging for the processor"""
@@ -178,7 +371,9 @@ class QgenImpfragProcessor:
             self.config.ifc_input_dir,
             self.config.fragments_output_dir,
             self.config.logs_dir,
-            self.config.reports_dir
+            self.config.reports_dir,
+            self.config.state_dir,
+            self.config.index_dir
         ]
         
         for directory in directories:
@@ -187,8 +382,10 @@ class QgenImpfragProcessor:
     
     def setup_file_watcher(self):
         """Setup file system monitoring for automatic processing"""
+        from watchdog.observers import Observer
+        
         self.observer = Observer()
-        event_handler = IfcFileHandler(self)
+        event_handler = ifc_file_handler(self)
         self.observer.schedule(
             event_handler, 
             str(self.config.ifc_input_dir), 
@@ -198,132 +395,437 @@ class QgenImpfragProcessor:
     
     def setup_routes(self):
         """Configure Flask API routes"""
+        from flask import request, jsonify
+        from src.http_utils import send_stored_file
+        from src.profile_api import profiling_requested, link_request_profile
         
-        @self.app.route('/health', methods=['GET'])
+        @self._app.route('/health', methods=['GET'])
         def health_check():
             return jsonify({
                 "status": "healthy",
                 "timestamp": datetime.now().isoformat(),
-                "service": "qgen-impfrag-backend"
+                "service": "qgen-impfrag-backend",
+                "startup": STARTUP.to_dict()
             })
         
-        @self.app.route('/api/files', methods=['GET'])
+        @self._app.route('/api/files', methods=['GET'])
         def list_files():
-            """List available IFC files and their conversion status"""
+            """List available IFC files, their conversion status and model statistics
+            
+            fields=a,b,... selects the statistics returned ("all" for every one).
+            """
             files = []
-            for ifc_file in self.config.ifc_input_dir.glob("*.ifc"):
-                fragment_file = self.config.fragments_output_dir / f"{ifc_file.stem}.frag"
+            fields = parse_fields(request.args.get("fields"))
+            ifc_files = self.ifc_storage.list(".ifc")
+            fragment_files = {f.name: f for f in self.fragment_storage.list(".frag")}
+            tilesets = {f.name for f in self.fragment_storage.list(TILESET_SUFFIX)}
+            jobs = self.job_store.latest_for_filenames([f.name for f in ifc_files])
+            stats = self.model_index.catalog().stats_for(Path(f.name).stem for f in ifc_files)
+            for ifc_file in ifc_files:
+                fragment_file = fragment_files.get(f"{Path(ifc_file.name).stem}.frag")
+                tileset = tileset_name(ifc_file.name)
                 files.append({
                     "filename": ifc_file.name,
-                    "size_mb": round(ifc_file.stat().st_size / (1024 * 1024), 2),
-                    "modified": datetime.fromtimestamp(ifc_file.stat().st_mtime).isoformat(),
-                    "has_fragments": fragment_file.exists(),
-                    "fragment_size_mb": round(fragment_file.stat().st_size / (1024 * 1024), 2) if fragment_file.exists() else None,
-                    "status": self.conversion_status.get(ifc_file.name, ConversionStatus(filename=ifc_file.name, status="ready")).status
+                    "size_mb": round(ifc_file.size / (1024 * 1024), 2),
+                    "modified": datetime.fromtimestamp(ifc_file.modified).isoformat(),
+                    "has_fragments": fragment_file is not None or tileset in tilesets,
+                    "fragment_size_mb": round(fragment_file.size / (1024 * 1024), 2) if fragment_file
+                                        else stats.get(Path(ifc_file.name).stem, {}).get("fragment_size_mb"),
+                    "tileset": tileset if tileset in tilesets else None,
+                    "status": jobs[ifc_file.name]["state"] if ifc_file.name in jobs else "ready",
+                    "stats": select_fields(stats.get(Path(ifc_file.name).stem, {}), fields)
                 })
             return jsonify(files)
         
-        @self.app.route('/api/convert', methods=['POST'])
+        @self._app.route('/api/convert', methods=['POST'])
         def convert_file_endpoint():
             """Convert a specific IFC file to fragments"""
             data = request.get_json()
             req = ConversionRequest(**data)
             
             ifc_file = self.config.ifc_input_dir / req.filename
-            if not ifc_file.exists():
+            if not self.ifc_storage.exists(req.filename):
                 return jsonify({"error": f"File not found: {req.filename}"}), 404
             
-            # Start conversion in background
-            result = self.convert_file(ifc_file, req.force_reconvert, req.output_filename)
-            return jsonify(result.dict())
+            # Interactive requests jump ahead of watcher and backfill work
+            profile = self.config.profiling_enabled and (req.profile or profiling_requested())
+            job = self.submit_conversion(ifc_file, req.force_reconvert, req.output_filename, INTERACTIVE, profile,
+                                         current_traceparent())
+            if profiling_requested():
+                link_request_profile(job.job_id)
+            if req.wait:
+                job.wait()
+                return jsonify(self.get_job_status(job.job_id).dict())
+            return jsonify(self.get_status(ifc_file.name).dict()), 202
         
-        @self.app.route('/api/status/<filename>', methods=['GET'])
+        @self._app.route('/api/status/<filename>', methods=['GET'])
         def get_conversion_status(filename):
             """Get conversion status for a specific file"""
-            if filename in self.conversion_status:
-                return jsonify(self.conversion_status[filename].dict())
+            status = self.get_status(filename)
+            if status is not None:
+                return jsonify(status.dict())
             return jsonify({"error": "File not found"}), 404
         
-        @self.app.route('/api/fragments/<filename>', methods=['GET'])
+        @self._app.route('/api/jobs', methods=['GET'])
+        def list_jobs():
+            """List queued and running conversion jobs"""
+            return jsonify({
+                "jobs": self.scheduler.jobs(),
+                "converters": self.converter.active_jobs(),
+                "scheduler": self.scheduler.stats()
+            })
+        
+        @self._app.route('/api/jobs/<job_id>', methods=['GET'])
+        def get_job(job_id):
+            """Get the status of a job by its ID"""
+            status = self.get_job_status(job_id)
+            if status is not None:
+                return jsonify(status.dict())
+            return jsonify({"error": "Job not found"}), 404
+        
+        @self._app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+        def cancel_job(job_id):
+            """Cancel a queued or running conversion and discard its partial output"""
+            if self.scheduler.cancel(job_id):
+                self._mark_cancelled(job_id)
+                return jsonify({"job_id": job_id, "status": "cancelled"})
+            if self.converter.cancel(job_id):
+                return jsonify({"job_id": job_id, "status": "cancelling"})
+            if self.work_queue is not None and self.work_queue.cancel(job_id):
+                return jsonify({"job_id": job_id, "status": "cancelling"})
+            # The job may belong to another worker process; it polls for this flag
+            if self.job_store.request_cancel(job_id):
+                return jsonify({"job_id": job_id, "status": "cancelling"})
+            return jsonify({"error": "Job not found or not running"}), 404
+        
+        @self._app.route('/api/fragments/<filename>', methods=['GET'])
         def download_fragment(filename):
-            """Download a fragments file"""
-            fragment_file = self.config.fragments_output_dir / filename
-            if fragment_file.exists():
-                return send_file(fragment_file, as_attachment=True)
-            return jsonify({"error": "Fragment file not found"}), 404
-    
-    def convert_file(self, ifc_file: Path, force_reconvert: bool = False, output_filename: str = None) -> ConversionStatus:
-        """Convert a single IFC file to fragments format"""
+            """Download a fragments file (supports Range requests)"""
+            return send_stored_file(
+                self.fragment_storage, filename,
+                as_attachment=True,
+                allow_redirect=self.config.storage_redirect,
+                accel_prefix=self.config.accel_redirect_prefix
+            )
+    
+    def submit_conversion(self, ifc_file: Path, force_reconvert: bool = False, output_filename: str = None,
+                          priority_class: str = INTERACTIVE, profile: bool = False,
+                          traceparent: Optional[str] = None):
+        """Queue a conversion on the scheduler, or the shared work queue, and return its job handle"""
+        job_id = self.converter.new_job_id()
+        estimate = self._estimate(ifc_file.name)
+        self._save_status(ConversionStatus(
+            filename=ifc_file.name,
+            status="queued",
+            job_id=job_id,
+            priority=priority_class,
+            message="Waiting for a conversion slot",
+            profiles=profile_url(job_id) if profile else None,
+            estimated_seconds=round(estimate.seconds, 1) if estimate is not None else None,
+            timeout_seconds=estimate.limits.timeout_seconds if estimate is not None else None
+        ))
+        if self.work_queue is not None:
+            self.work_queue.enqueue(job_id, {
+                "filename": ifc_file.name,
+                "force_reconvert": force_reconvert,
+                "output_filename": output_filename,
+                "profile": profile,
+                "traceparent": traceparent
+            }, priority_class)
+            return RemoteJob(self.work_queue, job_id)
+        return self.scheduler.submit(
+            self.convert_file, ifc_file, force_reconvert, output_filename, job_id, priority_class,
+            profile, traceparent,
+            priority_class=priority_class, job_id=job_id, threads=self._conversion_threads(ifc_file)
+        )
+    
+    def _estimate(self, filename: str) -> Optional[Estimate]:
+        """Predicted duration and limits of converting a stored IFC; pre-scanned where the file is local"""
+        stored = self.ifc_storage.stat(filename)
+        if stored is None:
+            return None
+        try:
+            return self.estimator.estimate(stored.size, self.ifc_storage.local_path(filename))
+        except Exception as e:
+            self.logger.warning(f"⚠️ Could not estimate the conversion of {filename}: {e}")
+            return None
+    
+    def _conversion_threads(self, ifc_file: Path) -> int:
+        """Threads a conversion of ifc_file will use: its tiles', or the converter's"""
+        stored = self.ifc_storage.stat(ifc_file.name)
+        if stored is None:
+            return 1
+        split_bytes = self.config.split_threshold_mb * 1024 * 1024
+        if split_bytes > 0 and stored.size >= split_bytes:
+            return self.tiled_converter.threads_for(stored.size)
+        return self.converter.threads_for(stored.size)
+    
+    def get_status(self, filename: str) -> Optional[ConversionStatus]:
+        """Status of the latest job for a file"""
+        return self._with_queue_position(self.job_store.latest_for_filename(filename))
+    
+    def get_job_status(self, job_id: str) -> Optional[ConversionStatus]:
+        """Status of a job by ID"""
+        return self._with_queue_position(self.job_store.get(job_id))
+    
+    def _with_queue_position(self, record: Optional[Dict[str, Any]]) -> Optional[ConversionStatus]:
+        if record is None:
+            return None
+        status = ConversionStatus(**record["data"])
+        if self.work_queue is not None and status.status in ("queued", "processing"):
+            status = self._sync_from_queue(status)
+        if status.status == "queued":
+            status.queue_position = self._queue_position(status.job_id)
+            # Behind the running jobs and the ones queued ahead of it
+            status.eta_seconds = self._job_etas().get(status.job_id)
+        elif status.status == "processing" and status.estimated_seconds is not None and status.start_time:
+            elapsed = (datetime.now() - status.start_time).total_seconds()
+            status.eta_seconds = round(remaining_seconds(status.estimated_seconds, elapsed, status.progress))
+        return status
+    
+    def _queue_position(self, job_id: str) -> Optional[int]:
+        if self.work_queue is not None:
+            return self.work_queue.position(job_id)
+        # Only known for jobs queued in this process
+        return self.scheduler.queue_position(job_id)
+    
+    def _job_etas(self) -> Dict[str, float]:
+        """ETA of every queued and processing job in the shared job store"""
+        jobs, now = [], datetime.now()
+        for state in ("queued", "processing"):
+            for record in self.job_store.list_by_state(state):
+                data = record["data"]
+                start = data.get("start_time")
+                jobs.append({
+                    "job_id": data["job_id"],
+                    "status": state,
+                    "estimated_seconds": data.get("estimated_seconds"),
+                    "progress": data.get("progress"),
+                    "elapsed_seconds": (now - datetime.fromisoformat(start)).total_seconds() if start else None,
+                    "queue_position": self._queue_position(data["job_id"]) if state == "queued" else None
+                })
+        return job_etas(jobs, self.config.max_concurrent_conversions)
+    
+    def _sync_from_queue(self, status: ConversionStatus) -> ConversionStatus:
+        """Fold progress reported by a remote worker into the local job store"""
+        queued = self.work_queue.get(status.job_id)
+        if queued is None:
+            return status
+        
+        if queued["status"]:
+            status = ConversionStatus(**queued["status"])
+        if queued["state"] == PENDING:
+            status.status = "queued"
+        elif queued["state"] == FAILED:
+            status.status = "failed"
+            status.end_time = status.end_time or datetime.now()
+            status.message = f"Conversion failed: {queued['error']}"
+        elif queued["state"] == CANCELLED:
+            status.status = "cancelled"
+            status.end_time = status.end_time or datetime.now()
+            status.message = "Conversion cancelled"
+        
+        if status.status not in ("queued", "processing"):
+            self._save_status(status)
+        return status
+    
+    def _save_status(self, status: ConversionStatus):
+        """Persist a status to the shared job store"""
+        status.queue_position = None
+        status.eta_seconds = None
+        self.job_store.save(
+            status.job_id,
+            status.filename,
+            status.status,
+            json.loads(status.json()),
+            priority=status.priority
+        )
+    
+    def _report_progress(self, status: ConversionStatus, percent: int, phase: str):
+        """Converter progress, from the runner's output reader"""
+        # 100% is reserved for the published result
+        status.progress = float(min(percent, 99))
+        status.message = f"Converting: {phase}"
+        self._save_status(status)
+    
+    def _mark_cancelled(self, job_id: str):
+        record = self.job_store.get(job_id)
+        if record is None:
+            return
+        status = ConversionStatus(**record["data"])
+        status.status = "cancelled"
+        status.end_time = datetime.now()
+        status.message = "Conversion cancelled"
+        self._save_status(status)
+    
+    def convert_file(self, ifc_file: Path, force_reconvert: bool = False, output_filename: str = None,
+                     job_id: Optional[str] = None, priority_class: Optional[str] = None,
+                     profile: bool = False, traceparent: Optional[str] = None) -> ConversionStatus:
+        """Convert a single IFC file to fragments format
+
+        With profile, the job and its converter processes are profiled
+        into the profile store (the remote worker's, for queued jobs).
+        traceparent continues the trace of the request that queued the job.
+        """
+        tracer = get_tracer()
+        record = self.job_store.get(job_id) if job_id else None
+        if record is not None and traceparent:
+            tracer.record("queue.wait", int(record["created_at"] * 1e9), time.time_ns(), parent=traceparent,
+                          attributes={"qgen.job_id": job_id})
+        with tracer.span("conversion", parent=traceparent,
+                         attributes={"qgen.job_id": job_id, "qgen.filename": ifc_file.name}) as span:
+            status = self._convert_file(ifc_file, force_reconvert, output_filename, job_id, priority_class, profile)
+            span.set_attribute("qgen.status", status.status)
+        return status
+    
+    def _convert_file(self, ifc_file: Path, force_reconvert: bool, output_filename: Optional[str],
+                      job_id: Optional[str], priority_class: Optional[str], profile: bool) -> ConversionStatus:
         filename = ifc_file.name
         output_filename = output_filename or f"{ifc_file.stem}.frag"
-        output_file = self.config.fragments_output_dir / output_filename
         
         # Check if already converted
-        if output_file.exists() and not force_reconvert:
+        existing = next((name for name in (output_filename, tileset_name(output_filename))
+                         if self.fragment_storage.exists(name)), None)
+        if existing and not force_reconvert:
             self.logger.info(f"✅ Fragment already exists for {filename}, skipping conversion")
             status = ConversionStatus(
                 filename=filename,
                 status="completed",
+                job_id=job_id or self.converter.new_job_id(),
+                priority=priority_class,
                 progress=100.0,
                 message="Already converted",
-                output_file=output_filename
+                output_file=existing
             )
-            self.conversion_status[filename] = status
+            self._save_status(status)
             return status
         
+        # Another process may have cancelled the job while it was queued here
+        if job_id and self.job_store.cancel_requested(job_id):
+            self._mark_cancelled(job_id)
+            return self.get_job_status(job_id)
+        
         # Initialize status
         status = ConversionStatus(
             filename=filename,
             status="processing",
+            job_id=job_id or self.converter.new_job_id(),
+            priority=priority_class,
             start_time=datetime.now(),
             message="Starting conversion..."
         )
-        self.conversion_status[filename] = status
+        if profile:
+            status.profiles = profile_url(status.job_id)
+        self._save_status(status)
         
+        result, tileset, original_size, conversion_seconds, fragment_size = None, None, None, None, None
+        # Size of the file the converter ran on (pruned or not), for the history
+        estimate, converted_size = None, None
         try:
             self.logger.info(f"🔄 Starting conversion of {filename}")
             
-            # Use the Node.js converter script
-            cmd = [
-                "node", 
-                str(CONVERTER_SCRIPT),
-                "--input", str(ifc_file),
-                "--output", str(output_file)
-            ]
-            
-            self.logger.info(f"Running converter: {' '.join(cmd)}")
+            # Run the Node.js converter with limits derived from the input size.
+            # Remote storage is staged through local files on this host.
+            output_file = self.fragment_storage.staging_path(output_filename)
+            node_args = self.profile_store.node_args(status.job_id) if profile else None
+            with self.profile_store.capture(status.job_id, "job", enabled=profile), \
+                    self.ifc_storage.local_copy(filename) as input_file:
+                original_size = converted_size = input_file.stat().st_size
+                estimate = self.estimator.estimate(original_size, input_file)
+                status.estimated_seconds = round(estimate.seconds, 1)
+                status.timeout_seconds = estimate.limits.timeout_seconds
+                split_bytes = self.config.split_threshold_mb * 1024 * 1024
+                started = time.time()
+                if split_bytes > 0 and original_size >= split_bytes:
+                    # Large models convert as parallel tiles, published by the tiled converter itself
+                    status.message = "Converting as tiles..."
+                    self._save_status(status)
+                    result, tileset = self.tiled_converter.convert(
+                        input_file, output_filename, status.job_id,
+                        cancel_check=lambda: self.job_store.cancel_requested(status.job_id),
+                        profile=self.prune_profile, node_args=node_args
+                    )
+                    conversion_seconds = round(time.time() - started, 2)
+                else:
+                    with pruned_input(input_file, self.prune_profile, self.logger) as (converter_input, prune):
+                        if converter_input != input_file:
+                            # Predicted from the file the converter runs on, like the history it is fitted on
+                            converted_size = converter_input.stat().st_size
+                            estimate = self.estimator.estimate(converted_size, converter_input)
+                            status.estimated_seconds = round(estimate.seconds, 1)
+                            status.timeout_seconds = estimate.limits.timeout_seconds
+                            self._save_status(status)
+                        started = time.time()
+                        result = self.converter.run(
+                            converter_input, output_file, job_id=status.job_id, limits=estimate.limits,
+                            cancel_check=lambda: self.job_store.cancel_requested(status.job_id),
+                            node_args=node_args,
+                            progress=lambda percent, phase: self._report_progress(status, percent, phase)
+                        )
+                        conversion_seconds = round(time.time() - started, 2)
+                    if prune is not None:
+                        status.preprocessing = with_conversion_time(prune, conversion_seconds)
+                
+                # Indexes are built from the same local copy while it exists
+                if result.success and self.pipeline is not None:
+                    status.message = "Building indexes..."
+                    self._save_status(status)
+                    self.pipeline.run(
+                        input_file, self.model_index.model_name(output_filename), status.job_id,
+                        cancel_check=lambda: self.job_store.cancel_requested(status.job_id)
+                    )
             
-            # Run the Node.js converter
-            result = subprocess.run(
-                cmd,
-                cwd=str(BACKEND_DIR),
-                capture_output=True,
-                text=True,
-                timeout=300  # 5 minute timeout
-            )
+            if result.cancelled:
+                self.logger.info(f"🛑 Conversion cancelled for {filename}")
+                status.status = "cancelled"
+                status.end_time = datetime.now()
+                status.message = "Conversion cancelled"
+                self._save_status(status)
+                self._record_history(status, output_filename, result, converted_size, conversion_seconds, None,
+                                     tileset, estimate)
+                return status
             
-            if result.returncode != 0:
-                error_msg = result.stderr.strip() or result.stdout.strip() or "Unknown conversion error"
-                raise Exception(f"Converter failed: {error_msg}")
+            if not result.success:
+                raise Exception(f"Converter failed: {result.error_message}")
             
-            self.logger.info(f"Converter output: {result.stdout.strip()}")
+            self.logger.debug(f"Converter output (tail): {result.stdout.strip()}")
             
             # Check if conversion was successful
-            if output_file.exists():
-                # Calculate compression ratio
-                original_size = ifc_file.stat().st_size
-                fragment_size = output_file.stat().st_size
+            if tileset is not None or output_file.exists():
+                # Publish to the fragment store, then calculate compression ratio
+                if tileset is not None:
+                    fragment_size = int(tileset["size_mb"] * 1024 * 1024)
+                else:
+                    with get_tracer().span("fragments.commit", attributes={"qgen.fragment": output_filename}):
+                        fragment_size = self.fragment_storage.commit(output_filename, output_file).size
+                        self.tiled_converter.discard(output_filename)
                 compression_ratio = (1 - fragment_size / original_size) * 100
                 
                 status.status = "completed"
                 status.progress = 100.0
                 status.end_time = datetime.now()
-                status.output_file = output_filename
+                status.output_file = tileset_name(output_filename) if tileset is not None else output_filename
                 status.compression_ratio = round(compression_ratio, 2)
                 status.file_size_mb = round(fragment_size / (1024 * 1024), 2)
                 status.message = f"Conversion completed successfully. Compression: {compression_ratio:.1f}%"
+                # Listings read these from the catalog instead of the files
+                self.model_index.catalog().update(
+                    self.model_index.model_name(output_filename), source=filename,
+                    conversion_seconds=conversion_seconds,
+                    converted_at=status.end_time.isoformat(),
+                    fragment_size_mb=status.file_size_mb,
+                    compression_ratio=status.compression_ratio,
+                    preprocessing=status.preprocessing,
+                    tiles=len(tileset["tiles"]) if tileset is not None else None
+                )
                 
-                self.logger.info(f"✅ Successfully converted {filename} (compression: {compression_ratio:.1f}%)")
+                self.logger.info(f"✅ Successfully converted {filename} (compression: {compression_ratio:.1f}%, "
+                                 f"converter startup: {result.startup_ms} ms)")
+                try:
+                    for project in self.bundler.refresh_for(filename):
+                        self.logger.info(f"🧩 Queued rebuild of project {project}")
+                except Exception as e:
+                    self.logger.warning(f"⚠️ Could not refresh projects of {filename}: {e}")
             else:
                 raise Exception("Conversion completed but output file not found")
         
@@ -333,12 +835,38 @@ class QgenImpfragProcessor:
             status.end_time = datetime.now()
             status.message = f"Conversion failed: {str(e)}"
         
-        self.conversion_status[filename] = status
+        self._save_status(status)
+        if result is not None:
+            self._record_history(status, output_filename, result, converted_size, conversion_seconds, fragment_size,
+                                 tileset, estimate)
         return status
     
-    def convert_all_files(self):
-        """Convert all IFC files in the input directory"""
-        ifc_files = list(self.config.ifc_input_dir.glob("*.ifc"))
+    def _record_history(self, status: ConversionStatus, output_filename: str, result, input_bytes: int,
+                        conversion_seconds: Optional[float], fragment_size: Optional[int],
+                        tileset: Optional[Dict[str, Any]], estimate: Optional[Estimate]):
+        """Keep the job's performance, and the size and features of the converted input, in the conversion history"""
+        model = self.model_index.model_name(output_filename)
+        # A converter run that succeeded can still fail the job while publishing
+        outcome = "completed" if status.status == "completed" else "failed" if result.success else result_status(result)
+        try:
+            # Entity counts come from the catalog entry the index pipeline wrote
+            stats = self.model_index.catalog().get(model) or {}
+            self.conversion_history.record(
+                status.job_id, model, outcome,
+                source=status.filename, converter_version=self.converter.version(), input_bytes=input_bytes,
+                entity_counts=stats.get("entity_counts"), output_bytes=fragment_size, seconds=conversion_seconds,
+                startup_ms=result.startup_ms, peak_memory_mb=result.peak_memory_mb,
+                phase_seconds=result.phase_seconds,
+                threads=self.converter.threads_for(input_bytes) if tileset is None else None,
+                tiles=len(tileset["tiles"]) if tileset is not None else None,
+                prescan=estimate.features if estimate is not None else None
+            )
+        except Exception as e:
+            self.logger.warning(f"⚠️ Could not record the conversion history of {status.filename}: {e}")
+    
+    def convert_all_files(self, wait: bool = True):
+        """Convert all IFC files in the input directory as backfill work"""
+        ifc_files = [self.config.ifc_input_dir / f.name for f in self.ifc_storage.list(".ifc")]
         
         if not ifc_files:
             self.logger.info("📁 No IFC files found in input directory")
@@ -346,8 +874,16 @@ class QgenImpfragProcessor:
         
         self.logger.info(f"🔄 Starting conversion of {len(ifc_files)} IFC files")
         
-        for ifc_file in ifc_files:
-            self.convert_file(ifc_file)
+        jobs = [self.submit_conversion(ifc_file, priority_class=BACKFILL) for ifc_file in ifc_files]
+        if not wait:
+            self.logger.info(f"📋 Queued {len(jobs)} backfill conversions")
+            return
+        
+        for job in jobs:
+            job.wait()
+            status = self.get_job_status(job.job_id)
+            if status is not None and status.status != "completed":
+                self.logger.warning(f"⚠️ {status.filename}: {status.message}")
         
         self.logger.info("✅ Batch conversion completed")
     
@@ -371,8 +907,10 @@ class QgenImpfragProcessor:
         if self.config.watch_enabled:
             self.start_file_watcher()
         
+        app = self.app
+        self.report_startup("server")
         try:
-            self.app.run(
+            app.run(
                 host=self.config.host,
                 port=self.config.port,
                 debug=self.config.debug,
@@ -391,10 +929,21 @@ def main():
     parser.add_argument("--dev", action="store_true", help="Run in development mode")
     parser.add_argument("--watch", action="store_true", help="Monitor IFC directory for new files")
     parser.add_argument("--convert", action="store_true", help="Convert all IFC files immediately and exit")
+    parser.add_argument("--worker", action="store_true", help="Pull conversion jobs from the shared work queue")
+    parser.add_argument("--worker-concurrency", type=int, default=1, help="Jobs a worker runs at once")
     parser.add_argument("--port", type=int, default=8000, help="API server port")
+    parser.add_argument("--backfill", type=Path, metavar="DIR", help="Convert an IFC archive tree, resumably")
+    parser.add_argument("--manifest", type=Path, help="Backfill manifest (default: one per archive in state_dir)")
+    parser.add_argument("--rescan", action="store_true", help="Scan the archive again for new or changed files")
+    parser.add_argument("--retry-failed", action="store_true", help="Retry files that failed every attempt")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Attempts per file before it is failed")
     
     args = parser.parse_args()
     
+    # Capacity settings from scripts/environment-manager.py (see src/startup.py); set variables take precedence
+    env_file = Path(os.getenv("QGEN_IMPFRAG_ENV_FILE", BACKEND_DIR.parent / ".env.auto"))
+    env_settings = load_env_file(env_file)
+    
     # Create configuration
     config = Config(
         debug=args.dev,
@@ -403,18 +952,61 @@ def main():
         log_level="DEBUG" if args.dev else "INFO"
     )
     
+    # Nothing interactive runs in convert-only mode, so backfill may use every slot
+    if args.convert or args.backfill:
+        config.reserved_interactive_slots = 0
+    if args.backfill:
+        config.auto_convert = False
+        config.watch_enabled = False
+    
+    # Workers always talk to the queue, and never enqueue work themselves
+    if args.worker:
+        config.distributed = True
+        config.auto_convert = False
+        config.watch_enabled = False
+    
     # Create processor
     processor = QgenImpfragProcessor(config)
+    if env_settings:
+        processor.logger.info(f"⚙️ Capacity profile from {env_file}: {config.max_concurrent_conversions} conversions, "
+                              f"{config.converter_max_heap_mb} MB heap, {processor.scheduler.thread_budget} threads")
     
     # Handle different run modes
-    if args.convert:
+    if args.worker:
+        worker = ConversionWorker(
+            processor,
+            processor.work_queue,
+            concurrency=args.worker_concurrency,
+            lease_seconds=config.queue_lease_seconds,
+            poll_seconds=config.worker_poll_seconds,
+            logger=processor.logger
+        )
+        processor.report_startup("worker")
+        worker.run()
+    elif args.backfill:
+        manifest = BackfillManifest(args.manifest or default_manifest_path(config.state_dir, args.backfill))
+        if args.retry_failed:
+            processor.logger.info(f"♻️ Retrying {manifest.reset_failed()} failed files")
+        # Twice the conversion slots in flight, so a slot never waits for the next file's copy
+        backfill = Backfill(processor, args.backfill, manifest, max_in_flight=config.max_concurrent_conversions * 2,
+                            max_attempts=args.max_attempts, logger=processor.logger)
+        processor.report_startup("backfill")
+        backfill.scan(rescan=args.rescan)
+        summary = backfill.run()
+        report_file = backfill.write_report(summary, config.reports_dir)
+        processor.logger.info(f"🏁 Backfill: {summary['states'].get('done', {}).get('files', 0)} done, "
+                              f"{summary['states'].get('failed', {}).get('files', 0)} failed; report: {report_file}")
+        sys.exit(1 if summary["interrupted"] or summary["failures"] else 0)
+    elif args.convert:
         processor.logger.info("🔄 Running in convert-only mode")
+        processor.report_startup("convert")
         processor.convert_all_files()
         processor.logger.info("✅ Conversion completed, exiting")
     else:
-        # Auto-convert existing files if enabled
+        # Auto-convert existing files if enabled; listing the input directory does not delay the server
         if config.auto_convert:
-            processor.convert_all_files()
+            threading.Thread(target=processor.convert_all_files, kwargs={"wait": False},
+                             name="qgen-auto-convert", daemon=True).start()
         
         # Start server
         processor.run_server()
@@ -0,0 +1,530 @@
+"""
+Streaming IFC pruning for QGEN_IMPFRAG
+======================================
+
+Writes a slimmer copy of an IFC file for the converter, which otherwise
+parses and processes everything an exporter wrote. The file is streamed
+twice, with only a compact reference table in memory in between:
+
+1. index every entity: type, references (and whether each sits in a
+   list), GlobalId; note duplicates of identical IfcOwnerHistory
+   records and of identical value entities (points, directions, ...)
+2. apply the profile's filters (entity classes, representation
+   identifiers, property set names), drop relationships left without a
+   relating or related side, then mark everything reachable from the
+   remaining IfcRoot objects, plus what is attached to it (styled
+   items, material properties, ...); a presentation layer is kept
+   with only those of its items that are kept anyway
+3. write the marked entities, pointing references at the surviving
+   duplicate and taking filtered and unkept entities out of lists
+
+Entity ids are kept, so express ids in the fragment still match the
+property and spatial indexes built from the original file.
+
+Profiles (PRUNE_PROFILES, or a JSON file of the same shape):
+    orphans   unreferenced entities and duplicates only
+    viewer    also annotations, grids, structural analysis, 2D
+              representations (Axis, FootPrint, Annotation, ...)
+    geometry  also every property set; properties are served from the
+              property index, which is built from the original file
+
+Author: XQG4_AXIS Team
+"""
+
+import fnmatch
+import hashlib
+import json
+import logging
+import re
+import tempfile
+import time
+from array import array
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from src.ifc_step import ENTITY_RE, _strip_strings, iter_records
+from src.tracing import get_tracer
+
+
+REF_OR_STRING_RE = re.compile(r"'(?:[^']|'')*'|#(\d+)")
+REF_RE = re.compile(r"#(\d+)")
+INNER_LIST_RE = re.compile(r"\([^()]*\)")
+GLOBAL_ID_ARG_RE = re.compile(r"\s*'[0-9A-Za-z_$]{22}'")
+# IFCSHAPEREPRESENTATION(#context, 'Identifier', 'Type', (items))
+REPRESENTATION_ID_RE = re.compile(r"\s*(?:#\d+|\$)\s*,\s*'((?:[^']|'')*)'")
+# IFCPROPERTYSET('GlobalId', #history, 'Name', ...)
+PSET_NAME_RE = re.compile(r"\s*'[^']*'\s*,\s*(?:#\d+|\$)\s*,\s*'((?:[^']|'')*)'")
+
+REPRESENTATION_TYPES = {"IFCSHAPEREPRESENTATION"}
+PRODUCT_SHAPE_TYPES = {"IFCPRODUCTDEFINITIONSHAPE"}
+PROPERTY_DEFINITION_TYPES = {"IFCPROPERTYSET", "IFCELEMENTQUANTITY"}
+OWNER_HISTORY_TYPE = "IFCOWNERHISTORY"
+# Nothing references these; they point at what they style, layer or describe,
+# and are kept while that is (as are *RELATIONSHIP resource types).
+ATTACHMENT_TYPES = {
+    "IFCSTYLEDITEM", "IFCANNOTATIONSURFACEOCCURRENCE", "IFCANNOTATIONCURVEOCCURRENCE",
+    "IFCANNOTATIONSYMBOLOCCURRENCE", "IFCANNOTATIONTEXTOCCURRENCE", "IFCANNOTATIONFILLAREAOCCURRENCE",
+    "IFCPRESENTATIONLAYERASSIGNMENT", "IFCPRESENTATIONLAYERWITHSTYLE", "IFCSHAPEASPECT",
+    "IFCMATERIALDEFINITIONREPRESENTATION", "IFCMATERIALPROPERTIES", "IFCEXTENDEDMATERIALPROPERTIES",
+    "IFCGENERALMATERIALPROPERTIES", "IFCMECHANICALMATERIALPROPERTIES", "IFCTHERMALMATERIALPROPERTIES",
+    "IFCOPTICALMATERIALPROPERTIES", "IFCHYGROSCOPICMATERIALPROPERTIES", "IFCWATERPROPERTIES",
+    "IFCMECHANICALCONCRETEMATERIALPROPERTIES", "IFCMECHANICALSTEELMATERIALPROPERTIES",
+    "IFCFUELPROPERTIES", "IFCPRODUCTSOFCOMBUSTIONPROPERTIES"
+}
+
+ROOT, FILTERED, RELATIONSHIP, MARKED, REWRITE, ATTACHMENT = 1, 2, 4, 8, 16, 32
+MISSING = 0xFFFFFFFF
+
+
+@dataclass
+class PruneProfile:
+    """What a preprocessing profile removes besides orphans"""
+    name: str
+    drop_classes: List[str] = field(default_factory=list)
+    drop_representations: List[str] = field(default_factory=list)
+    drop_property_sets: List[str] = field(default_factory=list)  # fnmatch patterns
+    dedupe: bool = True
+
+
+VIEWER_CLASSES = [
+    "IFCANNOTATION", "IFCGRID", "IFCGRIDAXIS", "IFCVIRTUALELEMENT",
+    "IFCSTRUCTURALANALYSISMODEL", "IFCSTRUCTURALCURVEMEMBER", "IFCSTRUCTURALSURFACEMEMBER",
+    "IFCSTRUCTURALPOINTCONNECTION", "IFCSTRUCTURALCURVECONNECTION", "IFCSTRUCTURALSURFACECONNECTION",
+    "IFCSTRUCTURALPOINTACTION", "IFCSTRUCTURALLINEARACTION", "IFCSTRUCTURALPLANARACTION",
+    "IFCSTRUCTURALPOINTREACTION", "IFCSTRUCTURALLOADGROUP", "IFCSTRUCTURALRESULTGROUP"
+]
+VIEWER_REPRESENTATIONS = ["Axis", "FootPrint", "Annotation", "Plan", "Profile", "Reference", "Box"]
+
+PRUNE_PROFILES: Dict[str, PruneProfile] = {
+    "orphans": PruneProfile("orphans"),
+    "viewer": PruneProfile("viewer", VIEWER_CLASSES, VIEWER_REPRESENTATIONS),
+    "geometry": PruneProfile("geometry", VIEWER_CLASSES, VIEWER_REPRESENTATIONS, ["*"])
+}
+
+
+def load_profiles(path: Optional[Path] = None) -> Dict[str, PruneProfile]:
+    """Built-in profiles, extended or overridden by a JSON file {name: {drop_classes: [...], ...}}"""
+    profiles = dict(PRUNE_PROFILES)
+    if path:
+        for name, spec in json.loads(Path(path).read_text()).items():
+            profiles[name] = PruneProfile(name, **spec)
+    return profiles
+
+
+def get_profile(name: str, path: Optional[Path] = None) -> Optional[PruneProfile]:
+    """The named profile; an empty name turns pruning off"""
+    if not name:
+        return None
+    profiles = load_profiles(path)
+    if name not in profiles:
+        raise ValueError(f"Unknown prune profile {name!r}; known: {', '.join(sorted(profiles))}")
+    return profiles[name]
+
+
+@contextmanager
+def pruned_input(ifc_path: Path, profile: Optional[PruneProfile],
+                 logger: Optional[logging.Logger] = None) -> Iterator[Tuple[Path, Optional[Dict[str, Any]]]]:
+    """Yield (file to convert, prune report) and remove the pruned copy afterwards
+
+    Pruning is only an optimisation: without a profile, when it fails or
+    when it saves nothing, the original file is converted.
+    """
+    logger = logger or logging.getLogger(__name__)
+    if profile is None:
+        yield ifc_path, None
+        return
+    with tempfile.TemporaryDirectory(prefix="qgen-prune-") as work_dir:
+        pruned = Path(work_dir) / Path(ifc_path).name
+        with get_tracer().span("prune", attributes={"qgen.prune.profile": profile.name}) as span:
+            try:
+                report = prune_ifc(ifc_path, pruned, profile)
+                span.set_attribute("qgen.prune.bytes_saved", report["bytes_saved"])
+            except Exception as e:
+                logger.warning(f"⚠️ Pruning {Path(ifc_path).name} failed, converting the original: {e}")
+                span.set_error(str(e))
+                report = None
+        if report is None or report["bytes_saved"] <= 0:
+            yield ifc_path, report
+            return
+        logger.info(f"✂️ Pruned {Path(ifc_path).name} ({profile.name}): "
+                    f"{report['bytes_saved'] / (1024 * 1024):.1f} MB and "
+                    f"{report['entities_in'] - report['entities_out']} entities removed in {report['seconds']}s")
+        yield pruned, report
+
+
+def with_conversion_time(report: Dict[str, Any], conversion_seconds: float) -> Dict[str, Any]:
+    """Add the converter time and an estimate of the time pruning saved
+
+    Converter time grows roughly with input size, so the time for the
+    original is extrapolated from the pruned run; the pruning time is
+    subtracted.
+    """
+    saved = conversion_seconds * report["bytes_saved"] / max(report["bytes_out"], 1) - report["seconds"]
+    return dict(report, conversion_seconds=conversion_seconds, estimated_seconds_saved=round(saved, 2))
+
+
+class EntityGraph:
+    """Compact per-entity arrays filled by the indexing pass"""
+
+    def __init__(self):
+        self.ids = array("I")
+        self.types = array("H")
+        self.flags = bytearray()
+        self.canonical = array("I")
+        self.ref_start = array("Q", [0])
+        # id << 1 | 1 when the reference sits inside a list; entity index << 1 | 1 once resolved
+        self.refs = array("Q")
+        self.type_names: List[str] = []
+        self._type_codes: Dict[str, int] = {}
+        self.index_by_id = array("i")
+        self.header: List[str] = []
+        # Ordinals of DATA records that are not entity instances
+        self.unparsed: Set[int] = set()
+        # Duplicate id -> id of the copy that is kept
+        self.remap: Dict[int, int] = {}
+
+    def type_code(self, name: str) -> int:
+        code = self._type_codes.get(name)
+        if code is None:
+            code = self._type_codes[name] = len(self.type_names)
+            self.type_names.append(name)
+        return code
+
+    def add(self, entity_id: int, type_name: str, flags: int) -> int:
+        index = len(self.ids)
+        self.ids.append(entity_id)
+        self.types.append(self.type_code(type_name))
+        self.flags.append(flags)
+        self.canonical.append(index)
+        if entity_id >= len(self.index_by_id):
+            self.index_by_id.extend([-1] * (entity_id + 1 - len(self.index_by_id) + 65536))
+        self.index_by_id[entity_id] = index
+        return index
+
+    def resolve(self):
+        """Point references at the surviving duplicate's index, dangling ones at MISSING,
+        and flag the records whose text has to change for it"""
+        index_by_id, canonical, refs, flags = self.index_by_id, self.canonical, self.refs, self.flags
+        ref_start, size = self.ref_start, len(index_by_id)
+        for index in range(len(self.ids)):
+            for k in range(ref_start[index], ref_start[index + 1]):
+                ref = refs[k]
+                entity_id = ref >> 1
+                target = index_by_id[entity_id] if entity_id < size else -1
+                if target < 0:
+                    refs[k] = MISSING << 1 | (ref & 1)
+                    continue
+                if canonical[target] != target:
+                    flags[index] |= REWRITE
+                refs[k] = canonical[target] << 1 | (ref & 1)
+        self.index_by_id = array("i")
+
+    def references(self, index: int):
+        return self.refs[self.ref_start[index]:self.ref_start[index + 1]]
+
+
+def _drop_refs(args: str, dropped: set) -> str:
+    """Remove references to dropped ids from lists, with their separating comma"""
+    out: List[str] = []
+    i, n = 0, len(args)
+    while i < n:
+        c = args[i]
+        if c == "'":
+            j = i + 1
+            while True:
+                j = args.index("'", j)
+                if j + 1 < n and args[j + 1] == "'":
+                    j += 2
+                    continue
+                break
+            out.append(args[i:j + 1])
+            i = j + 1
+        elif c == "#":
+            j = i + 1
+            while j < n and args[j].isdigit():
+                j += 1
+            if int(args[i + 1:j]) not in dropped:
+                out.append(args[i:j])
+                i = j
+                continue
+            k = j
+            while k < n and args[k].isspace():
+                k += 1
+            if k < n and args[k] == ",":
+                i = k + 1
+            else:
+                while out and out[-1].isspace():
+                    out.pop()
+                if out and out[-1] == ",":
+                    out.pop()
+                i = j
+        else:
+            out.append(c)
+            i += 1
+    return "".join(out)
+
+
+def _list_refs(stripped: str) -> Tuple[List[str], List[str]]:
+    """Split an entity's references into (single, in a list)"""
+    refs = REF_RE.findall(stripped)
+    if "(" not in stripped:
+        return refs, []
+    top = stripped
+    while "(" in top:
+        top = INNER_LIST_RE.sub("", top)
+    singles = REF_RE.findall(top)
+    if not singles:
+        return [], refs
+    remaining = set(singles)
+    return singles, [r for r in refs if r not in remaining]
+
+
+def index_ifc(in_path: Path, profile: Optional[PruneProfile] = None) -> EntityGraph:
+    """Pass 1: index every entity and apply the profile's filters"""
+    profile = profile or PRUNE_PROFILES["orphans"]
+    graph = EntityGraph()
+    drop_classes = {c.upper() for c in profile.drop_classes}
+    drop_representations = {r.lower() for r in profile.drop_representations}
+    duplicates: Dict[bytes, int] = {}
+    record_no = 0
+    refs, ref_start, canonical = graph.refs, graph.ref_start, graph.canonical
+
+    for section, record in iter_records(in_path):
+        if section == "HEADER":
+            graph.header.append(record)
+        if section != "DATA" or not record.startswith("#"):
+            continue
+        record_no += 1
+        m = ENTITY_RE.match(record)
+        if m is None:
+            graph.unparsed.add(record_no)
+            continue
+        entity_id, type_name, args = int(m.group(1)), m.group(2).upper(), m.group(3)
+        stripped = _strip_strings(args)
+
+        flags = 0
+        if type_name not in PROPERTY_DEFINITION_TYPES and GLOBAL_ID_ARG_RE.match(args):
+            flags |= ROOT
+        if type_name.startswith("IFCREL"):
+            flags |= RELATIONSHIP
+        elif type_name in ATTACHMENT_TYPES or (type_name.endswith("RELATIONSHIP") and not flags & ROOT):
+            flags |= ATTACHMENT
+        if type_name in drop_classes:
+            flags |= FILTERED
+        elif type_name in REPRESENTATION_TYPES and drop_representations:
+            rep = REPRESENTATION_ID_RE.match(args)
+            if rep and rep.group(1).lower() in drop_representations:
+                flags |= FILTERED
+        elif type_name in PROPERTY_DEFINITION_TYPES and profile.drop_property_sets:
+            pset = PSET_NAME_RE.match(args)
+            if pset and any(fnmatch.fnmatchcase(pset.group(1), p) for p in profile.drop_property_sets):
+                flags |= FILTERED
+        index = graph.add(entity_id, type_name, flags)
+
+        if "#" in stripped:
+            singles, in_lists = _list_refs(stripped)
+            refs.extend(int(r) << 1 for r in singles)
+            refs.extend(int(r) << 1 | 1 for r in in_lists)
+        ref_start.append(len(refs))
+
+        # Identical owner histories and value entities collapse onto the first one
+        if profile.dedupe and (type_name == OWNER_HISTORY_TYPE or ("#" not in stripped and not flags & ROOT)):
+            key = hashlib.blake2b(f"{type_name}({args})".encode("utf-8"), digest_size=12).digest()
+            first = duplicates.setdefault(key, index)
+            if first != index:
+                canonical[index] = first
+                graph.remap[entity_id] = graph.ids[first]
+    duplicates.clear()
+    graph.resolve()
+    return graph
+
+
+def restore_needed(graph: EntityGraph, flags: bytearray) -> bytearray:
+    """Unfilter what a kept entity needs outside a list, and the last representation of a kept product"""
+    count = len(graph.ids)
+    refs, ref_start, types = graph.refs, graph.ref_start, graph.types
+    product_shapes = {graph.type_code(t) for t in PRODUCT_SHAPE_TYPES}
+    pending = [i for i in range(count) if not flags[i] & (FILTERED | RELATIONSHIP)] \
+        if any(f & FILTERED for f in flags) else []
+    # The shape of a filtered product is swept with it; only shapes of kept products need a representation
+    kept_shapes = {r >> 1 for i in pending if flags[i] & ROOT for r in refs[ref_start[i]:ref_start[i + 1]]
+                   if r >> 1 != MISSING and types[r >> 1] in product_shapes}
+    while pending:
+        restored = []
+        for index in pending:
+            if flags[index] & (FILTERED | RELATIONSHIP):
+                continue
+            entity_refs = refs[ref_start[index]:ref_start[index + 1]]
+            needed = [r >> 1 for r in entity_refs if not r & 1]
+            if types[index] in product_shapes and index in kept_shapes:
+                in_lists = [r >> 1 for r in entity_refs if r & 1]
+                if in_lists and all(t != MISSING and flags[t] & FILTERED for t in in_lists):
+                    needed += in_lists
+            for t in needed:
+                if t != MISSING and flags[t] & FILTERED and not flags[t] & ROOT:
+                    flags[t] &= ~FILTERED
+                    restored.append(t)
+        # What was restored may in turn need filtered entities
+        pending = restored
+    return flags
+
+
+def select(graph: EntityGraph, flags: Optional[bytearray] = None, restore: bool = True) -> bytearray:
+    """Pass 2: settle the filters and mark what is kept
+
+    flags is a copy of graph.flags with more entities FILTERED (the
+    elements another part of a split owns, say); it is updated and
+    returned. IfcRoot entities are never restored, so restore_needed()
+    can run once before filtering only those, with restore=False here.
+    """
+    flags = flags if flags is not None else bytearray(graph.flags)
+    if restore:
+        restore_needed(graph, flags)
+    count = len(graph.ids)
+    refs, ref_start, types = graph.refs, graph.ref_start, graph.types
+    owner_history = graph.type_code(OWNER_HISTORY_TYPE)
+
+    # Relationships lose filtered members; one left without either side goes too
+    alive = lambda t: t != MISSING and not flags[t] & FILTERED
+    for index in range(count):
+        if flags[index] & (RELATIONSHIP | FILTERED) != RELATIONSHIP:
+            continue
+        entity_refs = refs[ref_start[index]:ref_start[index + 1]]
+        # The owner history is the only single reference that is not a relationship side
+        sides = [r >> 1 for r in entity_refs if not r & 1 and (r >> 1 == MISSING or types[r >> 1] != owner_history)]
+        in_lists = [r >> 1 for r in entity_refs if r & 1]
+        if not all(alive(t) for t in sides) or (in_lists and not any(alive(t) for t in in_lists)):
+            flags[index] |= FILTERED
+
+    # Mark everything reachable from the kept roots, noting which records
+    # need their references rewritten
+    stack = [i for i in range(count) if flags[i] & (ROOT | FILTERED) == ROOT]
+    attachments = [i for i in range(count) if flags[i] & (ATTACHMENT | FILTERED) == ATTACHMENT]
+    styles = {code for code, name in enumerate(graph.type_names) if name.endswith("STYLE")}
+    layers = []
+    while stack:
+        for index in stack:
+            flags[index] |= MARKED
+        while stack:
+            index = stack.pop()
+            for k in range(ref_start[index], ref_start[index + 1]):
+                t = refs[k] >> 1
+                if t == MISSING:
+                    continue
+                if flags[t] & FILTERED:
+                    flags[index] |= REWRITE
+                if not flags[t] & (MARKED | FILTERED):
+                    flags[t] |= MARKED
+                    stack.append(t)
+        # Attachments of what is kept are kept, with whatever they reference
+        pending = []
+        for index in attachments:
+            if flags[index] & MARKED:
+                continue
+            targets = refs[ref_start[index]:ref_start[index + 1]]
+            singles = [r >> 1 for r in targets if not r & 1]
+            in_lists = [r >> 1 for r in targets if r & 1]
+            # What a styled item styles is a single reference; a layer's items are a list
+            if singles:
+                if all(t != MISSING and flags[t] & MARKED for t in singles):
+                    stack.append(index)
+                else:
+                    pending.append(index)
+            elif any(t != MISSING and flags[t] & MARKED for t in in_lists):
+                # A layer keeps only its items that are kept anyway (and its styles): exporters layer
+                # nearly every representation, and following the list would bring dropped geometry back
+                flags[index] |= MARKED
+                layers.append(index)
+                for t in in_lists:
+                    if t != MISSING and types[t] in styles and not flags[t] & (MARKED | FILTERED):
+                        flags[t] |= MARKED
+                        stack.append(t)
+            else:
+                pending.append(index)
+        attachments = pending
+    # The layers' other items are taken out of their lists when written
+    for index in layers:
+        if any(r >> 1 != MISSING and not flags[r >> 1] & MARKED for r in graph.references(index)):
+            flags[index] |= REWRITE
+    return flags
+
+
+def write_selections(in_path: Path, graph: EntityGraph,
+                     selections: List[Tuple[Path, bytearray]]) -> List[Dict[str, int]]:
+    """Pass 3: write each selection's kept entities to its file, in one read of in_path"""
+    ids, canonical, remap = graph.ids, graph.canonical, graph.remap
+    outputs = []
+    for out_path, flags in selections:
+        out = open(out_path, "w", encoding="utf-8", newline="\n")
+        out.write("ISO-10303-21;\nHEADER;\n")
+        out.writelines(record + "\n" for record in graph.header)
+        out.write("ENDSEC;\nDATA;\n")
+        dropped_ids = {ids[i] for i in range(len(ids)) if flags[i] & FILTERED}
+        # So are the unkept items of kept presentation layers (see select)
+        for i in range(len(ids)):
+            if flags[i] & (ATTACHMENT | MARKED | REWRITE | FILTERED) == ATTACHMENT | MARKED | REWRITE:
+                dropped_ids.update(ids[r >> 1] for r in graph.references(i)
+                                   if r >> 1 != MISSING and not flags[r >> 1] & MARKED)
+        counts = {"entities_out": 0, "removed_unreferenced": 0, "removed_duplicates": 0, "removed_filtered": 0}
+        outputs.append((out, flags, dropped_ids, counts))
+
+    try:
+        index = record_no = 0
+        for section, record in iter_records(in_path):
+            if section != "DATA" or not record.startswith("#"):
+                continue
+            record_no += 1
+            if record_no in graph.unparsed:
+                continue
+            duplicate = canonical[index] != index
+            for out, flags, dropped_ids, counts in outputs:
+                entity_flags = flags[index]
+                if entity_flags & FILTERED:
+                    counts["removed_filtered"] += 1
+                elif duplicate:
+                    counts["removed_duplicates"] += 1
+                elif not entity_flags & MARKED:
+                    counts["removed_unreferenced"] += 1
+                elif not entity_flags & REWRITE:
+                    out.write(record + "\n")
+                    counts["entities_out"] += 1
+                else:
+                    m = ENTITY_RE.match(record)
+                    args = m.group(3)
+                    if remap:
+                        args = REF_OR_STRING_RE.sub(
+                            lambda r: f"#{remap.get(int(r.group(1)), r.group(1))}" if r.group(1) else r.group(0),
+                            args
+                        )
+                    if dropped_ids:
+                        args = _drop_refs(args, dropped_ids)
+                    out.write(f"#{m.group(1)}={m.group(2)}({args});\n")
+                    counts["entities_out"] += 1
+            index += 1
+        for out, _, _, _ in outputs:
+            out.write("ENDSEC;\nEND-ISO-10303-21;\n")
+    finally:
+        for out, _, _, _ in outputs:
+            out.close()
+    return [counts for _, _, _, counts in outputs]
+
+
+def prune_ifc(in_path: Path, out_path: Path, profile: PruneProfile) -> Dict[str, Any]:
+    """Write a pruned copy of in_path and return what was removed"""
+    started = time.time()
+    graph = index_ifc(in_path, profile)
+    counts = write_selections(in_path, graph, [(out_path, select(graph))])[0]
+
+    in_size = Path(in_path).stat().st_size
+    out_size = Path(out_path).stat().st_size
+    return dict(
+        profile=profile.name,
+        entities_in=len(graph.ids),
+        **counts,
+        bytes_in=in_size,
+        bytes_out=out_size,
+        bytes_saved=in_size - out_size,
+        seconds=round(time.time() - started, 3)
+    )
@@ -0,0 +1,205 @@
+"""
+Streaming IFC split for QGEN_IMPFRAG
+====================================
+
+Splits one large IFC into sub-models that convert independently, so the
+conversion of a 500 MB model runs on several cores instead of one.
+
+Elements are grouped with everything that has to convert with them:
+aggregated parts, openings and the elements filling them, nested
+components. Each group belongs to the storey (or other spatial element)
+it is contained in. Storeys are dealt to parts heaviest first, and a
+storey heavier than a part's share is dealt group by group.
+
+Every part keeps the spatial structure, type objects, styles and every
+other shared entity its elements reference (see ifc_prune: the other
+parts' elements are filtered and the rest is marked and swept; shared
+presentation layers keep only the part's own items). Entity
+ids are kept, so each part's express ids match the original file and
+the indexes built from it. Site and building geometry, if any, is
+repeated in every part.
+
+Author: XQG4_AXIS Team
+"""
+
+import heapq
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.ifc_prune import (
+    FILTERED, MISSING, RELATIONSHIP, EntityGraph, PruneProfile, index_ifc, restore_needed, select,
+    write_selections
+)
+
+
+SPATIAL_STRUCTURE_TYPES = {
+    "IFCPROJECT", "IFCSITE", "IFCBUILDING", "IFCBUILDINGSTOREY",
+    "IFCFACILITY", "IFCFACILITYPART", "IFCBRIDGE", "IFCBRIDGEPART", "IFCROAD", "IFCROADPART",
+    "IFCRAILWAY", "IFCRAILWAYPART", "IFCMARINEFACILITY", "IFCMARINEPART"
+}
+CONTAINMENT_TYPES = {"IFCRELCONTAINEDINSPATIALSTRUCTURE"}
+# Relationships whose sides must end up in the same part
+BINDING_TYPES = {
+    "IFCRELAGGREGATES", "IFCRELNESTS", "IFCRELVOIDSELEMENT", "IFCRELFILLSELEMENT",
+    "IFCRELPROJECTSELEMENT", "IFCRELADHERESTOELEMENT"
+}
+
+
+class _Groups:
+    """Union-find over entity indexes"""
+
+    def __init__(self, count: int):
+        self.parent = array("i", range(count))
+
+    def find(self, index: int) -> int:
+        parent = self.parent
+        root = index
+        while parent[root] != root:
+            root = parent[root]
+        while parent[index] != root:
+            parent[index], index = root, parent[index]
+        return root
+
+    def union(self, a: int, b: int):
+        a, b = self.find(a), self.find(b)
+        if a != b:
+            self.parent[max(a, b)] = min(a, b)
+
+
+def _element_groups(graph: EntityGraph) -> Dict[int, Dict[str, Any]]:
+    """Groups of elements that convert together, keyed by group, with their spatial container"""
+    count = len(graph.ids)
+    spatial = {graph.type_code(t) for t in SPATIAL_STRUCTURE_TYPES}
+    containment = {graph.type_code(t) for t in CONTAINMENT_TYPES}
+    binding = {graph.type_code(t) for t in BINDING_TYPES}
+    owner_history = graph.type_code("IFCOWNERHISTORY")
+    refs, ref_start, types, flags = graph.refs, graph.ref_start, graph.types, graph.flags
+
+    groups = _Groups(count)
+    contained: Dict[int, int] = {}
+    members = set()
+    for index in range(count):
+        if not flags[index] & RELATIONSHIP or types[index] not in containment | binding:
+            continue
+        entity_refs = refs[ref_start[index]:ref_start[index + 1]]
+        singles = [r >> 1 for r in entity_refs
+                   if not r & 1 and r >> 1 != MISSING and types[r >> 1] != owner_history]
+        in_lists = [r >> 1 for r in entity_refs if r & 1 and r >> 1 != MISSING]
+        if types[index] in containment:
+            for element in in_lists:
+                if types[element] not in spatial:
+                    members.add(element)
+                    for structure in singles:
+                        contained.setdefault(element, structure)
+            continue
+        sides = singles + in_lists
+        spatial_sides = [t for t in sides if types[t] in spatial]
+        if not spatial_sides:
+            members.update(sides)
+            for t in sides[1:]:
+                groups.union(sides[0], t)
+        elif len(spatial_sides) == 1 and spatial_sides[0] in singles:
+            # Spaces and the like aggregated into a storey belong to it
+            for element in sides:
+                if element != spatial_sides[0]:
+                    members.add(element)
+                    contained.setdefault(element, spatial_sides[0])
+
+    result: Dict[int, Dict[str, Any]] = {}
+    for element in sorted(members):
+        group = result.setdefault(groups.find(element), {"members": [], "structure": None, "weight": 0})
+        group["members"].append(element)
+        if group["structure"] is None and element in contained:
+            group["structure"] = contained[element]
+    # Groups in no spatial element stay in every part
+    return {key: group for key, group in result.items() if group["structure"] is not None}
+
+
+def _weigh(graph: EntityGraph, groups: Dict[int, Dict[str, Any]]):
+    """Entities each group brings; shared entities count for the first group reaching them"""
+    refs, ref_start = graph.refs, graph.ref_start
+    seen = bytearray(len(graph.ids))
+    for group in groups.values():
+        stack = [m for m in group["members"] if not seen[m]]
+        for m in stack:
+            seen[m] = 1
+        weight = 0
+        while stack:
+            index = stack.pop()
+            weight += 1
+            for k in range(ref_start[index], ref_start[index + 1]):
+                t = refs[k] >> 1
+                if t != MISSING and not seen[t]:
+                    seen[t] = 1
+                    stack.append(t)
+        group["weight"] = weight
+
+
+def _deal(groups: Dict[int, Dict[str, Any]], parts: int) -> List[List[int]]:
+    """Assign groups to parts: whole storeys where possible, heaviest first onto the lightest part"""
+    by_structure: Dict[int, List[int]] = {}
+    for key, group in groups.items():
+        by_structure.setdefault(group["structure"], []).append(key)
+    total = sum(group["weight"] for group in groups.values())
+    share = total / max(parts, 1)
+
+    units = []
+    for keys in by_structure.values():
+        weight = sum(groups[k]["weight"] for k in keys)
+        if weight > share:
+            units.extend((groups[k]["weight"], [k]) for k in keys)
+        else:
+            units.append((weight, keys))
+    units.sort(key=lambda unit: -unit[0])
+
+    heap = [(0, part) for part in range(min(parts, len(units)))]
+    assigned: List[List[int]] = [[] for _ in heap]
+    for weight, keys in units:
+        load, part = heapq.heappop(heap)
+        assigned[part].extend(keys)
+        heapq.heappush(heap, (load + weight, part))
+    return assigned
+
+
+def split_ifc(in_path: Path, out_dir: Path, parts: int,
+              profile: Optional[PruneProfile] = None) -> Dict[str, Any]:
+    """Split in_path into at most `parts` IFC files in out_dir, pruned with profile"""
+    started = time.time()
+    in_path, out_dir = Path(in_path), Path(out_dir)
+    graph = index_ifc(in_path, profile)
+    groups = _element_groups(graph)
+    _weigh(graph, groups)
+    assigned = _deal(groups, parts) if groups else [[]]
+
+    owners = [(member, part) for part, keys in enumerate(assigned)
+              for key in keys for member in groups[key]["members"]]
+
+    # Elements are IfcRoot entities, which filters never restore: settle the profile's filters once
+    settled = restore_needed(graph, bytearray(graph.flags))
+    selections, summaries = [], []
+    for part, keys in enumerate(assigned):
+        flags = bytearray(settled)
+        for member, owner in owners:
+            if owner != part:
+                flags[member] |= FILTERED
+        path = out_dir / f"{in_path.stem}.part{part + 1:02d}.ifc"
+        selections.append((path, select(graph, flags, restore=False)))
+        summaries.append({
+            "path": path,
+            "elements": sum(len(groups[k]["members"]) for k in keys),
+            "structures": sorted({graph.ids[groups[k]["structure"]] for k in keys}),
+            "weight": sum(groups[k]["weight"] for k in keys)
+        })
+
+    for summary, counts in zip(summaries, write_selections(in_path, graph, selections)):
+        summary.update(entities=counts["entities_out"], size_bytes=summary["path"].stat().st_size)
+    return {
+        "parts": summaries,
+        "entities_in": len(graph.ids),
+        "element_groups": len(groups),
+        "bytes_in": in_path.stat().st_size,
+        "profile": profile.name if profile else None,
+        "seconds": round(time.time() - started, 3)
+    }
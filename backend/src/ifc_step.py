@@ -0,0 +1,265 @@
+"""
+Streaming IFC (STEP physical file) reader for QGEN_IMPFRAG
+==========================================================
+
+Lightweight reader for the ISO 10303-21 text format used by .ifc files.
+It streams entity instances line by line without building a full
+model, so the backend can pre-scan, index and rewrite large IFC files
+without loading them into memory or depending on a full IFC toolkit.
+
+Arguments are only parsed for the entity types a caller asks for,
+which keeps a scan of a 500 MB model dominated by I/O.
+
+Author: XQG4_AXIS Team
+"""
+
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+# "#123= IFCWALL(...);" split into id, type and the raw argument text
+ENTITY_RE = re.compile(r"#(\d+)\s*=\s*([A-Za-z0-9_]+)\s*\((.*)\)\s*;\s*$", re.S)
+
+TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<str>'(?:[^']|'')*')
+      | (?P<ref>\#\d+)
+      | (?P<enum>\.[A-Za-z0-9_]+\.)
+      | (?P<num>[-+]?(?:\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?))
+      | (?P<typed>[A-Za-z][A-Za-z0-9_]*)\s*\(
+      | (?P<open>\()
+      | (?P<close>\))
+      | (?P<null>[$*])
+      | (?P<comma>,)
+      | (?P<binary>"[0-9A-Fa-f]*")
+    )""", re.X)
+
+REF_RE = re.compile(r"#(\d+)")
+
+# Control directives inside STEP strings
+X2_RE = re.compile(r"\\X2\\((?:[0-9A-F]{4})+)\\X0\\")
+X4_RE = re.compile(r"\\X4\\((?:[0-9A-F]{8})+)\\X0\\")
+X_RE = re.compile(r"\\X\\([0-9A-F]{2})")
+S_RE = re.compile(r"\\S\\(.)")
+P_RE = re.compile(r"\\P[A-I]\\")
+
+
+class Ref(int):
+    """Reference to another entity instance (#id)"""
+
+    def __repr__(self) -> str:
+        return f"#{int(self)}"
+
+
+class EnumValue(str):
+    """Enumeration or boolean value (.ELEMENT., .T.)"""
+
+
+@dataclass
+class TypedValue:
+    """Value wrapped in a defined type, e.g. IFCLABEL('Door')"""
+    type: str
+    value: Any
+
+
+@dataclass
+class Entity:
+    """One entity instance; args are parsed on first access"""
+    id: int
+    type: str
+    raw: str
+    _args: Optional[List[Any]] = None
+
+    @property
+    def args(self) -> List[Any]:
+        if self._args is None:
+            self._args = parse_args(self.raw)
+        return self._args
+
+    def refs(self) -> List[int]:
+        """Ids of every entity this one references, without a full parse"""
+        return [int(m) for m in REF_RE.findall(_strip_strings(self.raw))]
+
+
+def decode_string(raw: str) -> str:
+    """Decode a STEP string literal body (without the outer quotes)"""
+    value = raw.replace("''", "'")
+    if "\\" not in value:
+        return value
+    value = X2_RE.sub(lambda m: "".join(chr(int(m.group(1)[i:i + 4], 16))
+                                         for i in range(0, len(m.group(1)), 4)), value)
+    value = X4_RE.sub(lambda m: "".join(chr(int(m.group(1)[i:i + 8], 16))
+                                         for i in range(0, len(m.group(1)), 8)), value)
+    value = X_RE.sub(lambda m: chr(int(m.group(1), 16)), value)
+    value = S_RE.sub(lambda m: chr(ord(m.group(1)) + 128), value)
+    value = P_RE.sub("", value)
+    return value.replace("\\\\", "\\")
+
+
+def parse_args(raw: str) -> List[Any]:
+    """Parse an argument list into Python values
+
+    Strings become str, references Ref, enumerations EnumValue,
+    numbers int/float, $ and * None, nested lists list and typed
+    values TypedValue.
+    """
+    stack: List[List[Any]] = [[]]
+    typed: List[Optional[str]] = [None]
+    pos = 0
+    length = len(raw)
+    while pos < length:
+        m = TOKEN_RE.match(raw, pos)
+        if m is None:
+            if raw[pos:].strip():
+                raise ValueError(f"Cannot parse STEP arguments at {pos}: {raw[pos:pos + 40]!r}")
+            break
+        pos = m.end()
+        kind = m.lastgroup
+        text = m.group(kind)
+        current = stack[-1]
+        if kind == "comma":
+            continue
+        if kind == "str":
+            current.append(decode_string(text[1:-1]))
+        elif kind == "ref":
+            current.append(Ref(text[1:]))
+        elif kind == "enum":
+            current.append(EnumValue(text[1:-1]))
+        elif kind == "num":
+            current.append(float(text) if ("." in text or "e" in text or "E" in text) else int(text))
+        elif kind == "null":
+            current.append(None)
+        elif kind == "binary":
+            current.append(text[1:-1])
+        elif kind == "open":
+            stack.append([])
+            typed.append(None)
+        elif kind == "typed":
+            stack.append([])
+            typed.append(text.upper())
+        elif kind == "close":
+            if len(stack) == 1:
+                break
+            values = stack.pop()
+            type_name = typed.pop()
+            if type_name is not None:
+                stack[-1].append(TypedValue(type_name, values[0] if len(values) == 1 else values))
+            else:
+                stack[-1].append(values)
+    return stack[0]
+
+
+def _strip_strings(raw: str) -> str:
+    """Remove string literals so '#' inside text is not taken for a reference"""
+    if "'" not in raw:
+        return raw
+    return re.sub(r"'(?:[^']|'')*'", "''", raw)
+
+
+def iter_records(path: Path) -> Iterator[Tuple[str, str]]:
+    """Yield (section, record_text) for every record in the file
+
+    Records usually sit on one line; when a line ends inside a string
+    or without the closing ';', following lines are joined to it.
+    """
+    section = None
+    pending: List[str] = []
+    with open(path, "r", encoding="utf-8", errors="replace", newline=None) as f:
+        for line in f:
+            if pending:
+                pending.append(line)
+                record = "".join(pending)
+            else:
+                stripped = line.strip()
+                if not stripped:
+                    continue
+                if stripped in ("HEADER;", "DATA;"):
+                    section = stripped[:-1]
+                    continue
+                if stripped in ("ENDSEC;", "END-ISO-10303-21;") or stripped.startswith("ISO-10303-21"):
+                    section = None if stripped != "ENDSEC;" else section
+                    continue
+                if stripped.startswith("/*") and stripped.endswith("*/"):
+                    continue
+                record = line
+
+            if record.count("'") % 2 == 0 and record.rstrip().endswith(";"):
+                pending = []
+                yield section, record.strip()
+            elif not pending:
+                pending = [line]
+
+
+def iter_entities(path: Path, types: Optional[Set[str]] = None) -> Iterator[Entity]:
+    """Stream entity instances from the DATA section
+
+    If types is given (upper-case names), other entities are skipped
+    before their arguments are looked at.
+    """
+    for section, record in iter_records(path):
+        if section != "DATA" or not record.startswith("#"):
+            continue
+        m = ENTITY_RE.match(record)
+        if m is None:
+            continue
+        type_name = m.group(2).upper()
+        if types is not None and type_name not in types:
+            continue
+        yield Entity(int(m.group(1)), type_name, m.group(3))
+
+
+def read_header(path: Path) -> Dict[str, Any]:
+    """FILE_DESCRIPTION, FILE_NAME and FILE_SCHEMA of a file"""
+    header: Dict[str, Any] = {}
+    for section, record in iter_records(path):
+        if section == "DATA":
+            break
+        if section != "HEADER":
+            continue
+        m = re.match(r"([A-Z_]+)\s*\((.*)\)\s*;$", record, re.S)
+        if m is None:
+            continue
+        header[m.group(1)] = parse_args(m.group(2))
+
+    name = header.get("FILE_NAME", [])
+    schema = header.get("FILE_SCHEMA", [[]])
+    return {
+        "description": header.get("FILE_DESCRIPTION", [[None]])[0],
+        "name": name[0] if len(name) > 0 else None,
+        "timestamp": name[1] if len(name) > 1 else None,
+        "author": name[2] if len(name) > 2 else None,
+        "organization": name[3] if len(name) > 3 else None,
+        "preprocessor": name[4] if len(name) > 4 else None,
+        "originating_system": name[5] if len(name) > 5 else None,
+        "schema": schema[0][0] if schema and schema[0] else None
+    }
+
+
+def is_global_id(value: Any) -> bool:
+    """IfcRoot entities start with a 22-character GlobalId"""
+    return isinstance(value, str) and len(value) == 22
+
+
+def unwrap(value: Any) -> Any:
+    """Plain Python value of a possibly typed value"""
+    while isinstance(value, TypedValue):
+        value = value.value
+    return value
+
+
+def ref_list(value: Any) -> List[int]:
+    """Entity ids from an aggregate (or single) reference argument"""
+    if isinstance(value, Ref):
+        return [int(value)]
+    if isinstance(value, list):
+        return [int(v) for v in value if isinstance(v, Ref)]
+    return []
+
+
+def entity_counts(entities: Iterable[Entity]) -> Dict[str, int]:
+    counts: Dict[str, int] = {}
+    for entity in entities:
+        counts[entity.type] = counts.get(entity.type, 0) + 1
+    return counts
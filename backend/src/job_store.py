@@ -0,0 +1,197 @@
+"""
+Durable job store for QGEN_IMPFRAG
+==================================
+
+SQLite-backed store for conversion job state, shared by every API and
+converter process on a host.
+
+Jobs are indexed by job ID, filename and state. Finished jobs older
+than the retention period are purged, and the file is compacted
+afterwards.
+
+Author: XQG4_AXIS Team
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import sqlite3
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from src.db import SqliteDatabase, placeholders
+
+
+# Job states that will not change any more
+TERMINAL_STATES = ("completed", "failed", "cancelled")
+ACTIVE_STATES = ("queued", "processing")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    state TEXT NOT NULL,
+    priority TEXT,
+    owner TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_filename ON jobs (filename, created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, updated_at);
+"""
+
+
+def process_owner() -> str:
+    """Identifier of the current process, used to find orphaned jobs"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobStore:
+    """Job state shared across processes through SQLite"""
+
+    def __init__(self, db_path: Path, busy_timeout_ms: int = 10000,
+                 logger: Optional[logging.Logger] = None):
+        self.db = SqliteDatabase(db_path, busy_timeout_ms)
+        self.logger = logger or logging.getLogger(__name__)
+        self.db.executescript(SCHEMA)
+
+    def save(self, job_id: str, filename: str, state: str, data: Dict[str, Any],
+             priority: Optional[str] = None, owner: Optional[str] = None):
+        """Insert or update a job record"""
+        now = time.time()
+        with self.db.write() as conn:
+            conn.execute(
+                """
+                INSERT INTO jobs (job_id, filename, state, priority, owner, created_at, updated_at, data)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(job_id) DO UPDATE SET
+                    filename = excluded.filename,
+                    state = excluded.state,
+                    priority = COALESCE(excluded.priority, jobs.priority),
+                    owner = COALESCE(excluded.owner, jobs.owner),
+                    updated_at = excluded.updated_at,
+                    data = excluded.data
+                """,
+                (job_id, filename, state, priority, owner or process_owner(), now, now,
+                 json.dumps(data, default=str))
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self.db.execute(
+            "SELECT * FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return self._row_to_dict(row)
+
+    def latest_for_filename(self, filename: str) -> Optional[Dict[str, Any]]:
+        row = self.db.execute(
+            "SELECT * FROM jobs WHERE filename = ? ORDER BY created_at DESC LIMIT 1", (filename,)
+        ).fetchone()
+        return self._row_to_dict(row)
+
+    def latest_for_filenames(self, filenames: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Latest job per filename, in one query"""
+        if not filenames:
+            return {}
+        rows = self.db.execute(
+            f"""
+            SELECT * FROM jobs WHERE job_id IN (
+                SELECT job_id FROM jobs j WHERE filename IN ({placeholders(filenames)})
+                AND created_at = (SELECT MAX(created_at) FROM jobs WHERE filename = j.filename)
+            )
+            """,
+            filenames
+        ).fetchall()
+        return {row["filename"]: self._row_to_dict(row) for row in rows}
+
+    def list_by_state(self, state: str, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = self.db.execute(
+            "SELECT * FROM jobs WHERE state = ? ORDER BY updated_at DESC LIMIT ?", (state, limit)
+        ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def list_recent(self, limit: int = 100) -> List[Dict[str, Any]]:
+        rows = self.db.execute(
+            "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def request_cancel(self, job_id: str) -> bool:
+        """Flag an active job for cancellation by whichever process owns it"""
+        with self.db.write() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET cancel_requested = 1, updated_at = ? "
+                f"WHERE job_id = ? AND state IN ({placeholders(ACTIVE_STATES)})",
+                (time.time(), job_id, *ACTIVE_STATES)
+            )
+            return cursor.rowcount > 0
+
+    def cancel_requested(self, job_id: str) -> bool:
+        row = self.db.execute(
+            "SELECT cancel_requested FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return bool(row and row["cancel_requested"])
+
+    def fail_orphaned(self) -> int:
+        """Mark active jobs of dead local processes as failed, e.g. after a restart"""
+        hostname = socket.gethostname()
+        orphaned = []
+        for state in ACTIVE_STATES:
+            for job in self.list_by_state(state, limit=10000):
+                host, _, pid = (job["owner"] or "").rpartition(":")
+                if host == hostname and pid.isdigit() and not _pid_alive(int(pid)):
+                    orphaned.append(job)
+
+        for job in orphaned:
+            data = job["data"]
+            data.update(status="failed", message="Interrupted by a server restart")
+            self.save(job["job_id"], job["filename"], "failed", data)
+        if orphaned:
+            self.logger.info(f"🧹 Marked {len(orphaned)} interrupted jobs as failed")
+        return len(orphaned)
+
+    def purge(self, retention_days: float) -> int:
+        """Delete finished jobs older than the retention period"""
+        cutoff = time.time() - retention_days * 86400
+        with self.db.write() as conn:
+            cursor = conn.execute(
+                f"DELETE FROM jobs WHERE updated_at < ? "
+                f"AND state IN ({placeholders(TERMINAL_STATES)})",
+                (cutoff, *TERMINAL_STATES)
+            )
+            return cursor.rowcount
+
+    def maintenance(self, retention_days: float) -> Dict[str, int]:
+        """Purge expired jobs and compact if anything was removed"""
+        orphaned = self.fail_orphaned()
+        purged = self.purge(retention_days)
+        if purged:
+            self.db.compact()
+        self.logger.info(f"🧹 Job store maintenance: {purged} purged, {orphaned} orphaned")
+        return {"purged": purged, "orphaned": orphaned}
+
+    @staticmethod
+    def _row_to_dict(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        result = dict(row)
+        result["data"] = json.loads(result["data"])
+        result["cancel_requested"] = bool(result["cancel_requested"])
+        return result
+
+
+def _pid_alive(pid: int) -> bool:
+    if sys.platform == "win32":
+        # Signal 0 is CTRL_C_EVENT on Windows; assume the owner is alive
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
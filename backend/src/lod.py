@@ -0,0 +1,112 @@
+"""
+Level-of-detail variants for QGEN_IMPFRAG
+=========================================
+
+Optional overview variants of each model, built by the web-ifc geometry
+pass (ifc_geometry.js --lod) next to the full-detail fragment:
+
+    level 0  the fragment file itself
+    level 1  meshes simplified by vertex clustering (lod1.glb)
+    level 2  one box per element (lod2.glb)
+
+Levels 1 and 2 drop small element classes (fasteners, fittings, ...) and
+elements below a minimum size, which cover a few pixels in a site-wide
+view. A manifest lists every level with its size so a viewer can pick
+the coarsest one a scene needs:
+
+    data/index/<model>/lod/manifest.json
+
+Author: XQG4_AXIS Team
+"""
+
+import json
+import shutil
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+LOD_DIR = "lod"
+MANIFEST_FILE = "manifest.json"
+LEVEL_KINDS = {1: "decimated", 2: "boxes"}
+
+# Classes that are numerous, small and invisible at overview distance
+DEFAULT_EXCLUDED_CLASSES = [
+    "IFCSPACE", "IFCOPENINGELEMENT", "IFCFASTENER", "IFCMECHANICALFASTENER",
+    "IFCDISCRETEACCESSORY", "IFCFLOWFITTING", "IFCPIPEFITTING", "IFCDUCTFITTING",
+    "IFCCABLEFITTING", "IFCCABLECARRIERFITTING", "IFCFLOWCONTROLLER", "IFCVALVE",
+    "IFCDAMPER", "IFCSWITCHINGDEVICE", "IFCOUTLET", "IFCSENSOR", "IFCALARM",
+    "IFCFIRESUPPRESSIONTERMINAL", "IFCLIGHTFIXTURE", "IFCFURNISHINGELEMENT", "IFCFURNITURE"
+]
+
+
+@dataclass
+class LodSettings:
+    """How coarse the overview variants are"""
+    cell_size: float = 0.1  # metres; level 1 vertices closer than this merge
+    min_size: float = 0.25  # metres of bounding-box diagonal kept in level 1
+    proxy_min_size: float = 1.0  # metres of bounding-box diagonal kept in level 2
+    excluded_classes: List[str] = field(default_factory=lambda: list(DEFAULT_EXCLUDED_CLASSES))
+
+    def to_args(self, lod_dir: Path) -> List[str]:
+        """Arguments of ifc_geometry.js for these settings"""
+        return [
+            "--lod", str(lod_dir),
+            "--lod-cell", str(self.cell_size),
+            "--lod-min-size", str(self.min_size),
+            "--lod-proxy-min-size", str(self.proxy_min_size),
+            "--lod-exclude", ",".join(c.upper() for c in self.excluded_classes)
+        ]
+
+
+def publish_lod(build_dir: Path, report: Dict[str, Any], lod_dir: Path,
+                settings: LodSettings, started: float) -> Dict[str, Any]:
+    """Move freshly built levels into place and write their manifest"""
+    levels = []
+    for level, info in sorted(report["levels"].items(), key=lambda item: int(item[0])):
+        level = int(level)
+        size_bytes = (build_dir / info["file"]).stat().st_size
+        levels.append({
+            "level": level,
+            "kind": LEVEL_KINDS.get(level, "mesh"),
+            "file": info["file"],
+            "format": "glb",
+            "size_bytes": size_bytes,
+            "elements": info["elements"],
+            "triangles": info["triangles"],
+            "excluded_small": info["excluded_small"]
+        })
+
+    manifest = {
+        "built_at": datetime.now().isoformat(),
+        "seconds": round(time.time() - started, 3),
+        "source_elements": report["elements"],
+        "source_triangles": report["triangles"],
+        "excluded_by_class": report["excluded_classes"],
+        "settings": {
+            "cell_size": settings.cell_size,
+            "min_size": settings.min_size,
+            "proxy_min_size": settings.proxy_min_size,
+            "excluded_classes": settings.excluded_classes
+        },
+        "levels": levels
+    }
+    (build_dir / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+
+    # Swap the whole directory so readers never see a mix of old and new levels
+    old_dir = lod_dir.with_name(f"{lod_dir.name}.old")
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if lod_dir.exists():
+        lod_dir.rename(old_dir)
+    build_dir.rename(lod_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return manifest
+
+
+def read_manifest(lod_dir: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads((lod_dir / MANIFEST_FILE).read_text())
+    except FileNotFoundError:
+        return None
@@ -0,0 +1,383 @@
+"""
+Model query API for QGEN_IMPFRAG
+================================
+
+Flask blueprint serving the per-model indexes built by the
+post-conversion pipeline. Both API servers register it:
+
+    GET /api/models?fields=schema,bounds             catalog of models and their statistics
+    DELETE /api/models/<model>                       drop a model's indexes and geometry library use
+    GET /api/models/<model>/elements                 filter and page elements
+    GET /api/models/<model>/elements/<global_id>     properties of one element
+    GET /api/models/<model>/spatial                  spatial hierarchy
+    GET /api/models/<model>/types                    element counts by type
+    GET /api/models/<model>/lod                      level-of-detail variants and sizes
+    GET /api/models/<model>/lod/<file>               one level-of-detail file (glTF binary)
+    GET /api/models/<model>/geometry                 geometry library use of a model
+    GET /api/models/<model>/geometry/instances       instance table placing library chunks
+    GET /api/geometry                                geometry library size and savings
+    GET /api/geometry/<sha256>                       one geometry chunk (cached forever)
+    GET /api/search?q=D-1203                         elements by mark, tag, name or value
+    GET /api/spatial/box?min=x,y,z&max=x,y,z         elements intersecting a box
+    GET /api/spatial/nearest?point=x,y,z&k=10        nearest elements to a point
+    GET /api/spatial/ray?origin=x,y,z&direction=...  elements along a ray
+
+Spatial queries take models=a,b,... (default: every indexed model, if
+there are no more than MAX_SPATIAL_MODELS) so a federated set is
+queried in one request, and types=IFCDOOR,... to restrict the element
+classes returned.
+
+Author: XQG4_AXIS Team
+"""
+
+import math
+import time
+
+from flask import Blueprint, Flask, current_app, jsonify, request, send_from_directory
+
+from src.http_utils import send_stored_file
+from src.model_index import ModelIndex
+from src.model_catalog import parse_fields, select_fields
+
+
+model_api = Blueprint("model_api", __name__)
+
+# Models one spatial query may load; below the model index's cache so one query does not evict itself
+MAX_SPATIAL_MODELS = 32
+
+
+def register_model_api(app: Flask, model_index: ModelIndex):
+    app.extensions["qgen_model_index"] = model_index
+    app.register_blueprint(model_api)
+
+
+def _index() -> ModelIndex:
+    return current_app.extensions["qgen_model_index"]
+
+
+def _properties(model: str):
+    try:
+        store = _index().properties(model)
+    except ValueError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+    if store is None:
+        return None, (jsonify({"error": f"No property index for model: {model}"}), 404)
+    return store, None
+
+
+@model_api.route('/api/models', methods=['GET'])
+def list_models():
+    """Precomputed statistics of every cataloged model
+
+    Query parameters: fields (comma separated, "all" for every statistic).
+    """
+    fields = parse_fields(request.args.get("fields"))
+    models = [
+        {"model": entry["model"], "source": entry["source"], "stats": select_fields(entry["stats"], fields)}
+        for entry in _index().catalog().list()
+    ]
+    return jsonify({"models": models, "count": len(models)})
+
+
+@model_api.route('/api/models/<model>', methods=['GET'])
+def get_model(model):
+    """Every precomputed statistic of one model"""
+    stats = _index().catalog().get(model)
+    if stats is None:
+        return jsonify({"error": f"Model not in catalog: {model}"}), 404
+    return jsonify({"model": model, "stats": stats})
+
+
+@model_api.route('/api/models/<model>', methods=['DELETE'])
+def delete_model(model):
+    """Drop a model's indexes and catalog entry, deleting library chunks no other model uses
+
+    The fragment itself stays in the fragment store.
+    """
+    try:
+        removed = _index().remove(model)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if removed is None:
+        return jsonify({"error": f"Model not indexed: {model}"}), 404
+    return jsonify({"model": model, "deleted": True, **removed})
+
+
+@model_api.route('/api/models/<model>/elements', methods=['GET'])
+def query_elements(model):
+    """Elements filtered by type, property value, material or storey
+
+    Query parameters: type, pset, property, value, op (eq, contains,
+    gt, gte, lt, lte), material, storey (GlobalId), limit, after.
+    """
+    store, error = _properties(model)
+    if error:
+        return error
+
+    try:
+        page = store.query(
+            ifc_type=request.args.get("type"),
+            pset=request.args.get("pset"),
+            prop=request.args.get("property"),
+            value=request.args.get("value"),
+            op=request.args.get("op", "eq"),
+            material=request.args.get("material"),
+            storey=request.args.get("storey"),
+            after=request.args.get("after", 0, type=int),
+            limit=request.args.get("limit", 100, type=int)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    page["model"] = model
+    return jsonify(page)
+
+
+@model_api.route('/api/models/<model>/elements/<global_id>', methods=['GET'])
+def get_element(model, global_id):
+    """Attributes, property sets, type, materials and spatial path of an element"""
+    store, error = _properties(model)
+    if error:
+        return error
+
+    element = store.get_element(global_id)
+    if element is None:
+        return jsonify({"error": f"Element not found: {global_id}"}), 404
+    element["model"] = model
+
+    spatial = _index().spatial(model)
+    bounds = spatial.element_bounds(global_id) if spatial else None
+    element["bounds"] = [round(v, 4) for v in bounds] if bounds else None
+    return jsonify(element)
+
+
+@model_api.route('/api/models/<model>/spatial', methods=['GET'])
+def spatial_tree(model):
+    """Project / site / building / storey / space tree"""
+    store, error = _properties(model)
+    if error:
+        return error
+    return jsonify({"model": model, "tree": store.spatial_tree()})
+
+
+@model_api.route('/api/models/<model>/types', methods=['GET'])
+def type_counts(model):
+    """Number of elements of each IFC class"""
+    store, error = _properties(model)
+    if error:
+        return error
+    return jsonify({"model": model, "types": store.type_counts()})
+
+
+@model_api.route('/api/models/<model>/lod', methods=['GET'])
+def lod_manifest(model):
+    """Level-of-detail variants of a model, from full detail (level 0) to boxes"""
+    index = _index()
+    try:
+        manifest = index.lod_manifest(model)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if manifest is None:
+        return jsonify({"error": f"No LOD variants for model: {model}"}), 404
+
+    stats = index.catalog().get(model) or {}
+    full_size = round(stats["fragment_size_mb"] * 1024 * 1024) if stats.get("fragment_size_mb") else None
+    levels = [{
+        "level": 0,
+        "kind": "fragments",
+        "file": f"{model}.frag",
+        "format": "frag",
+        "url": f"/api/fragments/{model}.frag",
+        "size_bytes": full_size,
+        "elements": stats.get("elements")
+    }]
+    for level in manifest["levels"]:
+        level = dict(level, url=f"/api/models/{model}/lod/{level['file']}")
+        if full_size:
+            level["size_ratio"] = round(level["size_bytes"] / full_size, 4)
+        levels.append(level)
+    return jsonify(dict(manifest, model=model, levels=levels))
+
+
+@model_api.route('/api/models/<model>/lod/<filename>', methods=['GET'])
+def lod_file(model, filename):
+    """One level-of-detail file"""
+    try:
+        lod_dir = _index().lod_dir(model)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not filename.endswith(".glb"):
+        return jsonify({"error": f"Not a LOD file: {filename}"}), 404
+    return send_from_directory(lod_dir, filename, mimetype="model/gltf-binary", conditional=True)
+
+
+@model_api.route('/api/models/<model>/geometry', methods=['GET'])
+def model_geometry(model):
+    """How much of a model's geometry the library shares with other models"""
+    index = _index()
+    try:
+        instances = index.instances_path(model)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    stats = index.geometry().model_stats(model)
+    if stats is None or not instances.exists():
+        return jsonify({"error": f"No geometry library entries for model: {model}"}), 404
+    return jsonify(dict(stats, model=model, instances_url=f"/api/models/{model}/geometry/instances",
+                        chunk_url="/api/geometry/{hash}"))
+
+
+@model_api.route('/api/models/<model>/geometry/instances', methods=['GET'])
+def model_geometry_instances(model):
+    """Instance table (QGIN) of a model; chunks are fetched by hash"""
+    try:
+        instances = _index().instances_path(model)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not instances.exists():
+        return jsonify({"error": f"No geometry instances for model: {model}"}), 404
+    return send_from_directory(instances.parent, instances.name, mimetype="application/octet-stream",
+                               conditional=True)
+
+
+@model_api.route('/api/geometry', methods=['GET'])
+def geometry_library_stats():
+    return jsonify(_index().geometry().stats())
+
+
+@model_api.route('/api/geometry/<digest>', methods=['GET'])
+def geometry_chunk(digest):
+    """A geometry chunk; content-addressed, so it never changes"""
+    library = _index().geometry()
+    try:
+        name = library.chunk_name(digest.lower())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    response = send_stored_file(library.storage, name)
+    if isinstance(response, tuple):
+        return response
+    response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    return response
+
+
+def _vector(name: str, required: bool = True):
+    raw = request.args.get(name)
+    if raw is None:
+        if required:
+            raise ValueError(f"Missing parameter: {name}")
+        return None
+    values = [float(v) for v in raw.split(",")]
+    if len(values) != 3:
+        raise ValueError(f"{name} must be x,y,z")
+    return tuple(values)
+
+
+def _list_arg(name: str):
+    raw = request.args.get(name)
+    return [v for v in raw.split(",") if v] if raw else None
+
+
+def _spatial_indexes():
+    """(model, SpatialIndex) for the requested models"""
+    index = _index()
+    models = _list_arg("models") or index.spatial_models()
+    if len(models) > MAX_SPATIAL_MODELS:
+        raise ValueError(f"{len(models)} models to query, at most {MAX_SPATIAL_MODELS}: pass models=a,b,...")
+    indexes = []
+    for model in models:
+        spatial = index.spatial(model)
+        if spatial is None:
+            raise LookupError(f"No spatial index for model: {model}")
+        indexes.append((model, spatial))
+    return indexes
+
+
+def _spatial_query(run):
+    """Run a query on every requested model and tag hits with their model"""
+    started = time.perf_counter()
+    try:
+        hits = []
+        for model, spatial in _spatial_indexes():
+            for hit in run(spatial):
+                hit["model"] = model
+                hits.append(hit)
+    except LookupError as e:
+        return None, (jsonify({"error": str(e)}), 404)
+    except ValueError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+    return (hits, round((time.perf_counter() - started) * 1000, 3)), None
+
+
+@model_api.route('/api/spatial/box', methods=['GET'])
+def spatial_box():
+    """Elements whose bounds intersect an axis-aligned box"""
+    try:
+        box = _vector("min") + _vector("max")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    types = _list_arg("types")
+    limit = request.args.get("limit", 10000, type=int)
+
+    result, error = _spatial_query(lambda spatial: spatial.query_box(box, types=types, limit=limit))
+    if error:
+        return error
+    hits, elapsed_ms = result
+    return jsonify({"elements": hits[:limit], "count": len(hits[:limit]), "query_ms": elapsed_ms})
+
+
+@model_api.route('/api/spatial/nearest', methods=['GET'])
+def spatial_nearest():
+    """k elements nearest to a point (distance to their bounds)"""
+    try:
+        point = _vector("point")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    k = max(1, min(request.args.get("k", 10, type=int), 1000))
+    max_distance = request.args.get("max_distance", type=float)
+    types = _list_arg("types")
+
+    result, error = _spatial_query(
+        lambda spatial: spatial.nearest(point, k=k, types=types, max_distance=max_distance)
+    )
+    if error:
+        return error
+    hits, elapsed_ms = result
+    hits = sorted(hits, key=lambda hit: hit["distance"])[:k]
+    return jsonify({"elements": hits, "count": len(hits), "query_ms": elapsed_ms})
+
+
+@model_api.route('/api/spatial/ray', methods=['GET'])
+def spatial_ray():
+    """Elements whose bounds a ray passes through, nearest first"""
+    try:
+        origin = _vector("origin")
+        direction = _vector("direction")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    limit = max(1, min(request.args.get("limit", 10, type=int), 1000))
+    max_distance = request.args.get("max_distance", math.inf, type=float)
+    types = _list_arg("types")
+
+    result, error = _spatial_query(
+        lambda spatial: spatial.raycast(origin, direction, max_distance=max_distance, limit=limit, types=types)
+    )
+    if error:
+        return error
+    hits, elapsed_ms = result
+    hits = sorted(hits, key=lambda hit: hit["distance"])[:limit]
+    return jsonify({"elements": hits, "count": len(hits), "query_ms": elapsed_ms})
+
+
+@model_api.route('/api/search', methods=['GET'])
+def search_elements():
+    """Elements across all models by mark, tag, name, type or property value
+
+    Query parameters: q, models (comma separated), limit, fuzzy (default true).
+    """
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "Missing query parameter: q"}), 400
+    return jsonify(_index().search().search(
+        query,
+        models=_list_arg("models"),
+        limit=request.args.get("limit", 20, type=int),
+        fuzzy=request.args.get("fuzzy", "true").lower() != "false"
+    ))
@@ -0,0 +1,132 @@
+"""
+Model catalog for QGEN_IMPFRAG
+==============================
+
+Statistics of every converted model (schema, authoring application,
+entity counts by type, storeys, bounds, conversion time, ...) computed
+once while the model is converted and kept in one SQLite table, so the
+list endpoints can return them without opening any model file.
+
+Listings choose what they return with fields=a,b,... ; "all" returns
+every statistic and an empty value none.
+
+Author: XQG4_AXIS Team
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from src.db import SqliteDatabase, placeholders
+from src.ifc_step import entity_counts, iter_entities, read_header
+
+
+# Returned by listings unless fields= asks for others; entity_counts can be long
+DEFAULT_FIELDS = (
+    "schema", "authoring_app", "elements", "storey_count", "bounds",
+    "conversion_seconds", "converted_at"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    model TEXT PRIMARY KEY,
+    source TEXT,
+    updated_at REAL NOT NULL,
+    stats TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_models_source ON models (source);
+"""
+
+
+def parse_fields(raw: Optional[str]) -> Optional[List[str]]:
+    """Fields requested by a fields= query argument; None means every field"""
+    if raw is None:
+        return list(DEFAULT_FIELDS)
+    if raw.strip().lower() == "all":
+        return None
+    return [f.strip() for f in raw.split(",") if f.strip()]
+
+
+def select_fields(stats: Dict[str, Any], fields: Optional[List[str]]) -> Dict[str, Any]:
+    if fields is None:
+        return stats
+    return {f: stats.get(f) for f in fields}
+
+
+def ifc_statistics(ifc_path: Path, counts: Optional[Dict[str, int]] = None) -> Dict[str, Any]:
+    """Header and entity statistics of an IFC file
+
+    Pass the entity counts of an earlier scan to read only the header.
+    """
+    header = read_header(ifc_path)
+    if counts is None:
+        counts = entity_counts(iter_entities(ifc_path))
+    return {
+        "schema": header["schema"],
+        "authoring_app": header["originating_system"] or header["preprocessor"],
+        "author": header["author"],
+        "organization": header["organization"],
+        "timestamp": header["timestamp"],
+        "ifc_size_mb": round(Path(ifc_path).stat().st_size / (1024 * 1024), 2),
+        "entities": sum(counts.values()),
+        "storey_count": counts.get("IFCBUILDINGSTOREY", 0),
+        "entity_counts": dict(sorted(counts.items(), key=lambda item: -item[1]))
+    }
+
+
+class ModelCatalog:
+    """Precomputed statistics of every model, by model name"""
+
+    def __init__(self, db_path: Path, busy_timeout_ms: int = 10000):
+        self.db = SqliteDatabase(db_path, busy_timeout_ms)
+        self.db.executescript(SCHEMA)
+
+    def update(self, model: str, source: Optional[str] = None, **stats):
+        """Merge statistics into a model's entry, creating it if needed"""
+        with self.db.write() as conn:
+            row = conn.execute("SELECT source, stats FROM models WHERE model = ?", (model,)).fetchone()
+            merged = json.loads(row["stats"]) if row else {}
+            merged.update(stats)
+            conn.execute(
+                """
+                INSERT INTO models (model, source, updated_at, stats) VALUES (?, ?, ?, ?)
+                ON CONFLICT(model) DO UPDATE SET
+                    source = COALESCE(excluded.source, models.source),
+                    updated_at = excluded.updated_at,
+                    stats = excluded.stats
+                """,
+                (model, source, time.time(), json.dumps(merged, default=str))
+            )
+
+    def get(self, model: str) -> Optional[Dict[str, Any]]:
+        row = self.db.execute("SELECT stats FROM models WHERE model = ?", (model,)).fetchone()
+        return json.loads(row["stats"]) if row else None
+
+    def stats_for(self, models: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        """Statistics of several models, in one query"""
+        models = list(models)
+        if not models:
+            return {}
+        stats = {}
+        # Stay under SQLite's bound parameter limit on very large catalogs
+        for start in range(0, len(models), 500):
+            chunk = models[start:start + 500]
+            for row in self.db.execute(
+                f"SELECT model, stats FROM models WHERE model IN ({placeholders(chunk)})", chunk
+            ):
+                stats[row["model"]] = json.loads(row["stats"])
+        return stats
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [
+            {"model": row["model"], "source": row["source"], "stats": json.loads(row["stats"])}
+            for row in self.db.execute("SELECT model, source, stats FROM models ORDER BY model")
+        ]
+
+    def count(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM models").fetchone()[0]
+
+    def remove(self, model: str) -> bool:
+        with self.db.write() as conn:
+            return conn.execute("DELETE FROM models WHERE model = ?", (model,)).rowcount > 0
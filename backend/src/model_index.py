@@ -0,0 +1,161 @@
+"""
+Per-model index directory for QGEN_IMPFRAG
+==========================================
+
+Derived artifacts built from each model during conversion (property
+database, ...) live under one directory per model, named after the
+fragment file stem, next to the indexes shared by all models:
+
+    data/index/<model>/properties.sqlite3
+    data/index/<model>/spatial.idx
+    data/index/<model>/lod/manifest.json
+    data/index/<model>/instances.bin
+    data/index/search.sqlite3
+    data/index/catalog.sqlite3
+    data/index/geometry.sqlite3
+
+The directory is local to the API host, or a shared volume when workers
+run on other hosts. The property stores and spatial indexes opened for
+queries are kept for the most recently used models only.
+
+Author: XQG4_AXIS Team
+"""
+
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.property_store import PropertyStore
+from src.spatial_index import SpatialIndex
+from src.search_index import SearchIndex
+from src.model_catalog import ModelCatalog
+from src.lod import LOD_DIR, read_manifest
+from src.geometry_library import GeometryLibrary
+from src.storage import Storage, ShardedLocalStorage
+
+
+PROPERTIES_FILE = "properties.sqlite3"
+SPATIAL_FILE = "spatial.idx"
+SEARCH_FILE = "search.sqlite3"
+CATALOG_FILE = "catalog.sqlite3"
+INSTANCES_FILE = "instances.bin"
+GEOMETRY_DB_FILE = "geometry.sqlite3"
+# Chunk store when none is configured; the API servers use data/geometry
+GEOMETRY_DIR = ".geometry"
+# Models whose property store and spatial index stay open (a spatial index is held in memory)
+CACHED_MODELS = 64
+
+
+class ModelIndex:
+    """Locates and opens the derived artifacts of converted models"""
+
+    def __init__(self, index_dir: Path, geometry_storage: Optional[Storage] = None,
+                 cache_size: int = CACHED_MODELS):
+        self.index_dir = Path(index_dir)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self.geometry_storage = geometry_storage
+        self.cache_size = max(1, cache_size)
+        self._lock = threading.Lock()
+        self._stores: "OrderedDict[str, Tuple[int, PropertyStore]]" = OrderedDict()
+        self._spatial: "OrderedDict[str, Tuple[int, SpatialIndex]]" = OrderedDict()
+        self._search: Optional[SearchIndex] = None
+        self._catalog: Optional[ModelCatalog] = None
+        self._geometry: Optional[GeometryLibrary] = None
+
+    @staticmethod
+    def model_name(fragment_filename: str) -> str:
+        return Path(fragment_filename).stem
+
+    def model_dir(self, model: str) -> Path:
+        # Model names come from URLs; never let one escape the index
+        if not model or Path(model).name != model or model in (".", ".."):
+            raise ValueError(f"Invalid model name: {model!r}")
+        return self.index_dir / model
+
+    def properties_path(self, model: str) -> Path:
+        return self.model_dir(model) / PROPERTIES_FILE
+
+    def spatial_path(self, model: str) -> Path:
+        return self.model_dir(model) / SPATIAL_FILE
+
+    def instances_path(self, model: str) -> Path:
+        return self.model_dir(model) / INSTANCES_FILE
+
+    def lod_dir(self, model: str) -> Path:
+        return self.model_dir(model) / LOD_DIR
+
+    def lod_manifest(self, model: str) -> Optional[Dict[str, Any]]:
+        return read_manifest(self.lod_dir(model))
+
+    def models(self) -> List[str]:
+        return sorted(p.name for p in self.index_dir.iterdir() if p.is_dir() and not p.name.startswith("."))
+
+    def _cached(self, cache: "OrderedDict[str, Tuple[int, Any]]", model: str, path: Path, loader):
+        """Open an artifact once, and again whenever it has been rebuilt; least recently used ones are dropped"""
+        try:
+            mtime = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+        with self._lock:
+            cached = cache.get(model)
+            if cached is not None and cached[0] == mtime:
+                cache.move_to_end(model)
+                return cached[1]
+
+        # Loading reads the whole spatial index: other models are served meanwhile
+        loaded = loader(path)
+        with self._lock:
+            cached = cache.get(model)
+            # Another request may have loaded it too, or a newer build
+            if cached is None or cached[0] < mtime:
+                cached = (mtime, loaded)
+                cache[model] = cached
+            cache.move_to_end(model)
+            while len(cache) > self.cache_size:
+                cache.popitem(last=False)
+            return cached[1]
+
+    def properties(self, model: str) -> Optional[PropertyStore]:
+        return self._cached(self._stores, model, self.properties_path(model), PropertyStore)
+
+    def spatial(self, model: str) -> Optional[SpatialIndex]:
+        return self._cached(self._spatial, model, self.spatial_path(model), SpatialIndex)
+
+    def search(self) -> SearchIndex:
+        with self._lock:
+            if self._search is None:
+                self._search = SearchIndex(self.index_dir / SEARCH_FILE)
+            return self._search
+
+    def catalog(self) -> ModelCatalog:
+        with self._lock:
+            if self._catalog is None:
+                self._catalog = ModelCatalog(self.index_dir / CATALOG_FILE)
+            return self._catalog
+
+    def geometry(self) -> GeometryLibrary:
+        with self._lock:
+            if self._geometry is None:
+                storage = self.geometry_storage or ShardedLocalStorage(self.index_dir / GEOMETRY_DIR)
+                self._geometry = GeometryLibrary(storage, self.index_dir / GEOMETRY_DB_FILE)
+            return self._geometry
+
+    def spatial_models(self) -> List[str]:
+        return [m for m in self.models() if self.spatial_path(m).exists()]
+
+    def remove(self, model: str) -> Optional[Dict[str, Any]]:
+        """Drop a model's indexes, catalog entry and geometry library references; None if it had none"""
+        model_dir = self.model_dir(model)
+        if not model_dir.exists() and self.catalog().get(model) is None:
+            return None
+        with self._lock:
+            self._stores.pop(model, None)
+            self._spatial.pop(model, None)
+        self.search().remove_model(model)
+        self.catalog().remove(model)
+        collected = self.geometry().remove_model(model)
+        shutil.rmtree(model_dir, ignore_errors=True)
+        return {"collected_geometries": collected}
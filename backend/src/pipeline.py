@@ -0,0 +1,198 @@
+"""
+Post-conversion pipeline for QGEN_IMPFRAG
+=========================================
+
+Steps that run on the source IFC after the converter has produced a
+fragment, building the derived artifacts the query endpoints serve.
+A failing step is logged and reported but never fails the conversion:
+the fragment is still valid without its indexes.
+
+Author: XQG4_AXIS Team
+"""
+
+import json
+import time
+import shutil
+import logging
+from datetime import datetime
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.converter_runner import ConverterRunner
+from src.model_index import ModelIndex
+from src.model_catalog import ifc_statistics
+from src.property_store import build_property_store
+from src.spatial_index import build_spatial_index, read_bounds
+from src.lod import LodSettings, publish_lod
+from src.tracing import get_tracer
+
+
+BOUNDS_FILE = "bounds.bin"
+LOD_REPORT_FILE = "lod-report.json"
+INSTANCES_BUILD_FILE = "instances.build"
+
+
+@dataclass
+class PipelineContext:
+    """One model's pass through the pipeline"""
+    ifc_path: Path
+    model: str
+    job_id: Optional[str] = None
+    cancel_check: Optional[Callable[[], bool]] = None
+    # Summaries of the steps that already ran, by step name
+    results: Dict[str, Any] = field(default_factory=dict)
+
+
+# A step returns a JSON-serializable summary of what it built
+PipelineStep = Callable[[PipelineContext], Dict[str, Any]]
+
+
+class PostConversionPipeline:
+    """Ordered build steps run after each successful conversion"""
+
+    def __init__(self, model_index: ModelIndex, geometry_runner: Optional[ConverterRunner] = None,
+                 logger: Optional[logging.Logger] = None, spatial: bool = True,
+                 lod: Optional[LodSettings] = None, geometry_library: bool = False):
+        self.model_index = model_index
+        self.geometry_runner = geometry_runner
+        self.lod = lod
+        self.logger = logger or logging.getLogger(__name__)
+        self.steps: List[Tuple[str, PipelineStep]] = [
+            ("properties", self._build_properties),
+            ("search", self._index_search)
+        ]
+        # Geometry-based indexes need the web-ifc pass (ifc_geometry.js)
+        if geometry_runner is not None and spatial:
+            self.steps.append(("spatial", self._build_spatial))
+        if geometry_runner is not None and lod is not None:
+            self.steps.append(("lod", self._build_lod))
+        if geometry_runner is not None and geometry_library:
+            self.steps.append(("geometry", self._add_geometry))
+        # Last, so it can summarise what the other steps found
+        self.steps.append(("catalog", self._record_statistics))
+
+    def add_step(self, name: str, step: PipelineStep):
+        self.steps.append((name, step))
+
+    def run(self, ifc_path: Path, model: str, job_id: Optional[str] = None,
+            cancel_check: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+        """Run every step for one model and return their summaries by name"""
+        context = PipelineContext(Path(ifc_path), model, job_id, cancel_check)
+        tracer = get_tracer()
+        with tracer.span("indexes", attributes={"qgen.model": model}):
+            for name, step in self.steps:
+                if cancel_check and cancel_check():
+                    break
+                started = time.time()
+                with tracer.span(f"indexes.{name}") as span:
+                    try:
+                        context.results[name] = step(context)
+                        self.logger.info(f"🗂️ {model}: {name} built in {time.time() - started:.2f}s")
+                    except Exception as e:
+                        self.logger.warning(f"⚠️ {model}: {name} step failed: {e}")
+                        context.results[name] = {"error": str(e)}
+                        span.set_error(str(e))
+        return context.results
+
+    def _build_properties(self, context: PipelineContext) -> Dict[str, Any]:
+        return build_property_store(context.ifc_path, self.model_index.properties_path(context.model))
+
+    def _index_search(self, context: PipelineContext) -> Dict[str, Any]:
+        store = self.model_index.properties(context.model)
+        if store is None:
+            raise RuntimeError("property index missing, nothing to search")
+        return self.model_index.search().index_model(context.model, store.search_documents())
+
+    def _build_spatial(self, context: PipelineContext) -> Dict[str, Any]:
+        store = self.model_index.properties(context.model)
+        if store is None:
+            raise RuntimeError("property index missing, cannot map element ids")
+
+        bounds_path = self.model_index.model_dir(context.model) / BOUNDS_FILE
+        result = self.geometry_runner.run(
+            context.ifc_path, bounds_path,
+            job_id=f"{context.job_id or self.geometry_runner.new_job_id()}-geometry",
+            cancel_check=context.cancel_check,
+            extra_args=["--bounds"]
+        )
+        if not result.success:
+            raise RuntimeError(f"geometry pass failed: {result.error_message[-500:]}")
+
+        try:
+            elements = {row["id"]: (row["global_id"], row["ifc_type"]) for row in store.iter_elements()}
+            items = [
+                (elements[express_id][0], elements[express_id][1], box)
+                for express_id, box in read_bounds(bounds_path)
+                if express_id in elements
+            ]
+        finally:
+            bounds_path.unlink(missing_ok=True)
+        return build_spatial_index(items, self.model_index.spatial_path(context.model))
+
+    def _build_lod(self, context: PipelineContext) -> Dict[str, Any]:
+        started = time.time()
+        model_dir = self.model_index.model_dir(context.model)
+        job_id = context.job_id or self.geometry_runner.new_job_id()
+        build_dir = model_dir / f"lod.build-{job_id}"
+        report_path = model_dir / LOD_REPORT_FILE
+        model_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            result = self.geometry_runner.run(
+                context.ifc_path, report_path,
+                job_id=f"{job_id}-lod",
+                cancel_check=context.cancel_check,
+                extra_args=self.lod.to_args(build_dir)
+            )
+            if not result.success:
+                raise RuntimeError(f"LOD pass failed: {result.error_message[-500:]}")
+            report = json.loads(report_path.read_text())
+            manifest = publish_lod(build_dir, report, self.model_index.lod_dir(context.model), self.lod, started)
+        finally:
+            shutil.rmtree(build_dir, ignore_errors=True)
+            report_path.unlink(missing_ok=True)
+        return {level["file"]: level["size_bytes"] for level in manifest["levels"]}
+
+    def _add_geometry(self, context: PipelineContext) -> Dict[str, Any]:
+        model_dir = self.model_index.model_dir(context.model)
+        job_id = context.job_id or self.geometry_runner.new_job_id()
+        chunk_dir = model_dir / f"geometry.build-{job_id}"
+        instances_path = model_dir / f"{INSTANCES_BUILD_FILE}-{job_id}"
+        model_dir.mkdir(parents=True, exist_ok=True)
+        try:
+            result = self.geometry_runner.run(
+                context.ifc_path, instances_path,
+                job_id=f"{job_id}-geometry-library",
+                cancel_check=context.cancel_check,
+                extra_args=["--geometry", str(chunk_dir)]
+            )
+            if not result.success:
+                raise RuntimeError(f"geometry library pass failed: {result.error_message[-500:]}")
+            stats = self.model_index.geometry().add_model(context.model, chunk_dir, instances_path)
+            instances_path.replace(self.model_index.instances_path(context.model))
+        finally:
+            shutil.rmtree(chunk_dir, ignore_errors=True)
+            instances_path.unlink(missing_ok=True)
+        return stats
+
+    def _record_statistics(self, context: PipelineContext) -> Dict[str, Any]:
+        properties = context.results.get("properties", {})
+        stats = ifc_statistics(context.ifc_path, properties.get("entity_counts"))
+        if "elements" in properties:
+            stats["elements"] = properties["elements"]
+        store = self.model_index.properties(context.model)
+        if store is not None:
+            stats["storeys"] = store.storeys()
+            stats["storey_count"] = len(stats["storeys"])
+        bounds = context.results.get("spatial", {}).get("bounds")
+        if bounds:
+            stats["bounds"] = [round(v, 4) for v in bounds]
+        lod = context.results.get("lod", {})
+        if lod and "error" not in lod:
+            stats["lod_sizes"] = lod
+        geometry = context.results.get("geometry", {})
+        if geometry and "error" not in geometry:
+            stats["geometry_library"] = geometry
+        stats["indexed_at"] = datetime.now().isoformat()
+        self.model_index.catalog().update(context.model, **stats)
+        return {"entities": stats["entities"], "schema": stats["schema"]}
@@ -0,0 +1,122 @@
+"""
+Profile API for QGEN_IMPFRAG
+============================
+
+Flask blueprint serving conversion profiles (see profiling). Both API
+servers register it:
+
+    GET    /api/profiles                        profiled jobs, newest first
+    GET    /api/jobs/<job_id>/profiles          a job's profile files
+    GET    /api/jobs/<job_id>/profiles/<file>   download one profile file
+    DELETE /api/jobs/<job_id>/profiles          remove a job's profiles
+
+Any request with ?profile=1 is run under cProfile. A handler that starts
+a job links the request profile to it with link_request_profile(); other
+requests are stored under their own request-<id> and named in the
+X-QGEN-Profile response header.
+
+Author: XQG4_AXIS Team
+"""
+
+import uuid
+
+from flask import Blueprint, Flask, current_app, g, jsonify, request, send_file
+
+from src.profiling import ProfileStore, profile_url, start_python_profile
+
+
+profile_api = Blueprint("profile_api", __name__)
+
+TRUE_VALUES = {"1", "true", "yes", "on"}
+
+
+def register_profile_api(app: Flask, store: ProfileStore, enabled: bool = True):
+    app.extensions["qgen_profile_store"] = store
+    app.extensions["qgen_profiling_enabled"] = enabled
+    app.register_blueprint(profile_api)
+    app.before_request(_start_request_profile)
+    app.after_request(_save_request_profile)
+    app.teardown_request(_stop_request_profile)
+
+
+def _store() -> ProfileStore:
+    return current_app.extensions["qgen_profile_store"]
+
+
+def profiling_requested() -> bool:
+    """True when the current request asked to be profiled and profiling is enabled"""
+    return (current_app.extensions.get("qgen_profiling_enabled", False)
+            and request.args.get("profile", "").lower() in TRUE_VALUES)
+
+
+def link_request_profile(job_id: str):
+    """Store the current request's profile with the job it started"""
+    g.qgen_profile_id = job_id
+
+
+def _start_request_profile():
+    if "qgen_profile_store" in current_app.extensions and profiling_requested():
+        g.qgen_profiler = start_python_profile(_store().logger)
+
+
+def _save_request_profile(response):
+    profiler = g.pop("qgen_profiler", None)
+    if profiler is None:
+        return response
+    profiler.disable()
+    profile_id = g.get("qgen_profile_id") or f"request-{uuid.uuid4().hex}"
+    try:
+        _store().save_python(profile_id, "request", profiler)
+        response.headers["X-QGEN-Profile"] = profile_url(profile_id)
+    except (OSError, ValueError) as e:
+        _store().logger.warning(f"⚠️ Could not save request profile {profile_id}: {e}")
+    return response
+
+
+def _stop_request_profile(exc=None):
+    # Requests that failed before after_request still stop their profiler
+    profiler = g.pop("qgen_profiler", None)
+    if profiler is not None:
+        profiler.disable()
+
+
+@profile_api.route('/api/profiles', methods=['GET'])
+def list_profiles():
+    jobs = _store().jobs()
+    return jsonify({"profiles": jobs, "count": len(jobs)})
+
+
+@profile_api.route('/api/jobs/<job_id>/profiles', methods=['GET'])
+def job_profiles(job_id):
+    try:
+        files = _store().files(job_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if files is None:
+        return jsonify({"error": f"No profiles for job: {job_id}"}), 404
+    for f in files:
+        f["url"] = f"{profile_url(job_id)}/{f['name']}"
+    return jsonify({"job_id": job_id, "files": files, "count": len(files)})
+
+
+@profile_api.route('/api/jobs/<job_id>/profiles/<filename>', methods=['GET'])
+def download_profile(job_id, filename):
+    try:
+        path = _store().file_path(job_id, filename)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if path is None:
+        return jsonify({"error": f"Profile file not found: {filename}"}), 404
+    mimetype = "text/plain" if path.suffix == ".txt" else "application/octet-stream"
+    return send_file(path, as_attachment=True, mimetype=mimetype, conditional=True)
+
+
+@profile_api.route('/api/jobs/<job_id>/profiles', methods=['DELETE'])
+def delete_profiles(job_id):
+    try:
+        deleted = _store().delete(job_id)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if not deleted:
+        return jsonify({"error": f"No profiles for job: {job_id}"}), 404
+    return jsonify({"job_id": job_id, "deleted": True})
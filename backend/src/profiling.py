@@ -0,0 +1,167 @@
+"""
+Conversion profiling for QGEN_IMPFRAG
+=====================================
+
+Opt-in profiles of a slow conversion, kept as evidence for upstream
+reports. A profiled job collects:
+
+    <reports>/profiles/<job_id>/request.pstats    cProfile of the API request (plus a .txt summary)
+    <reports>/profiles/<job_id>/job.pstats        cProfile of the conversion job: pruning, splitting, indexes
+    <reports>/profiles/<job_id>/CPU.*.cpuprofile  V8 CPU profile of each converter process (--cpu-prof)
+    <reports>/profiles/<job_id>/Heap.*.heapprofile  V8 sampling heap profile (--heap-prof)
+
+.pstats files open with pstats or snakeviz, .cpuprofile and .heapprofile
+files with Chrome DevTools or speedscope. Node writes its profiles when
+the converter exits, so a converter that is killed (timeout, cancel)
+leaves none.
+
+cProfile only sees the thread it runs in. From Python 3.12 on a single
+profiler can be active per process; a capture that finds another one
+running is skipped with a warning.
+
+Author: XQG4_AXIS Team
+"""
+
+import cProfile
+import io
+import logging
+import pstats
+import re
+import shutil
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+# Job ids may come from clients, and name a directory here
+PROFILE_ID_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$")
+PROFILE_KINDS = {
+    ".pstats": "python",
+    ".txt": "python-summary",
+    ".cpuprofile": "node-cpu",
+    ".heapprofile": "node-heap"
+}
+SUMMARY_LINES = 60
+
+
+def profile_url(job_id: str) -> str:
+    """API path of a job's profiles (see profile_api)"""
+    return f"/api/jobs/{job_id}/profiles"
+
+
+def start_python_profile(logger: Optional[logging.Logger] = None) -> Optional[cProfile.Profile]:
+    """Start profiling the calling thread; None if another profiler is active"""
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        (logger or logging.getLogger(__name__)).warning(f"⚠️ Python profile skipped: {e}")
+        return None
+    return profiler
+
+
+class ProfileStore:
+    """Profiles of conversion jobs, one directory per job"""
+
+    def __init__(self, root: Path, logger: Optional[logging.Logger] = None):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.logger = logger or logging.getLogger(__name__)
+
+    @staticmethod
+    def validate_id(profile_id: str) -> str:
+        if not PROFILE_ID_RE.match(profile_id or "") or ".." in profile_id:
+            raise ValueError(f"Invalid profile id: {profile_id!r}")
+        return profile_id
+
+    def job_dir(self, job_id: str, create: bool = True) -> Path:
+        path = self.root / self.validate_id(job_id)
+        if create:
+            path.mkdir(exist_ok=True)
+        return path
+
+    def node_args(self, job_id: str) -> List[str]:
+        """Node flags writing the converter's CPU and sampling heap profiles into the job's directory"""
+        path = self.job_dir(job_id)
+        return ["--cpu-prof", f"--cpu-prof-dir={path}", "--heap-prof", f"--heap-prof-dir={path}"]
+
+    def save_python(self, job_id: str, name: str, profiler: cProfile.Profile) -> Path:
+        """Write a stopped profiler as <name>.pstats and a text summary sorted by cumulative time"""
+        path = self.job_dir(job_id) / f"{name}.pstats"
+        profiler.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(str(path), stream=summary).sort_stats("cumulative").print_stats(SUMMARY_LINES)
+        path.with_suffix(".txt").write_text(summary.getvalue(), encoding="utf-8")
+        return path
+
+    @contextmanager
+    def capture(self, job_id: str, name: str, enabled: bool = True):
+        """cProfile the calling thread for the duration of the block"""
+        profiler = start_python_profile(self.logger) if enabled else None
+        try:
+            yield profiler
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                try:
+                    self.save_python(job_id, name, profiler)
+                except OSError as e:
+                    self.logger.warning(f"⚠️ Could not save profile {name} of {job_id}: {e}")
+
+    def files(self, job_id: str) -> Optional[List[Dict[str, Any]]]:
+        """A job's profile files, or None if it was not profiled"""
+        path = self.job_dir(job_id, create=False)
+        if not path.is_dir():
+            return None
+        files = []
+        for f in sorted(path.iterdir()):
+            if f.suffix not in PROFILE_KINDS or not f.is_file():
+                continue
+            stat = f.stat()
+            files.append({
+                "name": f.name,
+                "kind": PROFILE_KINDS[f.suffix],
+                "size_bytes": stat.st_size,
+                "modified": datetime.fromtimestamp(stat.st_mtime).isoformat()
+            })
+        return files
+
+    def file_path(self, job_id: str, name: str) -> Optional[Path]:
+        if "/" in name or "\\" in name or Path(name).suffix not in PROFILE_KINDS:
+            raise ValueError(f"Invalid profile file: {name!r}")
+        path = self.job_dir(job_id, create=False) / name
+        return path if path.is_file() else None
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        """Profiled jobs, newest first"""
+        jobs = []
+        for path in self.root.iterdir():
+            if not path.is_dir():
+                continue
+            files = self.files(path.name) or []
+            jobs.append({
+                "job_id": path.name,
+                "files": len(files),
+                "size_bytes": sum(f["size_bytes"] for f in files),
+                "created": datetime.fromtimestamp(path.stat().st_mtime).isoformat()
+            })
+        return sorted(jobs, key=lambda job: job["created"], reverse=True)
+
+    def delete(self, job_id: str) -> bool:
+        path = self.job_dir(job_id, create=False)
+        if not path.is_dir():
+            return False
+        shutil.rmtree(path)
+        return True
+
+    def maintenance(self, retention_days: float) -> int:
+        """Remove profiles older than the job history; returns how many jobs were removed"""
+        cutoff = time.time() - retention_days * 86400
+        removed = 0
+        for path in self.root.iterdir():
+            if path.is_dir() and path.stat().st_mtime < cutoff:
+                shutil.rmtree(path, ignore_errors=True)
+                removed += 1
+        return removed
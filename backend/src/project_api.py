@@ -0,0 +1,126 @@
+"""
+Project bundle API for QGEN_IMPFRAG
+===================================
+
+Flask blueprint for federated projects (see project_bundle). Both API
+servers register it:
+
+    GET    /api/projects                      projects and their bundle state
+    PUT    /api/projects/<name>               define a project: {"members": ["601005-*.ifc"]}
+    GET    /api/projects/<name>               one project
+    DELETE /api/projects/<name>               remove a project and its bundle
+    POST   /api/projects/<name>/build         (re)build the bundle now
+    GET    /api/projects/<name>/fragment      the bundle, rebuilt first if stale
+
+Author: XQG4_AXIS Team
+"""
+
+from flask import Blueprint, Flask, current_app, jsonify, request
+
+from src.http_utils import send_stored_file
+from src.project_bundle import ProjectBundler
+from src.scheduler import INTERACTIVE
+
+
+project_api = Blueprint("project_api", __name__)
+
+
+def register_project_api(app: Flask, bundler: ProjectBundler, allow_redirect: bool = False,
+                         accel_prefix: str = ""):
+    app.extensions["qgen_project_bundler"] = bundler
+    app.extensions["qgen_project_download"] = {"allow_redirect": allow_redirect, "accel_prefix": accel_prefix}
+    app.register_blueprint(project_api)
+
+
+def _bundler() -> ProjectBundler:
+    return current_app.extensions["qgen_project_bundler"]
+
+
+def _project(name: str):
+    try:
+        ProjectBundler.validate_name(name)
+    except ValueError as e:
+        return None, (jsonify({"error": str(e)}), 400)
+    project = _bundler().projects.get(name)
+    if project is None:
+        return None, (jsonify({"error": f"Project not found: {name}"}), 404)
+    return project, None
+
+
+@project_api.route('/api/projects', methods=['GET'])
+def list_projects():
+    """Every project with its resolved members and bundle state"""
+    bundler = _bundler()
+    ifc_files = {f.name: f for f in bundler.ifc_storage.list(".ifc")}
+    projects = [bundler.status(project, ifc_files) for project in bundler.projects.list()]
+    return jsonify({"projects": projects, "count": len(projects)})
+
+
+@project_api.route('/api/projects/<name>', methods=['PUT'])
+def define_project(name):
+    """Create or redefine a project from member file names or patterns"""
+    try:
+        ProjectBundler.validate_name(name)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    data = request.get_json(silent=True) or {}
+    members = data.get("members")
+    if not isinstance(members, list) or not members or not all(isinstance(m, str) and m for m in members):
+        return jsonify({"error": "members must be a non-empty list of IFC file names or patterns"}), 400
+
+    bundler = _bundler()
+    created = bundler.projects.save(name, members, data.get("description"))
+    return jsonify(bundler.status(bundler.projects.get(name))), 201 if created else 200
+
+
+@project_api.route('/api/projects/<name>', methods=['GET'])
+def get_project(name):
+    project, error = _project(name)
+    if error:
+        return error
+    return jsonify(_bundler().status(project))
+
+
+@project_api.route('/api/projects/<name>', methods=['DELETE'])
+def delete_project(name):
+    project, error = _project(name)
+    if error:
+        return error
+    _bundler().delete(name)
+    return jsonify({"project": name, "deleted": True})
+
+
+@project_api.route('/api/projects/<name>/build', methods=['POST'])
+def build_project(name):
+    """Queue a bundle build; ?wait=true blocks until it is done"""
+    project, error = _project(name)
+    if error:
+        return error
+    job = _bundler().submit_build(name, priority_class=INTERACTIVE)
+    if request.args.get("wait", "false").lower() != "true":
+        return jsonify({"project": name, "job_id": job.job_id, "status": "queued"}), 202
+    try:
+        build = job.wait()
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"project": name, "job_id": job.job_id, "error": str(e)}), 500
+    return jsonify({"project": name, "job_id": job.job_id, "status": "completed", "build": build})
+
+
+@project_api.route('/api/projects/<name>/fragment', methods=['GET'])
+def project_fragment(name):
+    """The project's merged fragment; a stale bundle is rebuilt before it is served"""
+    project, error = _project(name)
+    if error:
+        return error
+    bundler = _bundler()
+    try:
+        if bundler.is_stale(name):
+            bundler.submit_build(name, priority_class=INTERACTIVE).wait()
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        return jsonify({"project": name, "error": str(e)}), 500
+    return send_stored_file(bundler.fragment_storage, bundler.bundle_name(name),
+                            **current_app.extensions["qgen_project_download"])
@@ -0,0 +1,249 @@
+"""
+Federated project bundles for QGEN_IMPFRAG
+==========================================
+
+A project names the IFC files that are always viewed together, either
+exactly or with wildcards ("601005-*.ifc"). Its bundle is one fragment
+converted from the members merged into a single IFC (see ifc_merge), so
+loading the project is one request and one decode, and geometry shared
+between members is stored once.
+
+Bundles are cached in the fragment store as <project>.project.frag.
+Each build records a fingerprint of its members (names, sizes and
+modification times); a bundle whose members changed, or whose pattern
+now matches other files, is stale and is rebuilt the next time it is
+requested, or right after a member is converted again.
+
+Author: XQG4_AXIS Team
+"""
+
+import fnmatch
+import hashlib
+import json
+import logging
+import re
+import tempfile
+import threading
+import time
+from contextlib import ExitStack
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from src.converter_runner import ConverterRunner
+from src.db import SqliteDatabase
+from src.ifc_merge import merge_ifc
+from src.scheduler import ConversionScheduler, BACKFILL
+from src.storage import Storage, StoredObject
+
+
+# Bumped when the merge output changes, so existing bundles are rebuilt
+MERGE_VERSION = 1
+BUNDLE_SUFFIX = ".project.frag"
+PROJECT_NAME_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS projects (
+    name TEXT PRIMARY KEY,
+    members TEXT NOT NULL,
+    description TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    fingerprint TEXT,
+    build TEXT
+);
+"""
+
+
+class ProjectStore:
+    """Project definitions and the state of their last bundle build"""
+
+    def __init__(self, db_path: Path, busy_timeout_ms: int = 10000):
+        self.db = SqliteDatabase(db_path, busy_timeout_ms)
+        self.db.executescript(SCHEMA)
+
+    def save(self, name: str, members: List[str], description: Optional[str] = None) -> bool:
+        """Create or redefine a project; returns True if it is new"""
+        now = time.time()
+        with self.db.write() as conn:
+            existed = conn.execute("SELECT 1 FROM projects WHERE name = ?", (name,)).fetchone() is not None
+            conn.execute(
+                """
+                INSERT INTO projects (name, members, description, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                    members = excluded.members,
+                    description = excluded.description,
+                    updated_at = excluded.updated_at
+                """,
+                (name, json.dumps(members), description, now, now)
+            )
+        return not existed
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        row = self.db.execute("SELECT * FROM projects WHERE name = ?", (name,)).fetchone()
+        return self._row_to_dict(row)
+
+    def list(self) -> List[Dict[str, Any]]:
+        return [self._row_to_dict(row) for row in self.db.execute("SELECT * FROM projects ORDER BY name")]
+
+    def delete(self, name: str) -> bool:
+        with self.db.write() as conn:
+            return conn.execute("DELETE FROM projects WHERE name = ?", (name,)).rowcount > 0
+
+    def record_build(self, name: str, fingerprint: str, build: Dict[str, Any]):
+        with self.db.write() as conn:
+            conn.execute(
+                "UPDATE projects SET fingerprint = ?, build = ? WHERE name = ?",
+                (fingerprint, json.dumps(build, default=str), name)
+            )
+
+    @staticmethod
+    def _row_to_dict(row) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        result = dict(row)
+        result["members"] = json.loads(result["members"])
+        result["build"] = json.loads(result["build"]) if result["build"] else None
+        return result
+
+
+class ProjectBundler:
+    """Builds, caches and refreshes the merged fragment of each project"""
+
+    def __init__(self, projects: ProjectStore, ifc_storage: Storage, fragment_storage: Storage,
+                 converter: ConverterRunner, scheduler: ConversionScheduler,
+                 logger: Optional[logging.Logger] = None):
+        self.projects = projects
+        self.ifc_storage = ifc_storage
+        self.fragment_storage = fragment_storage
+        self.converter = converter
+        self.scheduler = scheduler
+        self.logger = logger or logging.getLogger(__name__)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    @staticmethod
+    def validate_name(name: str) -> str:
+        if not PROJECT_NAME_RE.match(name or ""):
+            raise ValueError(f"Invalid project name: {name!r}")
+        return name
+
+    @staticmethod
+    def bundle_name(name: str) -> str:
+        return f"{name}{BUNDLE_SUFFIX}"
+
+    def resolve_members(self, members: List[str],
+                        ifc_files: Optional[Dict[str, StoredObject]] = None) -> List[StoredObject]:
+        """IFC files a member list names, in order, each once"""
+        if ifc_files is None:
+            ifc_files = {f.name: f for f in self.ifc_storage.list(".ifc")}
+        resolved: Dict[str, StoredObject] = {}
+        for member in members:
+            matches = sorted(fnmatch.filter(ifc_files, member)) if any(c in member for c in "*?[") else [member]
+            for match in matches:
+                if match not in ifc_files:
+                    raise LookupError(f"Project member not found: {match}")
+                resolved.setdefault(match, ifc_files[match])
+        return list(resolved.values())
+
+    @staticmethod
+    def fingerprint(files: List[StoredObject]) -> str:
+        key = json.dumps([MERGE_VERSION] + [[f.name, f.size, f.modified] for f in files])
+        return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+    def status(self, project: Dict[str, Any],
+               ifc_files: Optional[Dict[str, StoredObject]] = None) -> Dict[str, Any]:
+        """Definition, resolved members and bundle state of a project"""
+        result = dict(project)
+        try:
+            files = self.resolve_members(project["members"], ifc_files)
+            result["files"] = [f.name for f in files]
+            current = self.fingerprint(files) if files else None
+            result["error"] = None if files else "No member files match"
+        except LookupError as e:
+            result["files"], current, result["error"] = [], None, str(e)
+        bundle = self.fragment_storage.stat(self.bundle_name(project["name"]))
+        result["bundle"] = {
+            "filename": bundle.name,
+            "size_mb": round(bundle.size / (1024 * 1024), 2),
+            "url": f"/api/projects/{project['name']}/fragment"
+        } if bundle else None
+        result["stale"] = bundle is None or current is None or project["fingerprint"] != current
+        result.pop("fingerprint", None)
+        return result
+
+    def is_stale(self, name: str) -> bool:
+        project = self.projects.get(name)
+        if project is None:
+            raise LookupError(f"Project not found: {name}")
+        return self.status(project)["stale"]
+
+    def _lock(self, name: str) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(name, threading.Lock())
+
+    def build(self, name: str, job_id: Optional[str] = None,
+              cancel_check: Optional[Callable[[], bool]] = None) -> Dict[str, Any]:
+        """Merge the members, convert them and publish the bundle"""
+        with self._lock(name):
+            project = self.projects.get(name)
+            if project is None:
+                raise LookupError(f"Project not found: {name}")
+            files = self.resolve_members(project["members"])
+            if not files:
+                raise LookupError(f"No member files match project {name}")
+            fingerprint = self.fingerprint(files)
+            # Another request may have rebuilt it while this one waited
+            if project["fingerprint"] == fingerprint and self.fragment_storage.exists(self.bundle_name(name)):
+                return project["build"]
+
+            started = time.time()
+            job_id = job_id or self.converter.new_job_id()
+            self.logger.info(f"🧩 Building project {name} from {len(files)} models")
+            with ExitStack() as stack:
+                paths = [stack.enter_context(self.ifc_storage.local_copy(f.name)) for f in files]
+                work_dir = Path(stack.enter_context(tempfile.TemporaryDirectory(prefix="qgen-project-")))
+                merged_path = work_dir / f"{name}.ifc"
+                merge = merge_ifc(paths, merged_path, name)
+                for warning in merge["warnings"]:
+                    self.logger.warning(f"⚠️ Project {name}: {warning}")
+
+                staging = self.fragment_storage.staging_path(self.bundle_name(name))
+                result = self.converter.run(merged_path, staging, job_id=job_id, cancel_check=cancel_check)
+                if not result.success:
+                    raise RuntimeError(f"Project conversion failed: {result.error_message[-2000:]}")
+                stored = self.fragment_storage.commit(self.bundle_name(name), staging)
+
+            build = {
+                "job_id": job_id,
+                "built_at": datetime.now().isoformat(),
+                "seconds": round(time.time() - started, 2),
+                "members": [f.name for f in files],
+                "merge": merge,
+                "size_mb": round(stored.size / (1024 * 1024), 2),
+                "member_size_mb": round(sum(f.size for f in files) / (1024 * 1024), 2)
+            }
+            self.projects.record_build(name, fingerprint, build)
+            self.logger.info(f"✅ Project {name} built in {build['seconds']}s ({build['size_mb']} MB)")
+            return build
+
+    def submit_build(self, name: str, priority_class: str = BACKFILL):
+        """Queue a build on the conversion scheduler"""
+        return self.scheduler.submit(self.build, name, priority_class=priority_class,
+                                     job_id=f"project-{name}-{self.converter.new_job_id()}")
+
+    def refresh_for(self, filename: str) -> List[str]:
+        """Queue rebuilds of the stale projects a (re)converted IFC file belongs to"""
+        ifc_files = {f.name: f for f in self.ifc_storage.list(".ifc")}
+        queued = []
+        for project in self.projects.list():
+            status = self.status(project, ifc_files)
+            if filename in status["files"] and status["stale"]:
+                self.submit_build(project["name"])
+                queued.append(project["name"])
+        return queued
+
+    def delete(self, name: str) -> bool:
+        self.fragment_storage.delete(self.bundle_name(name))
+        return self.projects.delete(name)
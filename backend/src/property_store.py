@@ -0,0 +1,508 @@
+"""
+Element property store for QGEN_IMPFRAG
+=======================================
+
+Extracts element attributes, property sets, quantities, types,
+materials and the spatial hierarchy from an IFC file into a compact
+per-model SQLite database, so the API can answer property lookups
+without the frontend downloading and decoding the whole fragment.
+
+The database is built once per conversion into a temporary file and
+moved into place, then only ever read.
+
+Author: XQG4_AXIS Team
+"""
+
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.db import SqliteDatabase, placeholders
+from src.ifc_step import iter_entities, read_header, unwrap, ref_list, EnumValue
+
+
+SCHEMA_VERSION = 1
+
+PROPERTY_VALUE_TYPES = {
+    "IFCPROPERTYSINGLEVALUE", "IFCPROPERTYENUMERATEDVALUE",
+    "IFCPROPERTYLISTVALUE", "IFCPROPERTYBOUNDEDVALUE"
+}
+QUANTITY_TYPES = {
+    "IFCQUANTITYLENGTH", "IFCQUANTITYAREA", "IFCQUANTITYVOLUME", "IFCQUANTITYCOUNT",
+    "IFCQUANTITYWEIGHT", "IFCQUANTITYTIME", "IFCQUANTITYNUMBER"
+}
+MATERIAL_TYPES = {
+    "IFCMATERIAL", "IFCMATERIALLIST", "IFCMATERIALLAYERSETUSAGE", "IFCMATERIALLAYERSET",
+    "IFCMATERIALLAYER", "IFCMATERIALCONSTITUENTSET", "IFCMATERIALCONSTITUENT",
+    "IFCMATERIALPROFILESETUSAGE", "IFCMATERIALPROFILESET", "IFCMATERIALPROFILE"
+}
+SPATIAL_TYPES = {"IFCPROJECT", "IFCSITE", "IFCBUILDING", "IFCBUILDINGSTOREY", "IFCSPACE"}
+
+# Relationships that build the spatial tree: (relating index, related index)
+TREE_RELATIONS = {
+    "IFCRELAGGREGATES": (4, 5),
+    "IFCRELNESTS": (4, 5),
+    "IFCRELCONTAINEDINSPATIALSTRUCTURE": (5, 4)
+}
+
+COMPARISON_OPS = {"gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE elements (
+    id INTEGER PRIMARY KEY,
+    global_id TEXT NOT NULL,
+    ifc_type TEXT NOT NULL,
+    name TEXT,
+    description TEXT,
+    object_type TEXT,
+    tag TEXT,
+    is_type INTEGER NOT NULL DEFAULT 0,
+    type_id INTEGER,
+    parent_id INTEGER,
+    storey_id INTEGER
+);
+CREATE TABLE properties (
+    element_id INTEGER NOT NULL,
+    pset TEXT NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT,
+    num REAL,
+    kind TEXT NOT NULL
+);
+CREATE TABLE materials (element_id INTEGER NOT NULL, material TEXT NOT NULL);
+"""
+
+INDEXES = """
+CREATE INDEX idx_elements_global_id ON elements(global_id);
+CREATE INDEX idx_elements_type ON elements(ifc_type, id);
+CREATE INDEX idx_elements_parent ON elements(parent_id);
+CREATE INDEX idx_elements_storey ON elements(storey_id);
+CREATE INDEX idx_elements_type_id ON elements(type_id);
+CREATE INDEX idx_properties_element ON properties(element_id);
+CREATE INDEX idx_properties_value ON properties(name, value);
+CREATE INDEX idx_properties_num ON properties(name, num);
+CREATE INDEX idx_materials_element ON materials(element_id);
+CREATE INDEX idx_materials_name ON materials(material);
+"""
+
+
+def _text(value: Any) -> Optional[str]:
+    value = unwrap(value)
+    if value is None:
+        return None
+    if isinstance(value, EnumValue):
+        return {"T": "True", "F": "False", "U": "Unknown"}.get(value, str(value))
+    if isinstance(value, list):
+        return ", ".join(t for t in (_text(v) for v in value) if t is not None)
+    return str(value)
+
+
+def _number(value: Any) -> Optional[float]:
+    value = unwrap(value)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return float(value)
+
+
+def _property_value(type_name: str, args: List[Any]) -> Tuple[Optional[str], Optional[float], str]:
+    """(text, numeric, kind) of a property or quantity entity"""
+    if type_name in QUANTITY_TYPES:
+        value = args[3] if len(args) > 3 else None
+        return _text(value), _number(value), "quantity"
+    if type_name == "IFCPROPERTYSINGLEVALUE":
+        value = args[2] if len(args) > 2 else None
+        return _text(value), _number(value), "property"
+    if type_name == "IFCPROPERTYBOUNDEDVALUE":
+        upper, lower = (args[2], args[3]) if len(args) > 3 else (None, None)
+        return f"{_text(lower) or ''}..{_text(upper) or ''}", None, "property"
+    # Enumerated and list values: the values list comes third
+    return _text(args[2] if len(args) > 2 else None), None, "property"
+
+
+class PropertyExtractor:
+    """One streaming pass over an IFC file collecting everything the store needs"""
+
+    def __init__(self, ifc_path: Path):
+        self.ifc_path = Path(ifc_path)
+        self.roots: Dict[int, Tuple[str, List[Any]]] = {}
+        self.values: Dict[int, Tuple[str, List[Any]]] = {}
+        self.materials: Dict[int, Tuple[str, List[Any]]] = {}
+        self.entity_counts: Dict[str, int] = {}
+
+    def scan(self) -> "PropertyExtractor":
+        counts = self.entity_counts
+        for entity in iter_entities(self.ifc_path):
+            counts[entity.type] = counts.get(entity.type, 0) + 1
+            raw = entity.raw.lstrip()
+            # IfcRoot instances start with a quoted 22-character GlobalId
+            if len(raw) > 23 and raw[0] == "'" and raw[23] == "'":
+                self.roots[entity.id] = (entity.type, entity.args)
+            elif entity.type in PROPERTY_VALUE_TYPES or entity.type in QUANTITY_TYPES:
+                self.values[entity.id] = (entity.type, entity.args)
+            elif entity.type in MATERIAL_TYPES:
+                self.materials[entity.id] = (entity.type, entity.args)
+        return self
+
+    def _material_names(self, ref: int, depth: int = 0) -> List[str]:
+        """IfcMaterial names reachable from any material definition"""
+        entry = self.materials.get(ref)
+        if entry is None or depth > 4:
+            return []
+        type_name, args = entry
+        if type_name == "IFCMATERIAL":
+            return [_text(args[0])] if args and args[0] else []
+        names: List[str] = []
+        for arg in args:
+            for child in ref_list(arg):
+                for name in self._material_names(child, depth + 1):
+                    if name not in names:
+                        names.append(name)
+        return names
+
+    def rows(self) -> Tuple[List[tuple], List[tuple], List[tuple]]:
+        """Element, property and material rows ready for insertion"""
+        psets: Dict[int, Tuple[str, List[int]]] = {}
+        elements: Dict[int, Dict[str, Any]] = {}
+        parents: Dict[int, int] = {}
+        types: Dict[int, int] = {}
+        assignments: List[Tuple[List[int], int]] = []
+        material_links: List[Tuple[List[int], int]] = []
+
+        for entity_id, (type_name, args) in self.roots.items():
+            if type_name.startswith("IFCREL"):
+                if type_name in TREE_RELATIONS:
+                    relating, related = TREE_RELATIONS[type_name]
+                    for parent in ref_list(args[relating] if len(args) > relating else None):
+                        for child in ref_list(args[related] if len(args) > related else None):
+                            parents.setdefault(child, parent)
+                elif type_name == "IFCRELDEFINESBYTYPE" and len(args) > 5:
+                    for relating in ref_list(args[5]):
+                        for related in ref_list(args[4]):
+                            types[related] = relating
+                elif type_name == "IFCRELDEFINESBYPROPERTIES" and len(args) > 5:
+                    for definition in ref_list(args[5]):
+                        assignments.append((ref_list(args[4]), definition))
+                elif type_name == "IFCRELASSOCIATESMATERIAL" and len(args) > 5:
+                    for material in ref_list(args[5]):
+                        material_links.append((ref_list(args[4]), material))
+            elif type_name == "IFCPROPERTYSET" and len(args) > 4:
+                psets[entity_id] = (_text(args[2]) or "", ref_list(args[4]))
+            elif type_name == "IFCELEMENTQUANTITY" and len(args) > 5:
+                psets[entity_id] = (_text(args[2]) or "", ref_list(args[5]))
+            elif type_name.endswith("PROPERTIES") or "TEMPLATE" in type_name:
+                continue
+            else:
+                is_type = type_name.endswith("TYPE") or type_name.endswith("STYLE")
+                tag = None
+                # Tag is the 8th attribute of elements; other products may have an enumeration there (ProxyType, ...)
+                if not is_type and type_name not in SPATIAL_TYPES and len(args) > 7 \
+                        and isinstance(args[7], str) and not isinstance(args[7], EnumValue):
+                    tag = _text(args[7])
+                elements[entity_id] = {
+                    "global_id": args[0],
+                    "ifc_type": type_name,
+                    "name": _text(args[2]) if len(args) > 2 else None,
+                    "description": _text(args[3]) if len(args) > 3 else None,
+                    "object_type": None if is_type or len(args) <= 4 else _text(args[4]),
+                    "tag": tag,
+                    "is_type": 1 if is_type else 0
+                }
+                # Type objects carry their property sets directly
+                if is_type and len(args) > 5:
+                    for definition in ref_list(args[5]):
+                        assignments.append(([entity_id], definition))
+
+        storeys: Dict[int, Optional[int]] = {}
+
+        def storey_of(entity_id: int) -> Optional[int]:
+            chain = []
+            current: Optional[int] = entity_id
+            found = None
+            while current is not None and current not in storeys and len(chain) < 64:
+                chain.append(current)
+                if elements.get(current, {}).get("ifc_type") == "IFCBUILDINGSTOREY":
+                    found = current
+                    break
+                current = parents.get(current)
+            else:
+                if current is not None and current in storeys:
+                    found = storeys[current]
+            for item in chain:
+                storeys[item] = found
+            return found
+
+        element_rows = [
+            (entity_id, e["global_id"], e["ifc_type"], e["name"], e["description"], e["object_type"],
+             e["tag"], e["is_type"], types.get(entity_id), parents.get(entity_id),
+             None if e["is_type"] or e["ifc_type"] == "IFCBUILDINGSTOREY" else storey_of(entity_id))
+            for entity_id, e in elements.items()
+        ]
+
+        property_rows = []
+        for related, definition in assignments:
+            pset = psets.get(definition)
+            if pset is None:
+                continue
+            pset_name, value_ids = pset
+            values = []
+            for value_id in value_ids:
+                entry = self.values.get(value_id)
+                if entry is None:
+                    continue
+                type_name, args = entry
+                text, number, kind = _property_value(type_name, args)
+                values.append((pset_name, _text(args[0]) or "", text, number, kind))
+            for element_id in related:
+                if element_id in elements:
+                    property_rows.extend((element_id,) + value for value in values)
+
+        material_rows = []
+        for related, material in material_links:
+            names = self._material_names(material)
+            for element_id in related:
+                if element_id in elements:
+                    material_rows.extend((element_id, name) for name in names)
+
+        return element_rows, property_rows, material_rows
+
+
+def build_property_store(ifc_path: Path, db_path: Path) -> Dict[str, Any]:
+    """Extract an IFC file into a property database at db_path (replaced atomically)"""
+    started = time.time()
+    extractor = PropertyExtractor(ifc_path).scan()
+    element_rows, property_rows, material_rows = extractor.rows()
+    header = read_header(ifc_path)
+
+    db_path = Path(db_path)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = db_path.with_name(f".{db_path.name}.{os.getpid()}.tmp")
+    tmp.unlink(missing_ok=True)
+    try:
+        conn = sqlite3.connect(str(tmp))
+        try:
+            # Nothing reads the file until it is renamed into place
+            conn.execute("PRAGMA journal_mode=OFF")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.executescript(SCHEMA)
+            conn.executemany("INSERT INTO elements VALUES (?,?,?,?,?,?,?,?,?,?,?)", element_rows)
+            conn.executemany("INSERT INTO properties VALUES (?,?,?,?,?,?)", property_rows)
+            conn.executemany("INSERT INTO materials VALUES (?,?)", material_rows)
+            conn.executemany("INSERT INTO meta VALUES (?,?)", [
+                ("schema_version", str(SCHEMA_VERSION)),
+                ("source", Path(ifc_path).name),
+                ("ifc_schema", header.get("schema") or ""),
+                ("built_at", str(time.time()))
+            ])
+            conn.executescript(INDEXES)
+            conn.commit()
+            conn.execute("VACUUM")
+        finally:
+            conn.close()
+        os.replace(tmp, db_path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+    return {
+        "elements": sum(1 for row in element_rows if not row[7]),
+        "types": sum(1 for row in element_rows if row[7]),
+        "properties": len(property_rows),
+        "materials": len(material_rows),
+        "size_bytes": db_path.stat().st_size,
+        "seconds": round(time.time() - started, 3),
+        # Reused by later pipeline steps so the file is not scanned twice
+        "entity_counts": extractor.entity_counts
+    }
+
+
+class PropertyStore:
+    """Read-only queries against one model's property database"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.db = SqliteDatabase(self.db_path, read_only=True)
+
+    def _element_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "id": row["id"],
+            "global_id": row["global_id"],
+            "type": row["ifc_type"],
+            "name": row["name"],
+            "description": row["description"],
+            "object_type": row["object_type"],
+            "tag": row["tag"]
+        }
+
+    def _psets(self, element_ids: List[int]) -> Dict[str, Dict[str, Any]]:
+        """Property sets of several elements merged in order (later ids win)"""
+        psets: Dict[str, Dict[str, Any]] = {}
+        rows = self.db.execute(
+            f"SELECT element_id, pset, name, value, num FROM properties "
+            f"WHERE element_id IN ({placeholders(element_ids)})", element_ids
+        ).fetchall()
+        order = {element_id: i for i, element_id in enumerate(element_ids)}
+        for row in sorted(rows, key=lambda r: order[r["element_id"]]):
+            psets.setdefault(row["pset"], {})[row["name"]] = row["num"] if row["num"] is not None else row["value"]
+        return psets
+
+    def _materials(self, element_id: int, type_id: Optional[int]) -> List[str]:
+        ids = [element_id] + ([type_id] if type_id else [])
+        rows = self.db.execute(
+            f"SELECT element_id, material FROM materials WHERE element_id IN ({placeholders(ids)})", ids
+        ).fetchall()
+        own = [r["material"] for r in rows if r["element_id"] == element_id]
+        # Occurrences inherit the type's material unless they define their own
+        return own or [r["material"] for r in rows if r["element_id"] == type_id]
+
+    def _row(self, element_id: Optional[int]) -> Optional[sqlite3.Row]:
+        if element_id is None:
+            return None
+        return self.db.execute("SELECT * FROM elements WHERE id = ?", (element_id,)).fetchone()
+
+    def get_element(self, global_id: str) -> Optional[Dict[str, Any]]:
+        """Attributes, type, materials, property sets and spatial path of one element"""
+        row = self.db.execute("SELECT * FROM elements WHERE global_id = ? LIMIT 1", (global_id,)).fetchone()
+        if row is None:
+            return None
+
+        element = self._element_dict(row)
+        type_row = self._row(row["type_id"])
+        element["element_type"] = self._element_dict(type_row) if type_row else None
+        element["materials"] = self._materials(row["id"], row["type_id"])
+        # Type properties apply to every occurrence; the occurrence's own values win
+        element["psets"] = self._psets([i for i in (row["type_id"], row["id"]) if i])
+
+        path = []
+        parent = self._row(row["parent_id"])
+        while parent is not None and len(path) < 64:
+            path.append({"global_id": parent["global_id"], "type": parent["ifc_type"], "name": parent["name"]})
+            parent = self._row(parent["parent_id"])
+        element["spatial_path"] = list(reversed(path))
+        return element
+
+    def query(self, ifc_type: Optional[str] = None, pset: Optional[str] = None,
+              prop: Optional[str] = None, value: Optional[str] = None, op: str = "eq",
+              material: Optional[str] = None, storey: Optional[str] = None,
+              after: int = 0, limit: int = 100) -> Dict[str, Any]:
+        """Page through elements matching a type and/or property filter
+
+        Pages are keyed on the element id: pass the returned next_after
+        to get the following page.
+        """
+        where = ["e.is_type = 0", "e.id > ?"]
+        params: List[Any] = [after]
+
+        if ifc_type:
+            where.append("e.ifc_type = ?")
+            params.append(ifc_type.upper())
+
+        if prop:
+            condition = ["p.name = ?"]
+            condition_params: List[Any] = [prop]
+            if pset:
+                condition.append("p.pset = ?")
+                condition_params.append(pset)
+            if value is not None:
+                if op in COMPARISON_OPS:
+                    condition.append(f"p.num {COMPARISON_OPS[op]} ?")
+                    condition_params.append(float(value))
+                elif op == "contains":
+                    condition.append("p.value LIKE ?")
+                    condition_params.append(f"%{value}%")
+                elif op == "eq":
+                    condition.append("p.value = ?")
+                    condition_params.append(value)
+                else:
+                    raise ValueError(f"Unknown operator: {op}")
+            # Match on the occurrence or on its type
+            subquery = f"SELECT p.element_id FROM properties p WHERE {' AND '.join(condition)}"
+            where.append(f"(e.id IN ({subquery}) OR e.type_id IN ({subquery}))")
+            params.extend(condition_params * 2)
+
+        if material:
+            subquery = "SELECT element_id FROM materials WHERE material = ?"
+            where.append(f"(e.id IN ({subquery}) OR e.type_id IN ({subquery}))")
+            params.extend([material, material])
+
+        if storey:
+            where.append("e.storey_id = (SELECT id FROM elements WHERE global_id = ? LIMIT 1)")
+            params.append(storey)
+
+        limit = max(1, min(limit, 1000))
+        rows = self.db.execute(
+            f"SELECT e.* FROM elements e WHERE {' AND '.join(where)} ORDER BY e.id LIMIT ?",
+            params + [limit]
+        ).fetchall()
+        return {
+            "elements": [self._element_dict(row) for row in rows],
+            "count": len(rows),
+            "next_after": rows[-1]["id"] if len(rows) == limit else None
+        }
+
+    def type_counts(self) -> Dict[str, int]:
+        rows = self.db.execute(
+            "SELECT ifc_type, COUNT(*) AS n FROM elements WHERE is_type = 0 GROUP BY ifc_type ORDER BY n DESC"
+        ).fetchall()
+        return {row["ifc_type"]: row["n"] for row in rows}
+
+    def spatial_tree(self) -> List[Dict[str, Any]]:
+        """Project / site / building / storey / space hierarchy with element counts"""
+        rows = self.db.execute(
+            f"SELECT id, global_id, ifc_type, name, parent_id FROM elements "
+            f"WHERE ifc_type IN ({placeholders(SPATIAL_TYPES)}) ORDER BY id",
+            sorted(SPATIAL_TYPES)
+        ).fetchall()
+        counts = {
+            row["parent_id"]: row["n"] for row in self.db.execute(
+                "SELECT parent_id, COUNT(*) AS n FROM elements WHERE is_type = 0 GROUP BY parent_id"
+            )
+        }
+        nodes = {
+            row["id"]: {
+                "global_id": row["global_id"],
+                "type": row["ifc_type"],
+                "name": row["name"],
+                "element_count": counts.get(row["id"], 0),
+                "children": []
+            }
+            for row in rows
+        }
+        roots = []
+        for row in rows:
+            parent = nodes.get(row["parent_id"])
+            (parent["children"] if parent else roots).append(nodes[row["id"]])
+        return roots
+
+    def storeys(self) -> List[Dict[str, Any]]:
+        """Building storeys in file order with their element counts"""
+        return [
+            {"global_id": row["global_id"], "name": row["name"], "element_count": row["n"]}
+            for row in self.db.execute(
+                "SELECT s.global_id, s.name, "
+                "(SELECT COUNT(*) FROM elements e WHERE e.storey_id = s.id AND e.is_type = 0) AS n "
+                "FROM elements s WHERE s.ifc_type = 'IFCBUILDINGSTOREY' ORDER BY s.id"
+            )
+        ]
+
+    def iter_elements(self) -> Iterator[sqlite3.Row]:
+        """Every occurrence, for building derived indexes"""
+        yield from self.db.execute("SELECT * FROM elements WHERE is_type = 0 ORDER BY id")
+
+    def search_documents(self) -> Iterator[Dict[str, Any]]:
+        """Searchable text of every occurrence: attributes, type name, materials and text property values"""
+        rows = self.db.execute(
+            "SELECT e.global_id, e.ifc_type, e.name, e.tag, e.object_type, t.name AS type_name, "
+            "(SELECT group_concat(DISTINCT m.material) FROM materials m "
+            " WHERE m.element_id IN (e.id, e.type_id)) AS materials, "
+            "(SELECT group_concat(p.value, ' ') FROM properties p "
+            " WHERE p.element_id IN (e.id, e.type_id) AND p.num IS NULL AND p.kind = 'property' "
+            " AND p.value NOT IN ('True', 'False', 'Unknown', '')) AS text "
+            "FROM elements e LEFT JOIN elements t ON t.id = e.type_id WHERE e.is_type = 0"
+        )
+        for row in rows:
+            yield dict(row)
+
+    def meta(self) -> Dict[str, str]:
+        return {row["key"]: row["value"] for row in self.db.execute("SELECT key, value FROM meta")}
@@ -0,0 +1,287 @@
+"""
+Conversion scheduler for QGEN_IMPFRAG
+=====================================
+
+Prioritized job scheduler shared by interactive uploads, file-watcher
+conversions and batch backfills.
+
+Jobs are grouped into priority classes. Free worker slots are handed
+out with stride scheduling, so each class gets a share of throughput
+proportional to its weight, and a number of slots can be reserved for
+interactive work so that an upload never waits behind a full batch.
+
+Jobs also declare how many threads they use (a multithreaded converter,
+parallel tiles). A job is only started while the running jobs' threads
+leave room for it in the thread budget, so a few wide jobs do not
+oversubscribe the cores that many narrow ones would share. A job wider
+than the whole budget runs alone. While the next background job waits
+for threads, other background work waits behind it so that wide jobs
+are not starved; interactive jobs that fit are still started.
+
+Author: XQG4_AXIS Team
+"""
+
+import logging
+import threading
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+
+# Priority classes
+INTERACTIVE = "interactive"
+WATCH = "watch"
+BACKFILL = "backfill"
+
+PRIORITY_CLASSES = (INTERACTIVE, WATCH, BACKFILL)
+
+DEFAULT_WEIGHTS = {
+    INTERACTIVE: 8,
+    WATCH: 3,
+    BACKFILL: 1
+}
+
+# Stride scheduling numerator; a class advances by STRIDE / weight per dispatch
+STRIDE = 1 << 20
+
+
+class ScheduledJob:
+    """Handle for a job submitted to the scheduler"""
+
+    def __init__(self, job_id: str, priority_class: str, func: Callable, args: tuple, kwargs: dict,
+                 threads: int = 1):
+        self.job_id = job_id
+        self.priority_class = priority_class
+        self.threads = max(1, threads)
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.state = "queued"  # queued, running, done, cancelled
+        self.submitted_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self.result: Any = None
+        self.exception: Optional[BaseException] = None
+        self._done = threading.Event()
+
+    def wait(self, timeout: Optional[float] = None) -> Any:
+        """Block until the job has finished and return its result"""
+        if not self._done.wait(timeout):
+            raise TimeoutError(f"Job {self.job_id} still {self.state}")
+        if self.exception is not None:
+            raise self.exception
+        return self.result
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def queue_seconds(self) -> Optional[float]:
+        if self.started_at is None:
+            return None
+        return (self.started_at - self.submitted_at).total_seconds()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id,
+            "priority": self.priority_class,
+            "state": self.state,
+            "threads": self.threads,
+            "submitted_at": self.submitted_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
+
+
+class ConversionScheduler:
+    """Weighted fair scheduler with reserved interactive slots"""
+
+    def __init__(self, max_workers: int = 2, weights: Optional[Dict[str, int]] = None,
+                 reserved_interactive_slots: int = 1, logger: Optional[logging.Logger] = None,
+                 thread_budget: Optional[int] = None):
+        self.max_workers = max(1, max_workers)
+        # Threads all running jobs may use together; by default one per worker, i.e. no extra limit
+        self.thread_budget = max(1, thread_budget or self.max_workers)
+        self.weights = dict(DEFAULT_WEIGHTS)
+        self.weights.update(weights or {})
+        # At least one slot must stay usable by background work
+        self.reserved_interactive_slots = max(0, min(reserved_interactive_slots, self.max_workers - 1))
+        self.logger = logger or logging.getLogger(__name__)
+
+        self._queues: Dict[str, Deque[ScheduledJob]] = {cls: deque() for cls in PRIORITY_CLASSES}
+        self._pass: Dict[str, int] = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._jobs: Dict[str, ScheduledJob] = {}
+        self._running: Dict[str, int] = {cls: 0 for cls in PRIORITY_CLASSES}
+        self._running_threads = 0
+        self._cond = threading.Condition()
+        self._shutdown = False
+
+        self._workers: List[threading.Thread] = []
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"conversion-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, func: Callable, *args, priority_class: str = INTERACTIVE,
+               job_id: Optional[str] = None, threads: int = 1, **kwargs) -> ScheduledJob:
+        """Queue a callable under a priority class, using `threads` of the thread budget while it runs"""
+        if priority_class not in self._queues:
+            raise ValueError(f"Unknown priority class: {priority_class}")
+
+        job = ScheduledJob(job_id or uuid.uuid4().hex, priority_class, func, args, kwargs, threads)
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Scheduler is shut down")
+            queue = self._queues[priority_class]
+            if not queue and not self._running[priority_class]:
+                # A class returning from idle must not claim the slots it missed
+                self._pass[priority_class] = max(self._pass[priority_class], self._min_active_pass())
+            queue.append(job)
+            self._jobs[job.job_id] = job
+            self._cond.notify()
+
+        self.logger.debug(f"Queued job {job.job_id} ({priority_class}, {job.threads} threads)")
+        return job
+
+    def cancel(self, job_id: str) -> bool:
+        """Remove a queued job; running jobs must be cancelled by their owner"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state != "queued":
+                return False
+            self._queues[job.priority_class].remove(job)
+            self._finish(job, "cancelled")
+            return True
+
+    def get(self, job_id: str) -> Optional[ScheduledJob]:
+        with self._cond:
+            return self._jobs.get(job_id)
+
+    def queue_position(self, job_id: str) -> Optional[int]:
+        """Number of queued jobs that will be dispatched before this one (0 = next)"""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state != "queued":
+                return None
+
+            # Replay the dispatch order on copies of the queues, assuming that the
+            # running jobs all finish when nothing else fits
+            passes = dict(self._pass)
+            offsets = {cls: 0 for cls in PRIORITY_CLASSES}
+            running_threads = self._running_threads
+            position = 0
+            while True:
+                heads = {
+                    c: self._queues[c][offsets[c]]
+                    for c in PRIORITY_CLASSES if offsets[c] < len(self._queues[c])
+                }
+                cls = self._choose(heads, passes, running_threads)
+                if cls is None:
+                    running_threads = 0
+                    continue
+                if heads[cls] is job:
+                    return position
+                offsets[cls] += 1
+                passes[cls] += STRIDE // self.weights[cls]
+                running_threads += heads[cls].threads
+                position += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "max_workers": self.max_workers,
+                "thread_budget": self.thread_budget,
+                "running_threads": self._running_threads,
+                "reserved_interactive_slots": self.reserved_interactive_slots,
+                "weights": dict(self.weights),
+                "queued": {cls: len(q) for cls, q in self._queues.items()},
+                "running": dict(self._running)
+            }
+
+    def jobs(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            jobs = [job for job in self._jobs.values() if job.state in ("queued", "running")]
+        result = []
+        for job in jobs:
+            info = job.to_dict()
+            info["queue_position"] = self.queue_position(job.job_id)
+            result.append(info)
+        return result
+
+    def shutdown(self, wait: bool = True):
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for worker in self._workers:
+                worker.join()
+
+    def _min_active_pass(self) -> int:
+        active = [self._pass[c] for c in PRIORITY_CLASSES if self._queues[c] or self._running[c]]
+        return min(active) if active else max(self._pass.values())
+
+    def _next_job(self) -> Optional[ScheduledJob]:
+        """Pick the next dispatchable job; caller holds the lock"""
+        background_running = sum(n for cls, n in self._running.items() if cls != INTERACTIVE)
+        background_allowed = background_running < self.max_workers - self.reserved_interactive_slots
+
+        heads = {
+            cls: self._queues[cls][0] for cls in PRIORITY_CLASSES
+            if self._queues[cls] and (cls == INTERACTIVE or background_allowed)
+        }
+        cls = self._choose(heads, self._pass, self._running_threads)
+        if cls is None:
+            return None
+        self._pass[cls] += STRIDE // self.weights[cls]
+        return self._queues[cls].popleft()
+
+    def _choose(self, heads: Dict[str, ScheduledJob], passes: Dict[str, int],
+                running_threads: int) -> Optional[str]:
+        """Class whose head job starts next, in stride order among those that fit the thread budget"""
+        blocked = False
+        for cls in sorted(heads, key=lambda c: (passes[c], PRIORITY_CLASSES.index(c))):
+            # A background job waiting for threads is not overtaken by other background work,
+            # so wide jobs are not starved; interactive jobs that fit still start
+            if blocked and cls != INTERACTIVE:
+                continue
+            if not running_threads or running_threads + heads[cls].threads <= self.thread_budget:
+                return cls
+            if cls == INTERACTIVE:
+                return None
+            blocked = True
+        return None
+
+    def _worker_loop(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    if self._shutdown:
+                        return
+                    self._cond.wait()
+                    job = self._next_job()
+                job.state = "running"
+                job.started_at = datetime.now()
+                self._running[job.priority_class] += 1
+                self._running_threads += job.threads
+
+            try:
+                job.result = job.func(*job.args, **job.kwargs)
+            except BaseException as e:
+                self.logger.error(f"❌ Scheduled job {job.job_id} raised: {e}")
+                job.exception = e
+
+            with self._cond:
+                self._running[job.priority_class] -= 1
+                self._running_threads -= job.threads
+                self._finish(job, "done")
+                self._cond.notify_all()
+
+    def _finish(self, job: ScheduledJob, state: str):
+        """Mark a job finished and forget it; caller holds the lock"""
+        job.state = state
+        job.finished_at = datetime.now()
+        self._jobs.pop(job.job_id, None)
+        job._done.set()
@@ -0,0 +1,337 @@
+"""
+Element full-text search for QGEN_IMPFRAG
+=========================================
+
+One inverted index (SQLite FTS5) over element names, tags, types and
+text property values of every converted model. Each conversion
+replaces that model's documents in a single transaction, so the index
+grows incrementally and searching never opens a model.
+
+Tokenisation is tuned for BIM identifiers: a mark like "D-1203" is
+indexed as "d-1203", "d1203", "d" and "1203", so "D1203", "d-12" and
+"1203" all find it. Query terms match as prefixes; terms that find
+too little are widened to vocabulary words one or two edits away.
+
+Author: XQG4_AXIS Team
+"""
+
+import re
+import time
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from src.db import SqliteDatabase, placeholders
+
+
+SEPARATORS_RE = re.compile(r"[-_./\\]+")
+PARTS_RE = re.compile(r"[a-z]+|\d+")
+STRIP_CHARS = "\"'`,;:()[]{}<>!?#*"
+
+FUZZY_MIN_LENGTH = 4
+MAX_TERM_LENGTH = 32
+MAX_TEXT_CHARS = 4000
+# Count at most this many matches; broad terms stay fast on large catalogs
+MAX_CANDIDATES = 2000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS models (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    documents INTEGER NOT NULL DEFAULT 0,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS docs (
+    rowid INTEGER PRIMARY KEY,
+    model_id INTEGER NOT NULL,
+    global_id TEXT NOT NULL,
+    ifc_type TEXT,
+    name TEXT,
+    tag TEXT,
+    text TEXT,
+    tokens TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_docs_model ON docs(model_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+    name, tag, ifc_type, text, tokens,
+    content='docs', content_rowid='rowid',
+    tokenize="unicode61 remove_diacritics 2 tokenchars '-_./'",
+    prefix='2 3 4'
+);
+CREATE TABLE IF NOT EXISTS vocabulary (term TEXT PRIMARY KEY) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS vocabulary_deletes (
+    variant TEXT NOT NULL,
+    term TEXT NOT NULL,
+    PRIMARY KEY (variant, term)
+) WITHOUT ROWID;
+"""
+
+
+def normalize(text: str) -> str:
+    """Lower-case text with accents removed"""
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in text if not unicodedata.combining(c)).lower()
+
+
+def bim_tokens(text: Optional[str]) -> List[str]:
+    """Index terms of a text: whole identifiers, their compact form and their parts"""
+    if not text:
+        return []
+    tokens: List[str] = []
+    seen: Set[str] = set()
+
+    def add(token: str):
+        if token and token not in seen and len(token) <= MAX_TERM_LENGTH:
+            seen.add(token)
+            tokens.append(token)
+
+    for chunk in normalize(text).split():
+        chunk = chunk.strip(STRIP_CHARS)
+        if not chunk:
+            continue
+        add(chunk)
+        add(SEPARATORS_RE.sub("", chunk))
+        for part in PARTS_RE.findall(chunk):
+            add(part)
+            if part.isdigit() and part != part.lstrip("0"):
+                add(part.lstrip("0") or "0")
+    return tokens
+
+
+def query_terms(query: str) -> List[str]:
+    """Search terms of a query, one per whitespace-separated chunk"""
+    terms = []
+    for chunk in normalize(query).split():
+        compact = SEPARATORS_RE.sub("", chunk.strip(STRIP_CHARS))
+        compact = re.sub(r"[^\w]", "", compact)
+        if compact and compact not in terms:
+            terms.append(compact[:MAX_TERM_LENGTH])
+    return terms
+
+
+def _deletes(term: str) -> Set[str]:
+    return {term[:i] + term[i + 1:] for i in range(len(term))}
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """Edit distance counting a swap of neighbours as one edit, capped at limit + 1"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+def _fts_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+class SearchIndex:
+    """Full-text index shared by every model"""
+
+    def __init__(self, db_path, busy_timeout_ms: int = 30000):
+        self.db = SqliteDatabase(db_path, busy_timeout_ms=busy_timeout_ms)
+        self.db.executescript(SCHEMA)
+
+    def index_model(self, model: str, documents: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+        """Replace a model's documents
+
+        documents yield dicts with global_id, ifc_type, name, tag,
+        object_type, type_name, materials and text.
+        """
+        started = time.time()
+        rows = []
+        new_terms: Set[str] = set()
+        for doc in documents:
+            ifc_type = doc.get("ifc_type") or ""
+            type_words = [ifc_type, ifc_type[3:] if ifc_type.upper().startswith("IFC") else ""]
+            text = " ".join(t for t in (doc.get("object_type"), doc.get("type_name"), doc.get("materials"),
+                                        doc.get("text")) if t)
+            text = text[:MAX_TEXT_CHARS]
+            tokens = bim_tokens(" ".join(t for t in (doc.get("name"), doc.get("tag"), text, *type_words) if t))
+            # Typos are corrected in words, not in numbers
+            new_terms.update(t for t in tokens if len(t) >= FUZZY_MIN_LENGTH and not t.isdigit())
+            rows.append((doc["global_id"], ifc_type, doc.get("name"), doc.get("tag"), text, " ".join(tokens)))
+
+        with self.db.write() as conn:
+            existing = conn.execute("SELECT id FROM models WHERE name = ?", (model,)).fetchone()
+            if existing is not None:
+                model_id = existing["id"]
+                # External-content FTS needs the old values to remove them
+                conn.execute(
+                    "INSERT INTO docs_fts(docs_fts, rowid, name, tag, ifc_type, text, tokens) "
+                    "SELECT 'delete', rowid, name, tag, ifc_type, text, tokens FROM docs WHERE model_id = ?",
+                    (model_id,)
+                )
+                conn.execute("DELETE FROM docs WHERE model_id = ?", (model_id,))
+                conn.execute("UPDATE models SET documents = ?, indexed_at = ? WHERE id = ?",
+                             (len(rows), time.time(), model_id))
+            else:
+                model_id = conn.execute(
+                    "INSERT INTO models (name, documents, indexed_at) VALUES (?, ?, ?)",
+                    (model, len(rows), time.time())
+                ).lastrowid
+
+            conn.executemany(
+                "INSERT INTO docs (model_id, global_id, ifc_type, name, tag, text, tokens) VALUES (?,?,?,?,?,?,?)",
+                [(model_id,) + row for row in rows]
+            )
+            conn.execute(
+                "INSERT INTO docs_fts(rowid, name, tag, ifc_type, text, tokens) "
+                "SELECT rowid, name, tag, ifc_type, text, tokens FROM docs WHERE model_id = ?",
+                (model_id,)
+            )
+
+            added = [term for term in new_terms if conn.execute(
+                "INSERT OR IGNORE INTO vocabulary (term) VALUES (?)", (term,)
+            ).rowcount]
+            conn.executemany(
+                "INSERT OR IGNORE INTO vocabulary_deletes (variant, term) VALUES (?, ?)",
+                [(variant, term) for term in added for variant in _deletes(term)]
+            )
+
+        return {
+            "documents": len(rows),
+            "new_terms": len(added),
+            "seconds": round(time.time() - started, 3)
+        }
+
+    def remove_model(self, model: str) -> bool:
+        with self.db.write() as conn:
+            existing = conn.execute("SELECT id FROM models WHERE name = ?", (model,)).fetchone()
+            if existing is None:
+                return False
+            conn.execute(
+                "INSERT INTO docs_fts(docs_fts, rowid, name, tag, ifc_type, text, tokens) "
+                "SELECT 'delete', rowid, name, tag, ifc_type, text, tokens FROM docs WHERE model_id = ?",
+                (existing["id"],)
+            )
+            conn.execute("DELETE FROM docs WHERE model_id = ?", (existing["id"],))
+            conn.execute("DELETE FROM models WHERE id = ?", (existing["id"],))
+        return True
+
+    def _fuzzy_terms(self, term: str) -> List[str]:
+        """Vocabulary terms within one or two edits of term"""
+        if len(term) < FUZZY_MIN_LENGTH:
+            return []
+        variants = sorted(_deletes(term) | {term})
+        candidates = {
+            row["term"] for row in self.db.execute(
+                f"SELECT term FROM vocabulary_deletes WHERE variant IN ({placeholders(variants)})", variants
+            )
+        }
+        candidates.update(
+            row["term"] for row in self.db.execute(
+                f"SELECT term FROM vocabulary WHERE term IN ({placeholders(variants)})", variants
+            )
+        )
+        limit = 1 if len(term) < 8 else 2
+        return sorted(t for t in candidates if t != term and _edit_distance(term, t, limit) <= limit)
+
+    def _match(self, expressions: List[str], model_ids: Optional[List[int]], limit: int):
+        """Best `limit` matches and the number of matches, counted up to MAX_CANDIDATES"""
+        where = "WHERE docs_fts MATCH ?"
+        params: List[Any] = [" AND ".join(expressions)]
+        if model_ids is not None:
+            where += f" AND d.model_id IN ({placeholders(model_ids)})"
+            params.extend(model_ids)
+        rows = self.db.execute(
+            "SELECT d.rowid, d.global_id, d.ifc_type, d.name, d.tag, d.text, m.name AS model, "
+            "bm25(docs_fts, 10.0, 10.0, 2.0, 1.0, 4.0) AS score "
+            "FROM docs_fts JOIN docs d ON d.rowid = docs_fts.rowid JOIN models m ON m.id = d.model_id "
+            f"{where} ORDER BY score LIMIT ?",
+            params + [limit]
+        ).fetchall()
+        total = self.db.execute(
+            "SELECT count(*) AS n FROM (SELECT 1 FROM docs_fts JOIN docs d ON d.rowid = docs_fts.rowid "
+            f"{where} LIMIT ?)",
+            params + [MAX_CANDIDATES]
+        ).fetchone()["n"]
+        return rows, total
+
+    def search(self, query: str, models: Optional[List[str]] = None, limit: int = 20,
+               fuzzy: bool = True) -> Dict[str, Any]:
+        """Best matching elements as model, GlobalId, type, name and a snippet"""
+        started = time.perf_counter()
+        terms = query_terms(query)
+        if not terms:
+            return {"query": query, "results": [], "count": 0, "fuzzy": False, "query_ms": 0.0}
+        limit = max(1, min(limit, 200))
+
+        model_ids = None
+        if models:
+            model_ids = [row["id"] for row in self.db.execute(
+                f"SELECT id FROM models WHERE name IN ({placeholders(models)})", models
+            )]
+            if not model_ids:
+                return {"query": query, "results": [], "count": 0, "fuzzy": False, "query_ms": 0.0}
+
+        rows, total = self._match([f"tokens : {_fts_phrase(t)}*" for t in terms], model_ids, limit)
+        used_fuzzy = False
+        if fuzzy and len(rows) < limit:
+            expressions = []
+            for term in terms:
+                alternatives = [term] + self._fuzzy_terms(term)
+                expressions.append(
+                    "tokens : (" + " OR ".join(f"{_fts_phrase(t)}*" if t == term else _fts_phrase(t)
+                                               for t in alternatives) + ")"
+                )
+            if any(" OR " in e for e in expressions):
+                used_fuzzy = True
+                seen = {row["rowid"] for row in rows}
+                more, more_total = self._match(expressions, model_ids, limit)
+                rows = rows + [row for row in more if row["rowid"] not in seen][:limit - len(rows)]
+                total = max(total, more_total)
+
+        results = [{
+            "model": row["model"],
+            "global_id": row["global_id"],
+            "type": row["ifc_type"],
+            "name": row["name"],
+            "tag": row["tag"],
+            "snippet": self._snippet(row, terms)
+        } for row in rows]
+        return {
+            "query": query,
+            "results": results,
+            "count": len(results),
+            "matches": total if total < MAX_CANDIDATES else f"{MAX_CANDIDATES}+",
+            "fuzzy": used_fuzzy,
+            "query_ms": round((time.perf_counter() - started) * 1000, 2)
+        }
+
+    @staticmethod
+    def _snippet(row, terms: List[str], width: int = 80) -> str:
+        """Part of the first field mentioning a query term, with the term marked"""
+        for field in ("tag", "name", "text", "ifc_type"):
+            value = row[field]
+            if not value:
+                continue
+            folded = normalize(value)
+            compact_positions = [i for i, c in enumerate(folded) if c.isalnum()]
+            compact = "".join(folded[i] for i in compact_positions)
+            for term in terms:
+                at = compact.find(term)
+                if at == -1:
+                    continue
+                start = compact_positions[at]
+                end = compact_positions[min(at + len(term), len(compact_positions)) - 1] + 1
+                lo = max(0, start - width // 2)
+                hi = min(len(value), end + width // 2)
+                return (("…" if lo else "") + value[lo:start] + "[" + value[start:end] + "]"
+                        + value[end:hi] + ("…" if hi < len(value) else ""))
+        return row["name"] or ""
+
+    def stats(self) -> Dict[str, Any]:
+        row = self.db.execute("SELECT COUNT(*) AS models, COALESCE(SUM(documents), 0) AS documents FROM models").fetchone()
+        terms = self.db.execute("SELECT COUNT(*) AS n FROM vocabulary").fetchone()["n"]
+        return {"models": row["models"], "documents": row["documents"], "vocabulary": terms}
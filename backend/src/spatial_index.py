@@ -0,0 +1,330 @@
+"""
+Element spatial index for QGEN_IMPFRAG
+======================================
+
+Packed R-tree over per-element axis-aligned bounding boxes, built once
+per model from the geometry pass output (ifc_geometry.js --bounds) and
+persisted next to the model's other indexes. Answers box intersection,
+nearest-k and ray queries without loading the fragment.
+
+Leaves are ordered with Sort-Tile-Recursive packing in 3D and every
+level is stored contiguously, so the tree is a handful of flat arrays
+that load straight from disk.
+
+File layout (little-endian):
+    "QSPI" | uint32 version | uint32 header length | JSON header
+    float32 boxes[nodes * 6] | uint16 leaf type index[items] | GlobalId bytes[items * 22]
+
+Author: XQG4_AXIS Team
+"""
+
+import heapq
+import json
+import math
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+SPATIAL_INDEX_VERSION = 1
+NODE_SIZE = 8
+GLOBAL_ID_BYTES = 22
+
+BOUNDS_MAGIC = b"QBND"
+BOUNDS_RECORD = struct.Struct("<I6f")
+
+Box = Tuple[float, float, float, float, float, float]
+
+
+def read_bounds(path: Path) -> Iterable[Tuple[int, Box]]:
+    """(expressID, box) records written by ifc_geometry.js --bounds"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if data[:4] != BOUNDS_MAGIC:
+        raise ValueError(f"Not a bounds file: {path}")
+    count = struct.unpack_from("<I", data, 8)[0]
+    for record in BOUNDS_RECORD.iter_unpack(data[12:12 + count * BOUNDS_RECORD.size]):
+        yield record[0], record[1:]
+
+
+def _str_order(boxes: Sequence[Box], node_size: int) -> List[int]:
+    """Sort-Tile-Recursive ordering of item indices in 3D"""
+    n = len(boxes)
+    leaves = math.ceil(n / node_size)
+    slices = max(1, math.ceil(leaves ** (1 / 3)))
+    centers = [((b[0] + b[3]) / 2, (b[1] + b[4]) / 2, (b[2] + b[5]) / 2) for b in boxes]
+
+    x_slab = node_size * slices * slices
+    y_slab = node_size * slices
+    order: List[int] = []
+    by_x = sorted(range(n), key=lambda i: centers[i][0])
+    for xs in range(0, n, x_slab):
+        by_y = sorted(by_x[xs:xs + x_slab], key=lambda i: centers[i][1])
+        for ys in range(0, len(by_y), y_slab):
+            order.extend(sorted(by_y[ys:ys + y_slab], key=lambda i: centers[i][2]))
+    return order
+
+
+def build_spatial_index(items: List[Tuple[str, str, Box]], out_path: Path,
+                        node_size: int = NODE_SIZE) -> Dict[str, Any]:
+    """Pack (global_id, ifc_type, box) items into an index file (replaced atomically)"""
+    items = [item for item in items if all(math.isfinite(v) for v in item[2])]
+    order = _str_order([item[2] for item in items], node_size)
+    leaves = [items[i] for i in order]
+
+    types = sorted({item[1] for item in leaves})
+    type_index = {name: i for i, name in enumerate(types)}
+
+    boxes = array("f")
+    for _, _, box in leaves:
+        boxes.extend(box)
+
+    # Each upper level groups consecutive runs of node_size children
+    level_bounds = [len(leaves)]
+    level_start = 0
+    count = len(leaves)
+    while count > 1:
+        for start in range(level_start, level_start + count, node_size):
+            end = min(start + node_size, level_start + count)
+            box = [math.inf, math.inf, math.inf, -math.inf, -math.inf, -math.inf]
+            for child in range(start, end):
+                offset = child * 6
+                for axis in range(3):
+                    box[axis] = min(box[axis], boxes[offset + axis])
+                    box[axis + 3] = max(box[axis + 3], boxes[offset + axis + 3])
+            boxes.extend(box)
+        level_start += count
+        count = math.ceil(count / node_size)
+        level_bounds.append(level_start + count)
+
+    header = json.dumps({
+        "items": len(leaves),
+        "node_size": node_size,
+        "level_bounds": level_bounds,
+        "types": types
+    }).encode("utf-8")
+
+    type_ids = array("H", (type_index[item[1]] for item in leaves))
+    global_ids = b"".join(item[0].encode("ascii", "replace")[:GLOBAL_ID_BYTES].ljust(GLOBAL_ID_BYTES)
+                          for item in leaves)
+    if sys.byteorder != "little":
+        boxes.byteswap()
+        type_ids.byteswap()
+
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_path.with_name(f".{out_path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp, "wb") as f:
+            f.write(b"QSPI")
+            f.write(struct.pack("<II", SPATIAL_INDEX_VERSION, len(header)))
+            f.write(header)
+            f.write(boxes.tobytes())
+            f.write(type_ids.tobytes())
+            f.write(global_ids)
+        os.replace(tmp, out_path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+    return {
+        "elements": len(leaves),
+        "levels": len(level_bounds),
+        "size_bytes": out_path.stat().st_size,
+        "bounds": list(boxes[-6:]) if leaves else None
+    }
+
+
+class SpatialIndex:
+    """Loaded packed R-tree for one model"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            data = f.read()
+        if data[:4] != b"QSPI":
+            raise ValueError(f"Not a spatial index: {path}")
+        version, header_len = struct.unpack_from("<II", data, 4)
+        if version != SPATIAL_INDEX_VERSION:
+            raise ValueError(f"Unsupported spatial index version {version}: {path}")
+        offset = 12
+        header = json.loads(data[offset:offset + header_len])
+        offset += header_len
+
+        self.items: int = header["items"]
+        self.node_size: int = header["node_size"]
+        self.level_bounds: List[int] = header["level_bounds"]
+        self.types: List[str] = header["types"]
+        self.level_starts = [0] + self.level_bounds[:-1]
+
+        nodes = self.level_bounds[-1]
+        self.boxes = array("f")
+        self.boxes.frombytes(data[offset:offset + nodes * 24])
+        offset += nodes * 24
+        self.type_ids = array("H")
+        self.type_ids.frombytes(data[offset:offset + self.items * 2])
+        offset += self.items * 2
+        if sys.byteorder != "little":
+            self.boxes.byteswap()
+            self.type_ids.byteswap()
+        self._global_ids = data[offset:offset + self.items * GLOBAL_ID_BYTES]
+        self._positions: Optional[Dict[str, int]] = None
+
+    @property
+    def bounds(self) -> Optional[Box]:
+        if not self.items:
+            return None
+        return tuple(self.boxes[-6:])
+
+    def global_id(self, position: int) -> str:
+        start = position * GLOBAL_ID_BYTES
+        return self._global_ids[start:start + GLOBAL_ID_BYTES].decode("ascii").rstrip()
+
+    def box(self, position: int) -> Box:
+        offset = position * 6
+        return tuple(self.boxes[offset:offset + 6])
+
+    def element_bounds(self, global_id: str) -> Optional[Box]:
+        if self._positions is None:
+            self._positions = {self.global_id(i): i for i in range(self.items)}
+        position = self._positions.get(global_id)
+        return None if position is None else self.box(position)
+
+    def _hit(self, position: int, **extra) -> Dict[str, Any]:
+        hit = {
+            "global_id": self.global_id(position),
+            "type": self.types[self.type_ids[position]],
+            "bounds": self.boxes[position * 6:position * 6 + 6].tolist()
+        }
+        hit.update(extra)
+        return hit
+
+    def _children(self, level: int, node: int) -> Tuple[int, int]:
+        below = level - 1
+        first = self.level_starts[below] + (node - self.level_starts[level]) * self.node_size
+        return first, min(first + self.node_size, self.level_bounds[below])
+
+    def _type_filter(self, types: Optional[Iterable[str]]):
+        if not types:
+            return None
+        wanted = {t.upper() for t in types}
+        return {i for i, name in enumerate(self.types) if name in wanted}
+
+    def query_box(self, box: Box, types: Optional[Iterable[str]] = None,
+                  limit: int = 10000) -> List[Dict[str, Any]]:
+        """Elements whose bounds intersect box"""
+        if not self.items:
+            return []
+        allowed = self._type_filter(types)
+        b = self.boxes
+        min_x, min_y, min_z, max_x, max_y, max_z = box
+        found: List[int] = []
+        root = self.level_bounds[-1] - 1
+        # Stack of (level, first node, end node) runs of siblings
+        stack = [(len(self.level_bounds) - 1, root, root + 1)]
+        while stack and len(found) < limit:
+            level, first, last = stack.pop()
+            for node in range(first, last):
+                o = node * 6
+                x0, y0, z0, x1, y1, z1 = b[o:o + 6]
+                if x0 > max_x or y0 > max_y or z0 > max_z or x1 < min_x or y1 < min_y or z1 < min_z:
+                    continue
+                if level:
+                    stack.append((level - 1, *self._children(level, node)))
+                elif allowed is None or self.type_ids[node] in allowed:
+                    found.append(node)
+        return [self._hit(node) for node in found[:limit]]
+
+    def nearest(self, point: Tuple[float, float, float], k: int = 10,
+                types: Optional[Iterable[str]] = None,
+                max_distance: Optional[float] = None) -> List[Dict[str, Any]]:
+        """k elements whose bounds are closest to point (0 if it lies inside)"""
+        if not self.items:
+            return []
+        allowed = self._type_filter(types)
+        max_sq = max_distance ** 2 if max_distance is not None else math.inf
+        b = self.boxes
+        px, py, pz = point
+        root = self.level_bounds[-1] - 1
+        heap = [(0.0, len(self.level_bounds) - 1, root)]
+        results = []
+        while heap and len(results) < k:
+            dist_sq, level, node = heapq.heappop(heap)
+            if dist_sq > max_sq:
+                break
+            if level == 0:
+                # Filtered here, not while expanding: a single-element index has a leaf for a root
+                if allowed is None or self.type_ids[node] in allowed:
+                    results.append(self._hit(node, distance=round(math.sqrt(dist_sq), 4)))
+                continue
+            first, last = self._children(level, node)
+            for child in range(first, last):
+                o = child * 6
+                x0, y0, z0, x1, y1, z1 = b[o:o + 6]
+                dx = x0 - px if px < x0 else (px - x1 if px > x1 else 0.0)
+                dy = y0 - py if py < y0 else (py - y1 if py > y1 else 0.0)
+                dz = z0 - pz if pz < z0 else (pz - z1 if pz > z1 else 0.0)
+                heapq.heappush(heap, (dx * dx + dy * dy + dz * dz, level - 1, child))
+        return results
+
+    def _ray_entry(self, node: int, origin, inverse) -> Optional[float]:
+        """Distance along the ray to the box (slab test), or None if it misses"""
+        o = node * 6
+        box = self.boxes[o:o + 6]
+        t_min, t_max = 0.0, math.inf
+        for axis in range(3):
+            inv = inverse[axis]
+            lo, hi = box[axis], box[axis + 3]
+            if inv is None:
+                if origin[axis] < lo or origin[axis] > hi:
+                    return None
+                continue
+            t1 = (lo - origin[axis]) * inv
+            t2 = (hi - origin[axis]) * inv
+            if t1 > t2:
+                t1, t2 = t2, t1
+            if t1 > t_min:
+                t_min = t1
+            if t2 < t_max:
+                t_max = t2
+            if t_min > t_max:
+                return None
+        return t_min
+
+    def raycast(self, origin: Tuple[float, float, float], direction: Tuple[float, float, float],
+                max_distance: float = math.inf, limit: int = 10,
+                types: Optional[Iterable[str]] = None) -> List[Dict[str, Any]]:
+        """Elements whose bounds the ray passes through, nearest first
+
+        Hits are against bounding boxes, so callers picking exact
+        surfaces refine the short candidate list client-side.
+        """
+        if not self.items:
+            return []
+        length = math.sqrt(sum(c * c for c in direction))
+        if length == 0:
+            raise ValueError("Ray direction must not be zero")
+        direction = tuple(c / length for c in direction)
+        inverse = tuple(1.0 / c if c != 0 else None for c in direction)
+        allowed = self._type_filter(types)
+
+        root = self.level_bounds[-1] - 1
+        entry = self._ray_entry(root, origin, inverse)
+        heap = [] if entry is None else [(entry, len(self.level_bounds) - 1, root)]
+        results = []
+        while heap and len(results) < limit:
+            distance, level, node = heapq.heappop(heap)
+            if distance > max_distance:
+                break
+            if level == 0:
+                if allowed is None or self.type_ids[node] in allowed:
+                    results.append(self._hit(node, distance=round(distance, 4)))
+                continue
+            first, last = self._children(level, node)
+            for child in range(first, last):
+                child_entry = self._ray_entry(child, origin, inverse)
+                if child_entry is not None:
+                    heapq.heappush(heap, (child_entry, level - 1, child))
+        return results
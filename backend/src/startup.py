@@ -0,0 +1,90 @@
+"""
+Startup timing for QGEN_IMPFRAG
+===============================
+
+Milestones of a process's startup (imports done, services set up,
+ready), measured from the start of the process itself so that the
+interpreter's own startup is included. Both API servers log the report
+when they are ready and return it from /health.
+
+Both servers also load the environment file that
+scripts/environment-manager.py generates (.env.auto in the project
+root, or QGEN_IMPFRAG_ENV_FILE) before reading their configuration, so
+the capacity profile detected for the host applies without hand tuning.
+Only the capacity settings are taken from it (the platform, ports and
+directories it also lists are for the setup scripts), and variables
+already set in the environment take precedence.
+
+Author: XQG4_AXIS Team
+"""
+
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+
+# The settings of scripts/environment-manager.py's capacity profile
+CAPACITY_SETTINGS = (
+    "QGEN_IMPFRAG_MAX_CONCURRENT_CONVERSIONS",
+    "QGEN_IMPFRAG_CONVERTER_MAX_HEAP_MB",
+    "QGEN_IMPFRAG_THREAD_BUDGET",
+    "QGEN_IMPFRAG_SPLIT_PARTS",
+    "QGEN_IMPFRAG_SPLIT_MAX_PARALLEL",
+    "QGEN_IMPFRAG_SQLITE_CACHE_MB",
+    "QGEN_IMPFRAG_CONVERTER_CACHE_DIR",
+    "WEB_CONCURRENCY"
+)
+
+
+def load_env_file(path: Path, names: Iterable[str] = CAPACITY_SETTINGS) -> Dict[str, str]:
+    """Set the KEY=VALUE lines of an env file for the given names that are not set yet; returns the ones applied"""
+    try:
+        lines = Path(path).read_text(encoding="utf-8").splitlines()
+    except OSError:
+        return {}
+    names = set(names)
+    applied = {}
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+        name, value = (part.strip() for part in line.split("=", 1))
+        if len(value) >= 2 and value[0] == value[-1] and value[0] in "'\"":
+            value = value[1:-1]
+        if name in names and name not in os.environ:
+            os.environ[name] = applied[name] = value
+    return applied
+
+
+def process_age_seconds() -> Optional[float]:
+    """Seconds since this process started, from /proc; None where that is not available"""
+    try:
+        with open("/proc/self/stat", "rb") as f:
+            # The command name may contain spaces; fields continue after its closing parenthesis
+            fields = f.read().rsplit(b")", 1)[1].split()
+        with open("/proc/uptime", "rb") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupReport:
+    """Milestones of this process's startup, in milliseconds since it started"""
+
+    def __init__(self, mode: str = "server"):
+        self.mode = mode
+        # Without /proc, time counts from the creation of the report
+        self._origin = time.perf_counter() - (process_age_seconds() or 0.0)
+        self.marks: Dict[str, int] = {}
+
+    def mark(self, milestone: str) -> int:
+        self.marks[milestone] = round((time.perf_counter() - self._origin) * 1000)
+        return self.marks[milestone]
+
+    def summary(self) -> str:
+        return f"{self.mode}: " + ", ".join(f"{name} {ms} ms" for name, ms in self.marks.items())
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"mode": self.mode, "milestones_ms": dict(self.marks)}
@@ -0,0 +1,331 @@
+"""
+Fragment and IFC storage backends for QGEN_IMPFRAG
+==================================================
+
+Storage abstraction used by the API and the converter pipeline instead
+of hard-wired local directories. Every backend supports listing,
+streamed and ranged reads, atomic streamed writes, and a staging path
+that the Node converter can write to directly.
+
+Backends (selected with a storage URL):
+- file:///path         plain local directory (the default)
+- sharded:///path      local directory sharded by name hash, for very large catalogs
+- s3://bucket/prefix   S3-compatible object store (AWS, MinIO, ...), via boto3.
+                       Endpoint and credentials come from the standard AWS_*
+                       variables or ?endpoint=http://minio:9000 in the URL.
+
+Author: XQG4_AXIS Team
+"""
+
+import os
+import shutil
+import hashlib
+import tempfile
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+
+CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class StoredObject:
+    """Metadata of a stored file"""
+    name: str
+    size: int
+    modified: float
+    created: Optional[float] = None
+
+
+class Storage:
+    """Interface shared by the storage backends"""
+
+    def list(self, suffix: Optional[str] = None) -> List[StoredObject]:
+        raise NotImplementedError
+
+    def stat(self, name: str) -> Optional[StoredObject]:
+        raise NotImplementedError
+
+    def exists(self, name: str) -> bool:
+        return self.stat(name) is not None
+
+    def open_read(self, name: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        """Stream bytes [start, end] (inclusive) of an object"""
+        raise NotImplementedError
+
+    def write_stream(self, name: str, stream: BinaryIO) -> StoredObject:
+        """Store everything read from a file-like object; readers never see partial data"""
+        raise NotImplementedError
+
+    def delete(self, name: str) -> bool:
+        raise NotImplementedError
+
+    def local_path(self, name: str) -> Optional[Path]:
+        """Path of the object on the local file system, if it has one"""
+        return None
+
+    def staging_path(self, name: str) -> Path:
+        """Local path a producer (e.g. the converter) should write the object to"""
+        raise NotImplementedError
+
+    def commit(self, name: str, path: Path) -> StoredObject:
+        """Publish a file written to staging_path()"""
+        raise NotImplementedError
+
+    @contextmanager
+    def local_copy(self, name: str) -> Iterator[Path]:
+        """Local file with the object's content for the duration of the block"""
+        path = self.local_path(name)
+        if path is not None:
+            yield path
+            return
+
+        fd, tmp = tempfile.mkstemp(suffix=Path(name).suffix)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in self.open_read(name):
+                    f.write(chunk)
+            yield Path(tmp)
+        finally:
+            os.unlink(tmp)
+
+    def presigned_url(self, name: str, expires_seconds: int = 3600) -> Optional[str]:
+        """Time-limited direct download URL, for backends that support it"""
+        return None
+
+    def describe(self) -> str:
+        raise NotImplementedError
+
+
+class LocalStorage(Storage):
+    """Files in one local directory"""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, name: str) -> Path:
+        # Names are flat; never let one escape the root
+        if not name or Path(name).name != name or name in (".", ".."):
+            raise ValueError(f"Invalid object name: {name!r}")
+        return self.root / name
+
+    def _entries(self) -> Iterator[os.DirEntry]:
+        with os.scandir(self.root) as it:
+            for entry in it:
+                # Dot files are in-flight writes
+                if entry.is_file() and not entry.name.startswith("."):
+                    yield entry
+
+    def list(self, suffix: Optional[str] = None) -> List[StoredObject]:
+        objects = []
+        for entry in self._entries():
+            if suffix and not entry.name.lower().endswith(suffix):
+                continue
+            st = entry.stat()
+            objects.append(StoredObject(entry.name, st.st_size, st.st_mtime, st.st_ctime))
+        return objects
+
+    def stat(self, name: str) -> Optional[StoredObject]:
+        try:
+            st = self._path(name).stat()
+        except (FileNotFoundError, ValueError):
+            return None
+        return StoredObject(name, st.st_size, st.st_mtime, st.st_ctime)
+
+    def open_read(self, name: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        with open(self._path(name), "rb") as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                chunk = f.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def write_stream(self, name: str, stream: BinaryIO) -> StoredObject:
+        target = self.staging_path(name)
+        tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            with open(tmp, "wb") as f:
+                shutil.copyfileobj(stream, f, CHUNK_SIZE)
+            os.replace(tmp, target)
+        finally:
+            if tmp.exists():
+                tmp.unlink()
+        return self.stat(name)
+
+    def delete(self, name: str) -> bool:
+        try:
+            self._path(name).unlink()
+            return True
+        except FileNotFoundError:
+            return False
+
+    def local_path(self, name: str) -> Optional[Path]:
+        return self._path(name)
+
+    def staging_path(self, name: str) -> Path:
+        path = self._path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        return path
+
+    def commit(self, name: str, path: Path) -> StoredObject:
+        target = self._path(name)
+        if Path(path) != target:
+            os.replace(path, target)
+        return self.stat(name)
+
+    def describe(self) -> str:
+        return f"file://{self.root}"
+
+
+class ShardedLocalStorage(LocalStorage):
+    """Local files spread over hash-named subdirectories (ab/cd/name)
+
+    Keeps directories small when a catalog grows to hundreds of
+    thousands of models, which plain directories on network volumes
+    handle poorly.
+    """
+
+    def __init__(self, root: Path, depth: int = 2):
+        super().__init__(root)
+        self.depth = depth
+
+    def _path(self, name: str) -> Path:
+        flat = super()._path(name)
+        digest = hashlib.sha1(name.encode("utf-8")).hexdigest()
+        shards = [digest[i * 2:i * 2 + 2] for i in range(self.depth)]
+        return self.root.joinpath(*shards, flat.name)
+
+    def _entries(self) -> Iterator[os.DirEntry]:
+        stack = [str(self.root)]
+        while stack:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir():
+                        stack.append(entry.path)
+                    elif entry.is_file() and not entry.name.startswith("."):
+                        yield entry
+
+    def describe(self) -> str:
+        return f"sharded://{self.root}"
+
+
+class S3Storage(Storage):
+    """Objects in an S3-compatible bucket"""
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: Optional[str] = None,
+                 region: Optional[str] = None, staging_dir: Optional[Path] = None):
+        # Imported here: boto3 takes longer to import than the rest of the backend
+        try:
+            import boto3
+            from botocore.exceptions import ClientError
+        except ImportError:
+            raise RuntimeError("S3 storage requested but boto3 is not installed (pip install boto3)")
+        self._client_error = ClientError
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.endpoint_url = endpoint_url
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+        self.staging_dir = Path(staging_dir or tempfile.gettempdir()) / "qgen_impfrag_staging"
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+
+    def _key(self, name: str) -> str:
+        if not name or "/" in name or name in (".", ".."):
+            raise ValueError(f"Invalid object name: {name!r}")
+        return f"{self.prefix}/{name}" if self.prefix else name
+
+    def list(self, suffix: Optional[str] = None) -> List[StoredObject]:
+        objects = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        prefix = f"{self.prefix}/" if self.prefix else ""
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, Delimiter="/"):
+            for item in page.get("Contents", []):
+                name = item["Key"][len(prefix):]
+                if suffix and not name.lower().endswith(suffix):
+                    continue
+                objects.append(StoredObject(name, item["Size"], item["LastModified"].timestamp()))
+        return objects
+
+    def stat(self, name: str) -> Optional[StoredObject]:
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+        except self._client_error as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return None
+            raise
+        return StoredObject(name, head["ContentLength"], head["LastModified"].timestamp())
+
+    def open_read(self, name: str, start: int = 0, end: Optional[int] = None) -> Iterator[bytes]:
+        kwargs = {"Bucket": self.bucket, "Key": self._key(name)}
+        if start or end is not None:
+            kwargs["Range"] = f"bytes={start}-{'' if end is None else end}"
+        body = self.client.get_object(**kwargs)["Body"]
+        try:
+            for chunk in body.iter_chunks(CHUNK_SIZE):
+                yield chunk
+        finally:
+            body.close()
+
+    def write_stream(self, name: str, stream: BinaryIO) -> StoredObject:
+        # upload_fileobj switches to multipart for large streams; the object
+        # only becomes visible once the upload completes
+        self.client.upload_fileobj(stream, self.bucket, self._key(name))
+        return self.stat(name)
+
+    def delete(self, name: str) -> bool:
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+        return True
+
+    def staging_path(self, name: str) -> Path:
+        self._key(name)
+        return self.staging_dir / f"{uuid.uuid4().hex}-{name}"
+
+    def commit(self, name: str, path: Path) -> StoredObject:
+        try:
+            self.client.upload_file(str(path), self.bucket, self._key(name))
+        finally:
+            Path(path).unlink(missing_ok=True)
+        return self.stat(name)
+
+    def presigned_url(self, name: str, expires_seconds: int = 3600) -> Optional[str]:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self._key(name)},
+            ExpiresIn=expires_seconds
+        )
+
+    def describe(self) -> str:
+        location = f"s3://{self.bucket}/{self.prefix}"
+        return f"{location} ({self.endpoint_url})" if self.endpoint_url else location
+
+
+def make_storage(url: Optional[str], default_root: Path) -> Storage:
+    """Create a storage backend from a URL; empty means a local directory at default_root"""
+    if not url:
+        return LocalStorage(default_root)
+
+    parsed = urlparse(url)
+    if parsed.scheme == "file":
+        return LocalStorage(Path(parsed.path))
+    if parsed.scheme == "sharded":
+        depth = int(parse_qs(parsed.query).get("depth", ["2"])[0])
+        return ShardedLocalStorage(Path(parsed.path), depth=depth)
+    if parsed.scheme == "s3":
+        query = parse_qs(parsed.query)
+        return S3Storage(
+            bucket=parsed.netloc,
+            prefix=parsed.path,
+            endpoint_url=query.get("endpoint", [os.getenv("AWS_ENDPOINT_URL")])[0],
+            region=query.get("region", [None])[0]
+        )
+    if "://" not in url:
+        return LocalStorage(Path(url))
+    raise ValueError(f"Unsupported storage URL: {url}")
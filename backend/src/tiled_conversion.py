@@ -0,0 +1,188 @@
+"""
+Tiled conversion for QGEN_IMPFRAG
+=================================
+
+Converts one large IFC as several tiles at once: the model is split by
+storey (see ifc_split), every part is converted by its own converter
+process, and the fragments are published as a tile set the viewer loads
+together:
+
+    <model>.tiles.json              manifest: tiles, their elements, sizes and timings
+    <model>.<build>.tNN.fragtile    one fragment per tile
+
+Tiles are named per build, so readers of the previous manifest keep
+working until the new one replaces it. A tile set replaces the model's
+single <model>.frag, and a later single conversion removes the tile
+set. If any tile fails the others are stopped and nothing is published.
+
+Author: XQG4_AXIS Team
+"""
+
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.converter_runner import ConverterRunner, ConverterResult
+from src.ifc_prune import PruneProfile
+from src.ifc_split import split_ifc
+from src.storage import Storage
+from src.tracing import get_tracer
+
+
+TILESET_SUFFIX = ".tiles.json"
+TILE_SUFFIX = ".fragtile"
+
+
+def tileset_name(fragment_name: str) -> str:
+    return f"{Path(fragment_name).stem}{TILESET_SUFFIX}"
+
+
+def tile_name(fragment_name: str, build: str, number: int) -> str:
+    return f"{Path(fragment_name).stem}.{build}.t{number:02d}{TILE_SUFFIX}"
+
+
+class TiledConverter:
+    """Split, convert in parallel and publish large models as tile sets"""
+
+    def __init__(self, converter: ConverterRunner, fragment_storage: Storage, parts: int = 0,
+                 max_parallel: int = 0, logger: Optional[logging.Logger] = None):
+        self.converter = converter
+        self.fragment_storage = fragment_storage
+        self.parts = parts or min(os.cpu_count() or 1, 8)
+        self.max_parallel = max_parallel or self.parts
+        self.logger = logger or logging.getLogger(__name__)
+
+    def threads_for(self, input_size_bytes: int) -> int:
+        """Threads the tiles of an input of this size use at once, for the scheduler"""
+        parallel = min(self.max_parallel, self.parts)
+        return parallel * self.converter.threads_for(input_size_bytes // self.parts)
+
+    def read_manifest(self, fragment_name: str) -> Optional[Dict[str, Any]]:
+        name = tileset_name(fragment_name)
+        if not self.fragment_storage.exists(name):
+            return None
+        return json.loads(b"".join(self.fragment_storage.open_read(name)))
+
+    def convert(self, input_path: Path, fragment_name: str, job_id: str,
+                cancel_check: Optional[Callable[[], bool]] = None,
+                profile: Optional[PruneProfile] = None,
+                node_args: Optional[List[str]] = None) -> Tuple[ConverterResult, Optional[Dict[str, Any]]]:
+        """Convert input_path as a tile set; returns the combined result and the published manifest
+
+        node_args are passed to every tile's converter process.
+        """
+        started = time.time()
+        build = job_id[:8]
+        tracer = get_tracer()
+        # Tile threads do not inherit the caller's current span
+        parent = tracer.current_span()
+        with tempfile.TemporaryDirectory(prefix="qgen-split-") as work_dir:
+            with tracer.span("split", attributes={"qgen.split.parts": self.parts}) as span:
+                split = split_ifc(input_path, Path(work_dir), self.parts, profile)
+                span.set_attribute("qgen.split.element_groups", split["element_groups"])
+            parts = split["parts"]
+            self.logger.info(f"🧩 Split {Path(input_path).name} into {len(parts)} tiles in {split['seconds']}s")
+
+            # One failed tile stops the rest
+            failed = threading.Event()
+            stop = lambda: failed.is_set() or (cancel_check is not None and cancel_check())
+
+            def run_tile(number: int, part: Dict[str, Any]) -> ConverterResult:
+                tile_started = time.time()
+                with tracer.span(f"tile.t{number:02d}", parent=parent,
+                                 attributes={"qgen.tile.elements": part["elements"]}):
+                    result = self.converter.run(
+                        part["path"], self.fragment_storage.staging_path(tile_name(fragment_name, build, number)),
+                        job_id=f"{job_id}.t{number:02d}", cancel_check=stop, node_args=node_args
+                    )
+                part["seconds"] = round(time.time() - tile_started, 2)
+                if not result.success:
+                    failed.set()
+                return result
+
+            results: Dict[int, ConverterResult] = {}
+            with ThreadPoolExecutor(max_workers=min(self.max_parallel, len(parts)),
+                                    thread_name_prefix="qgen-tile") as pool:
+                futures = {pool.submit(run_tile, n, part): n for n, part in enumerate(parts, start=1)}
+                for future in as_completed(futures):
+                    results[futures[future]] = future.result()
+
+        ordered = [results[n] for n in sorted(results)]
+        # Report the tile that failed, not the ones it stopped
+        failures = [r for r in ordered if not r.success and not r.cancelled] or [r for r in ordered if not r.success]
+        result = ConverterResult(
+            job_id=job_id,
+            returncode=failures[0].returncode if failures else 0,
+            stdout="\n".join(r.stdout.strip() for r in ordered if r.stdout.strip()),
+            stderr="\n".join(r.stderr.strip() for r in failures if r.stderr.strip()),
+            cancelled=bool(failures) and failures[0].cancelled,
+            timed_out=any(r.timed_out for r in failures),
+            # Tiles run side by side; the largest tile's process is the one that needed the biggest heap
+            peak_memory_mb=max((r.peak_memory_mb for r in ordered if r.peak_memory_mb is not None), default=None)
+        )
+        if not result.success:
+            for number in range(1, len(parts) + 1):
+                staging = self.fragment_storage.staging_path(tile_name(fragment_name, build, number))
+                if staging.exists():
+                    staging.unlink()
+            return result, None
+        return result, self._publish(fragment_name, build, parts, split, started)
+
+    def _publish(self, fragment_name: str, build: str, parts: List[Dict[str, Any]], split: Dict[str, Any],
+                 started: float) -> Dict[str, Any]:
+        previous = self.read_manifest(fragment_name)
+        tiles = []
+        for number, part in enumerate(parts, start=1):
+            name = tile_name(fragment_name, build, number)
+            stored = self.fragment_storage.commit(name, self.fragment_storage.staging_path(name))
+            tiles.append({
+                "file": name,
+                "url": f"/api/fragments/{name}",
+                "size_mb": round(stored.size / (1024 * 1024), 2),
+                "elements": part["elements"],
+                "structures": part["structures"],
+                "entities": part["entities"],
+                "ifc_size_mb": round(part["size_bytes"] / (1024 * 1024), 2),
+                "seconds": part["seconds"]
+            })
+        size_mb = round(sum(t["size_mb"] for t in tiles), 2)
+        seconds = round(time.time() - started, 2)
+        manifest = {
+            "model": Path(fragment_name).stem,
+            "build": build,
+            "tiles": tiles,
+            "size_mb": size_mb,
+            "split": {k: split[k] for k in ("entities_in", "element_groups", "bytes_in", "profile", "seconds")},
+            "conversion_seconds": seconds,
+            # Sum of the tile conversions: roughly what one process would have taken
+            "tile_seconds": round(sum(t["seconds"] for t in tiles), 2),
+            "created_at": datetime.now().isoformat()
+        }
+        self.fragment_storage.write_stream(tileset_name(fragment_name),
+                                           io.BytesIO(json.dumps(manifest, indent=2).encode("utf-8")))
+
+        # The tile set replaces the single fragment and the previous build's tiles
+        self.fragment_storage.delete(fragment_name)
+        current = {t["file"] for t in tiles}
+        for tile in (previous or {}).get("tiles", []):
+            if tile["file"] not in current:
+                self.fragment_storage.delete(tile["file"])
+        self.logger.info(f"✅ Published {len(tiles)} tiles of {fragment_name} ({size_mb} MB) in {seconds}s")
+        return manifest
+
+    def discard(self, fragment_name: str) -> bool:
+        """Remove a model's tile set, after it was converted to a single fragment again"""
+        manifest = self.read_manifest(fragment_name)
+        if manifest is None:
+            return False
+        for tile in manifest["tiles"]:
+            self.fragment_storage.delete(tile["file"])
+        return self.fragment_storage.delete(tileset_name(fragment_name))
@@ -0,0 +1,363 @@
+"""
+Request and job tracing for QGEN_IMPFRAG
+========================================
+
+One trace per conversion, from the HTTP request through the scheduler
+queue into the converter process. The W3C trace context (traceparent)
+is taken from the incoming request or created for it, handed to the job
+and passed to ifc_converter.js in the TRACEPARENT environment variable;
+the converter writes its own spans to the file named by
+QGEN_TRACE_FILE, which are exported with the rest:
+
+    POST /api/convert              server span
+      upload.receive
+      queue.wait
+      conversion                   the scheduled job
+        prune | split
+        converter                  one per converter process (tiles run side by side)
+          converter.startup        ifc_converter.js: process start to modules loaded
+          ifc.read
+          ifc.process              one child per importer phase
+          fragments.write
+        indexes
+      fragments.commit             publishing the converted output
+
+Spans are exported as OTLP/JSON: appended to a file (one
+ExportTraceServiceRequest per line, the format of the OpenTelemetry
+collector's file exporter and otlpjsonfile receiver), or posted in
+batches to an OTLP/HTTP collector (http://collector:4318/v1/traces).
+Without an exporter trace ids are still created and propagated, so log
+lines carrying them can be matched up.
+
+Author: XQG4_AXIS Team
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# OTLP span kinds
+INTERNAL, SERVER, CLIENT, PRODUCER, CONSUMER = 1, 2, 3, 4, 5
+STATUS_OK, STATUS_ERROR = 1, 2
+
+EXPORT_BATCH_SIZE = 256
+EXPORT_INTERVAL_SECONDS = 2.0
+
+# The span current in this thread, whichever tracer made it
+_current_span: ContextVar[Optional["Span"]] = ContextVar("qgen_current_span", default=None)
+
+
+@dataclass(frozen=True)
+class SpanContext:
+    trace_id: str
+    span_id: str
+    sampled: bool = True
+
+    @property
+    def traceparent(self) -> str:
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    @classmethod
+    def parse(cls, traceparent: Optional[str]) -> Optional["SpanContext"]:
+        match = TRACEPARENT_RE.match((traceparent or "").strip().lower())
+        if match is None or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+            return None
+        return cls(match.group(1), match.group(2), bool(int(match.group(3), 16) & 1))
+
+
+Parent = Union["Span", SpanContext, str, None]
+
+
+def _new_id(size: int) -> str:
+    return os.urandom(size).hex()
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, (list, tuple)):
+        return {"arrayValue": {"values": [_otlp_value(v) for v in value]}}
+    return {"stringValue": str(value)}
+
+
+def otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class Span:
+    """A timed operation; end() hands it to the tracer's exporter"""
+
+    def __init__(self, tracer: "Tracer", name: str, context: SpanContext, parent_id: Optional[str],
+                 kind: int = INTERNAL, start_ns: Optional[int] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.name = name
+        self.context = context
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start_ns = start_ns or time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = 0
+        self.status_message = ""
+
+    @property
+    def traceparent(self) -> str:
+        return self.context.traceparent
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_error(self, message: str):
+        self.status, self.status_message = STATUS_ERROR, message[:500]
+
+    def end(self, end_ns: Optional[int] = None):
+        if self.end_ns is not None:
+            return
+        self.end_ns = end_ns or time.time_ns()
+        self.tracer.export(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        span = {
+            "traceId": self.context.trace_id,
+            "spanId": self.context.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": otlp_attributes(self.attributes),
+            "status": {"code": self.status, "message": self.status_message} if self.status else {}
+        }
+        if self.parent_id:
+            span["parentSpanId"] = self.parent_id
+        return span
+
+
+class FileExporter:
+    """Appends OTLP/JSON export requests to <dir>/traces-<date>.jsonl"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, request: Dict[str, Any]):
+        line = json.dumps(request, separators=(",", ":")) + "\n"
+        path = self.directory / f"traces-{datetime.now():%Y-%m-%d}.jsonl"
+        with self._lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+class OtlpHttpExporter:
+    """Posts OTLP/JSON export requests to a collector's /v1/traces"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0, logger: Optional[logging.Logger] = None):
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger(__name__)
+
+    def export(self, request: Dict[str, Any]):
+        body = json.dumps(request, separators=(",", ":")).encode("utf-8")
+        http_request = urllib.request.Request(self.endpoint, data=body, method="POST",
+                                              headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(http_request, timeout=self.timeout) as response:
+                response.read()
+        except OSError as e:
+            self.logger.warning(f"⚠️ Trace export to {self.endpoint} failed: {e}")
+
+
+class Tracer:
+    """Creates spans and exports them in batches from a background thread"""
+
+    def __init__(self, service_name: str, exporter=None, logger: Optional[logging.Logger] = None):
+        self.service_name = service_name
+        self.exporter = exporter
+        self.logger = logger or logging.getLogger(__name__)
+        self._pending: "queue.Queue[tuple]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def current_span(self) -> Optional[Span]:
+        return _current_span.get()
+
+    def start_span(self, name: str, parent: Parent = None, kind: int = INTERNAL,
+                   attributes: Optional[Dict[str, Any]] = None, start_ns: Optional[int] = None) -> Span:
+        """A new span under parent (a span, context or traceparent), else under the current span"""
+        if parent is None:
+            parent = self.current_span()
+        if isinstance(parent, str):
+            parent = SpanContext.parse(parent)
+        if isinstance(parent, Span):
+            parent = parent.context
+        if parent is None:
+            context, parent_id = SpanContext(_new_id(16), _new_id(8)), None
+        else:
+            context, parent_id = SpanContext(parent.trace_id, _new_id(8), parent.sampled), parent.span_id
+        return Span(self, name, context, parent_id, kind, start_ns, attributes)
+
+    @contextmanager
+    def span(self, name: str, parent: Parent = None, kind: int = INTERNAL,
+             attributes: Optional[Dict[str, Any]] = None):
+        """Run a block in a span that is current for the calling thread"""
+        span = self.start_span(name, parent, kind, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.set_error(f"{type(e).__name__}: {e}")
+            raise
+        finally:
+            _current_span.reset(token)
+            span.end()
+
+    def activate(self, span: Span):
+        """Make span current until deactivate(token), for spans opened and closed in separate hooks"""
+        return _current_span.set(span)
+
+    def deactivate(self, token):
+        _current_span.reset(token)
+
+    def record(self, name: str, start_ns: int, end_ns: int, parent: Parent = None,
+               attributes: Optional[Dict[str, Any]] = None) -> Span:
+        """Export an interval measured elsewhere, e.g. time spent in a queue"""
+        span = self.start_span(name, parent, attributes=attributes, start_ns=start_ns)
+        span.end(max(end_ns, start_ns))
+        return span
+
+    def import_spans(self, path: Path, service_name: str):
+        """Export spans another process wrote as a JSON list (see ifc_converter.js)"""
+        if not self.enabled:
+            return
+        try:
+            raw = json.loads(Path(path).read_text(encoding="utf-8") or "[]")
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"⚠️ Could not read spans from {path}: {e}")
+            return
+        spans = []
+        for item in raw:
+            span = {
+                "traceId": item["traceId"],
+                "spanId": item["spanId"],
+                "name": item["name"],
+                "kind": item.get("kind", INTERNAL),
+                "startTimeUnixNano": str(item["startTimeUnixNano"]),
+                "endTimeUnixNano": str(item.get("endTimeUnixNano") or item["startTimeUnixNano"]),
+                "attributes": otlp_attributes(item.get("attributes") or {}),
+                "status": item.get("status") or {}
+            }
+            if item.get("parentSpanId"):
+                span["parentSpanId"] = item["parentSpanId"]
+            spans.append(span)
+        for span in spans:
+            self._enqueue(service_name, span)
+
+    def export(self, span: Span):
+        if self.enabled and span.context.sampled:
+            self._enqueue(self.service_name, span.to_otlp())
+
+    def _enqueue(self, service_name: str, span: Dict[str, Any]):
+        self._pending.put((service_name, span))
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="qgen-trace-export", daemon=True)
+                self._thread.start()
+
+    def flush(self):
+        """Export everything pending now (e.g. before a worker process exits)"""
+        batch = []
+        while True:
+            try:
+                batch.append(self._pending.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self._export_batch(batch)
+
+    def _run(self):
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + EXPORT_INTERVAL_SECONDS
+            while len(batch) < EXPORT_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._export_batch(batch)
+
+    def _export_batch(self, batch: List[tuple]):
+        by_service: Dict[str, List[Dict[str, Any]]] = {}
+        for service_name, span in batch:
+            by_service.setdefault(service_name, []).append(span)
+        request = {"resourceSpans": [{
+            "resource": {"attributes": otlp_attributes({"service.name": service_name})},
+            "scopeSpans": [{"scope": {"name": "qgen_impfrag"}, "spans": spans}]
+        } for service_name, spans in by_service.items()]}
+        try:
+            self.exporter.export(request)
+        except Exception as e:
+            self.logger.warning(f"⚠️ Trace export failed: {e}")
+
+
+_tracer = Tracer("qgen-impfrag")
+
+
+def configure_tracing(service_name: str, export: str = "", reports_dir: Optional[Path] = None,
+                      logger: Optional[logging.Logger] = None) -> Tracer:
+    """Set up the process-wide tracer
+
+    export is "" (ids only, nothing exported), "file" (reports_dir/traces)
+    or the URL of an OTLP/HTTP collector's /v1/traces endpoint.
+    """
+    global _tracer
+    exporter = None
+    if export == "file":
+        exporter = FileExporter(Path(reports_dir or ".") / "traces")
+    elif export.startswith(("http://", "https://")):
+        exporter = OtlpHttpExporter(export, logger=logger)
+    elif export:
+        raise ValueError(f"Unknown trace export: {export!r} (use file or an http(s):// OTLP endpoint)")
+    _tracer = Tracer(service_name, exporter, logger)
+    return _tracer
+
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+
+def current_traceparent() -> Optional[str]:
+    """traceparent of the calling thread's span, to hand to work that runs elsewhere"""
+    span = _current_span.get()
+    return span.traceparent if span is not None else None
+
+
+# Spans still queued when the process exits
+atexit.register(lambda: _tracer.flush() if _tracer.enabled else None)
@@ -0,0 +1,540 @@
+"""
+Shared work queue for QGEN_IMPFRAG conversion workers
+=====================================================
+
+Queue of conversion jobs that worker processes on any host can pull
+from. A claimed job is leased to one worker for a limited time; the
+worker renews the lease with heartbeats while the converter runs. If a
+worker dies its lease expires and the job goes back to the queue until
+it has used up its attempts. Records of finished jobs are purged after
+the job retention period.
+
+Backends:
+- Redis (redis://host:port/db), for workers spread over several hosts
+- SQLite (sqlite:///path/to/queue.sqlite3), for several workers on one host
+
+Author: XQG4_AXIS Team
+"""
+
+import json
+import time
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from src.db import SqliteDatabase, placeholders
+from src.scheduler import PRIORITY_CLASSES, INTERACTIVE
+
+
+# Queue record states
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+
+@dataclass
+class Lease:
+    """A job claimed by a worker"""
+    job_id: str
+    payload: Dict[str, Any]
+    priority_class: str
+    attempt: int
+    expires_at: float
+
+
+class WorkQueue:
+    """Interface shared by the queue backends"""
+
+    def __init__(self, max_attempts: int = 3, logger: Optional[logging.Logger] = None):
+        self.max_attempts = max_attempts
+        self.logger = logger or logging.getLogger(__name__)
+
+    def enqueue(self, job_id: str, payload: Dict[str, Any], priority_class: str = INTERACTIVE):
+        raise NotImplementedError
+
+    def claim(self, worker_id: str, lease_seconds: float) -> Optional[Lease]:
+        """Lease the highest-priority pending job, oldest first"""
+        raise NotImplementedError
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float,
+                  status: Optional[Dict[str, Any]] = None) -> bool:
+        """Renew a lease; False if the worker lost it or the job was cancelled"""
+        raise NotImplementedError
+
+    def complete(self, job_id: str, worker_id: str, result: Dict[str, Any]):
+        raise NotImplementedError
+
+    def fail(self, job_id: str, worker_id: str, error: str, retry: bool = True):
+        """Record a failed attempt; retried until max_attempts is reached"""
+        raise NotImplementedError
+
+    def cancel(self, job_id: str) -> bool:
+        """Cancel a pending job or flag a leased one for its worker"""
+        raise NotImplementedError
+
+    def requeue_expired(self) -> int:
+        """Return jobs of lost workers to the queue"""
+        raise NotImplementedError
+
+    def position(self, job_id: str) -> Optional[int]:
+        """Number of pending jobs that will be claimed before this one"""
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def purge(self, retention_days: float) -> int:
+        """Delete the records of jobs finished before the retention period"""
+        raise NotImplementedError
+
+    def maintenance(self, retention_days: float) -> int:
+        """Purge expired records; run with the job store's maintenance"""
+        purged = self.purge(retention_days)
+        self.logger.info(f"🧹 Work queue maintenance: {purged} purged")
+        return purged
+
+
+QUEUE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS work_queue (
+    job_id TEXT PRIMARY KEY,
+    payload TEXT NOT NULL,
+    priority_rank INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker_id TEXT,
+    lease_expires REAL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    enqueued_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    status TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_work_queue_pending ON work_queue (state, priority_rank, enqueued_at);
+CREATE INDEX IF NOT EXISTS idx_work_queue_leases ON work_queue (state, lease_expires);
+"""
+
+
+class SqliteWorkQueue(WorkQueue):
+    """Work queue in a local SQLite database, for workers on one host"""
+
+    def __init__(self, db_path: Path, max_attempts: int = 3, logger: Optional[logging.Logger] = None):
+        super().__init__(max_attempts, logger)
+        self.db = SqliteDatabase(db_path)
+        self.db.executescript(QUEUE_SCHEMA)
+
+    def enqueue(self, job_id: str, payload: Dict[str, Any], priority_class: str = INTERACTIVE):
+        now = time.time()
+        with self.db.write() as conn:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO work_queue
+                    (job_id, payload, priority_rank, state, enqueued_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (job_id, json.dumps(payload), PRIORITY_CLASSES.index(priority_class), PENDING, now, now)
+            )
+
+    def claim(self, worker_id: str, lease_seconds: float) -> Optional[Lease]:
+        now = time.time()
+        with self.db.write() as conn:
+            row = conn.execute(
+                """
+                SELECT * FROM work_queue WHERE state = ?
+                ORDER BY priority_rank, enqueued_at LIMIT 1
+                """,
+                (PENDING,)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                """
+                UPDATE work_queue SET state = ?, worker_id = ?, lease_expires = ?,
+                    attempts = attempts + 1, updated_at = ?
+                WHERE job_id = ?
+                """,
+                (LEASED, worker_id, now + lease_seconds, now, row["job_id"])
+            )
+        return Lease(
+            job_id=row["job_id"],
+            payload=json.loads(row["payload"]),
+            priority_class=PRIORITY_CLASSES[row["priority_rank"]],
+            attempt=row["attempts"] + 1,
+            expires_at=now + lease_seconds
+        )
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float,
+                  status: Optional[Dict[str, Any]] = None) -> bool:
+        now = time.time()
+        with self.db.write() as conn:
+            cursor = conn.execute(
+                """
+                UPDATE work_queue SET lease_expires = ?, updated_at = ?, status = COALESCE(?, status)
+                WHERE job_id = ? AND worker_id = ? AND state = ? AND cancel_requested = 0
+                """,
+                (now + lease_seconds, now, json.dumps(status, default=str) if status else None,
+                 job_id, worker_id, LEASED)
+            )
+            return cursor.rowcount > 0
+
+    def complete(self, job_id: str, worker_id: str, result: Dict[str, Any]):
+        self._finish(job_id, worker_id, DONE, status=result)
+
+    def fail(self, job_id: str, worker_id: str, error: str, retry: bool = True):
+        now = time.time()
+        with self.db.write() as conn:
+            row = conn.execute(
+                "SELECT attempts, cancel_requested FROM work_queue WHERE job_id = ? AND worker_id = ?",
+                (job_id, worker_id)
+            ).fetchone()
+            if row is None:
+                return
+            if row["cancel_requested"]:
+                state = CANCELLED
+            elif retry and row["attempts"] < self.max_attempts:
+                state = PENDING
+            else:
+                state = FAILED
+            conn.execute(
+                """
+                UPDATE work_queue SET state = ?, worker_id = NULL, lease_expires = NULL,
+                    error = ?, updated_at = ?
+                WHERE job_id = ?
+                """,
+                (state, error, now, job_id)
+            )
+
+    def cancel(self, job_id: str) -> bool:
+        now = time.time()
+        with self.db.write() as conn:
+            cursor = conn.execute(
+                "UPDATE work_queue SET state = ?, updated_at = ? WHERE job_id = ? AND state = ?",
+                (CANCELLED, now, job_id, PENDING)
+            )
+            if cursor.rowcount:
+                return True
+            cursor = conn.execute(
+                "UPDATE work_queue SET cancel_requested = 1, updated_at = ? WHERE job_id = ? AND state = ?",
+                (now, job_id, LEASED)
+            )
+            return cursor.rowcount > 0
+
+    def requeue_expired(self) -> int:
+        now = time.time()
+        with self.db.write() as conn:
+            expired = conn.execute(
+                "SELECT job_id, attempts, cancel_requested FROM work_queue WHERE state = ? AND lease_expires < ?",
+                (LEASED, now)
+            ).fetchall()
+            for row in expired:
+                if row["cancel_requested"]:
+                    state = CANCELLED
+                elif row["attempts"] < self.max_attempts:
+                    state = PENDING
+                else:
+                    state = FAILED
+                conn.execute(
+                    """
+                    UPDATE work_queue SET state = ?, worker_id = NULL, lease_expires = NULL,
+                        error = 'Worker lost', updated_at = ?
+                    WHERE job_id = ?
+                    """,
+                    (state, now, row["job_id"])
+                )
+        if expired:
+            self.logger.warning(f"♻️ Requeued {len(expired)} jobs from lost workers")
+        return len(expired)
+
+    def position(self, job_id: str) -> Optional[int]:
+        row = self.db.execute(
+            "SELECT priority_rank, enqueued_at FROM work_queue WHERE job_id = ? AND state = ?",
+            (job_id, PENDING)
+        ).fetchone()
+        if row is None:
+            return None
+        return self.db.execute(
+            """
+            SELECT COUNT(*) FROM work_queue WHERE state = ? AND (
+                priority_rank < ? OR (priority_rank = ? AND enqueued_at < ?)
+            )
+            """,
+            (PENDING, row["priority_rank"], row["priority_rank"], row["enqueued_at"])
+        ).fetchone()[0]
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self.db.execute("SELECT * FROM work_queue WHERE job_id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        return {
+            "job_id": row["job_id"],
+            "state": row["state"],
+            "priority": PRIORITY_CLASSES[row["priority_rank"]],
+            "attempts": row["attempts"],
+            "worker_id": row["worker_id"],
+            "status": json.loads(row["status"]) if row["status"] else None,
+            "error": row["error"]
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        rows = self.db.execute("SELECT state, COUNT(*) AS n FROM work_queue GROUP BY state").fetchall()
+        return {"backend": "sqlite", "states": {row["state"]: row["n"] for row in rows}}
+
+    def purge(self, retention_days: float) -> int:
+        cutoff = time.time() - retention_days * 86400
+        with self.db.write() as conn:
+            purged = conn.execute(
+                f"DELETE FROM work_queue WHERE updated_at < ? AND state IN ({placeholders(FINISHED_STATES)})",
+                (cutoff, *FINISHED_STATES)
+            ).rowcount
+        if purged:
+            self.db.compact()
+        return purged
+
+    def _finish(self, job_id: str, worker_id: str, state: str, status: Dict[str, Any]):
+        with self.db.write() as conn:
+            conn.execute(
+                """
+                UPDATE work_queue SET state = ?, lease_expires = NULL, status = ?, updated_at = ?
+                WHERE job_id = ? AND worker_id = ?
+                """,
+                (state, json.dumps(status, default=str), time.time(), job_id, worker_id)
+            )
+
+
+# Pops the first pending job across the priority lists and leases it atomically
+REDIS_CLAIM_SCRIPT = """
+for i = 1, #KEYS - 1 do
+    local job_id = redis.call('LPOP', KEYS[i])
+    if job_id then
+        redis.call('ZADD', KEYS[#KEYS], ARGV[1], job_id)
+        return job_id
+    end
+end
+return false
+"""
+
+
+class RedisWorkQueue(WorkQueue):
+    """Work queue in Redis, for workers on several hosts"""
+
+    def __init__(self, url: str, prefix: str = "qgen_impfrag:queue", max_attempts: int = 3,
+                 logger: Optional[logging.Logger] = None):
+        super().__init__(max_attempts, logger)
+        # Imported here, so that SQLite queues and plain API servers do not load it
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("Redis queue requested but the redis package is not installed")
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self._claim = self.client.register_script(REDIS_CLAIM_SCRIPT)
+
+    def _pending_key(self, priority_class: str) -> str:
+        return f"{self.prefix}:pending:{priority_class}"
+
+    def _job_key(self, job_id: str) -> str:
+        return f"{self.prefix}:job:{job_id}"
+
+    @property
+    def _leases_key(self) -> str:
+        return f"{self.prefix}:leases"
+
+    @property
+    def _finished_key(self) -> str:
+        # Finished job IDs scored by finish time, for purge()
+        return f"{self.prefix}:finished"
+
+    def enqueue(self, job_id: str, payload: Dict[str, Any], priority_class: str = INTERACTIVE):
+        pipe = self.client.pipeline()
+        pipe.delete(self._job_key(job_id))
+        pipe.zrem(self._finished_key, job_id)
+        pipe.hset(self._job_key(job_id), mapping={
+            "payload": json.dumps(payload),
+            "priority": priority_class,
+            "state": PENDING,
+            "attempts": 0,
+            "enqueued_at": time.time()
+        })
+        pipe.rpush(self._pending_key(priority_class), job_id)
+        pipe.execute()
+
+    def claim(self, worker_id: str, lease_seconds: float) -> Optional[Lease]:
+        expires_at = time.time() + lease_seconds
+        keys = [self._pending_key(cls) for cls in PRIORITY_CLASSES] + [self._leases_key]
+        job_id = self._claim(keys=keys, args=[expires_at])
+        if not job_id:
+            return None
+
+        job_key = self._job_key(job_id)
+        pipe = self.client.pipeline()
+        pipe.hset(job_key, mapping={"state": LEASED, "worker_id": worker_id})
+        pipe.hincrby(job_key, "attempts", 1)
+        pipe.hgetall(job_key)
+        _, attempts, record = pipe.execute()
+
+        if record.get("cancel_requested"):
+            pipe = self.client.pipeline()
+            pipe.zrem(self._leases_key, job_id)
+            pipe.hset(job_key, "state", CANCELLED)
+            pipe.zadd(self._finished_key, {job_id: time.time()})
+            pipe.execute()
+            return None
+
+        return Lease(
+            job_id=job_id,
+            payload=json.loads(record["payload"]),
+            priority_class=record.get("priority", INTERACTIVE),
+            attempt=int(attempts),
+            expires_at=expires_at
+        )
+
+    def heartbeat(self, job_id: str, worker_id: str, lease_seconds: float,
+                  status: Optional[Dict[str, Any]] = None) -> bool:
+        job_key = self._job_key(job_id)
+        worker, state, cancel = self.client.hmget(job_key, "worker_id", "state", "cancel_requested")
+        if worker != worker_id or state != LEASED or cancel:
+            return False
+        pipe = self.client.pipeline()
+        pipe.zadd(self._leases_key, {job_id: time.time() + lease_seconds}, xx=True)
+        if status:
+            pipe.hset(job_key, "status", json.dumps(status, default=str))
+        pipe.execute()
+        return True
+
+    def complete(self, job_id: str, worker_id: str, result: Dict[str, Any]):
+        job_key = self._job_key(job_id)
+        if self.client.hget(job_key, "worker_id") != worker_id:
+            return
+        pipe = self.client.pipeline()
+        pipe.zrem(self._leases_key, job_id)
+        pipe.hset(job_key, mapping={"state": DONE, "status": json.dumps(result, default=str)})
+        pipe.zadd(self._finished_key, {job_id: time.time()})
+        pipe.execute()
+
+    def fail(self, job_id: str, worker_id: str, error: str, retry: bool = True):
+        job_key = self._job_key(job_id)
+        if self.client.hget(job_key, "worker_id") != worker_id:
+            return
+        self._release(job_id, error, retry)
+
+    def cancel(self, job_id: str) -> bool:
+        job_key = self._job_key(job_id)
+        state, priority = self.client.hmget(job_key, "state", "priority")
+        if state == PENDING and self.client.lrem(self._pending_key(priority), 0, job_id):
+            pipe = self.client.pipeline()
+            pipe.hset(job_key, "state", CANCELLED)
+            pipe.zadd(self._finished_key, {job_id: time.time()})
+            pipe.execute()
+            return True
+        if state in (PENDING, LEASED):
+            # Lost the race with a worker's claim; the worker sees the flag
+            self.client.hset(job_key, "cancel_requested", 1)
+            return True
+        return False
+
+    def requeue_expired(self) -> int:
+        expired = self.client.zrangebyscore(self._leases_key, "-inf", time.time())
+        requeued = 0
+        for job_id in expired:
+            # Only the caller that removes the lease gets to requeue the job
+            if self.client.zrem(self._leases_key, job_id):
+                self._release(job_id, "Worker lost", retry=True)
+                requeued += 1
+        if requeued:
+            self.logger.warning(f"♻️ Requeued {requeued} jobs from lost workers")
+        return requeued
+
+    def position(self, job_id: str) -> Optional[int]:
+        state, priority = self.client.hmget(self._job_key(job_id), "state", "priority")
+        if state != PENDING:
+            return None
+        index = self.client.lpos(self._pending_key(priority), job_id)
+        if index is None:
+            return None
+        ahead = PRIORITY_CLASSES[:PRIORITY_CLASSES.index(priority)]
+        return index + sum(self.client.llen(self._pending_key(cls)) for cls in ahead)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        record = self.client.hgetall(self._job_key(job_id))
+        if not record:
+            return None
+        return {
+            "job_id": job_id,
+            "state": record.get("state"),
+            "priority": record.get("priority"),
+            "attempts": int(record.get("attempts", 0)),
+            "worker_id": record.get("worker_id"),
+            "status": json.loads(record["status"]) if record.get("status") else None,
+            "error": record.get("error")
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "pending": {cls: self.client.llen(self._pending_key(cls)) for cls in PRIORITY_CLASSES},
+            "leased": self.client.zcard(self._leases_key)
+        }
+
+    def purge(self, retention_days: float) -> int:
+        cutoff = time.time() - retention_days * 86400
+        expired = self.client.zrangebyscore(self._finished_key, "-inf", cutoff)
+        if not expired:
+            return 0
+        pipe = self.client.pipeline()
+        pipe.delete(*(self._job_key(job_id) for job_id in expired))
+        pipe.zrem(self._finished_key, *expired)
+        pipe.execute()
+        return len(expired)
+
+    def _release(self, job_id: str, error: str, retry: bool):
+        job_key = self._job_key(job_id)
+        attempts, priority, cancel = self.client.hmget(job_key, "attempts", "priority", "cancel_requested")
+        pipe = self.client.pipeline()
+        pipe.zrem(self._leases_key, job_id)
+        pipe.hdel(job_key, "worker_id")
+        if cancel:
+            pipe.hset(job_key, mapping={"state": CANCELLED, "error": error})
+            pipe.zadd(self._finished_key, {job_id: time.time()})
+        elif retry and int(attempts or 0) < self.max_attempts:
+            pipe.hset(job_key, mapping={"state": PENDING, "error": error})
+            # Retries go to the front of their class
+            pipe.lpush(self._pending_key(priority), job_id)
+        else:
+            pipe.hset(job_key, mapping={"state": FAILED, "error": error})
+            pipe.zadd(self._finished_key, {job_id: time.time()})
+        pipe.execute()
+
+
+class RemoteJob:
+    """Handle for a job handed to the queue, mirroring ScheduledJob.wait()"""
+
+    def __init__(self, queue: WorkQueue, job_id: str, poll_seconds: float = 1.0):
+        self.queue = queue
+        self.job_id = job_id
+        self.poll_seconds = poll_seconds
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Block until a worker has finished the job and return its queue record"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            record = self.queue.get(self.job_id)
+            if record is None or record["state"] in (DONE, FAILED, CANCELLED):
+                return record
+            if deadline is not None and time.monotonic() >= deadline:
+                raise TimeoutError(f"Job {self.job_id} still {record['state']}")
+            time.sleep(self.poll_seconds)
+
+
+def make_work_queue(url: str, max_attempts: int = 3, logger: Optional[logging.Logger] = None) -> WorkQueue:
+    """Create a queue backend from a redis:// or sqlite:/// URL"""
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisWorkQueue(url, max_attempts=max_attempts, logger=logger)
+    if url.startswith("sqlite:///"):
+        return SqliteWorkQueue(Path(url[len("sqlite:///"):]), max_attempts=max_attempts, logger=logger)
+    raise ValueError(f"Unsupported queue URL: {url}")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test IFC pruning and splitting on small generated models
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.ifc_prune import PRUNE_PROFILES, prune_ifc
+from src.ifc_split import split_ifc
+
+HEADER = "ISO-10303-21;\nHEADER;\nFILE_DESCRIPTION((''),'2;1');\nENDSEC;\nDATA;\n"
+FOOTER = "ENDSEC;\nEND-ISO-10303-21;\n"
+
+# A wall and an annotation, each with its own geometry
+MODEL = """#1=IFCPROJECT('0YvctVUKr0kugbFTf53O9L',$,'Project',$,$,$,$,(#10),$);
+#10=IFCGEOMETRICREPRESENTATIONCONTEXT($,'Model',3,1.E-05,#11,$);
+#11=IFCAXIS2PLACEMENT3D(#12,$,$);
+#12=IFCCARTESIANPOINT((0.,0.,0.));
+#20=IFCANNOTATION('1YvctVUKr0kugbFTf53O9L',$,'Note',$,$,$,#21);
+#21=IFCPRODUCTDEFINITIONSHAPE($,$,(#22));
+#22=IFCSHAPEREPRESENTATION(#10,'Annotation','Curve2D',(#23,#24));
+#23=IFCPOLYLINE((#25,#26));
+#24=IFCCARTESIANPOINT((5.,5.));
+#25=IFCCARTESIANPOINT((1.,0.));
+#26=IFCCARTESIANPOINT((2.,0.));
+#30=IFCWALL('2YvctVUKr0kugbFTf53O9L',$,'Wall',$,$,$,#31,$,$);
+#31=IFCPRODUCTDEFINITIONSHAPE($,$,(#32));
+#32=IFCSHAPEREPRESENTATION(#10,'Body','SweptSolid',(#33));
+#33=IFCEXTRUDEDAREASOLID(#34,#11,#35,3.);
+#34=IFCRECTANGLEPROFILEDEF(.AREA.,$,#36,1.,0.2);
+#35=IFCDIRECTION((0.,0.,1.));
+#36=IFCAXIS2PLACEMENT2D(#37,$);
+#37=IFCCARTESIANPOINT((0.,0.));
+"""
+# Exporters put every representation in a layer
+LAYER = "#40=IFCPRESENTATIONLAYERASSIGNMENT('Layer',$,(#22,#32),$);\n"
+
+
+def _prune(work_dir: Path, name: str, data: str):
+    source = work_dir / f"{name}.ifc"
+    source.write_text(HEADER + data + FOOTER)
+    pruned = work_dir / f"{name}.pruned.ifc"
+    report = prune_ifc(source, pruned, PRUNE_PROFILES["viewer"])
+    return report, pruned.read_text()
+
+
+def test_prune_layered_filtered_product():
+    """A layer shared with a kept product does not bring back a filtered product's geometry"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        plain, plain_text = _prune(Path(work_dir), "plain", MODEL)
+        layered, layered_text = _prune(Path(work_dir), "layered", MODEL + LAYER)
+
+    for entity in ("#20=", "#21=", "#22=", "#23=", "#24="):
+        assert entity not in layered_text, f"{entity} kept through the layer"
+    assert "#40=IFCPRESENTATIONLAYERASSIGNMENT('Layer',$,(#32),$);" in layered_text
+    assert "#33=" in layered_text
+    # The layer costs its own record, not the annotation's geometry
+    assert layered["entities_out"] == plain["entities_out"] + 1
+    assert layered["bytes_saved"] > 0 and layered["bytes_out"] < plain["bytes_out"] + len(LAYER)
+
+
+def _storeys_model(walls: int, layer: bool) -> str:
+    """Two storeys of walls with their own geometry, optionally all in one presentation layer"""
+    lines = [
+        "#1=IFCPROJECT('0YvctVUKr0kugbFTf53O9L',$,'Project',$,$,$,$,(#10),$);",
+        "#10=IFCGEOMETRICREPRESENTATIONCONTEXT($,'Model',3,1.E-05,#11,$);",
+        "#11=IFCAXIS2PLACEMENT3D(#12,$,$);",
+        "#12=IFCCARTESIANPOINT((0.,0.,0.));",
+        "#2=IFCBUILDING('0YvctVUKr0kugbFTf53O9B',$,'Building',$,$,$,$,$,.ELEMENT.,$,$,$);",
+        "#3=IFCRELAGGREGATES('0YvctVUKr0kugbFTf53O9A',$,$,$,#1,(#2));",
+        "#4=IFCBUILDINGSTOREY('0YvctVUKr0kugbFTf53O91',$,'Level 1',$,$,$,$,$,.ELEMENT.,0.);",
+        "#5=IFCBUILDINGSTOREY('0YvctVUKr0kugbFTf53O92',$,'Level 2',$,$,$,$,$,.ELEMENT.,3.);",
+        "#6=IFCRELAGGREGATES('0YvctVUKr0kugbFTf53O9C',$,$,$,#2,(#4,#5));"
+    ]
+    storeys, representations = {4: [], 5: []}, []
+    for n in range(walls):
+        i = 100 + n * 10
+        lines += [
+            f"#{i}=IFCWALL('{n:022d}',$,'Wall {n}',$,$,$,#{i + 1},$,$);",
+            f"#{i + 1}=IFCPRODUCTDEFINITIONSHAPE($,$,(#{i + 2}));",
+            f"#{i + 2}=IFCSHAPEREPRESENTATION(#10,'Body','SweptSolid',(#{i + 3}));",
+            f"#{i + 3}=IFCEXTRUDEDAREASOLID(#{i + 4},#11,#{i + 5},3.);",
+            f"#{i + 4}=IFCRECTANGLEPROFILEDEF(.AREA.,$,#{i + 6},{n + 1}.,0.2);",
+            f"#{i + 5}=IFCDIRECTION((0.,0.,{n + 1}.));",
+            f"#{i + 6}=IFCAXIS2PLACEMENT2D(#{i + 7},$);",
+            f"#{i + 7}=IFCCARTESIANPOINT(({n}.,0.));"
+        ]
+        storeys[4 if n % 2 else 5].append(i)
+        representations.append(i + 2)
+    for storey, members in storeys.items():
+        refs = ",".join(f"#{m}" for m in members)
+        lines.append(f"#{storey + 10}=IFCRELCONTAINEDINSPATIALSTRUCTURE('0YvctVUKr0kugbFTf53O{storey:02d}',$,$,$,"
+                     f"({refs}),#{storey});")
+    if layer:
+        lines.append(f"#99=IFCPRESENTATIONLAYERASSIGNMENT('Walls',$,({','.join(f'#{r}' for r in representations)}),$);")
+    return "\n".join(lines) + "\n"
+
+
+def test_split_layered_parts():
+    """A layer over every representation does not pull the other parts' geometry into each part"""
+    with tempfile.TemporaryDirectory() as work_dir:
+        work_dir = Path(work_dir)
+        entities = {}
+        for layer in (False, True):
+            source = work_dir / f"model-{layer}.ifc"
+            source.write_text(HEADER + _storeys_model(100, layer) + FOOTER)
+            out_dir = work_dir / f"parts-{layer}"
+            out_dir.mkdir()
+            report = split_ifc(source, out_dir, 2)
+            assert len(report["parts"]) == 2
+            entities[layer] = [part["entities"] for part in report["parts"]]
+            # Each part repeats only the shared structure; together they are about the source
+            assert sum(part["size_bytes"] for part in report["parts"]) < report["bytes_in"] * 1.2
+    # The layer itself is the only addition to each part
+    assert entities[True] == [n + 1 for n in entities[False]], entities
+
+
+if __name__ == "__main__":
+    for name, test in sorted(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test the conversion scheduler's dispatch order under the thread budget
+"""
+import sys
+import threading
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.scheduler import ConversionScheduler, INTERACTIVE, WATCH, BACKFILL, STRIDE
+
+
+def _blocker():
+    """A job function that runs until its event is set"""
+    release = threading.Event()
+    started = threading.Event()
+
+    def run():
+        started.set()
+        release.wait(10)
+    return run, started, release
+
+
+def test_interactive_passes_waiting_wide_job():
+    scheduler = ConversionScheduler(max_workers=3, thread_budget=4, reserved_interactive_slots=1)
+    try:
+        run, started, release = _blocker()
+        scheduler.submit(run, priority_class=BACKFILL, threads=2)
+        assert started.wait(5)
+
+        # Needs the whole budget, so waits for the running backfill job
+        wide = scheduler.submit(lambda: None, priority_class=WATCH, threads=4)
+        narrow = scheduler.submit(lambda: None, priority_class=BACKFILL, threads=1)
+        # Interactive work is behind in stride order, as after a burst of uploads
+        scheduler._pass[INTERACTIVE] += 2 * STRIDE
+        interactive = scheduler.submit(lambda: None, priority_class=INTERACTIVE, threads=1)
+        assert scheduler.queue_position(interactive.job_id) == 0
+        interactive.wait(5)
+
+        # Other background work does not overtake the waiting wide job
+        assert wide.state == "queued" and narrow.state == "queued"
+        assert scheduler.queue_position(wide.job_id) == 0
+        assert scheduler.queue_position(narrow.job_id) == 1
+        release.set()
+        wide.wait(5)
+        narrow.wait(5)
+    finally:
+        scheduler.shutdown()
+
+
+def test_interactive_waits_for_threads():
+    scheduler = ConversionScheduler(max_workers=3, thread_budget=2, reserved_interactive_slots=1)
+    try:
+        run, started, release = _blocker()
+        scheduler.submit(run, priority_class=BACKFILL, threads=2)
+        assert started.wait(5)
+
+        interactive = scheduler.submit(lambda: None, priority_class=INTERACTIVE, threads=1)
+        watch = scheduler.submit(lambda: None, priority_class=WATCH, threads=1)
+        assert not interactive._done.wait(0.2)
+        assert scheduler.queue_position(interactive.job_id) == 0
+        assert scheduler.queue_position(watch.job_id) == 1
+        release.set()
+        interactive.wait(5)
+        watch.wait(5)
+    finally:
+        scheduler.shutdown()
+
+
+if __name__ == "__main__":
+    for name, test in sorted(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
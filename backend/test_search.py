@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test element search: BIM identifier tokens, fuzzy terms and ranking
+"""
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from src.search_index import MAX_CANDIDATES, SearchIndex, bim_tokens, query_terms
+
+
+def _index(directory: str, documents) -> SearchIndex:
+    index = SearchIndex(Path(directory) / "search.sqlite3")
+    index.index_model("model", documents)
+    return index
+
+
+def _door(global_id: str, tag: str, name: str = "Door") -> dict:
+    return {"global_id": global_id, "ifc_type": "IFCDOOR", "name": name, "tag": tag}
+
+
+def test_bim_tokens():
+    assert bim_tokens("D-1203") == ["d-1203", "d1203", "d", "1203"]
+    assert bim_tokens("Fire_Rated (EI30)") == ["fire_rated", "firerated", "fire", "rated", "ei30", "ei", "30"]
+    assert bim_tokens("W-007") == ["w-007", "w007", "w", "007", "7"]
+    assert bim_tokens("Türblatt") == ["turblatt"]
+    assert bim_tokens(None) == []
+
+
+def test_query_terms():
+    assert query_terms("D1203") == ["d1203"]
+    assert query_terms("d-12 \"1203\"") == ["d12", "1203"]
+    assert query_terms("door DOOR Door") == ["door"]
+    assert query_terms(" -- ") == []
+
+
+def test_identifier_forms():
+    with tempfile.TemporaryDirectory() as directory:
+        index = _index(directory, [_door("A", "D-1203"), _door("B", "D-1300"), _door("C", "W-1203", "Window")])
+        for query, expected in (("D1203", {"A"}), ("d-12", {"A"}), ("1203", {"A", "C"}), ("D-1203", {"A"})):
+            found = {hit["global_id"] for hit in index.search(query, fuzzy=False)["results"]}
+            assert found == expected, (query, found)
+
+
+def test_fuzzy_terms():
+    with tempfile.TemporaryDirectory() as directory:
+        index = _index(directory, [_door("A", "D-1203"), {"global_id": "B", "ifc_type": "IFCWALL", "name": "Wall"}])
+        result = index.search("dorr")
+        assert result["fuzzy"] and [hit["global_id"] for hit in result["results"]] == ["A"]
+        assert index.search("dorr", fuzzy=False)["results"] == []
+        # Identifiers one edit away are found when the exact one is not there
+        assert [hit["global_id"] for hit in index.search("D1204")["results"]] == ["A"]
+
+
+def test_best_match_among_many():
+    with tempfile.TemporaryDirectory() as directory:
+        # Broad matches first, the best one (the term in fewest other words) last
+        documents = [{"global_id": f"W{i}", "ifc_type": "IFCWALL", "name": "Wall",
+                      "text": "reinforced concrete cast in place"}
+                     for i in range(MAX_CANDIDATES + 100)]
+        documents.append({"global_id": "BEST", "ifc_type": "IFCWALL", "name": "Concrete", "tag": "concrete"})
+        index = _index(directory, documents)
+        result = index.search("concrete", limit=1)
+        assert result["results"][0]["global_id"] == "BEST", result["results"]
+        assert result["matches"] == f"{MAX_CANDIDATES}+"
+
+
+if __name__ == "__main__":
+    for name, test in sorted(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✅ {name}")
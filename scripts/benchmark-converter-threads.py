@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+QGEN_IMPFRAG Converter Thread Benchmark
+=======================================
+
+Converts every IFC file of a corpus with the single-threaded web-ifc
+build and with the multithreaded one, and reports the wall time of
+each and the speedup.
+
+    python scripts/benchmark-converter-threads.py [--corpus data/ifc] [--threads 4] [--runs 3]
+
+The multithreaded build is looked up like the converter does
+(QGEN_WEBIFC_MT_PATH, by default backend/node_modules/web-ifc-mt). The
+report is printed and written to data/reports/benchmarks.
+
+Author: XQG4_AXIS Team
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import replace
+from datetime import datetime
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+BACKEND_DIR = PROJECT_ROOT / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from src.converter_runner import ConverterRunner  # noqa: E402
+
+
+def time_conversion(runner, ifc_file, threads, runs, work_dir):
+    """Median wall time of converting ifc_file on `threads` web-ifc threads, or None if it failed"""
+    limits = replace(runner.limits_for(ifc_file), threads=threads)
+    seconds = []
+    for run in range(runs):
+        output = Path(work_dir) / f"{ifc_file.stem}.t{threads}.{run}.frag"
+        started = time.perf_counter()
+        result = runner.run(ifc_file, output, limits=limits)
+        elapsed = time.perf_counter() - started
+        output.unlink(missing_ok=True)
+        if not result.success:
+            print(f"   ❌ {threads} thread(s): {result.error_message[-300:]}")
+            return None
+        seconds.append(elapsed)
+    return round(statistics.median(seconds), 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multithreaded against single-threaded web-ifc")
+    parser.add_argument("--corpus", type=Path, default=PROJECT_ROOT / "data" / "ifc")
+    parser.add_argument("--threads", type=int, default=min(os.cpu_count() or 1, 8))
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--max-heap-mb", type=int, default=8192)
+    parser.add_argument("--output", type=Path, default=PROJECT_ROOT / "data" / "reports" / "benchmarks")
+    args = parser.parse_args()
+
+    mt_path = Path(os.getenv("QGEN_WEBIFC_MT_PATH", BACKEND_DIR / "node_modules" / "web-ifc-mt"))
+    if not (mt_path / "web-ifc-node.wasm").exists():
+        print(f"⚠️  No multithreaded web-ifc build in {mt_path}: both runs will be single-threaded")
+
+    files = sorted(args.corpus.glob("*.ifc"), key=lambda f: f.stat().st_size)
+    if not files:
+        print(f"❌ No IFC files in {args.corpus}")
+        return 1
+
+    runner = ConverterRunner(BACKEND_DIR / "ifc_converter.js", cwd=BACKEND_DIR, max_heap_mb=args.max_heap_mb)
+    results = []
+    with tempfile.TemporaryDirectory(prefix="qgen-bench-") as work_dir:
+        for ifc_file in files:
+            size_mb = round(ifc_file.stat().st_size / (1024 * 1024), 2)
+            print(f"📄 {ifc_file.name} ({size_mb} MB)")
+            single = time_conversion(runner, ifc_file, 1, args.runs, work_dir)
+            multi = time_conversion(runner, ifc_file, args.threads, args.runs, work_dir)
+            speedup = round(single / multi, 2) if single and multi else None
+            print(f"   1 thread: {single}s, {args.threads} threads: {multi}s, speedup: {speedup}x")
+            results.append({"file": ifc_file.name, "size_mb": size_mb, "single_thread_seconds": single,
+                            "multi_thread_seconds": multi, "speedup": speedup})
+
+    measured = [r for r in results if r["speedup"]]
+    single_total = sum(r["single_thread_seconds"] for r in measured)
+    multi_total = sum(r["multi_thread_seconds"] for r in measured)
+    report = {
+        "created": datetime.now().isoformat(),
+        "corpus": str(args.corpus),
+        "threads": args.threads,
+        "runs": args.runs,
+        "multithreaded_build": str(mt_path) if (mt_path / "web-ifc-node.wasm").exists() else None,
+        "files": results,
+        "total_speedup": round(single_total / multi_total, 2) if multi_total else None
+    }
+    args.output.mkdir(parents=True, exist_ok=True)
+    report_file = args.output / f"converter-threads-{datetime.now():%Y%m%d-%H%M%S}.json"
+    report_file.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    print(f"🏁 Total speedup on {len(measured)} files: {report['total_speedup']}x")
+    print(f"✅ Report written: {report_file}")
+    return 0 if len(measured) == len(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,6 +6,13 @@ QGEN_IMPFRAG Environment Detection and Configuration
 Automatically detects the operating system and configures paths,
 ports, and environment variables for optimal cross-platform operation.
 
+It also detects the usable CPU cores and memory (container cgroup
+limits included) and the disk type, free space and filesystem of the
+data directories. A capacity profile is derived from them: converter
+concurrency, Node heap size, thread budget, tiling parallelism, SQLite
+cache and server worker counts. The profile is written to .env.auto,
+which the backend loads at startup (--capacity prints it as JSON).
+
 Supports:
 - Linux (current server environment)
 - Windows (client laptop/PC deployment)
@@ -14,11 +21,24 @@ Supports:
 
 import os
 import sys
+import math
+import shutil
 import platform
+import tempfile
 import json
 from pathlib import Path
 from typing import Dict, Any, Optional
 
+# Filesystems whose I/O goes over the network
+NETWORK_FILESYSTEMS = {"nfs", "nfs4", "cifs", "smb3", "smbfs", "sshfs", "fuse.sshfs", "9p", "glusterfs",
+                       "fuse.glusterfs", "ceph", "fuse.ceph", "lustre", "gpfs", "afs", "davfs", "fuse.s3fs"}
+
+# Capacity profile bounds
+MAX_CONVERSIONS = 16
+MEMORY_PER_CONVERSION_MB = 3072
+MIN_HEAP_MB = 1024
+MAX_HEAP_MB = 8192
+
 class EnvironmentManager:
     """Cross-platform environment configuration manager"""
     
@@ -172,6 +192,219 @@ class EnvironmentManager:
             "package_manager": "npm"  # Could be extended to support yarn, pnpm
         }
     
+    def detect_cpu(self) -> Dict[str, Any]:
+        """Detect the CPU cores this process may use (affinity mask and cgroup quota included)"""
+        logical = os.cpu_count() or 1
+        usable = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else logical
+        quota = self.get_cgroup_cpu_quota()
+        if quota is not None:
+            usable = max(1, min(usable, math.ceil(quota)))
+        
+        return {
+            "logical": logical,
+            "usable": usable,
+            "cgroup_quota": round(quota, 2) if quota is not None else None
+        }
+    
+    def get_cgroup_cpu_quota(self) -> Optional[float]:
+        """Get the container's CPU quota in cores, None without one"""
+        try:
+            # cgroup v2: "<quota> <period>" or "max <period>"
+            quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()[:2]
+            return None if quota == "max" else int(quota) / int(period)
+        except (OSError, ValueError):
+            pass
+        
+        try:
+            # cgroup v1: a quota of -1 means unlimited
+            quota = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+            period = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+            return quota / period if quota > 0 else None
+        except (OSError, ValueError):
+            return None
+    
+    def detect_memory(self) -> Dict[str, Any]:
+        """Detect physical memory and the container's memory limit"""
+        total = self.get_physical_memory()
+        limit = self.get_cgroup_memory_limit()
+        known = [value for value in (total, limit) if value]
+        
+        def to_mb(value):
+            return value // (1024 * 1024) if value else None
+        
+        return {
+            "total_mb": to_mb(total),
+            "cgroup_limit_mb": to_mb(limit),
+            "usable_mb": to_mb(min(known)) if known else None
+        }
+    
+    def get_physical_memory(self) -> Optional[int]:
+        """Get physical memory in bytes"""
+        if self.platform == "windows":
+            try:
+                import ctypes
+                
+                class MemoryStatus(ctypes.Structure):
+                    _fields_ = [("dwLength", ctypes.c_ulong), ("dwMemoryLoad", ctypes.c_ulong),
+                                ("ullTotalPhys", ctypes.c_ulonglong), ("ullAvailPhys", ctypes.c_ulonglong),
+                                ("ullTotalPageFile", ctypes.c_ulonglong), ("ullAvailPageFile", ctypes.c_ulonglong),
+                                ("ullTotalVirtual", ctypes.c_ulonglong), ("ullAvailVirtual", ctypes.c_ulonglong),
+                                ("ullAvailExtendedVirtual", ctypes.c_ulonglong)]
+                
+                status = MemoryStatus()
+                status.dwLength = ctypes.sizeof(MemoryStatus)
+                if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+                    return status.ullTotalPhys
+            except (AttributeError, OSError):
+                pass
+            return None
+        
+        try:
+            return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        except (AttributeError, ValueError, OSError):
+            return None
+    
+    def get_cgroup_memory_limit(self) -> Optional[int]:
+        """Get the container's memory limit in bytes, None without one"""
+        for limit_file in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+            try:
+                value = Path(limit_file).read_text().strip()
+            except OSError:
+                continue
+            # cgroup v1 reports "no limit" as a huge page-aligned number
+            if value == "max" or int(value) >= 1 << 60:
+                return None
+            return int(value)
+        return None
+    
+    def detect_storage(self, path: Path) -> Dict[str, Any]:
+        """Detect free space, filesystem and disk type of the volume holding a directory"""
+        # Directories that do not exist yet will be created on their nearest existing parent's volume
+        path = path.absolute()
+        while not path.exists() and path != path.parent:
+            path = path.parent
+        
+        usage = shutil.disk_usage(path)
+        storage = {
+            "path": str(path),
+            "free_gb": round(usage.free / 1024 ** 3, 1),
+            "total_gb": round(usage.total / 1024 ** 3, 1),
+            "filesystem": None,
+            "network": False,
+            "disk_type": "unknown"
+        }
+        
+        if self.platform == "windows":
+            try:
+                import ctypes
+                drive = os.path.splitdrive(str(path))[0] + "\\"
+                # DRIVE_REMOTE
+                storage["network"] = str(path).startswith("\\\\") or ctypes.windll.kernel32.GetDriveTypeW(drive) == 4
+            except (AttributeError, OSError):
+                pass
+        else:
+            mount = self.find_mount(path)
+            if mount:
+                storage["filesystem"] = mount["filesystem"]
+                storage["network"] = mount["filesystem"] in NETWORK_FILESYSTEMS
+                if not storage["network"]:
+                    storage["disk_type"] = self.get_disk_type(mount["device"])
+        
+        if storage["network"]:
+            storage["disk_type"] = "network"
+        
+        return storage
+    
+    def find_mount(self, path: Path) -> Optional[Dict[str, str]]:
+        """Find the mount holding a path in /proc/self/mountinfo (Linux only)"""
+        try:
+            lines = Path("/proc/self/mountinfo").read_text().splitlines()
+        except OSError:
+            return None
+        
+        target = str(path.resolve())
+        best = None
+        for line in lines:
+            # <id> <parent> <major:minor> <root> <mount point> <options> [optional...] - <fstype> <source> ...
+            fields, _, tail = line.partition(" - ")
+            fields, tail = fields.split(), tail.split()
+            if len(fields) < 5 or not tail:
+                continue
+            mount_point = fields[4].replace("\\040", " ")
+            inside = target == mount_point or target.startswith(mount_point.rstrip("/") + "/")
+            if inside and (best is None or len(mount_point) >= len(best["mount_point"])):
+                best = {"mount_point": mount_point, "device": fields[2], "filesystem": tail[0]}
+        return best
+    
+    def get_disk_type(self, device: str) -> str:
+        """Get "ssd" or "hdd" for a block device given as major:minor"""
+        device_dir = Path("/sys/dev/block") / device
+        # Partitions have no queue of their own; it belongs to their parent disk
+        for queue in (device_dir / "queue", device_dir / ".." / "queue"):
+            try:
+                return "hdd" if queue.joinpath("rotational").read_text().strip() == "1" else "ssd"
+            except OSError:
+                continue
+        return "unknown"
+    
+    def get_capacity_profile(self) -> Dict[str, Any]:
+        """Derive concurrency, heap and cache sizes from the detected hardware"""
+        cpu = self.detect_cpu()
+        memory = self.detect_memory()
+        project_root = self.get_project_root()
+        directories = self.get_data_directories()
+        storage = {
+            "ifc_input": self.detect_storage(Path(directories["ifc_input"])),
+            "fragments_output": self.detect_storage(Path(directories["fragments_output"])),
+            "state": self.detect_storage(project_root / "data" / "state")
+        }
+        
+        cores = cpu["usable"]
+        memory_mb = memory["usable_mb"] or 4096
+        network = any(volume["network"] for volume in storage.values())
+        slow_disk = any(volume["disk_type"] in ("hdd", "network") for volume in storage.values())
+        
+        # A conversion keeps about two cores busy (web-ifc plus Node's GC and compiler threads)
+        # and needs a few GB, whichever runs out first
+        conversions = max(1, min(cores // 2, memory_mb // MEMORY_PER_CONVERSION_MB, MAX_CONVERSIONS))
+        # Converter heaps get 60% of memory; the rest is for the API servers, SQLite and the page cache
+        heap_mb = int(min(MAX_HEAP_MB, max(MIN_HEAP_MB, memory_mb * 0.6 / conversions))) // 256 * 256
+        split_parts = max(1, min(cores, 8))
+        
+        # Only these are loaded by the API servers (src/startup.py CAPACITY_SETTINGS)
+        settings = {
+            "QGEN_IMPFRAG_MAX_CONCURRENT_CONVERSIONS": conversions,
+            "QGEN_IMPFRAG_CONVERTER_MAX_HEAP_MB": heap_mb,
+            # Multithreaded conversions may use every core between them
+            "QGEN_IMPFRAG_THREAD_BUDGET": cores,
+            "QGEN_IMPFRAG_SPLIT_PARTS": split_parts,
+            # Tile conversions read and write a lot; spinning and network disks do not keep up with many
+            "QGEN_IMPFRAG_SPLIT_MAX_PARALLEL": min(split_parts, 2) if slow_disk else split_parts,
+            "QGEN_IMPFRAG_SQLITE_CACHE_MB": max(16, min(256, memory_mb // 64)),
+            # Read by gunicorn and other WSGI servers
+            "WEB_CONCURRENCY": max(2, min(cores + 1, 9))
+        }
+        if network:
+            # The Node compile cache is read on every converter start: keep it off the network
+            settings["QGEN_IMPFRAG_CONVERTER_CACHE_DIR"] = str(Path(tempfile.gettempdir()) / "qgen-node-compile-cache")
+        
+        warnings = []
+        if storage["state"]["network"]:
+            warnings.append("SQLite job state in data/state is on a network mount; WAL locking is unreliable there")
+        for name, volume in storage.items():
+            if volume["free_gb"] < 10:
+                warnings.append(f"Only {volume['free_gb']} GB free for {name} ({volume['path']})")
+        if memory_mb < conversions * MIN_HEAP_MB * 2:
+            warnings.append(f"{memory_mb} MB memory is tight for converting large models")
+        
+        return {
+            "cpu": cpu,
+            "memory": memory,
+            "storage": storage,
+            "settings": settings,
+            "warnings": warnings
+        }
+    
     def load_base_config(self) -> Dict[str, Any]:
         """Load base configuration"""
         return {
@@ -191,6 +424,7 @@ class EnvironmentManager:
             "docker": self.get_docker_configuration(),
             "python": self.get_python_configuration(),
             "node": self.get_node_configuration(),
+            "capacity": self.get_capacity_profile(),
             "base": self.base_config
         }
     
@@ -200,6 +434,9 @@ class EnvironmentManager:
             output_path = self.get_project_root() / ".env.auto"
         
         config = self.environment_config
+        capacity = config['capacity']
+        capacity_lines = "\n".join(f"{name}={value}" for name, value in capacity['settings'].items())
+        capacity_warnings = "".join(f"# ⚠️  {warning}\n" for warning in capacity['warnings'])
         
         env_content = f"""# QGEN_IMPFRAG Auto-Generated Environment Configuration
 # Generated for: {config['platform']} platform
@@ -237,6 +474,10 @@ VITE_FRONTEND_URL=http://localhost:{config['ports']['frontend']}
 
 # Security Configuration
 QGEN_CORS_ORIGINS=http://localhost:{config['ports']['frontend']},http://localhost:{config['ports']['frontend_dev']}
+
+# Capacity Profile ({capacity['cpu']['usable']} usable cores, {capacity['memory']['usable_mb']} MB usable memory)
+# Loaded by the backend at startup; variables already set in the environment take precedence
+{capacity_warnings}{capacity_lines}
 """
         
         with open(output_path, 'w') as f:
@@ -263,6 +504,23 @@ QGEN_CORS_ORIGINS=http://localhost:{config['ports']['frontend']},http://localhos
             exists = "✅" if Path(path).exists() else "❌"
             print(f"  {name}: {exists} {path}")
         print("")
+        
+        capacity = config['capacity']
+        quota = capacity['cpu']['cgroup_quota']
+        limit = capacity['memory']['cgroup_limit_mb']
+        print("⚙️  Capacity Profile:")
+        print(f"  CPU: {capacity['cpu']['usable']} of {capacity['cpu']['logical']} cores usable"
+              + (f" (cgroup quota {quota})" if quota is not None else ""))
+        print(f"  Memory: {capacity['memory']['usable_mb']} MB usable"
+              + (f" (cgroup limit {limit} MB)" if limit else ""))
+        for name, volume in capacity['storage'].items():
+            print(f"  {name}: {volume['disk_type']}, {volume['filesystem'] or 'unknown'} filesystem, "
+                  f"{volume['free_gb']} of {volume['total_gb']} GB free")
+        for name, value in capacity['settings'].items():
+            print(f"  {name}={value}")
+        for warning in capacity['warnings']:
+            print(f"  ⚠️  {warning}")
+        print("")
 
 def main():
     """Main function for command-line usage"""
@@ -276,6 +534,8 @@ def main():
             print(f"✅ Environment file created: {env_file}")
         elif sys.argv[1] == "--json":
             print(json.dumps(env_manager.environment_config, indent=2))
+        elif sys.argv[1] == "--capacity":
+            print(json.dumps(env_manager.environment_config["capacity"], indent=2))
     else:
         env_manager.print_configuration_summary()
         env_file = env_manager.create_environment_file()